@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技能时间轴查看器 - 性能基准
+
+覆盖解析吞吐量、首次渲染时间、每次点击的重算延迟和每行内存，使用 RAID 目录下的
+真实时间轴以及 1k ~ 1M 条目的合成时间轴。结果写成 JSON，并与保存的基线比较。
+
+    python benchmarks/run_benchmarks.py                       # 运行并与基线比较
+    python benchmarks/run_benchmarks.py --quick               # 合成时间轴最多 100k 条
+    python benchmarks/run_benchmarks.py --save-baseline       # 把本次结果保存为基线
+    python benchmarks/run_benchmarks.py --runs 3              # 整组运行 3 次，每项取中位数
+
+渲染相关的基准需要图形环境（Linux 下可用 xvfb-run），没有时自动跳过。基线中没有的指标
+视为失败。修改热点路径的提交应同时更新基线，或在提交说明中解释退化的原因。
+"""
+
+import os
+import sys
+import gc
+import json
+import glob
+import time
+import random
+import argparse
+import statistics
+import platform
+import subprocess
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from timeline_core.parser import parse_timeline_lines, parse_timeline_file  # noqa: E402
+from timeline_core.plan import SerpentPlan  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(ROOT_DIR, "benchmarks", "baseline.json")
+SYNTHETIC_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+QUICK_SIZES = [1_000, 10_000, 100_000]
+
+
+def synthetic_timeline(entry_count: int, seed: int = 1) -> list:
+    """生成合成时间轴文本行：每 0.5 秒一条，夹杂同步窗口、duration 和注释"""
+    rng = random.Random(seed)
+    lines = ['hideall "--sync--"', ""]
+    for index in range(entry_count):
+        time_val = index * 0.5
+        if index % 50 == 0:
+            lines.append(f"# phase {index // 50}")
+        if index % 10 == 0:
+            lines.append(f'{time_val:.1f} "--sync--" StartsUsing {{"id":"{index % 0xFFFF:04X}","source":"Boss"}} window 10,10')
+        elif index % 7 == 0:
+            lines.append(f'{time_val:.1f} "技能 {rng.randrange(200)}" duration {rng.randrange(1, 10)}')
+        else:
+            lines.append(f'{time_val:.1f} "技能 {rng.randrange(200)}" Ability {{"id":"{index % 0xFFFF:04X}","source":"Boss"}}')
+    return lines
+
+
+def synthetic_uses(rows: list, interval: float = 10.0) -> list:
+    """每隔 interval 秒在最近的行上使用一次（数量多但始终可行的计划）"""
+    uses = []
+    next_time = 0.0
+    for time_val, skill_name in rows:
+        if time_val >= next_time:
+            uses.append((time_val, skill_name))
+            next_time = time_val + interval
+    return uses
+
+
+def best_of(function, repeat: int, number: int = 1) -> float:
+    """重复 repeat 次、每次连续执行 number 遍，取最短的平均每遍耗时（秒）
+
+    不到 1 毫秒的操作单次计时受调度抖动影响很大，应增大 number。与 timeit 相同，
+    计时期间暂停垃圾回收。
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            best = min(best, (time.perf_counter() - start) / number)
+        finally:
+            gc.enable()
+    return best
+
+
+def small_number(count: int) -> int:
+    """数据量较小（单次耗时在毫秒以下）时每次计时连续执行的遍数"""
+    return 20 if count <= 10_000 else 1
+
+
+def bench_parse(results: dict, name: str, lines: list, repeat: int):
+    duration = best_of(lambda: parse_timeline_lines(lines), repeat, small_number(len(lines)))
+    results[f"parse.{name}.seconds"] = duration
+    results[f"parse.{name}.lines_per_second"] = len(lines) / duration if duration else 0.0
+
+
+def bench_memory(results: dict, name: str, lines: list):
+    """解析结果加上逐行蛇胆状态的内存，按行平均"""
+    gc.collect()
+    tracemalloc.start()
+    parsed = parse_timeline_lines(lines)
+    plan = SerpentPlan(parsed.as_rows())
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results[f"memory.{name}.bytes_per_row"] = current / max(1, len(plan.rows))
+    del parsed, plan
+
+
+def bench_recompute(results: dict, name: str, rows: list, repeat: int):
+    """每次点击的重算：全量扫描，以及在时间轴中间/末尾添加一次使用后的增量重算"""
+    plan = SerpentPlan(rows)
+    for use_time, skill_name in synthetic_uses(rows):
+        plan.ledger.add_use(use_time, skill_name)
+    results[f"recompute.{name}.uses"] = len(plan.ledger)
+    number = small_number(len(rows))
+    results[f"recompute.{name}.full_seconds"] = best_of(plan.recompute, repeat, number)
+    plan.recompute()
+
+    for position, fraction in (("middle", 0.5), ("late", 0.95)):
+        use_time = rows[int(len(rows) * fraction)][0] + 1.0
+
+        def click():
+            plan.ledger.add_use(use_time, "bench")
+            plan.mark_dirty(use_time, use_time + plan.regen_interval)
+            plan.refresh()
+            plan.ledger.remove_use(use_time, "bench")
+            plan.mark_dirty(use_time, use_time + plan.regen_interval)
+            plan.refresh()
+
+        # 一次 click 包含添加和撤销两次增量重算
+        results[f"recompute.{name}.click_{position}_seconds"] = best_of(click, repeat, number) / 2
+
+
+def bench_render(results: dict, cases: list, repeat: int) -> str:
+    """首次渲染与点击后重绘，需要图形环境；返回跳过原因（成功时为空字符串）"""
+    try:
+        import tkinter as tk
+        from timeline_viewer import TimelineViewer
+        viewer = TimelineViewer()
+    except (ImportError, RuntimeError) as e:
+        return str(e)
+    except Exception as e:  # tkinter.TclError：没有显示器
+        return str(e)
+
+    try:
+        viewer.root.geometry("1200x650")
+        viewer.root.update()
+        for name, rows in cases:
+            def render():
+                viewer.timeline_data = rows
+                viewer.display_timeline()
+                viewer.root.update_idletasks()
+
+            results[f"render.{name}.first_seconds"] = best_of(render, repeat)
+
+            offset_var = tk.StringVar(value="0")
+            click_time = rows[len(rows) // 2][0]
+
+            def click():
+                viewer.use_serpent_offering_with_individual_offset(click_time, "bench", offset_var)
+                viewer.flush_serpent_updates()
+                viewer.root.update_idletasks()
+                viewer.reset_serpent()
+
+            results[f"render.{name}.click_seconds"] = best_of(click, repeat)
+            results[f"render.{name}.full_refresh_seconds"] = best_of(viewer.update_all_serpent_displays, repeat)
+    finally:
+        viewer.root.destroy()
+    return ""
+
+
+def run(sizes: list, repeat: int, render: bool) -> dict:
+    results = {}
+    render_cases = []
+
+    for file_path in sorted(glob.glob(os.path.join(ROOT_DIR, "RAID", "*.txt"))):
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        with open(file_path, "r", encoding="utf-8") as file:
+            lines = file.read().splitlines()
+        bench_parse(results, name, lines, repeat)
+        results[f"parse.{name}.file_seconds"] = best_of(lambda: parse_timeline_file(file_path), repeat,
+                                                        small_number(len(lines)))
+        rows = parse_timeline_lines(lines).as_rows()
+        bench_recompute(results, name, rows, repeat)
+        render_cases.append((name, rows))
+        print(f"  {name}: {len(rows)} 行", file=sys.stderr)
+
+    for size in sizes:
+        name = f"synthetic_{size}"
+        lines = synthetic_timeline(size)
+        size_repeat = repeat if size <= 100_000 else 1
+        bench_parse(results, name, lines, size_repeat)
+        bench_memory(results, name, lines)
+        rows = parse_timeline_lines(lines).as_rows()
+        bench_recompute(results, name, rows, size_repeat)
+        if size <= 100_000:
+            render_cases.append((name, rows))
+        print(f"  {name}: {len(rows)} 行", file=sys.stderr)
+
+    if render:
+        skipped = bench_render(results, render_cases, repeat)
+        if skipped:
+            print(f"  跳过渲染基准: {skipped}", file=sys.stderr)
+    return results
+
+
+def median_results(runs: list) -> dict:
+    """多次整组运行的结果，每项指标取中位数（减少机器负载在运行之间变化的影响）"""
+    return {key: statistics.median(results[key] for results in runs if key in results) for key in runs[0]}
+
+
+def git_revision() -> str:
+    """当前代码的 git 提交（不在仓库中时为空字符串）"""
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    return output.stdout.strip() if output.returncode == 0 else ""
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """与基线比较耗时和内存（越小越好的指标），返回退化的指标和基线中没有的指标
+
+    基线中没有的指标无法比较，同样视为失败：新增基准或渲染基准首次运行时需要重新生成基线。
+    """
+    regressions = []
+    for key, value in sorted(results.items()):
+        old = baseline.get(key)
+        if old is None:
+            print(f"{key:<60} {'-':>12} -> {value:12.6g}  ← 基线中没有")
+            regressions.append(key)
+            continue
+        if not old or key.endswith("lines_per_second") or key.endswith(".uses"):
+            continue
+        ratio = value / old
+        marker = ""
+        if ratio > threshold:
+            marker = "  ← 退化"
+            regressions.append(key)
+        print(f"{key:<60} {old:12.6g} -> {value:12.6g}  x{ratio:5.2f}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="技能时间轴查看器性能基准")
+    parser.add_argument("--quick", action="store_true", help="合成时间轴最多 100k 条")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数，取最短耗时（默认 5）")
+    parser.add_argument("--runs", type=int, default=1, help="整组运行的次数，每项取中位数（默认 1）")
+    parser.add_argument("--no-render", action="store_true", help="跳过需要图形环境的渲染基准")
+    parser.add_argument("--output", help="结果 JSON 文件（默认只打印）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线 JSON 文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--threshold", type=float, default=1.25, help="超过基线多少倍视为退化（默认 1.25）")
+    args = parser.parse_args()
+
+    print("运行基准...", file=sys.stderr)
+    sizes = QUICK_SIZES if args.quick else SYNTHETIC_SIZES
+    results = median_results([run(sizes, args.repeat, not args.no_render) for _ in range(max(1, args.runs))])
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"已保存基线: {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as file:
+        saved = json.load(file)
+    print(f"基线: {saved.get('revision') or '未知提交'} ({saved.get('time', '')})", file=sys.stderr)
+    baseline = saved["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} 项指标相对基线退化超过 {args.threshold}x 或基线中没有", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
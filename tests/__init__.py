@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""timeline_core 的测试"""
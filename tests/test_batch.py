@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""批量分析的摘要字段"""
+
+import glob
+import os
+
+import pytest
+
+from timeline_core.batch import analyze_timeline, summarize_gauge
+
+RAID_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "RAID")
+RAID_FILES = sorted(glob.glob(os.path.join(RAID_DIR, "*.txt")))
+
+
+@pytest.mark.parametrize("file_path", RAID_FILES, ids=os.path.basename)
+@pytest.mark.parametrize("match, window", [((), 0.0), (("波动炮", "--"), 2.0), (("a", "e"), 0.0)])
+def test_desired_rows_are_planned_or_dropped(file_path, match, window):
+    summary = analyze_timeline(file_path, match, window)
+    assert summary["desired_rows"] == summary["planned_uses"] + summary["dropped_uses"]
+    if not match:
+        assert summary["dropped_uses"] == 0
+        assert summary["planned_uses"] == summary["max_usable_charges"]
+
+
+def test_summarize_gauge_counts_wasted_charges():
+    # 0 ~ 100 秒内从未使用：满蛇胆 100 秒，可以额外放入 3 次使用
+    summary = summarize_gauge([], 100.0)
+    assert summary["full_seconds"] == 100.0
+    assert summary["wasted_charges"] == 3
+    assert summary["idle_charge_seconds"] == 300.0
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""解析缓存：编码往返、失效检查、损坏时回退和按最近使用淘汰"""
+
+import glob
+import os
+
+import pytest
+
+from timeline_core import cache as cache_module
+from timeline_core.cache import TimelineCache, decode_parsed_timeline, encode_parsed_timeline
+from timeline_core.parser import TimelineEntry, parse_timeline_file
+
+RAID_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "RAID")
+RAID_FILES = sorted(glob.glob(os.path.join(RAID_DIR, "*.txt")))
+
+TIMELINE = '0.0 "--sync--" InCombat {"inGameCombat":"1"} window 0,1\n10.0 "技能" duration 5\n20 label "循环"\n'
+
+
+def snapshot(parsed) -> tuple:
+    """解析结果的全部字段"""
+    entries = [tuple(getattr(entry, name) for name in TimelineEntry.__slots__) for entry in parsed.entries]
+    labels = [(label.time, label.name, label.line) for label in parsed.labels]
+    errors = [(error.line, error.column, error.message, error.text) for error in parsed.errors]
+    return entries, labels, errors, sorted(parsed.hidden_names)
+
+
+def forbid_parsing(monkeypatch):
+    def fail(lines):
+        raise AssertionError("不应重新解析")
+    monkeypatch.setattr(cache_module, "parse_timeline_lines", fail)
+
+
+def write(path, text: str):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(text)
+
+
+@pytest.mark.parametrize("file_path", RAID_FILES, ids=os.path.basename)
+def test_encode_round_trip(file_path):
+    parsed = parse_timeline_file(file_path)
+    assert snapshot(decode_parsed_timeline(encode_parsed_timeline(parsed))) == snapshot(parsed)
+
+
+def test_load_uses_cache(tmp_path, monkeypatch):
+    source = tmp_path / "fight.txt"
+    write(source, TIMELINE)
+    cache = TimelineCache(str(tmp_path / "cache"))
+    expected = snapshot(cache.load(str(source)))
+    assert os.path.exists(cache.cache_path(str(source)))
+
+    forbid_parsing(monkeypatch)
+    assert snapshot(cache.load(str(source))) == expected
+
+
+def test_same_content_with_new_mtime_skips_parsing(tmp_path, monkeypatch):
+    source = tmp_path / "fight.txt"
+    write(source, TIMELINE)
+    cache = TimelineCache(str(tmp_path / "cache"))
+    expected = snapshot(cache.load(str(source)))
+
+    # 只改 mtime：比较 SHA-1 后内容相同，只刷新缓存文件头
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    forbid_parsing(monkeypatch)
+    assert snapshot(cache.load(str(source))) == expected
+    assert snapshot(cache.load(str(source))) == expected
+
+
+def test_changed_content_is_reparsed(tmp_path):
+    source = tmp_path / "fight.txt"
+    write(source, TIMELINE)
+    cache = TimelineCache(str(tmp_path / "cache"))
+    cache.load(str(source))
+
+    # 大小不变、mtime 只差 1 ns 的修改：比较 SHA-1 后重新解析
+    stat = os.stat(source)
+    changed = TIMELINE.replace("10.0", "12.5")
+    write(source, changed)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert [entry.time for entry in cache.load(str(source)).entries] == [0.0, 12.5]
+
+    write(source, changed + '30.0 "新技能"\n')
+    assert [entry.name for entry in cache.load(str(source)).entries] == ["--sync--", "技能", "新技能"]
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: data[:30],  # 文件头不完整
+    lambda data: data[:60] + b"\0" * (len(data) - 60),  # 压缩数据损坏
+    lambda data: data[:-8],  # 压缩数据被截断
+    lambda data: b"XXXX" + data[4:],  # 魔数不对
+])
+def test_corrupt_cache_falls_back_to_parsing(tmp_path, corrupt):
+    source = tmp_path / "fight.txt"
+    write(source, TIMELINE)
+    cache = TimelineCache(str(tmp_path / "cache"))
+    expected = snapshot(cache.load(str(source)))
+
+    cache_path = cache.cache_path(str(source))
+    with open(cache_path, "rb") as file:
+        data = file.read()
+    with open(cache_path, "wb") as file:
+        file.write(corrupt(data))
+    assert snapshot(cache.load(str(source))) == expected
+    # 重新解析后写回了完好的缓存
+    with open(cache_path, "rb") as file:
+        assert file.read() == data
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache_dir = tmp_path / "cache"
+    sources = []
+    for name in ("a", "b", "c"):
+        source = tmp_path / f"{name}.txt"
+        write(source, TIMELINE)
+        sources.append(str(source))
+
+    cache = TimelineCache(str(cache_dir))
+    first, second, third = sources
+    cache.load(first)
+    cache.load(second)
+    size = os.path.getsize(cache.cache_path(first))
+    cache.max_bytes = size * 2 + size // 2
+
+    # b 较早使用，a 之后从缓存读取（刷新最近使用时间），再加入 c 时淘汰 b
+    os.utime(cache.cache_path(first), ns=(10 ** 9, 10 ** 9))
+    os.utime(cache.cache_path(second), ns=(2 * 10 ** 9, 2 * 10 ** 9))
+    cache.load(first)
+    cache.load(third)
+    assert os.path.exists(cache.cache_path(first))
+    assert not os.path.exists(cache.cache_path(second))
+    assert os.path.exists(cache.cache_path(third))
+
+    cache.clear()
+    assert not any(name.endswith(".tlc") for name in os.listdir(cache_dir))
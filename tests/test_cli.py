@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""命令行：输出被提前关闭时安静退出"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_closed_stdout_does_not_raise():
+    # 读端在子进程写入前就关闭，相当于管道到 head 后 head 已退出
+    process = subprocess.Popen([sys.executable, "-m", "timeline_core", "simulate", os.path.join("RAID", "DSR.txt")],
+                               cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    process.stdout.close()
+    stderr = process.stderr.read().decode("utf-8", errors="replace")
+    process.stderr.close()
+    assert process.wait(timeout=60) == 1
+    assert "BrokenPipeError" not in stderr and "Exception ignored" not in stderr
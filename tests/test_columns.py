@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""列式存储：条目和行经过字符串表与各列往返后每个字段不变"""
+
+import glob
+import os
+import random
+
+import pytest
+
+from timeline_core.columns import StringTable, TimelineColumns, TimelineRows
+from timeline_core.parser import TimelineEntry, parse_timeline_file
+
+RAID_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "RAID")
+RAID_FILES = sorted(glob.glob(os.path.join(RAID_DIR, "*.txt")))
+
+
+def fields(entry: TimelineEntry) -> tuple:
+    return tuple(getattr(entry, name) for name in TimelineEntry.__slots__)
+
+
+def random_entry(rng: random.Random, line: int) -> TimelineEntry:
+    entry = TimelineEntry(rng.randrange(0, 400) * 0.5, rng.choice(["", "技能A", "技能B", "--sync--"]), line)
+    if rng.random() < 0.5:
+        entry.sync_type = rng.choice(["Ability", "StartsUsing", "InCombat"])
+        entry.payload = '{"id":"%X"}' % rng.randrange(16 ** 4)
+    if rng.random() < 0.3:
+        entry.window = (rng.randrange(0, 20) * 0.5, rng.randrange(0, 20) * 0.5)
+    if rng.random() < 0.2:
+        entry.jump = rng.choice([rng.randrange(0, 400) * 0.5, "循环"])
+        entry.force_jump = rng.random() < 0.5
+    if rng.random() < 0.2:
+        entry.duration = rng.randrange(1, 20) * 0.5
+    entry.hidden = rng.random() < 0.1
+    return entry
+
+
+def test_string_table():
+    table = StringTable()
+    assert [table.intern(value) for value in ["a", "b", "a"]] == [0, 1, 0]
+    assert list(table.intern_all(["c", "a", "c", "d"])) == [2, 0, 2, 3]
+    assert len(table) == 4 and [table[index] for index in range(4)] == ["a", "b", "c", "d"]
+
+
+@pytest.mark.parametrize("file_path", RAID_FILES, ids=os.path.basename)
+def test_parsed_entries_round_trip(file_path):
+    parsed = parse_timeline_file(file_path)
+    entries = list(parsed.entries)
+    rebuilt = TimelineColumns(entries)
+    assert [fields(entry) for entry in rebuilt] == [fields(entry) for entry in entries]
+    assert list(rebuilt.rows()) == list(parsed.as_rows())
+    assert [entry.name for entry in entries] == list(parsed.entries.iter_names())
+    for index, entry in enumerate(entries):
+        assert parsed.entries.params(index) == entry.sync_params()
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_entries_round_trip(seed):
+    rng = random.Random(seed)
+    entries = [random_entry(rng, line) for line in range(1, 300)]
+    columns = TimelineColumns()
+    columns.extend(entries[:100])
+    for entry in entries[100:]:
+        columns.append(entry)
+    assert [fields(entry) for entry in columns] == [fields(entry) for entry in entries]
+    assert fields(columns[-1]) == fields(entries[-1])
+    assert [fields(entry) for entry in columns[5:10]] == [fields(entry) for entry in entries[5:10]]
+
+    # 稳定排序后跳转等稀疏字段随条目移动
+    columns.sort_by_time()
+    expected = sorted(entries, key=lambda entry: entry.time)
+    assert [fields(entry) for entry in columns] == [fields(entry) for entry in expected]
+    assert list(columns.rows()) == [(entry.time, entry.name) for entry in expected if entry.name]
+
+    hidden = {"技能A"}
+    columns.set_hidden(hidden)
+    assert [entry.hidden for entry in columns] == [entry.name in hidden for entry in expected]
+
+
+def test_rows_behave_like_tuple_list():
+    rng = random.Random(1)
+    expected = [(rng.randrange(0, 400) * 0.5, rng.choice(["技能A", "技能B", "技能C"])) for _ in range(50)]
+    rows = TimelineRows(expected[:20])
+    for row in expected[20:30]:
+        rows.append(row)
+    rows.extend(TimelineRows(expected[30:]))  # 来自另一个字符串表
+    assert list(rows) == expected and rows == expected
+    assert len(rows) == 50 and rows[7] == expected[7] and rows.name(7) == expected[7][1]
+    assert list(rows[10:20]) == expected[10:20]
+    assert rows[10:20].names is rows.names
+    assert list(rows.times) == [time_val for time_val, _ in expected]
+
+    shared = TimelineRows()
+    shared.extend(rows)
+    assert shared.names is rows.names and shared == rows
+    assert TimelineRows(expected[:49]) != rows
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""分支图：沿 jump / label 走出的路径和战斗时间"""
+
+import pytest
+
+from timeline_core.graph import TimelineGraph
+from timeline_core.parser import parse_timeline_lines
+
+LOOP = [
+    '0.0 "开始"',
+    '10.0 "循环开始"',
+    '20.0 "循环中"',
+    '30.0 "回到循环" jump 10',
+    '40.0 "--sync--" Ability {"id":"1"} jump "p2"',
+    '50.0 "跳过的技能"',
+    '60 label "p2"',
+    '60.0 "二阶段"',
+    '70.0 "强制跳转" forcejump 80',
+    '75.0 "被强制跳过"',
+    '80.0 "结尾" jump 0',
+    '90.0 "结束后"',
+]
+
+
+def graph_of(lines) -> TimelineGraph:
+    return TimelineGraph(parse_timeline_lines(lines))
+
+
+def names_and_times(graph: TimelineGraph, choices=None) -> list:
+    return [(time_val, graph.entries.name(index)) for time_val, index in graph.path(choices)]
+
+
+def test_branch_points_and_labels():
+    graph = graph_of(LOOP)
+    assert graph.label_time("p2") == 60.0
+    # label 行不是条目；jump 0 让时间轴停止，不是可以选择的分支
+    assert [(jump.source, jump.target, jump.target_time, jump.force) for jump in graph.branch_points()] == [
+        (3, 1, 10.0, False), (4, 6, 60.0, False), (7, 9, 80.0, True)]
+    assert graph.jumps[9].target is None
+    # 片段在跳转条目之后和跳转目标处断开
+    assert [graph.segment_of(index) for index in range(11)] == [0, 1, 1, 1, 2, 3, 4, 4, 5, 6, 7]
+
+
+def test_default_path_takes_only_forcejump():
+    assert names_and_times(graph_of(LOOP)) == [
+        (0.0, "开始"), (10.0, "循环开始"), (20.0, "循环中"), (30.0, "回到循环"),
+        (40.0, "--sync--"), (50.0, "跳过的技能"), (60.0, "二阶段"), (70.0, "强制跳转"),
+        (70.0, "结尾"), (80.0, "结束后"),
+    ]
+
+
+def test_repeated_jump_and_label_offsets():
+    graph = graph_of(LOOP)
+    # 循环触发两次，每次把之后的战斗时间推迟 20 秒；label 跳转跳过 50 秒的条目，提前 20 秒
+    path = names_and_times(graph, {3: 2, 4: True})
+    assert path == [
+        (0.0, "开始"), (10.0, "循环开始"), (20.0, "循环中"), (30.0, "回到循环"),
+        (30.0, "循环开始"), (40.0, "循环中"), (50.0, "回到循环"),
+        (50.0, "循环开始"), (60.0, "循环中"), (70.0, "回到循环"),
+        (80.0, "--sync--"), (80.0, "二阶段"), (90.0, "强制跳转"),
+        (90.0, "结尾"), (100.0, "结束后"),
+    ]
+
+
+def test_forcejump_can_be_disabled():
+    path = names_and_times(graph_of(LOOP), {7: 0})
+    assert path[-3:] == [(75.0, "被强制跳过"), (80.0, "结尾"), (90.0, "结束后")]
+
+
+def test_jump_between_entries_lands_on_next_entry():
+    # 目标时间 15 处没有条目：从之后的第一个条目继续，战斗时间仍按目标时间对齐
+    graph = graph_of(['0.0 "A"', '10.0 "B"', '20.0 "C"', '30.0 "D" jump 15', '40.0 "E"'])
+    assert names_and_times(graph, {3: 1}) == [
+        (0.0, "A"), (10.0, "B"), (20.0, "C"), (30.0, "D"), (35.0, "C"), (45.0, "D"), (55.0, "E")]
+
+
+def test_path_rows_skip_unnamed_entries():
+    graph = graph_of(['0.0 "" InCombat {"inGameCombat":"1"}', '5.0 "A"', '10.0 "B" jump 5', '20.0 "C"'])
+    rows, indices = graph.path_rows({2: 1})
+    assert list(rows) == [(5.0, "A"), (10.0, "B"), (10.0, "A"), (15.0, "B"), (25.0, "C")]
+    assert list(indices) == [1, 2, 1, 2, 3]
+
+
+def test_endless_loop_is_bounded():
+    graph = graph_of(['0.0 "A"', '10.0 "B" jump 5'])
+    assert len(graph.path({1: 10 ** 9}, max_segments=50)) < 200
+
+
+def test_choices_for_times():
+    graph = graph_of(LOOP)
+    assert graph.choices_for_times([30.0, 30.02, 40.0]) == {3: 2, 4: 1}
+    with pytest.raises(ValueError):
+        graph.choices_for_times([35.0])
+    # jump 0 不能被选择
+    with pytest.raises(ValueError):
+        graph.choices_for_times([80.0])
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""持久化映射与计划历史"""
+
+import random
+
+import pytest
+
+from timeline_core.history import EMPTY_MAP, PlanHistory, PlanState
+
+
+def build(items: dict):
+    mapping = EMPTY_MAP
+    for key, value in items.items():
+        mapping = mapping.set(key, value)
+    return mapping
+
+
+def expected_diff(old: dict, new: dict) -> list:
+    keys = sorted(set(old) | set(new))
+    return [(key, old.get(key), new.get(key)) for key in keys if old.get(key) != new.get(key)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_diff_matches_dict_comparison(seed):
+    rng = random.Random(seed)
+    old = {rng.randrange(500): rng.randrange(10) for _ in range(200)}
+    old_map = build(old)
+    new = dict(old)
+    new_map = old_map
+    for _ in range(rng.randrange(0, 30)):
+        key = rng.randrange(600)
+        if key in new and rng.random() < 0.5:
+            del new[key]
+            new_map = new_map.remove(key)
+        else:
+            new[key] = rng.randrange(10)
+            new_map = new_map.set(key, new[key])
+
+    assert new_map.items() == sorted(new.items())
+    assert old_map.items() == sorted(old.items())
+    assert old_map.diff(new_map) == expected_diff(old, new)
+    assert new_map.diff(old_map) == expected_diff(new, old)
+    assert old_map.diff(old_map) == []
+
+
+def test_diff_of_independently_built_maps():
+    # 键相同但结构独立构建时同样按值比较
+    first = build({key: key * 2 for key in range(50)})
+    second = build({key: key * 2 for key in reversed(range(50))})
+    assert first.diff(second) == []
+    assert first.diff(second.set(7, 0)) == [(7, 14, 0)]
+
+
+def test_history_undo_redo_and_merge():
+    history = PlanHistory()
+    state = PlanState()
+    history.reset(state)
+    first = state.with_use(10.0, "技能", 1)
+    history.record(first, "添加")
+    second = first.with_offset(3, "0.5")
+    history.record(second, "偏移", merge_key=3)
+    third = second.with_offset(3, "1")
+    history.record(third, "偏移", merge_key=3)
+
+    assert history.current() is third
+    assert history.undo()[1] is first
+    assert history.redo()[1] is third
+    assert history.undo()[1] is first
+    assert history.undo()[1] is state
+    assert not history.can_undo()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""蛇胆账本与一次扫描的结果一致，删除和移动使用后索引保持有序"""
+
+import random
+
+import pytest
+
+from timeline_core.serpent import SerpentLedger, sweep_serpent_states
+
+
+def random_rows(rng: random.Random, count: int) -> list:
+    """按时间排序的 (时间, 技能名称) 行，时间取 0.5 秒的整数倍以制造同一时间的事件"""
+    return sorted((rng.randrange(0, 1200) * 0.5, f"技能{rng.randrange(20)}") for _ in range(count))
+
+
+def random_uses(rng: random.Random, count: int) -> list:
+    return sorted((rng.randrange(0, 1200) * 0.5, f"技能{rng.randrange(5)}") for _ in range(count))
+
+
+def assert_states_equal(actual: list, expected: list):
+    assert len(actual) == len(expected)
+    for index, (got, want) in enumerate(zip(actual, expected)):
+        assert got[:2] == want[:2], index
+        assert got[2:] == pytest.approx(want[2:]), index
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_ledger_matches_sweep(seed):
+    rng = random.Random(seed)
+    rows = random_rows(rng, 200)
+    uses = random_uses(rng, rng.randrange(0, 40))
+    ledger = SerpentLedger()
+    for use_time, skill_name in uses:
+        ledger.add_use(use_time, skill_name)
+    assert ledger.uses() == uses
+
+    row_times = [row_time for row_time, _ in rows]
+    states = sweep_serpent_states(row_times, uses)
+    expected = [(ledger.charges_at(row_time),) + ledger.next_recovery(row_time) for row_time in row_times]
+    assert_states_equal(states, expected)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_ledger_remove_and_move(seed):
+    rng = random.Random(seed)
+    uses = random_uses(rng, 30)
+    ledger = SerpentLedger()
+    for use_time, skill_name in uses:
+        ledger.add_use(use_time, skill_name)
+    for _ in range(20):
+        use_time, skill_name = uses.pop(rng.randrange(len(uses)))
+        if rng.random() < 0.5:
+            assert ledger.remove_use(use_time, skill_name)
+        else:
+            new_time = rng.randrange(0, 1200) * 0.5
+            assert ledger.move_use(use_time, skill_name, new_time)
+            uses.append((new_time, skill_name))
+            uses.sort()
+        assert ledger.uses() == uses
+        assert len(ledger) == len(uses)
+    assert not ledger.remove_use(-1.0, "不存在")
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""时间轴库索引：编码往返和查询"""
+
+import glob
+import os
+import zlib
+
+import pytest
+
+from timeline_core.library import LibraryHit, LibraryIndex, decode_library, encode_library, index_timeline_file
+
+RAID_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "RAID")
+RAID_FILES = sorted(glob.glob(os.path.join(RAID_DIR, "*.txt")))
+
+
+def snapshot(files) -> list:
+    return [(library_file.path, library_file.mtime_ns, library_file.size,
+             [(hit.file, hit.time, hit.line, hit.name, hit.ids, hit.source) for hit in library_file.hits])
+            for library_file in files]
+
+
+def test_encode_round_trip():
+    files = [index_timeline_file(file_path) for file_path in RAID_FILES]
+    # 技能 ID 中的逗号和空字符串都原样保留
+    files[0].hits.append(LibraryHit(files[0].path, 1.0, 3, "", ("A,B", "", "C"), "来源"))
+    files[0].hits.append(LibraryHit(files[0].path, 2.0, 4, "无 ID", (), None))
+    assert snapshot(decode_library(encode_library(files))) == snapshot(files)
+    assert decode_library(encode_library([])) == []
+
+
+# 空数据、旧版本（技能 ID 以逗号连接）和魔数不对
+@pytest.mark.parametrize("data", [b"", b"SGTL\x01\x00", b"XXXX\x02\x00" + b"\0" * 8])
+def test_decode_rejects_garbage(data):
+    with pytest.raises(ValueError):
+        decode_library(data)
+
+
+def test_decode_rejects_truncated_body():
+    data = encode_library([index_timeline_file(RAID_FILES[0])])
+    body = zlib.decompress(data[6:])
+    with pytest.raises(ValueError):
+        decode_library(data[:6] + zlib.compress(body[:-3]))
+
+
+def write_timeline(path, name: str):
+    with open(path, "w", encoding="utf-8") as timeline_file:
+        timeline_file.write(f'0.0 "--sync--" StartsUsing {{"id": "1234", "source": "测试首领"}} window 0,1\n'
+                            f'10.0 "{name}" Ability {{"id": "ABCD"}}\n')
+
+
+def test_update_reparses_only_changed_files(tmp_path):
+    paths = [str(tmp_path / f"{name}.txt") for name in ("甲", "乙", "丙")]
+    for path, name in zip(paths, ("甲斩", "乙斩", "丙斩")):
+        write_timeline(path, name)
+    index_path = str(tmp_path / "cache" / "library.idx")
+
+    index = LibraryIndex(index_path)
+    assert index.update(paths, jobs=1) == (3, 0)
+    assert index.update(paths, jobs=1) == (0, 0)
+    assert [hit.file for hit in index.query("斩")] == sorted(paths)
+
+    # 大小变化的文件被重新解析，其余文件的条目原样保留
+    unchanged = index.files[paths[0]]
+    write_timeline(paths[1], "乙新斩击")
+    assert index.update(paths, jobs=1) == (1, 0)
+    assert index.files[paths[0]] is unchanged
+    assert [hit.name for hit in index.query("新斩击")] == ["乙新斩击"]
+    assert index.query("乙斩") == []
+
+    # 从磁盘读取的索引认为所有文件都是最新的
+    reloaded = LibraryIndex(index_path)
+    assert snapshot(reloaded.files[path] for path in sorted(paths)) == snapshot(index.files[path] for path in sorted(paths))
+    assert reloaded.update(paths, jobs=1) == (0, 0)
+    assert [hit.ids for hit in reloaded.query("ABCD", fields=("id",))] == [("ABCD",)] * 3
+
+    # 不在列表中的文件被移除，不存在的文件记为错误
+    missing = str(tmp_path / "丁.txt")
+    assert reloaded.update(paths[:2] + [missing], jobs=1) == (0, 1)
+    assert sorted(reloaded.files) == sorted(paths[:2])
+    assert list(reloaded.errors) == [missing]
+    assert sorted(hit.name for hit in LibraryIndex(index_path).query("斩")) == sorted(["甲斩", "乙新斩击"])
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""流式解析：与原来的正则解析得到相同的行，并逐行报告错误"""
+
+import glob
+import os
+import re
+
+import pytest
+
+from timeline_core.parser import parse_timeline_file, parse_timeline_lines
+
+RAID_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "RAID")
+RAID_FILES = sorted(glob.glob(os.path.join(RAID_DIR, "*.txt")))
+
+
+def regex_rows(file_path: str) -> list:
+    """原来查看器中的 parse_file：两个正则依次匹配，跳过 label、同步条目和 hideall"""
+    rows = []
+    pattern = r'^(\d+\.?\d*)\s+"([^"]+)"'
+    pattern_no_quotes = r'^(\d+\.?\d*)\s+([^"#\s][^#]*?)(?:\s+[A-Z]|$)'
+    with open(file_path, "r", encoding="utf-8") as file:
+        lines = file.read().split("\n")
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or line.startswith("hideall"):
+            continue
+        match = re.match(pattern, line)
+        if match:
+            rows.append((float(match.group(1)), match.group(2)))
+            continue
+        match = re.match(pattern_no_quotes, line)
+        if match:
+            skill_name = match.group(2).strip()
+            if skill_name and not skill_name.startswith("label") and not skill_name.startswith("--"):
+                rows.append((float(match.group(1)), skill_name))
+    rows.sort(key=lambda row: row[0])
+    return rows
+
+
+@pytest.mark.parametrize("file_path", RAID_FILES, ids=os.path.basename)
+def test_rows_match_regex_parser(file_path):
+    assert list(parse_timeline_file(file_path).as_rows()) == regex_rows(file_path)
+
+
+def test_malformed_ucob_sync_lines_reported():
+    parsed = parse_timeline_file(os.path.join(RAID_DIR, "UCOB.txt"))
+    assert [error.line for error in parsed.errors] == [25, 38, 56]
+    for error in parsed.errors:
+        # JSON 之后多出的 ', pair: [...] }' 片段，同一行只报告一次
+        assert error.column == 98
+        assert error.text[error.column - 1:].startswith("', pair:")
+    # 有错误的行仍保留可识别的部分
+    entries = {entry.line: entry for entry in parsed.entries}
+    assert entries[25].sync_type == "CombatantMemory"
+    assert entries[25].window == (100.0, 0.0)
+
+
+def test_tokens():
+    parsed = parse_timeline_lines([
+        'hideall "--sync--"',
+        '0.0 "--sync--" InCombat {"inGameCombat":"1"} window 0,1',
+        '10.5 "技能" Ability {"id":"A74F","source":"Boss"} window 10 jump "循环" # 注释',
+        '20 label "循环"',
+        '30.0 "下一个" duration 5 forcejump 10.5',
+        'oops',
+    ])
+    entries = list(parsed.entries)
+    assert [(entry.time, entry.name, entry.line) for entry in entries] == [
+        (0.0, "--sync--", 2), (10.5, "技能", 3), (30.0, "下一个", 5)]
+    assert entries[0].hidden and entries[0].window == (0.0, 1.0)
+    assert entries[1].sync_params() == {"id": "A74F", "source": "Boss"}
+    assert entries[1].window == (5.0, 5.0) and entries[1].jump == "循环" and not entries[1].force_jump
+    assert entries[2].duration == 5.0 and entries[2].jump == 10.5 and entries[2].force_jump
+    assert [(label.time, label.name) for label in parsed.labels] == [(20.0, "循环")]
+    assert [(error.line, error.column) for error in parsed.errors] == [(6, 1)]
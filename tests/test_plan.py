@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""蛇胆计划：增量刷新与全量重算、二分查找使用记录所在行与逐行比较一致"""
+
+import math
+import random
+
+import pytest
+
+from timeline_core.history import PlanHistory
+from timeline_core.plan import SerpentPlan
+from timeline_core.reload import match_rows
+
+
+def random_rows(rng: random.Random, count: int) -> list:
+    return sorted((rng.randrange(0, 1200) * 0.5, f"技能{rng.randrange(8)}") for _ in range(count))
+
+
+def brute_force_use_row(plan: SerpentPlan, use_time: float, skill_name: str):
+    best = None
+    best_distance = None
+    for index, (_, row_name) in enumerate(plan.rows):
+        if row_name != skill_name:
+            continue
+        distance = abs(plan.use_time_for_row(index) - use_time)
+        if best is None or distance < best_distance:
+            best, best_distance = index, distance
+    return best
+
+
+def comparable_windows(windows: list) -> list:
+    """NaN 互不相等，比较前换成 None"""
+    return [tuple(None if isinstance(value, float) and math.isnan(value) else value for value in window)
+            for window in windows]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_use_row_matches_brute_force(seed):
+    rng = random.Random(seed)
+    plan = SerpentPlan(random_rows(rng, 300))
+    for _ in range(30):
+        plan.set_row_offset(rng.randrange(len(plan.rows)), rng.choice(["-12", "-0.5", "3", "15.5", "x"]))
+    for _ in range(200):
+        use_time = rng.randrange(-20, 1300) * 0.5
+        skill_name = f"技能{rng.randrange(9)}"
+        assert plan.use_row(use_time, skill_name) == brute_force_use_row(plan, use_time, skill_name)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_refresh_matches_recompute(seed):
+    rng = random.Random(seed)
+    rows = random_rows(rng, 300)
+    plan = SerpentPlan(rows)
+    for _ in range(40):
+        if len(plan.ledger) and rng.random() < 0.4:
+            use_time, skill_name = rng.choice(plan.ledger.uses())
+            plan.remove_use(use_time, skill_name)
+        else:
+            row_time, skill_name = rng.choice(rows)
+            plan.add_use(row_time, skill_name)
+        plan.refresh()
+        full = SerpentPlan(rows)
+        for use_time, skill_name in plan.ledger.uses():
+            full.ledger.add_use(use_time, skill_name)
+        full.recompute()
+        assert plan.states == full.states
+        assert plan.blocked_intervals() == full.blocked_intervals()
+        windows = [plan.safe_window(index) for index in range(len(rows))]
+        assert comparable_windows(windows) == comparable_windows(full.compute_safe_windows(0, len(rows)))
+
+
+def test_safe_windows_computed_on_demand():
+    plan = SerpentPlan([(float(time_val), "技能") for time_val in range(0, 120, 5)])
+    for use_time in (10.0, 20.0, 25.0):
+        plan.add_use(use_time, "技能")
+    plan.refresh()
+    assert plan.blocked is None  # 没有查询过可用偏移时不计算不可用区间
+    assert plan.safe_window(7) == (5.0, 10.0, False)  # 35s 不可用，最早在 40s 再使用
+    assert plan.blocked == ([-5.0], [40.0])
+    plan.remove_use(25.0, "技能")
+    plan.refresh()
+    assert plan.blocked == ([], [])
+    plan.recompute()
+    assert plan.blocked is None
+
+
+def test_remap_rows_moves_and_drops_uses():
+    old_rows = [(10.0, "A"), (20.0, "B"), (30.0, "C")]
+    new_rows = [(12.0, "A"), (30.0, "C")]
+    plan = SerpentPlan(old_rows)
+    plan.add_use(10.5, "A")
+    plan.add_use(20.0, "B")
+    plan.add_use(5.0, "手动")
+    plan.set_row_offset(2, "1")
+    dropped = plan.remap_rows(new_rows, match_rows(old_rows, new_rows))
+    assert dropped == 1
+    assert plan.ledger.uses() == [(5.0, "手动"), (12.5, "A")]
+    assert plan.offsets == {1: "1"}
+
+
+def test_remap_state_matches_remap_rows():
+    rng = random.Random(5)
+    old_rows = random_rows(rng, 200)
+    new_rows = sorted(rng.sample(old_rows, 150) + random_rows(rng, 20))
+    plan = SerpentPlan(old_rows)
+    for index in rng.sample(range(len(old_rows)), 30):
+        plan.add_use(plan.use_time_for_row(index), old_rows[index][1])
+        plan.set_row_offset(index, rng.choice(["1", "-2.5"]))
+        plan.set_desired(index, 1)
+    row_map = match_rows(old_rows, new_rows)
+    remapped = plan.remap_state(plan.state, new_rows, row_map)
+    uses_before = len(plan.ledger)
+    dropped = plan.remap_rows(new_rows, row_map)
+    assert dropped == uses_before - len(plan.ledger)
+    assert remapped.uses.items() == plan.state.uses.items()
+    assert remapped.offsets.items() == plan.state.offsets.items()
+    assert remapped.desired.items() == plan.state.desired.items()
+
+
+def test_remap_history_keeps_undo_steps():
+    old_rows = [(10.0, "A"), (20.0, "B"), (30.0, "C")]
+    new_rows = [(5.0, "新"), (10.0, "A"), (25.0, "B"), (30.0, "C")]
+    plan = SerpentPlan(old_rows)
+    history = PlanHistory()
+    history.reset(plan.state)
+    plan.add_use(20.0, "B")
+    history.record(plan.state, "使用")
+    plan.set_row_offset(2, "1")
+    history.record(plan.state, "偏移", merge_key=2)
+    history.save_snapshot("快照", plan.state)
+
+    row_map = match_rows(old_rows, new_rows)
+    history.remap(lambda state: plan.remap_state(state, new_rows, row_map))
+    assert plan.remap_rows(new_rows, row_map, history.current()) == 0
+    assert history.current() is plan.state
+    assert plan.ledger.uses() == [(25.0, "B")]
+    assert plan.offsets == {3: "1"}
+    assert history.snapshot("快照") is plan.state
+
+    _, state = history.undo()
+    plan.restore(state)
+    plan.refresh()
+    assert plan.offsets == {} and plan.ledger.uses() == [(25.0, "B")]
+    _, state = history.undo()
+    plan.restore(state)
+    assert plan.ledger.uses() == []
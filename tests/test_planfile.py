@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""计划文件的编码、存储和后台自动保存"""
+
+import hashlib
+
+import pytest
+
+from timeline_core.history import PlanState
+from timeline_core.planfile import PlanAutosaver, PlanFormatError, PlanStore, SavedPlan, decode_plan, encode_plan
+
+
+def sample_plan() -> SavedPlan:
+    digest = hashlib.sha1(b"timeline").digest()
+    uses = [(12.5, "蛇胆"), (12.5, "蛇胆"), (40.25, "技能 A"), (1234.125, "蛇胆")]
+    offsets = {3: "0.5", 17: "-1.25", 200: "+2"}
+    desired = {3: 1.0, 42: 2.5}
+    return SavedPlan(digest, uses, offsets, desired, {7: 2, 9: 0})
+
+
+def assert_same_plan(actual: SavedPlan, expected: SavedPlan):
+    for name in SavedPlan.__slots__:
+        assert getattr(actual, name) == getattr(expected, name), name
+
+
+def test_round_trip():
+    saved = sample_plan()
+    assert_same_plan(decode_plan(encode_plan(saved)), saved)
+
+
+def test_round_trip_empty():
+    saved = SavedPlan(b"\0" * 20)
+    assert_same_plan(decode_plan(encode_plan(saved)), saved)
+
+
+def test_from_state_round_trip():
+    state = PlanState().with_use(10.0, "蛇胆", 1).with_use(10.0, "蛇胆", 1).with_offset(2, "1.5").with_desired(5, 1)
+    saved = SavedPlan.from_state(state, b"\1" * 20, {4: 1})
+    decoded = decode_plan(encode_plan(saved))
+    assert decoded.uses == [(10.0, "蛇胆"), (10.0, "蛇胆")]
+    assert decoded.offsets == {2: "1.5"}
+    assert decoded.desired == {5: 1}
+    assert decoded.branch_choices == {4: 1}
+
+
+@pytest.mark.parametrize("data", [b"", b"not a plan file at all, definitely not", b"SGPL"])
+def test_decode_rejects_garbage(data):
+    with pytest.raises(PlanFormatError):
+        decode_plan(data)
+
+
+def test_decode_rejects_truncated_body():
+    data = encode_plan(sample_plan())
+    with pytest.raises(PlanFormatError):
+        decode_plan(data[:-5])
+
+
+def test_store_save_and_load(tmp_path):
+    store = PlanStore(str(tmp_path))
+    assert store.load("fight.txt") is None
+    saved = sample_plan()
+    store.save("fight.txt", saved)
+    assert_same_plan(store.load("fight.txt"), saved)
+
+
+def test_autosaver_writes_latest_state(tmp_path):
+    store = PlanStore(str(tmp_path))
+    saver = PlanAutosaver(store, delay=0.001)
+    state = PlanState()
+    for number in range(1, 50):
+        state = state.with_offset(0, str(number))
+        saver.schedule("fight.txt", state, b"\0" * 20, {})
+        if number % 7 == 0:
+            saver.flush()
+    saver.close()
+    assert saver.last_error is None
+    assert store.load("fight.txt").offsets == {0: "49"}
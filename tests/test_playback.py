@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""回放：战斗时钟和事件流合并"""
+
+import random
+
+from timeline_core.playback import EventCursor, FightClock
+
+
+class FakeClock:
+    """手动推进的真实时间"""
+
+    def __init__(self):
+        self.real = 0.0
+
+    def __call__(self) -> float:
+        return self.real
+
+
+def all_events(streams: dict) -> list:
+    return sorted((time_val, name, index) for name, times in streams.items() for index, time_val in enumerate(times))
+
+
+def test_clock_pause_seek_and_speed():
+    fake = FakeClock()
+    clock = FightClock(fake)
+    fake.real = 5.0
+    assert clock.now() == 0.0 and clock.real_delay(1.0) == float("inf")
+    clock.play()
+    fake.real = 8.0
+    assert clock.now() == 3.0
+    clock.set_speed(2.0)
+    fake.real = 9.0
+    assert clock.now() == 5.0 and clock.real_delay(7.0) == 1.0
+    clock.pause()
+    fake.real = 20.0
+    assert clock.now() == 5.0
+    clock.seek(-3.0)
+    assert clock.now() == 0.0 and not clock.running
+    clock.play()
+    fake.real = 21.0
+    assert clock.now() == 2.0
+
+
+def test_pop_due_merges_streams_in_time_order():
+    streams = {"行": [0.0, 5.0, 10.0, 10.0, 30.0], "使用": [10.0, 12.0], "回复": [], "计时": [1.0, 11.0, 29.0]}
+    cursor = EventCursor(streams)
+    assert cursor.next_time() == 1.0  # 0 秒的事件视为已发生
+    due = cursor.pop_due(10.0)
+    assert due == [(1.0, "计时", 0), (5.0, "行", 1), (10.0, "使用", 0), (10.0, "行", 2), (10.0, "行", 3)]
+    assert cursor.pop_due(10.0) == []
+    assert cursor.next_time() == 11.0
+    assert cursor.pop_due(100.0) == [(11.0, "计时", 1), (12.0, "使用", 1), (29.0, "计时", 2), (30.0, "行", 4)]
+    assert cursor.next_time() is None
+
+
+def test_seek_back_and_forth_matches_all_events():
+    rng = random.Random(13)
+    streams = {name: sorted(round(rng.uniform(0, 100), 1) for _ in range(rng.randrange(0, 40)))
+               for name in ("行", "使用", "回复", "计时")}
+    events = all_events(streams)
+    cursor = EventCursor(streams)
+    for _ in range(200):
+        start = rng.uniform(-5, 105)
+        end = start + rng.uniform(0, 20)
+        cursor.seek(start)
+        due = cursor.pop_due(end)
+        assert due == [event for event in events if start < event[0] <= end]
+        expected_next = [event[0] for event in events if event[0] > end]
+        assert cursor.next_time() == (expected_next[0] if expected_next else None)
+
+
+def test_set_stream_keeps_position():
+    cursor = EventCursor({"行": [1.0, 2.0, 3.0]})
+    cursor.pop_due(1.5)
+    cursor.set_stream("使用", [1.0, 2.5])
+    assert cursor.pop_due(3.0) == [(2.0, "行", 1), (2.5, "使用", 1), (3.0, "行", 2)]
+    # 替换事件流后按当前位置重新定位
+    cursor.set_stream("行", [2.0, 4.0])
+    assert cursor.pop_due(5.0) == [(4.0, "行", 1)]
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""热重载：只重新解析变化范围的结果与完整解析一致"""
+
+import glob
+import os
+import random
+
+import pytest
+
+from timeline_core.parser import parse_timeline_lines
+from timeline_core.reload import changed_line_range, match_rows, reparse_timeline
+
+RAID_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "RAID")
+RAID_FILES = sorted(glob.glob(os.path.join(RAID_DIR, "*.txt")))
+
+# 编辑时插入的行：普通条目、同步条目、label、hideall、注释、空行和错误行
+EXTRA_LINES = [
+    '12.5 "新技能"',
+    '30.0 "--sync--" StartsUsing {"id":"1234","source":"Boss"} window 10,10',
+    '45.0 "跳转" Ability {"id":"ABCD"} jump 100',
+    '50.0 label "p2"',
+    'hideall "新技能"',
+    'hideall "--sync--"',
+    '# 注释',
+    '',
+    '60.0 "未闭合的名称',
+]
+
+
+def read_lines(file_path: str) -> list:
+    with open(file_path, "r", encoding="utf-8") as file:
+        return file.read().splitlines()
+
+
+def snapshot(parsed) -> tuple:
+    """把解析结果转成可以直接比较的元组"""
+    entries = [tuple(getattr(entry, name) for name in entry.__slots__) for entry in parsed.entries]
+    labels = [(label.time, label.name, label.line) for label in parsed.labels]
+    errors = [(error.line, error.column, error.message, error.text) for error in parsed.errors]
+    return entries, labels, errors, sorted(parsed.hidden_names)
+
+
+def random_edit(rng: random.Random, lines: list) -> list:
+    lines = list(lines)
+    for _ in range(rng.randrange(1, 4)):
+        position = rng.randrange(len(lines) + 1)
+        kind = rng.randrange(3)
+        if kind == 0 or not lines:
+            lines[position:position] = rng.sample(EXTRA_LINES, rng.randrange(1, 3))
+        elif kind == 1:
+            del lines[position:position + rng.randrange(1, 5)]
+        else:
+            lines[position:position + 1] = [rng.choice(EXTRA_LINES)]
+    return lines
+
+
+@pytest.mark.parametrize("file_path", RAID_FILES, ids=os.path.basename)
+def test_reparse_matches_full_parse(file_path):
+    rng = random.Random(os.path.basename(file_path))
+    lines = read_lines(file_path)
+    parsed = parse_timeline_lines(lines)
+    for _ in range(10):
+        new_lines = random_edit(rng, lines)
+        before = snapshot(parsed)
+        reparsed = reparse_timeline(lines, parsed, new_lines)
+        assert snapshot(reparsed) == snapshot(parse_timeline_lines(new_lines))
+        assert snapshot(parsed) == before  # 旧的解析结果不被修改
+        lines, parsed = new_lines, reparsed
+
+
+def test_reparse_hideall_change_updates_whole_file():
+    lines = ['10.0 "技能A"', '20.0 "技能B"', '30.0 "技能A"']
+    parsed = parse_timeline_lines(lines)
+    new_lines = lines + ['hideall "技能A"']
+    reparsed = reparse_timeline(lines, parsed, new_lines)
+    assert [entry.hidden for entry in reparsed.entries] == [True, False, True]
+    assert snapshot(reparsed) == snapshot(parse_timeline_lines(new_lines))
+
+
+def test_changed_line_range():
+    assert changed_line_range(["a", "b", "c"], ["a", "b", "c"]) == (3, 3, 3)
+    assert changed_line_range(["a", "b", "c"], ["a", "x", "c"]) == (1, 2, 2)
+    assert changed_line_range(["a", "c"], ["a", "b", "c"]) == (1, 1, 2)
+
+
+def test_match_rows_keeps_unchanged_rows():
+    old_rows = [(10.0, "A"), (20.0, "B"), (30.0, "C")]
+    new_rows = [(5.0, "新"), (10.0, "A"), (30.0, "C")]
+    assert match_rows(old_rows, new_rows) == {0: 1, 2: 2}
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""多资源模拟：NumPy 与纯 Python 路径的结果一致"""
+
+import random
+
+import pytest
+
+from timeline_core import resources
+from timeline_core.resources import ResourceDefinition, simulate_resources
+
+RESOURCES = [
+    ResourceDefinition("蛇胆", max_charges=3, regen_interval=30.0, regen_model="per_use", costs={"蛇胆": 1}),
+    ResourceDefinition("豆子", max_charges=3, regen_interval=20.0, regen_model="continuous",
+                       costs={"发炎": 1, "根素": 2}, gains={"根素": 3}, initial=1),
+    ResourceDefinition("充能", max_charges=2, regen_interval=40.0, regen_model="charges", costs={"发炎": 1}),
+]
+ACTION_NAMES = ["蛇胆", "发炎", "根素", "无关"]
+
+
+def random_case(seed: int):
+    rng = random.Random(seed)
+    row_times = sorted(rng.randrange(0, 1200) * 0.5 for _ in range(rng.randrange(1, 300)))
+    actions = [(rng.randrange(0, 1200) * 0.5, rng.choice(ACTION_NAMES)) for _ in range(rng.randrange(0, 60))]
+    return row_times, sorted(actions)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_numpy_matches_python(seed):
+    numpy = pytest.importorskip("numpy")
+    row_times, actions = random_case(seed)
+    expected = resources._simulate_python(RESOURCES, actions, row_times)
+    actual = resources._simulate_numpy(numpy, RESOURCES, actions, row_times)
+    assert actual.keys() == expected.keys()
+    for name in expected:
+        assert actual[name] == pytest.approx(expected[name]), name
+
+
+def test_without_numpy(monkeypatch):
+    monkeypatch.setattr(resources, "_NUMPY_MIN_SIZE", 10 ** 9)
+    values = simulate_resources(RESOURCES[:1], [(10.0, "蛇胆"), (10.0, "蛇胆"), (20.0, "蛇胆"), (25.0, "蛇胆")],
+                                [0.0, 10.0, 20.0, 25.0, 40.0, 50.0, 60.0])
+    assert values == {"蛇胆": [3.0, 1.0, 0.0, 0.0, 2.0, 3.0, 3.0]}
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_charges_overspend_clamped(use_numpy, monkeypatch):
+    # 两层充能在 0 秒用掉三次、5 秒再用一次：数量停在 0，不会变成负数
+    if use_numpy:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(resources, "_NUMPY_MIN_SIZE", 0 if use_numpy else 10 ** 9)
+    charges = ResourceDefinition("充能", max_charges=2, regen_interval=10.0, regen_model="charges", costs={"发炎": 1})
+    values = simulate_resources([charges], [(0.0, "发炎")] * 3 + [(5.0, "发炎")],
+                                [0.0, 5.0, 10.0, 20.0, 30.0, 40.0, 50.0])
+    assert values == {"充能": [0.0, 0.0, 0.0, 0.0, 1.0, 2.0, 2.0]}
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""鲁棒性模拟：NumPy 与纯 Python 路径的结果一致"""
+
+import pytest
+
+from timeline_core import robustness
+from timeline_core.robustness import Jitter, analyze_robustness, drift_groups
+
+USES = [(10.0, "A"), (11.0, "B"), (12.0, "C"), (40.5, "D"), (41.0, "E"), (70.0, "F")]
+ANCHORS = [0, 0, 1, 2, 2, 3]
+WINDOWS = [(2.5, 2.5), None, (1.0, 4.0), None]
+
+
+def chunk_arguments(entry_jitter: Jitter, input_delay: Jitter, trials: int):
+    use_times = [use_time for use_time, _ in USES]
+    groups, group_windows = drift_groups(ANCHORS, WINDOWS)
+    return use_times, groups, group_windows, entry_jitter, input_delay, trials, 3, 30.0
+
+
+def test_deterministic_chunks_match():
+    pytest.importorskip("numpy")
+    arguments = chunk_arguments(Jitter("none"), Jitter("none"), 50)
+    assert robustness._simulate_chunk_numpy(*arguments, 1) == robustness._simulate_chunk_python(*arguments, 1)
+
+
+@pytest.mark.parametrize("entry_jitter, input_delay", [
+    ("uniform:1", "none"),
+    ("window:1", "exponential:0.3"),
+    ("normal:0.5", "uniform:0.2"),
+])
+def test_failure_probabilities_agree(entry_jitter, input_delay):
+    # 两条路径使用不同的随机数生成器，只比较统计结果
+    pytest.importorskip("numpy")
+    arguments = chunk_arguments(Jitter.parse(entry_jitter), Jitter.parse(input_delay), 20000)
+    numpy_counts, numpy_failed = robustness._simulate_chunk_numpy(*arguments, 1)
+    python_counts, python_failed = robustness._simulate_chunk_python(*arguments, 1)
+    trials = arguments[5]
+    for numpy_count, python_count in zip(numpy_counts, python_counts):
+        assert abs(numpy_count - python_count) / trials < 0.02
+    assert abs(numpy_failed - python_failed) / trials < 0.02
+
+
+def test_analyze_without_numpy(monkeypatch):
+    monkeypatch.setattr(robustness, "_np", False)
+    uses = [(0.0, "A"), (1.0, "B"), (2.0, "C"), (3.0, "D")]
+    report = analyze_robustness(uses, [0, 1, 2, 3], [None] * 4, Jitter("none"), Jitter("none"), trials=100, seed=1)
+    assert report.failure_probability() == [0.0, 0.0, 0.0, 1.0]
+    assert report.any_failure_probability() == 1.0
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""名称索引与分类筛选：结果与逐条子串扫描一致"""
+
+import glob
+import os
+import random
+
+import pytest
+
+from timeline_core.parser import parse_timeline_file
+from timeline_core.search import CATEGORY_NAMES, NgramIndex, SkillIndex
+
+RAID_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "RAID")
+RAID_FILES = sorted(glob.glob(os.path.join(RAID_DIR, "*.txt")))
+
+
+def random_terms(rng: random.Random, names: list, count: int) -> list:
+    """从名称中截取的不含空白的子串（随机大小写），以及一些不会出现的词"""
+    terms = []
+    for _ in range(count):
+        name = rng.choice(rng.choice(names).split())
+        start = rng.randrange(len(name))
+        term = name[start:start + rng.randrange(1, 7)]
+        terms.append("".join(char.upper() if rng.random() < 0.5 else char for char in term))
+    return terms + ["不存在的技能", "zzzz", "--同步化--x"]
+
+
+def scan(entries, terms: list, categories: list) -> set:
+    """逐条扫描：每个词都出现在名称中，并属于任一选中的分类"""
+    matched = set()
+    for index, entry in enumerate(entries):
+        if not entry.name:
+            continue
+        name = entry.name.lower()
+        if not all(term.lower() in name for term in terms):
+            continue
+        marker = "--" in entry.name
+        in_category = {
+            "marker": marker,
+            "sync": entry.sync_type is not None,
+            "damage": entry.sync_type in ("Ability", "StartsUsing") and not marker,
+        }
+        if categories and not any(in_category[category] for category in categories):
+            continue
+        matched.add(index)
+    return matched
+
+
+def test_ngram_index_matches_substring_scan():
+    rng = random.Random(0)
+    index = NgramIndex()
+    texts = ["Alpha", "alphabet", "贤者蛇胆", "蛇胆", "--sync--", "A", "ab", "aab", "a--b"]
+    assert [index.add(text) for text in texts] == list(range(len(texts)))
+    assert index.add("ALPHA") == 0 and len(index) == len(texts)
+    for term in random_terms(rng, texts, 200) + ["a", "ab", "AB", "alphab", "蛇", "-"]:
+        expected = {text_id for text_id, text in enumerate(texts) if term.lower() in text.lower()}
+        assert index.match(term) == expected, term
+
+
+@pytest.mark.parametrize("file_path", RAID_FILES, ids=os.path.basename)
+def test_skill_index_matches_scan(file_path):
+    rng = random.Random(file_path)
+    entries = parse_timeline_file(file_path).entries
+    index = SkillIndex(entries)
+    named = list(entries)
+    names = [entry.name for entry in named if entry.name]
+
+    assert index.search() is None
+    for term in random_terms(rng, names, 40):
+        assert index.search(term) == scan(named, [term], []), term
+    for _ in range(20):
+        terms = rng.sample(random_terms(rng, names, 5), 2)
+        categories = rng.sample(sorted(CATEGORY_NAMES), rng.randrange(0, 3))
+        assert index.search(" ".join(terms), categories) == scan(named, terms, categories), (terms, categories)
+    for category in CATEGORY_NAMES:
+        assert index.search("", [category]) == scan(named, [], [category])
+
+
+def test_filter_rows_keeps_row_order():
+    entries = parse_timeline_file(os.path.join(RAID_DIR, "UCOB.txt")).entries
+    index = SkillIndex(entries)
+    row_entries = [entry_index for entry_index, name in enumerate(entries.iter_names()) if name]
+    assert index.filter_rows(row_entries) is None
+    rows = index.filter_rows(row_entries, "", ["damage"])
+    expected = scan(list(entries), [], ["damage"])
+    assert rows == [row for row, entry_index in enumerate(row_entries) if entry_index in expected]
+    assert index.filter_rows(row_entries, "不存在的技能") == []
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""不可用区间与安全偏移窗口：局部拼接与完整计算、NumPy 与纯 Python 路径一致"""
+
+import bisect
+import math
+import random
+
+import pytest
+
+from timeline_core import sensitivity
+from timeline_core.sensitivity import (blocked_use_intervals, safe_offset_window, safe_offset_windows,
+                                       splice_blocked_intervals)
+
+REGEN = 30.0
+
+
+def random_use_times(rng: random.Random, count: int) -> list:
+    return sorted(rng.randrange(0, 2400) * 0.5 for _ in range(count))
+
+
+@pytest.fixture(params=["python", "numpy"])
+def numpy_mode(request, monkeypatch):
+    """强制走纯 Python 或 NumPy 路径"""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+        monkeypatch.setattr(sensitivity, "_NUMPY_MIN_SIZE", 0)
+    else:
+        monkeypatch.setattr(sensitivity, "_NUMPY_MIN_SIZE", 10 ** 9)
+    return request.param
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_splice_matches_full(seed):
+    rng = random.Random(seed)
+    uses = random_use_times(rng, rng.randrange(0, 80))
+    blocked = blocked_use_intervals(uses)
+    for _ in range(10):
+        if uses and rng.random() < 0.4:
+            changed = uses.pop(rng.randrange(len(uses)))
+        else:
+            changed = rng.randrange(0, 2400) * 0.5
+            bisect.insort(uses, changed)
+        # 与 SerpentPlan.refresh 相同的局部范围
+        low = changed - REGEN
+        high = changed + REGEN
+        nearby = uses[bisect.bisect_left(uses, low - REGEN):bisect.bisect_right(uses, high + REGEN)]
+        blocked = splice_blocked_intervals(blocked, blocked_use_intervals(nearby), low, high)
+        assert blocked == blocked_use_intervals(uses)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_numpy_matches_python(seed, monkeypatch):
+    pytest.importorskip("numpy")
+    rng = random.Random(seed)
+    uses = random_use_times(rng, rng.randrange(0, 300))
+    row_times = sorted(rng.randrange(0, 2400) * 0.5 for _ in range(400))
+
+    monkeypatch.setattr(sensitivity, "_NUMPY_MIN_SIZE", 10 ** 9)
+    python_blocked = blocked_use_intervals(uses)
+    python_windows = safe_offset_windows(row_times, *python_blocked, 5.0)
+    monkeypatch.setattr(sensitivity, "_NUMPY_MIN_SIZE", 0)
+    numpy_blocked = blocked_use_intervals(uses)
+    numpy_windows = safe_offset_windows(row_times, *numpy_blocked, 5.0)
+
+    assert numpy_blocked == python_blocked
+    lows, highs, usable = numpy_windows
+    assert usable == python_windows[2]
+    for actual, expected in zip(lows + highs, python_windows[0] + python_windows[1]):
+        assert actual == expected or (math.isnan(actual) and math.isnan(expected))
+
+
+def test_blocked_intervals(numpy_mode):
+    # 三次使用后到第一次回复前不能再使用
+    assert blocked_use_intervals([10.0, 20.0, 25.0]) == ([-5.0], [40.0])
+    assert blocked_use_intervals([10.0, 50.0, 90.0]) == ([], [])
+
+
+def test_safe_windows(numpy_mode):
+    lows, highs, usable = safe_offset_windows([0.0, 30.0, 45.0], [-5.0], [40.0], 5.0)
+    assert usable == [False, False, True]
+    assert lows[2] == -5.0 and highs[2] == 5.0
+    assert highs[0] == -5.0
+    assert math.isnan(lows[1])
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_single_row_matches_batch(seed, numpy_mode):
+    rng = random.Random(seed)
+    blocked = blocked_use_intervals(random_use_times(rng, rng.randrange(0, 300)))
+    row_times = sorted(rng.randrange(0, 2400) * 0.5 for _ in range(300))
+    lows, highs, usable = safe_offset_windows(row_times, *blocked, 5.0)
+    for row_time, expected in zip(row_times, zip(lows, highs, usable)):
+        actual = safe_offset_window(row_time, *blocked, 5.0)
+        assert actual[2] == expected[2]
+        assert all(a == b or (math.isnan(a) and math.isnan(b)) for a, b in zip(actual[:2], expected[:2]))
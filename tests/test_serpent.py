@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""蛇胆状态的一次扫描、增量重扫与逐行计算一致"""
+
+import random
+
+import pytest
+
+from timeline_core.serpent import resweep_serpent_states, sweep_serpent_states
+
+
+def random_rows(rng: random.Random, count: int) -> list:
+    """按时间排序的 (时间, 技能名称) 行，时间取 0.5 秒的整数倍以制造同一时间的事件"""
+    return sorted((rng.randrange(0, 1200) * 0.5, f"技能{rng.randrange(20)}") for _ in range(count))
+
+
+def random_uses(rng: random.Random, count: int) -> list:
+    return sorted((rng.randrange(0, 1200) * 0.5, f"技能{rng.randrange(5)}") for _ in range(count))
+
+
+def assert_states_equal(actual: list, expected: list):
+    assert len(actual) == len(expected)
+    for index, (got, want) in enumerate(zip(actual, expected)):
+        assert got[:2] == want[:2], index
+        assert got[2:] == pytest.approx(want[2:]), index
+
+
+def reference_state(target_time: float, uses: list, max_count: int = 3, regen_interval: float = 30.0) -> tuple:
+    """逐行计算：处理所有不晚于 target_time 的使用和回复事件，再找下一个回复"""
+    events = []
+    for use_time, _ in uses:
+        if use_time <= target_time:
+            events.append((use_time, -1))
+            if use_time + regen_interval <= target_time:
+                events.append((use_time + regen_interval, 1))
+    count = max_count
+    for _, change in sorted(events):
+        count = max(0, min(max_count, count + change))
+
+    pending = [(use_time + regen_interval, use_time, skill_name) for use_time, skill_name in uses
+               if use_time + regen_interval > target_time]
+    if not pending:
+        return count, None, 0.0, 0.0
+    recovery_time, use_time, skill_name = min(pending, key=lambda item: item[0])
+    progress = max(0.0, min(1.0, (target_time - use_time) / regen_interval))
+    return count, skill_name, progress, recovery_time - target_time
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_sweep_matches_per_row_calculation(seed):
+    rng = random.Random(seed)
+    rows = random_rows(rng, 200)
+    uses = random_uses(rng, rng.randrange(0, 40))
+    row_times = [row_time for row_time, _ in rows]
+    expected = [reference_state(row_time, uses) for row_time in row_times]
+    assert_states_equal(sweep_serpent_states(row_times, uses), expected)
+
+
+def test_sweep_without_uses():
+    assert sweep_serpent_states([0.0, 10.0], []) == [(3, None, 0.0, 0.0), (3, None, 0.0, 0.0)]
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_resweep_matches_full_sweep(seed):
+    rng = random.Random(seed)
+    rows = random_rows(rng, 300)
+    row_times = [row_time for row_time, _ in rows]
+    uses = random_uses(rng, rng.randrange(1, 40))
+    states = sweep_serpent_states(row_times, uses)
+
+    for _ in range(10):
+        if uses and rng.random() < 0.4:
+            changed = uses.pop(rng.randrange(len(uses)))
+        else:
+            changed = (rng.randrange(0, 1200) * 0.5, f"技能{rng.randrange(5)}")
+            uses.append(changed)
+            uses.sort()
+        resweep_serpent_states(states, row_times, uses, changed[0], changed[0] + 30.0)
+        assert_states_equal(states, sweep_serpent_states(row_times, uses))
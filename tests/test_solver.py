@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""使用计划求解：与穷举所有使用顺序的结果一致"""
+
+import itertools
+import random
+
+import pytest
+
+from timeline_core.solver import DesiredUse, solve_serpent_plan
+
+REGEN = 30.0
+
+
+def place_in_order(items: list, max_count: int):
+    """按给定顺序依次在最早可行时间使用，全部放得下时返回使用时间"""
+    times = []
+    for item in items:
+        use_time = item.earliest
+        if times:
+            use_time = max(use_time, times[-1])
+        if len(times) >= max_count:
+            use_time = max(use_time, times[-max_count] + REGEN)
+        if use_time > item.latest:
+            return None
+        times.append(use_time)
+    return times
+
+
+def brute_force_value(items: list, max_count: int) -> float:
+    """枚举所有子集的所有使用顺序；固定顺序时最早可行时间最优"""
+    best = 0.0
+    for size in range(1, len(items) + 1):
+        for subset in itertools.combinations(items, size):
+            value = sum(item.priority for item in subset)
+            if value <= best:
+                continue
+            if any(place_in_order(order, max_count) is not None for order in itertools.permutations(subset)):
+                best = value
+    return best
+
+
+def assert_feasible(solved, items: list, max_count: int):
+    by_row = {item.row: item for item in items}
+    times = sorted(use_time for _, use_time, _ in solved.uses)
+    for row, use_time, _ in solved.uses:
+        assert by_row[row].earliest <= use_time <= by_row[row].latest
+    for first, later in zip(times, times[max_count:]):
+        assert later >= first + REGEN
+    assert solved.value == pytest.approx(sum(by_row[row].priority for row, _, _ in solved.uses))
+    assert len(solved.uses) + len(solved.dropped) == len(items)
+
+
+def random_items(rng: random.Random, count: int, mixed: bool) -> list:
+    items = []
+    width = rng.choice([0.0, 5.0, 20.0])
+    for row in range(count):
+        time_val = rng.randrange(0, 240) * 0.5
+        if mixed:
+            low, high = -rng.choice([0.0, 5.0, 20.0, 60.0]), rng.choice([0.0, 5.0, 20.0, 60.0])
+        else:
+            low, high = -width, width
+        items.append(DesiredUse(row, time_val, f"技能{row}", rng.choice([1.0, 2.0, 3.0]), low, high))
+    return items
+
+
+@pytest.mark.parametrize("mixed", [False, True])
+@pytest.mark.parametrize("seed", range(40))
+def test_matches_brute_force(seed, mixed):
+    rng = random.Random(seed)
+    max_count = rng.randrange(1, 4)
+    items = random_items(rng, rng.randrange(1, 7), mixed)
+    solved = solve_serpent_plan(items, max_count, REGEN)
+    assert solved.exact
+    assert_feasible(solved, items, max_count)
+    assert solved.value == pytest.approx(brute_force_value(items, max_count))
+
+
+def test_nested_window_used_before_its_start_order():
+    # 范围最长的条目排在最前面使用，后面两个范围较窄的条目才都能放入
+    items = [
+        DesiredUse(0, 50.0, "宽", 1.0, -50.0, 50.0),
+        DesiredUse(1, 55.0, "窄", 1.0, -5.0, 5.0),
+        DesiredUse(2, 90.0, "末", 1.0, 0.0, 5.0),
+    ]
+    solved = solve_serpent_plan(items, max_count=1, regen_interval=REGEN)
+    assert solved.exact
+    assert [(row, use_time) for row, use_time, _ in solved.uses] == [(0, 0.0), (1, 50.0), (2, 90.0)]
+    assert not solved.dropped
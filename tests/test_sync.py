@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""日志同步：同步窗口索引、jump / label、战斗重置和日志增量读取"""
+
+import os
+
+import pytest
+
+from timeline_core.parser import parse_timeline_lines
+from timeline_core.playback import FightClock
+from timeline_core.sync import LogSyncEngine, LogTailer
+
+TIMELINE = [
+    '0.0 "--Reset--" ActorControl {"command":"4000000F"} window 0,100000 jump 0',
+    '0.0 "--sync--" InCombat {"inGameCombat":"1"} window 0,1',
+    '10.0 "斩击" Ability {"id":"A001","source":"首领"} window 5,5',
+    '20.0 "旋风" Ability {"id":"A002"}',
+    '30.0 "读条" StartsUsing {"id":"B00[0-9]"} window 10,10',
+    '40.0 "--sync--" Ability {"id":"A003"} window 40,5 jump "循环"',
+    '50.0 "远跳" Ability {"id":"A004"} window 5,5 jump 200',
+    '100 label "循环"',
+    '100.0 "循环技能" Ability {"id":["A005","A006"]} window 10,10',
+    '110.0 "不支持" Ability {"unknownField":"1"}',
+]
+
+RESET = "33|2024-01-01T00:00:00.0000000+08:00|80037569|4000000F|00|00|00|00|hash"
+IN_COMBAT = "260|2024-01-01T00:00:00.0000000+08:00|1|1|1|1|hash"
+
+
+def ability(skill_id: str, source: str = "首领", line_type: str = "21") -> str:
+    return f"{line_type}|2024-01-01T00:00:00.0000000+08:00|40001234|{source}|{skill_id}|技能|10000001|玩家|hash"
+
+
+class FakeClock:
+    """手动推进的真实时间"""
+
+    def __init__(self):
+        self.real = 0.0
+
+    def __call__(self) -> float:
+        return self.real
+
+
+@pytest.fixture
+def fake():
+    return FakeClock()
+
+
+@pytest.fixture
+def engine(fake):
+    clock = FightClock(fake)
+    clock.play()
+    return LogSyncEngine(parse_timeline_lines(TIMELINE), clock)
+
+
+def active_names(engine: LogSyncEngine) -> list:
+    """活动条目的名称（同一时间的条目按行号排列）"""
+    return [point.entry.name for point in sorted(engine.active_points(), key=lambda point: point.entry.line)]
+
+
+def test_sync_points(engine):
+    assert engine.unsupported == 1
+    assert engine.starts == sorted(engine.starts)
+    keys = {point.entry.name: point.key for point in engine.points}
+    assert keys["读条"] is None  # 只有正则条件
+    assert keys["循环技能"] == ("id", 4, frozenset({"A005", "A006"}))
+    point = next(point for point in engine.points if point.entry.name == "旋风")
+    assert (point.start, point.end) == (17.5, 22.5)  # 默认窗口 2.5s
+
+
+def test_window_indexing(engine, fake):
+    assert active_names(engine) == ["--Reset--", "--sync--", "--sync--"]
+    engine.advance(7.0)
+    assert active_names(engine) == ["--Reset--", "斩击", "--sync--"]
+    engine.advance(17.6)
+    assert active_names(engine) == ["--Reset--", "旋风", "--sync--"]
+    engine.advance(46.0)
+    assert active_names(engine) == ["--Reset--", "远跳"]
+    # 时间倒退时重建索引
+    engine.advance(7.0)
+    assert active_names(engine) == ["--Reset--", "斩击", "--sync--"]
+    assert sum(engine.active_counts.values()) == 3
+
+
+def test_sync_only_inside_window(engine, fake):
+    fake.real = 3.0
+    assert engine.feed_lines([ability("A002"), ability("A001")]) == []
+    assert engine.clock.now() == 3.0
+
+    fake.real = 8.0
+    # 来源不符、ID 不符、行类型不在时间轴中或格式不对的行都不匹配
+    assert engine.feed_lines([ability("A001", source="小怪"), ability("A00"), "99|x|A001", "无分隔符", ""]) == []
+    # ID 不区分大小写，22 行同样是 Ability
+    matches = engine.feed_lines([ability("a001", line_type="22")])
+    assert [(match.entry.name, match.old_time, match.new_time) for match in matches] == [("斩击", 8.0, 10.0)]
+    assert engine.clock.now() == 10.0 and engine.clock.running
+    fake.real += 1.5
+    assert engine.clock.now() == 11.5
+    assert engine.lines_seen == 8 and engine.matches == 1
+
+
+def test_regex_condition(engine, fake):
+    fake.real = 25.0
+    start = "20|2024-01-01T00:00:00.0000000+08:00|40001234|首领|{}|读条|10000001|玩家|4.70|hash"
+    assert engine.feed_lines([start.format("B01A")]) == []
+    matches = engine.feed_lines([start.format("b007")])
+    assert [match.entry.name for match in matches] == ["读条"]
+    assert engine.clock.now() == 30.0
+
+
+def test_jump_to_label_and_time(engine, fake):
+    fake.real = 35.0
+    matches = engine.feed_lines([ability("A003")])
+    assert [(match.old_time, match.new_time) for match in matches] == [(35.0, 100.0)]
+    assert engine.clock.now() == 100.0
+    # 跳转后按新时间重建索引：循环中的条目可以同步，原来的条目不行
+    assert active_names(engine) == ["--Reset--", "循环技能"]
+    assert engine.feed_lines([ability("A004")]) == []
+    fake.real += 3.0
+    assert [match.new_time for match in engine.feed_lines([ability("A006")])] == [100.0]
+
+    engine.clock.seek(48.0)
+    assert [match.new_time for match in engine.feed_lines([ability("A004")])] == [200.0]
+    assert engine.clock.now() == 200.0
+
+
+def test_jump_zero_pauses_until_combat(engine, fake):
+    fake.real = 60.0
+    matches = engine.feed_lines([RESET])
+    assert [(match.entry.name, match.new_time) for match in matches] == [("--Reset--", 0.0)]
+    assert not engine.clock.running
+    fake.real = 90.0
+    assert engine.clock.now() == 0.0
+    assert engine.feed_lines([ability("A001")]) == []
+
+    # 进入战斗后从 0 秒继续计时
+    assert [match.entry.name for match in engine.feed_lines([IN_COMBAT])] == ["--sync--"]
+    assert engine.clock.running
+    fake.real = 92.0
+    assert engine.clock.now() == 2.0
+
+
+def append(path, data: bytes):
+    with open(path, "ab") as log_file:
+        log_file.write(data)
+
+
+def test_tailer_partial_lines(tmp_path):
+    path = str(tmp_path / "Network.log")
+    append(path, "旧的一行\n".encode("utf-8"))
+    tailer = LogTailer(path)
+    try:
+        assert tailer.read_lines() == []
+        append(path, b"21|a\n21|b")
+        assert tailer.read_lines() == ["21|a"]
+        assert tailer.read_lines() == []
+        append(path, b"c\n\n260|d\n")
+        assert tailer.read_lines() == ["21|bc", "", "260|d"]
+    finally:
+        tailer.close()
+
+    tailer = LogTailer(path, from_end=False)
+    try:
+        assert tailer.read_lines() == ["旧的一行", "21|a", "21|bc", "", "260|d"]
+    finally:
+        tailer.close()
+
+
+def test_tailer_small_reads_keep_multibyte_characters(tmp_path):
+    path = str(tmp_path / "Network.log")
+    append(path, "斩击\n旋风\n".encode("utf-8"))
+    tailer = LogTailer(path, from_end=False, max_read=4)
+    try:
+        lines = []
+        for _ in range(10):
+            lines += tailer.read_lines()
+        assert lines == ["斩击", "旋风"]
+    finally:
+        tailer.close()
+
+
+def test_tailer_truncation(tmp_path):
+    path = str(tmp_path / "Network.log")
+    append(path, b"21|old\n21|half")
+    tailer = LogTailer(path, from_end=False)
+    try:
+        assert tailer.read_lines() == ["21|old"]
+        # 日志被截断或替换为更短的文件：丢弃半行，从头读取
+        with open(path, "wb") as log_file:
+            log_file.write(b"01|new\n")
+        assert tailer.read_lines() == ["01|new"]
+        os.remove(path)
+        assert tailer.read_lines() == []
+    finally:
+        tailer.close()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""多文档：按内存预算和视图数淘汰最久未使用的文档"""
+
+import os
+
+from timeline_core.parser import parse_timeline_file
+from timeline_core.workspace import DocumentLRU, TimelineDocument
+
+TOP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "RAID", "TOP.txt")
+
+
+def make_document(path: str, model_bytes: int = 0, view=None) -> TimelineDocument:
+    document = TimelineDocument(path, plan=object(), history=object())
+    if model_bytes:
+        document.graph = object()
+        document.model_bytes = model_bytes
+    document.view = view
+    return document
+
+
+def make_lru(sizes, memory_budget: int, max_views: int = 3) -> DocumentLRU:
+    documents = DocumentLRU(memory_budget=memory_budget, max_views=max_views)
+    for index, size in enumerate(sizes):
+        documents.add(make_document(f"{index}.txt", size))
+    return documents
+
+
+def test_set_model_estimates_size():
+    parsed = parse_timeline_file(TOP_FILE)
+    with open(TOP_FILE, encoding="utf-8") as timeline_file:
+        lines = timeline_file.read().splitlines()
+    document = TimelineDocument(TOP_FILE, plan=None, history=None)
+    document.set_model(parsed, graph=object(), skill_index=None, lines=lines, watcher=None)
+    assert document.has_model()
+    assert document.model_bytes > parsed.entries.nbytes() + sum(map(len, lines))
+    document.compact()
+    assert not document.has_model() and document.model_bytes == 0
+
+
+def test_trim_within_budget_keeps_everything():
+    documents = make_lru([100, 200, 300], memory_budget=600)
+    assert documents.trim(documents.get("2.txt")) == ([], [])
+    assert all(document.has_model() for document in documents)
+
+
+def test_trim_compacts_least_recent_first():
+    documents = make_lru([100, 200, 300, 400], memory_budget=750)
+    documents.touch(documents.get("0.txt"))  # 顺序：1, 2, 3, 0
+    active = documents.get("0.txt")
+    plan = documents.get("1.txt").plan
+
+    compacted, dropped_views = documents.trim(active)
+    # 丢弃 1 后为 800，丢弃 2 后为 500，不再继续
+    assert [document.path for document in compacted] == ["1.txt", "2.txt"]
+    assert dropped_views == []
+    assert documents.model_bytes() == 500
+    assert [document.has_model() for document in documents] == [False, False, True, True]
+    # 计划部分和文档本身保留
+    assert len(documents) == 4 and documents.get("1.txt").plan is plan
+
+
+def test_trim_never_compacts_active_document():
+    documents = make_lru([100, 1000], memory_budget=500)
+    active = documents.get("1.txt")
+    compacted, _ = documents.trim(active)
+    assert compacted == [documents.get("0.txt")]
+    assert active.has_model() and documents.model_bytes() == 1000
+
+    # 再次淘汰时已丢弃的文档不计入
+    assert documents.trim(active) == ([], [])
+
+
+def test_trim_limits_views():
+    documents = DocumentLRU(memory_budget=1 << 30, max_views=2)
+    for index in range(5):
+        documents.add(make_document(f"{index}.txt", view=f"视图{index}"))
+    documents.touch(documents.get("1.txt"))  # 顺序：0, 2, 3, 4, 1
+    active = documents.get("4.txt")
+
+    # 当前文档的视图占一个名额，只再保留最近使用的一个
+    _, dropped_views = documents.trim(active)
+    assert [document.path for document in dropped_views] == ["0.txt", "2.txt", "3.txt"]
+
+    # 界面销毁视图后不再返回
+    for document in dropped_views:
+        document.view = None
+    assert documents.trim(active) == ([], [])
+
+    # 当前文档还没有视图时不占名额
+    active.view = None
+    documents.get("0.txt").view = "视图0"
+    _, dropped_views = documents.trim(active)
+    assert dropped_views == []
+    documents.get("2.txt").view = "视图2"
+    _, dropped_views = documents.trim(active)
+    assert [document.path for document in dropped_views] == ["0.txt"]
+
+
+def test_most_recent_and_remove():
+    documents = make_lru([0, 0, 0], memory_budget=0)
+    assert documents.most_recent().path == "2.txt"
+    assert documents.most_recent(exclude=documents.get("2.txt")).path == "1.txt"
+    closed = documents.get("2.txt")
+    documents.remove(closed)
+    documents.remove(closed)  # 重复关闭不报错
+    assert [document.path for document in documents] == ["0.txt", "1.txt"]
+    assert documents.most_recent().path == "1.txt"
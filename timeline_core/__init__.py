@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""技能时间轴核心逻辑（不依赖 tkinter）
+
+包含时间轴解析、解析缓存、蛇胆资源模拟和使用计划模型。子模块按需导入，
+``import timeline_core`` 本身不加载任何子模块。
+"""
+
+_EXPORTS = {
+    "TimelineEntry": "parser",
+    "TimelineLabel": "parser",
+    "TimelineParseError": "parser",
+    "ParsedTimeline": "parser",
+    "parse_timeline_lines": "parser",
+    "parse_timeline_file": "parser",
+    "TimelineColumns": "columns",
+    "TimelineRows": "columns",
+    "TimelineCache": "cache",
+    "encode_parsed_timeline": "cache",
+    "decode_parsed_timeline": "cache",
+    "SerpentLedger": "serpent",
+    "sweep_serpent_states": "serpent",
+    "resweep_serpent_states": "serpent",
+    "SerpentPlan": "plan",
+    "PlanHistory": "history",
+    "PlanState": "history",
+    "PersistentMap": "history",
+    "SavedPlan": "planfile",
+    "PlanStore": "planfile",
+    "PlanAutosaver": "planfile",
+    "encode_plan": "planfile",
+    "decode_plan": "planfile",
+    "TimelineGraph": "graph",
+    "FileWatcher": "reload",
+    "TimelineDocument": "workspace",
+    "DocumentLRU": "workspace",
+    "reparse_timeline": "reload",
+    "match_rows": "reload",
+    "ResourceDefinition": "resources",
+    "simulate_resources": "resources",
+    "blocked_use_intervals": "sensitivity",
+    "safe_offset_window": "sensitivity",
+    "safe_offset_windows": "sensitivity",
+    "SkillIndex": "search",
+    "NgramIndex": "search",
+    "LibraryIndex": "library",
+    "LibraryHit": "library",
+    "Jitter": "robustness",
+    "analyze_robustness": "robustness",
+    "FightClock": "playback",
+    "EventCursor": "playback",
+    "LogSyncEngine": "sync",
+    "LogTailer": "sync",
+    "Profiler": "profiling",
+    "profiler": "profiling",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    module = importlib.import_module(f"{__name__}.{module_name}")
+    return getattr(module, name)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""批量分析多个时间轴：多进程并行，结果逐条输出为 JSON Lines 或 CSV"""
+
+import os
+import csv
+import glob
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .parser import parse_timeline_file
+from .graph import TimelineGraph
+from .plan import SerpentPlan
+from .solver import desired_uses_from_rows, solve_serpent_plan
+
+SUMMARY_FIELDS = [
+    "file", "entries", "rows", "hidden_entries", "labels", "parse_errors", "duration",
+    "max_usable_charges", "desired_rows", "planned_uses", "dropped_uses",
+    "idle_charge_seconds", "full_seconds", "wasted_charges", "full_windows",
+]
+
+
+def gauge_segments(uses: Sequence[float], end_time: float, max_count: int = 3,
+                   regen_interval: float = 30.0) -> List[Tuple[float, float, int]]:
+    """按时间顺序返回 [0, end_time] 内蛇胆数量不变的区间 (开始, 结束, 数量)"""
+    events = []
+    for use_time in uses:
+        events.append((use_time, -1))
+        events.append((use_time + regen_interval, 1))
+    events.sort()
+
+    segments = []
+    count = max_count
+    previous = 0.0
+    for event_time, change in events:
+        if event_time > end_time:
+            break
+        if event_time > previous:
+            segments.append((previous, event_time, count))
+            previous = event_time
+        count = max(0, min(max_count, count + change))
+    if end_time > previous:
+        segments.append((previous, end_time, count))
+    return segments
+
+
+def summarize_gauge(uses: Sequence[float], end_time: float, max_count: int = 3,
+                    regen_interval: float = 30.0) -> dict:
+    """统计闲置蛇胆：闲置的蛇胆·秒、满蛇胆的总时间，以及满蛇胆超过一个回复间隔的区间
+
+    满蛇胆时使用一次并在回复间隔内回复也不会影响之后的蛇胆，因此每个满蛇胆区间
+    可以额外放入 floor(长度 / 回复间隔) 次使用，计为浪费的蛇胆。
+    """
+    idle_charge_seconds = 0.0
+    full_seconds = 0.0
+    full_windows = []
+    window_start = None
+
+    for start, end, count in gauge_segments(uses, end_time, max_count, regen_interval):
+        idle_charge_seconds += count * (end - start)
+        if count >= max_count:
+            full_seconds += end - start
+            if window_start is None:
+                window_start = start
+        elif window_start is not None:
+            full_windows.append((window_start, start))
+            window_start = None
+    if window_start is not None:
+        full_windows.append((window_start, end_time))
+
+    wasted_windows = [(start, end) for start, end in full_windows if end - start >= regen_interval]
+    wasted_charges = sum(int((end - start) // regen_interval) for start, end in wasted_windows)
+    return {
+        "idle_charge_seconds": round(idle_charge_seconds, 3),
+        "full_seconds": round(full_seconds, 3),
+        "wasted_charges": wasted_charges,
+        "full_windows": [(round(start, 3), round(end, 3)) for start, end in wasted_windows],
+    }
+
+
+def analyze_timeline(file_path: str, match: Sequence[str] = (), window: float = 0.0,
+                     max_count: int = 3, regen_interval: float = 30.0) -> dict:
+    """分析一个时间轴文件
+
+    max_usable_charges 是只在时间轴行上使用时最多能用掉的蛇胆数；计划默认即为该
+    最大计划，给出 match 时改为只在名称包含任一关键词的行使用并求解。desired_rows
+    总是等于 planned_uses + dropped_uses：没有 match 时希望使用的就是最大计划中的
+    行，dropped_uses 为 0。
+    """
+    parsed = parse_timeline_file(file_path)
+    rows, _ = TimelineGraph(parsed).path_rows()
+    plan = SerpentPlan(rows, max_count, regen_interval)
+    duration = plan.row_times[-1] if plan.row_times else 0.0
+
+    all_rows = desired_uses_from_rows(plan.rows, {index: 1 for index in range(len(plan.rows))}, -window, window)
+    best = solve_serpent_plan(all_rows, max_count, regen_interval)
+
+    if match:
+        for index, (_, skill_name) in enumerate(plan.rows):
+            if any(keyword in skill_name for keyword in match):
+                plan.set_desired(index, 1)
+        solved = plan.solve(-window, window)
+        dropped_uses = len(solved.dropped)
+    else:
+        solved = best
+        for index, _, _ in best.uses:
+            plan.set_desired(index, 1)
+        dropped_uses = 0  # best.dropped 是没有选中的其余所有行，并不是希望使用的行
+
+    summary = {
+        "file": file_path,
+        "entries": len(parsed.entries),
+        "rows": len(plan.rows),
+        "hidden_entries": parsed.entries.hidden_count(),
+        "labels": len(parsed.labels),
+        "parse_errors": len(parsed.errors),
+        "duration": duration,
+        "max_usable_charges": len(best.uses),
+        "desired_rows": len(plan.desired),
+        "planned_uses": len(solved.uses),
+        "dropped_uses": dropped_uses,
+    }
+    summary.update(summarize_gauge([use_time for _, use_time, _ in solved.uses], duration, max_count, regen_interval))
+    return summary
+
+
+def collect_timeline_files(paths: Iterable[str]) -> List[str]:
+    """展开目录（其中的 *.txt）和通配符，返回排序后的文件列表"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "*.txt")))
+        elif any(char in path for char in "*?["):
+            files.extend(glob.glob(path))
+        else:
+            files.append(path)
+    return sorted(set(files))
+
+
+def iter_batch_analysis(files: Sequence[str], jobs: Optional[int] = None, **options) -> Iterator[dict]:
+    """在进程池中分析所有文件，按完成顺序逐个产出结果；单个文件失败时产出带 error 的结果"""
+    if jobs == 1 or len(files) <= 1:
+        for file_path in files:
+            yield _analyze_safely(file_path, options)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(_analyze_safely, file_path, options) for file_path in files]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _analyze_safely(file_path: str, options: dict) -> dict:
+    try:
+        return analyze_timeline(file_path, **options)
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        return {"file": file_path, "error": str(e)}
+
+
+def write_jsonl(summaries: Iterable[dict], stream) -> int:
+    """逐行写出 JSON，返回失败的文件数"""
+    failures = 0
+    for summary in summaries:
+        failures += "error" in summary
+        stream.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        stream.flush()
+    return failures
+
+
+def write_csv(summaries: Iterable[dict], stream) -> int:
+    """逐行写出 CSV，full_windows 写成 开始-结束;开始-结束，返回失败的文件数"""
+    writer = csv.DictWriter(stream, fieldnames=SUMMARY_FIELDS + ["error"], extrasaction="ignore")
+    writer.writeheader()
+    failures = 0
+    for summary in summaries:
+        failures += "error" in summary
+        row = dict(summary)
+        if "full_windows" in row:
+            row["full_windows"] = ";".join(f"{start:g}-{end:g}" for start, end in row["full_windows"])
+        writer.writerow(row)
+        stream.flush()
+    return failures
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""解析结果的二进制编码与磁盘缓存"""
+
+import os
+import zlib
+import struct
+import hashlib
+from array import array
+from typing import Optional
+
+from .parser import ParsedTimeline, TimelineLabel, TimelineParseError, parse_timeline_lines
+
+
+_CACHE_MAGIC = b"SGTC"
+_CACHE_VERSION = 1
+_CACHE_HEADER = struct.Struct("<4sHqq20s")  # 魔数, 版本, mtime_ns, 文件大小, SHA-1
+_CACHE_ENTRY = struct.Struct("<diiiBddBdidI")
+_CACHE_LABEL = struct.Struct("<diI")
+_CACHE_ERROR = struct.Struct("<IIii")
+_CACHE_COUNT = struct.Struct("<I")
+
+_FLAG_HIDDEN = 1
+_FLAG_FORCE_JUMP = 2
+_FLAG_WINDOW = 4
+_JUMP_NONE, _JUMP_TIME, _JUMP_LABEL = 0, 1, 2
+
+
+def encode_parsed_timeline(parsed: ParsedTimeline) -> bytes:
+    """把解析结果编码为紧凑的二进制格式（字符串表 + 定长记录，整体 zlib 压缩）"""
+    strings = []
+    string_ids = {}
+
+    def intern_id(value):
+        if value is None:
+            return -1
+        string_id = string_ids.get(value)
+        if string_id is None:
+            string_id = string_ids[value] = len(strings)
+            strings.append(value)
+        return string_id
+
+    entry_records = []
+    for entry in parsed.entries:
+        flags = 0
+        if entry.hidden:
+            flags |= _FLAG_HIDDEN
+        if entry.force_jump:
+            flags |= _FLAG_FORCE_JUMP
+        window_before = window_after = 0.0
+        if entry.window is not None:
+            flags |= _FLAG_WINDOW
+            window_before, window_after = entry.window
+        jump_kind, jump_time, jump_label = _JUMP_NONE, 0.0, -1
+        if isinstance(entry.jump, str):
+            jump_kind, jump_label = _JUMP_LABEL, intern_id(entry.jump)
+        elif entry.jump is not None:
+            jump_kind, jump_time = _JUMP_TIME, entry.jump
+        duration = entry.duration if entry.duration is not None else float("nan")
+        entry_records.append(_CACHE_ENTRY.pack(
+            entry.time, intern_id(entry.name), intern_id(entry.sync_type), intern_id(entry.payload), flags,
+            window_before, window_after, jump_kind, jump_time, jump_label, duration, entry.line
+        ))
+
+    label_records = [_CACHE_LABEL.pack(label.time, intern_id(label.name), label.line) for label in parsed.labels]
+    error_records = [
+        _CACHE_ERROR.pack(error.line, error.column, intern_id(error.message), intern_id(error.text))
+        for error in parsed.errors
+    ]
+    hidden_ids = [intern_id(name) for name in sorted(parsed.hidden_names)]
+
+    parts = [_CACHE_COUNT.pack(len(strings))]
+    for value in strings:
+        encoded = value.encode("utf-8")
+        parts.append(_CACHE_COUNT.pack(len(encoded)))
+        parts.append(encoded)
+    parts.append(_CACHE_COUNT.pack(len(hidden_ids)))
+    parts.append(array("i", hidden_ids).tobytes())
+    for records in (entry_records, label_records, error_records):
+        parts.append(_CACHE_COUNT.pack(len(records)))
+        parts.extend(records)
+    return zlib.compress(b"".join(parts))
+
+
+def decode_parsed_timeline(data: bytes) -> ParsedTimeline:
+    """从 encode_parsed_timeline 的输出还原解析结果"""
+    body = memoryview(zlib.decompress(data))
+    offset = 0
+
+    def read_count():
+        nonlocal offset
+        (count,) = _CACHE_COUNT.unpack_from(body, offset)
+        offset += _CACHE_COUNT.size
+        return count
+
+    strings = []
+    for _ in range(read_count()):
+        length = read_count()
+        strings.append(str(body[offset:offset + length], "utf-8"))
+        offset += length
+
+    def lookup(string_id):
+        return None if string_id < 0 else strings[string_id]
+
+    parsed = ParsedTimeline()
+    hidden_count = read_count()
+    hidden_ids = array("i")
+    hidden_ids.frombytes(body[offset:offset + hidden_count * hidden_ids.itemsize])
+    offset += hidden_count * hidden_ids.itemsize
+    parsed.hidden_names = {strings[string_id] for string_id in hidden_ids}
+
+    count = read_count()
+    end = offset + count * _CACHE_ENTRY.size
+    records = []
+    for (time_val, name_id, sync_id, payload_id, flags, window_before, window_after,
+         jump_kind, jump_time, jump_label, duration, line) in _CACHE_ENTRY.iter_unpack(body[offset:end]):
+        jump = None
+        if jump_kind == _JUMP_TIME:
+            jump = jump_time
+        elif jump_kind == _JUMP_LABEL:
+            jump = strings[jump_label]
+        records.append((time_val, strings[name_id], line, lookup(sync_id), lookup(payload_id),
+                        (window_before, window_after) if flags & _FLAG_WINDOW else None,
+                        jump, bool(flags & _FLAG_FORCE_JUMP),
+                        duration if duration == duration else None,  # NaN 表示没有 duration
+                        bool(flags & _FLAG_HIDDEN)))
+    parsed.entries.extend_records(records)
+    offset = end
+
+    count = read_count()
+    end = offset + count * _CACHE_LABEL.size
+    for time_val, name_id, line in _CACHE_LABEL.iter_unpack(body[offset:end]):
+        parsed.labels.append(TimelineLabel(time_val, strings[name_id], line))
+    offset = end
+
+    count = read_count()
+    end = offset + count * _CACHE_ERROR.size
+    for line, column, message_id, text_id in _CACHE_ERROR.iter_unpack(body[offset:end]):
+        parsed.errors.append(TimelineParseError(line, column, lookup(message_id), lookup(text_id)))
+
+    return parsed
+
+
+def default_cache_dir() -> str:
+    """默认缓存目录：Windows 使用 LOCALAPPDATA，其他系统使用 XDG_CACHE_HOME 或 ~/.cache"""
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "SGE_TimeLineTool", "timelines")
+
+
+class TimelineCache:
+    """解析结果的磁盘缓存
+
+    以文件绝对路径为键，缓存文件头记录源文件的 mtime、大小和 SHA-1。mtime 与
+    大小都未变化时直接读取缓存，完全跳过解析；变化时再比较内容哈希，内容相同只
+    刷新文件头。缓存目录总大小超过 max_bytes 时按最近使用时间淘汰。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 8 * 1024 * 1024):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def cache_path(self, file_path: str) -> str:
+        """源文件对应的缓存文件路径"""
+        key = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + ".tlc")
+
+    def load(self, file_path: str) -> ParsedTimeline:
+        """读取解析结果，缓存失效时重新解析并写回缓存"""
+        stat = os.stat(file_path)
+        cache_path = self.cache_path(file_path)
+        header = None
+        try:
+            with open(cache_path, "rb") as cache_file:
+                header = _CACHE_HEADER.unpack(cache_file.read(_CACHE_HEADER.size))
+                magic, version, mtime_ns, size, digest = header
+                if magic == _CACHE_MAGIC and version == _CACHE_VERSION \
+                        and mtime_ns == stat.st_mtime_ns and size == stat.st_size:
+                    parsed = decode_parsed_timeline(cache_file.read())
+                    self._touch(cache_path)
+                    return parsed
+        except (OSError, struct.error, zlib.error, UnicodeDecodeError, IndexError):
+            header = None
+
+        with open(file_path, "rb") as source_file:
+            content = source_file.read()
+        digest = hashlib.sha1(content).digest()
+
+        if header is not None and header[0] == _CACHE_MAGIC and header[1] == _CACHE_VERSION and header[4] == digest:
+            # 只是 mtime 变了，内容相同：刷新文件头即可
+            try:
+                with open(cache_path, "r+b") as cache_file:
+                    cache_file.write(_CACHE_HEADER.pack(_CACHE_MAGIC, _CACHE_VERSION,
+                                                        stat.st_mtime_ns, stat.st_size, digest))
+                    return decode_parsed_timeline(cache_file.read())
+            except (OSError, struct.error, zlib.error, UnicodeDecodeError, IndexError):
+                pass
+
+        parsed = parse_timeline_lines(content.decode("utf-8").splitlines())
+        self.store(cache_path, parsed, stat, digest)
+        return parsed
+
+    def store(self, cache_path: str, parsed: ParsedTimeline, stat: os.stat_result, digest: bytes):
+        """写入缓存文件并按大小限制淘汰旧缓存，写入失败不影响加载"""
+        header = _CACHE_HEADER.pack(_CACHE_MAGIC, _CACHE_VERSION, stat.st_mtime_ns, stat.st_size, digest)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = cache_path + ".tmp"
+            with open(temp_path, "wb") as cache_file:
+                cache_file.write(header)
+                cache_file.write(encode_parsed_timeline(parsed))
+            os.replace(temp_path, cache_path)
+            self.evict()
+        except OSError:
+            pass
+
+    def evict(self):
+        """缓存总大小超过上限时，删除最久未使用的缓存文件"""
+        files = []
+        total = 0
+        with os.scandir(self.cache_dir) as scanner:
+            for item in scanner:
+                if item.name.endswith(".tlc"):
+                    item_stat = item.stat()
+                    files.append((item_stat.st_mtime_ns, item_stat.st_size, item.path))
+                    total += item_stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        """删除所有缓存文件"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        with os.scandir(self.cache_dir) as scanner:
+            for item in scanner:
+                if item.name.endswith(".tlc"):
+                    try:
+                        os.remove(item.path)
+                    except OSError:
+                        pass
+
+    def _touch(self, cache_path: str):
+        """更新缓存文件的修改时间，作为 LRU 的最近使用时间"""
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""命令行入口
+
+    python -m timeline_core simulate RAID/TOP.txt --use 120.5 --use 180
+    python -m timeline_core solve RAID/TOP.txt --want 120.5:3 --match 波动炮 --window 2
+    python -m timeline_core batch RAID --format csv --output summary.csv
+    python -m timeline_core gauges RAID/TOP.txt --resources sage.json --action 120.5:蛇胆
+    python -m timeline_core robust RAID/TOP.txt --use 120.5 --use 150.5 --trials 20000
+    python -m timeline_core find 空间斩 --library RAID
+"""
+
+import os
+import sys
+import bisect
+import argparse
+from typing import List, Optional, Tuple
+
+from .graph import TimelineGraph
+from .parser import parse_timeline_file
+from .plan import SerpentPlan
+
+
+def use_skill_name(plan: SerpentPlan, use_time: float) -> str:
+    """命令行指定的使用时间取不晚于该时间的最后一行的技能名称"""
+    index = bisect.bisect_right(plan.row_times, use_time) - 1
+    return plan.rows[index][1] if index >= 0 else "手动"
+
+
+def format_state_row(time_val: float, skill_name: str, state: tuple, max_count: int) -> str:
+    """格式化一行蛇胆状态"""
+    serpent_count, next_skill, progress, time_remaining = state
+    if serpent_count >= max_count:
+        recovery = "已满"
+    elif next_skill is None:
+        recovery = "待使用"
+    else:
+        recovery = f"{next_skill[:8]} {progress * 100:5.1f}% {time_remaining:6.1f}s"
+    return f"{time_val:8.1f}s  {serpent_count}/{max_count}  {recovery:<28}  {skill_name}"
+
+
+def load_path(args) -> Optional[Tuple[TimelineGraph, List[Tuple[float, str]], List[int]]]:
+    """解析时间轴并按 --jump 选择的分支取出 (分支图, 路径上的行, 每行的条目下标)，跳转不存在时返回 None"""
+    parsed = parse_timeline_file(args.file)
+    for error in parsed.errors:
+        print(f"{args.file}: {error}", file=sys.stderr)
+    graph = TimelineGraph(parsed)
+    try:
+        choices = graph.choices_for_times(args.jump)
+    except ValueError as e:
+        print(f"{args.file}: {e}", file=sys.stderr)
+        return None
+    rows, indices = graph.path_rows(choices)
+    return graph, rows, indices
+
+
+def load_path_rows(args) -> Optional[List[Tuple[float, str]]]:
+    """解析时间轴并按 --jump 选择的分支取出路径上的行，跳转不存在时返回 None"""
+    loaded = load_path(args)
+    return loaded[1] if loaded is not None else None
+
+
+def run_simulate(args) -> int:
+    """simulate 子命令：打印每行的蛇胆量谱"""
+    rows = load_path_rows(args)
+    if rows is None:
+        return 1
+    plan = SerpentPlan(rows, args.max_charges, args.regen)
+    exit_code = 0
+    for use_time in sorted(args.use):
+        if not plan.add_use(max(0.0, use_time), use_skill_name(plan, use_time)):
+            print(f"✗ 蛇胆不足，无法在 {use_time:.1f}s 使用", file=sys.stderr)
+            exit_code = 1
+    plan.refresh()
+
+    print(f"{'时间':>8}   蛇胆  {'回复':<28}  技能名称")
+    for (time_val, skill_name), state in zip(plan.rows, plan.states):
+        print(format_state_row(time_val, skill_name, state, plan.max_count))
+    return exit_code
+
+
+def parse_weighted(value: str) -> Tuple[str, float]:
+    """解析 值[:优先级]，优先级默认为 1"""
+    target, separator, priority = value.rpartition(":")
+    if not separator:
+        return value, 1.0
+    try:
+        return target, float(priority)
+    except ValueError:
+        return value, 1.0
+
+
+def nearest_row(plan: SerpentPlan, time_val: float) -> int:
+    """时间最接近的行"""
+    index = bisect.bisect_left(plan.row_times, time_val)
+    if index == len(plan.row_times) or (index > 0 and time_val - plan.row_times[index - 1] <= plan.row_times[index] - time_val):
+        index -= 1
+    return index
+
+
+def run_solve(args) -> int:
+    """solve 子命令：按希望使用的行求解使用计划"""
+    rows = load_path_rows(args)
+    if rows is None:
+        return 1
+    plan = SerpentPlan(rows, args.max_charges, args.regen)
+    if not plan.rows:
+        print(f"{args.file}: 没有时间轴数据", file=sys.stderr)
+        return 1
+
+    for value in args.want:
+        target, priority = parse_weighted(value)
+        plan.set_desired(nearest_row(plan, float(target)), priority)
+    for value in args.match:
+        target, priority = parse_weighted(value)
+        for index, (_, skill_name) in enumerate(plan.rows):
+            if target in skill_name:
+                plan.set_desired(index, priority)
+
+    solved = plan.solve(-args.window, args.window)
+    plan.replace_uses(solved.uses)
+
+    print(f"放入 {len(solved.uses)} 次使用，总优先级 {solved.value:g}" + ("" if solved.exact else "（状态数达到上限，结果可能非最优）"))
+    for index, use_time, skill_name in solved.uses:
+        print(f"  使用 {use_time:8.1f}s  偏移 {use_time - plan.row_times[index]:+5.1f}s  {skill_name}")
+    for item in solved.dropped:
+        print(f"  未放入 {item.time:6.1f}s  优先级 {item.priority:g}  {item.name}")
+
+    if args.table:
+        print(f"{'时间':>8}   蛇胆  {'回复':<28}  技能名称")
+        for (time_val, skill_name), state in zip(plan.rows, plan.states):
+            print(format_state_row(time_val, skill_name, state, plan.max_count))
+    return 0 if not solved.dropped else 1
+
+
+def parse_action(value: str) -> Tuple[float, str]:
+    """解析 时间[:动作名称]，动作名称默认为蛇胆"""
+    from .resources import SERPENT_ACTION
+    time_text, _, action = value.partition(":")
+    return float(time_text), action or SERPENT_ACTION
+
+
+def run_gauges(args) -> int:
+    """gauges 子命令：按资源定义模拟多种资源并打印每行的数量"""
+    from .resources import DEFAULT_RESOURCES, load_resource_definitions, simulate_resources
+
+    rows = load_path_rows(args)
+    if rows is None:
+        return 1
+    resources = load_resource_definitions(args.resources) if args.resources else list(DEFAULT_RESOURCES)
+    actions = [parse_action(value) for value in args.action]
+    values = simulate_resources(resources, actions, rows.times)
+
+    names = [resource.name for resource in resources]
+    print(f"{'时间':>8}  " + "  ".join(f"{name:>6}" for name in names) + "  技能名称")
+    for index, (time_val, skill_name) in enumerate(rows):
+        print(f"{time_val:8.1f}s " + "  ".join(f"{values[name][index]:>6g}" for name in names) + f"  {skill_name}")
+    return 0
+
+
+def run_robust(args) -> int:
+    """robust 子命令：蒙特卡洛模拟时间抖动，打印每次使用失败的概率"""
+    from .robustness import Jitter, analyze_robustness, row_sync_windows, use_anchor_rows
+
+    loaded = load_path(args)
+    if loaded is None:
+        return 1
+    graph, rows, indices = loaded
+    try:
+        entry_jitter = Jitter.parse(args.entry_jitter)
+        input_delay = Jitter.parse(args.input_delay)
+    except ValueError as e:
+        print(f"参数错误: {e}", file=sys.stderr)
+        return 1
+
+    plan = SerpentPlan(rows, args.max_charges, args.regen)
+    uses = [(max(0.0, use_time), use_skill_name(plan, use_time)) for use_time in sorted(args.use)]
+    report = analyze_robustness(uses, use_anchor_rows(rows, uses), row_sync_windows(graph.entries, indices),
+                                entry_jitter, input_delay, trials=args.trials, max_count=args.max_charges,
+                                regen_interval=args.regen, seed=args.seed, jobs=args.jobs or None)
+
+    print(f"{'时间':>8}  {'失败概率':>8}  技能名称")
+    for (use_time, skill_name), probability in zip(report.uses, report.failure_probability()):
+        print(f"{use_time:8.1f}s  {probability * 100:7.2f}%  {skill_name}")
+    print(f"{report.trials} 次试验，至少一次使用失败的概率 {report.any_failure_probability() * 100:.2f}%")
+    return 0
+
+
+def run_batch(args) -> int:
+    """batch 子命令：并行分析多个时间轴并逐条输出摘要"""
+    from .batch import collect_timeline_files, iter_batch_analysis, write_csv, write_jsonl
+
+    files = collect_timeline_files(args.paths)
+    if not files:
+        print("没有找到时间轴文件", file=sys.stderr)
+        return 1
+
+    summaries = iter_batch_analysis(files, args.jobs, match=args.match, window=args.window,
+                                    max_count=args.max_charges, regen_interval=args.regen)
+    writer = write_csv if args.format == "csv" else write_jsonl
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as stream:
+            failures = writer(summaries, stream)
+    else:
+        failures = writer(summaries, sys.stdout)
+    return 1 if failures else 0
+
+
+def run_find(args) -> int:
+    """find 子命令：更新时间轴库的索引并列出匹配的条目"""
+    from .batch import collect_timeline_files
+    from .library import LIBRARY_FIELDS, LibraryIndex
+
+    files = collect_timeline_files(args.library or ["RAID"])
+    if not files:
+        print("没有找到时间轴文件", file=sys.stderr)
+        return 1
+    index = LibraryIndex(args.index)
+    index.update(files, args.jobs)
+    for path, error in sorted(index.errors.items()):
+        print(f"{path}: {error}", file=sys.stderr)
+
+    hits = index.query(" ".join(args.query), args.field or LIBRARY_FIELDS)
+    for hit in hits[:args.limit] if args.limit else hits:
+        details = " ".join(filter(None, (",".join(hit.ids), hit.source)))
+        print(f"{hit.file}:{hit.line}  {hit.time:8.1f}s  {hit.name or '--'}  {details}")
+    print(f"{len(hits)} 条匹配，索引中共 {len(index)} 条（{len(index.files)} 个文件）", file=sys.stderr)
+    return 0 if hits else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m timeline_core", description="技能时间轴命令行工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    simulate = subparsers.add_parser("simulate", help="模拟蛇胆使用并打印每行的蛇胆量谱")
+    simulate.add_argument("file", help="cactbot 时间轴文件")
+    simulate.add_argument("--use", type=float, action="append", default=[], metavar="TIME",
+                          help="在指定时间使用蛇胆，可重复")
+    simulate.add_argument("--max-charges", type=int, default=3, help="最大蛇胆数量（默认 3）")
+    simulate.add_argument("--regen", type=float, default=30.0, help="蛇胆回复间隔秒数（默认 30）")
+    simulate.add_argument("--jump", type=float, action="append", default=[], metavar="TIME",
+                          help="触发时间为 TIME 的跳转（jump），重复表示触发多次")
+    simulate.set_defaults(handler=run_simulate)
+
+    solve = subparsers.add_parser("solve", help="按希望使用的行求解蛇胆使用计划")
+    solve.add_argument("file", help="cactbot 时间轴文件")
+    solve.add_argument("--want", action="append", default=[], metavar="TIME[:PRIORITY]",
+                       help="希望在最接近该时间的行使用，可重复")
+    solve.add_argument("--match", action="append", default=[], metavar="NAME[:PRIORITY]",
+                       help="希望在名称包含 NAME 的所有行使用，可重复")
+    solve.add_argument("--window", type=float, default=0.0, help="允许的偏移范围 ± 秒（默认 0）")
+    solve.add_argument("--max-charges", type=int, default=3, help="最大蛇胆数量（默认 3）")
+    solve.add_argument("--regen", type=float, default=30.0, help="蛇胆回复间隔秒数（默认 30）")
+    solve.add_argument("--table", action="store_true", help="同时打印每行的蛇胆量谱")
+    solve.add_argument("--jump", type=float, action="append", default=[], metavar="TIME",
+                       help="触发时间为 TIME 的跳转（jump），重复表示触发多次")
+    solve.set_defaults(handler=run_solve)
+
+    gauges = subparsers.add_parser("gauges", help="按资源定义模拟多种资源并打印每行的数量")
+    gauges.add_argument("file", help="cactbot 时间轴文件")
+    gauges.add_argument("--resources", help="资源定义 JSON 文件（默认只有蛇胆）")
+    gauges.add_argument("--action", action="append", default=[], metavar="TIME[:NAME]",
+                        help="在指定时间执行动作（默认动作为蛇胆），可重复")
+    gauges.add_argument("--jump", type=float, action="append", default=[], metavar="TIME",
+                        help="触发时间为 TIME 的跳转（jump），重复表示触发多次")
+    gauges.set_defaults(handler=run_gauges)
+
+    robust = subparsers.add_parser("robust", help="模拟时间抖动，估计每次蛇胆使用失败的概率")
+    robust.add_argument("file", help="cactbot 时间轴文件")
+    robust.add_argument("--use", type=float, action="append", default=[], metavar="TIME",
+                        help="计划在指定时间使用蛇胆，可重复")
+    robust.add_argument("--trials", type=int, default=20000, help="试验次数（默认 20000）")
+    robust.add_argument("--entry-jitter", default="window:0.5", metavar="KIND[:SCALE]",
+                        help="条目时间漂移分布：none / uniform / normal / exponential / window（默认 window:0.5，"
+                             "即同步窗口的一半）")
+    robust.add_argument("--input-delay", default="exponential:0.15", metavar="KIND[:SCALE]",
+                        help="按键延迟分布（默认 exponential:0.15，平均 0.15s）")
+    robust.add_argument("--seed", type=int, default=None, help="随机种子")
+    robust.add_argument("--jobs", type=int, default=1, help="工作进程数（默认 1，0 表示 CPU 核数）")
+    robust.add_argument("--max-charges", type=int, default=3, help="最大蛇胆数量（默认 3）")
+    robust.add_argument("--regen", type=float, default=30.0, help="蛇胆回复间隔秒数（默认 30）")
+    robust.add_argument("--jump", type=float, action="append", default=[], metavar="TIME",
+                        help="触发时间为 TIME 的跳转（jump），重复表示触发多次")
+    robust.set_defaults(handler=run_robust)
+
+    batch = subparsers.add_parser("batch", help="并行分析多个时间轴并输出每场战斗的摘要")
+    batch.add_argument("paths", nargs="+", help="时间轴文件、目录（分析其中的 *.txt）或通配符")
+    batch.add_argument("--match", action="append", default=[], metavar="NAME",
+                       help="只在名称包含 NAME 的行使用蛇胆，可重复；默认使用最大计划")
+    batch.add_argument("--window", type=float, default=0.0, help="允许的偏移范围 ± 秒（默认 0）")
+    batch.add_argument("--max-charges", type=int, default=3, help="最大蛇胆数量（默认 3）")
+    batch.add_argument("--regen", type=float, default=30.0, help="蛇胆回复间隔秒数（默认 30）")
+    batch.add_argument("--jobs", type=int, default=None, help="工作进程数（默认 CPU 核数）")
+    batch.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="输出格式（默认 jsonl）")
+    batch.add_argument("--output", help="输出文件（默认标准输出）")
+    batch.set_defaults(handler=run_batch)
+
+    find = subparsers.add_parser("find", help="在整个时间轴库中按技能名称、技能 ID 或来源查找条目")
+    find.add_argument("query", nargs="+", help="查询词，多个词都要出现（不区分大小写）")
+    find.add_argument("--library", action="append", default=None, metavar="PATH",
+                      help="时间轴文件、目录或通配符，可重复（默认 RAID）")
+    find.add_argument("--field", action="append", choices=("name", "id", "source"), default=None,
+                      help="只在指定字段中查找，可重复（默认全部）")
+    find.add_argument("--index", help="索引文件路径（默认位于缓存目录）")
+    find.add_argument("--jobs", type=int, default=None, help="解析变化文件的工作进程数（默认 CPU 核数）")
+    find.add_argument("--limit", type=int, default=0, help="最多列出的条目数（默认全部）")
+    find.set_defaults(handler=run_find)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        exit_code = args.handler(args)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # 输出被提前关闭（例如管道到 head）：把 stdout 指向空设备，
+        # 避免解释器退出时刷新缓冲区再次报错
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        os.close(devnull)
+        exit_code = 1
+    return exit_code
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""列式存储的时间轴：条目和行的每个字段保存在一个连续的 array 中
+
+TimelineColumns 保存解析出的条目：时间、行号、窗口和 duration 为 ``array('d')``
+/ ``array('I')``，名称和同步参数文本驻留在 StringTable 中只存编号，同步
+类型为一个字节的编码，跳转很少，按条目下标单独存放。每个条目约 46 字节，百万
+条目的时间轴也只占几十 MB。按下标取出时才创建 TimelineEntry，同步参数 JSON 在
+第一次查看时才解析（相同的参数文本只解析一次）。
+
+TimelineRows 是查看器和使用计划的 (时间, 技能名称) 行：时间和名称编号两列，行为
+与元组列表相同（下标、切片、迭代、比较、extend）。``times`` 可以直接交给
+bisect、资源模拟和 numpy（缓冲区协议，不复制）。
+"""
+
+import json
+from array import array
+from collections.abc import Sequence
+from itertools import islice, repeat
+from operator import le
+from typing import Iterable, Iterator, Optional, Set, Tuple
+
+from .parser import TimelineEntry
+
+_FLAG_HIDDEN = 1
+_FLAG_FORCE_JUMP = 2
+_NAN = float("nan")
+
+
+class StringTable:
+    """字符串驻留表：相同的字符串只保存一次，按编号查找"""
+    __slots__ = ("strings", "ids")
+
+    def __init__(self):
+        self.strings = []  # 编号 -> 字符串
+        self.ids = {}  # 字符串 -> 编号
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def __getitem__(self, string_id: int) -> str:
+        return self.strings[string_id]
+
+    def intern(self, value: str) -> int:
+        """返回字符串的编号，不存在时加入"""
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def intern_all(self, values) -> Iterator[int]:
+        """批量驻留：只对不同的字符串查表，返回每个值的编号"""
+        values = values if isinstance(values, (list, tuple)) else list(values)
+        ids = self.ids
+        strings = self.strings
+        for value in dict.fromkeys(values):
+            if value not in ids:
+                ids[value] = len(strings)
+                strings.append(value)
+        return map(ids.__getitem__, values)
+
+
+def _array_bytes(*arrays: array) -> int:
+    return sum(len(column) * column.itemsize for column in arrays)
+
+
+class TimelineRows(Sequence):
+    """按列保存的 (时间, 技能名称) 行，用法与元组列表相同"""
+    __slots__ = ("times", "name_ids", "names")
+
+    def __init__(self, rows: Iterable[Tuple[float, str]] = (), names: Optional[StringTable] = None):
+        self.times = array("d")  # 每行的时间（升序）
+        self.name_ids = array("I")  # 每行名称在 names 中的编号
+        self.names = names if names is not None else StringTable()
+        self.extend(rows)
+
+    @classmethod
+    def from_columns(cls, times: array, name_ids: array, names: StringTable) -> "TimelineRows":
+        """直接使用已有的列（不复制）"""
+        rows = cls.__new__(cls)
+        rows.times = times
+        rows.name_ids = name_ids
+        rows.names = names
+        return rows
+
+    def __repr__(self):
+        return f"TimelineRows({len(self.times)} rows)"
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TimelineRows.from_columns(self.times[index], self.name_ids[index], self.names)
+        return self.times[index], self.names.strings[self.name_ids[index]]
+
+    def __iter__(self) -> Iterator[Tuple[float, str]]:
+        return zip(self.times, map(self.names.strings.__getitem__, self.name_ids))
+
+    def __eq__(self, other):
+        if isinstance(other, TimelineRows):
+            if self.times != other.times:
+                return False
+            if other.names is self.names:
+                return self.name_ids == other.name_ids
+        elif not isinstance(other, (list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(row == other_row for row, other_row in zip(self, other))
+
+    __hash__ = None
+
+    def name(self, index: int) -> str:
+        return self.names.strings[self.name_ids[index]]
+
+    def append(self, row: Tuple[float, str]):
+        time_val, name = row
+        self.times.append(time_val)
+        self.name_ids.append(self.names.intern(name))
+
+    def extend(self, rows: Iterable[Tuple[float, str]]):
+        """追加行；来自同一个字符串表的 TimelineRows 直接复制两列"""
+        if isinstance(rows, TimelineRows):
+            if rows.names is not self.names:
+                if self.name_ids:
+                    strings = rows.names.strings
+                    intern = self.names.intern
+                    self.name_ids.extend(intern(strings[name_id]) for name_id in rows.name_ids)
+                    self.times.extend(rows.times)
+                    return
+                self.names = rows.names  # 空的行直接共用对方的字符串表
+            self.times.extend(rows.times)
+            self.name_ids.extend(rows.name_ids)
+            return
+        intern = self.names.intern
+        for time_val, name in rows:
+            self.times.append(time_val)
+            self.name_ids.append(intern(name))
+
+    def nbytes(self) -> int:
+        """两列占用的字节数（不含共用的字符串表）"""
+        return _array_bytes(self.times, self.name_ids)
+
+
+class TimelineColumns(Sequence):
+    """按列保存的时间轴条目；按下标取出时创建 TimelineEntry"""
+    __slots__ = ("times", "name_ids", "sync_codes", "payload_ids", "lines", "flags",
+                 "window_before", "window_after", "durations", "jumps", "strings",
+                 "sync_types", "sync_type_codes", "_params")
+
+    def __init__(self, entries: Iterable[TimelineEntry] = ()):
+        self.times = array("d")
+        self.name_ids = array("I")  # 名称在 strings 中的编号
+        self.sync_codes = array("B")  # 同步类型编码，0 表示没有同步指令
+        self.payload_ids = array("i")  # 同步参数文本在 strings 中的编号，-1 表示没有
+        self.lines = array("I")  # 条目在文件中的行号
+        self.flags = array("B")  # 隐藏 / forcejump
+        self.window_before = array("d")  # 同步窗口，NaN 表示没有 window
+        self.window_after = array("d")
+        self.durations = array("d")  # NaN 表示没有 duration
+        self.jumps = {}  # 条目下标 -> 跳转目标：时间 (float) 或标签名称 (str)
+        self.strings = StringTable()  # 名称和同步参数文本
+        self.sync_types = [None]  # 同步类型编码 -> 同步类型
+        self.sync_type_codes = {None: 0}
+        self._params = {}  # 参数文本编号 -> 解析后的同步参数
+        self.extend(entries)
+
+    def __repr__(self):
+        return f"TimelineColumns({len(self.times)} entries)"
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.entry(position) for position in range(*index.indices(len(self.times)))]
+        if index < 0:
+            index += len(self.times)
+        return self.entry(index)
+
+    def __iter__(self) -> Iterator[TimelineEntry]:
+        return map(self.entry, range(len(self.times)))
+
+    def append(self, entry: TimelineEntry):
+        self.extend((entry,))
+
+    def extend(self, entries: Iterable[TimelineEntry]):
+        self.extend_records([(entry.time, entry.name, entry.line, entry.sync_type, entry.payload, entry.window,
+                              entry.jump, entry.force_jump, entry.duration, entry.hidden) for entry in entries])
+
+    def extend_records(self, records: list):
+        """不创建 TimelineEntry，按列追加一批条目
+
+        每个记录为 (时间, 名称, 行号, 同步类型, 同步参数, 窗口, 跳转, forcejump, duration, 隐藏)。
+        先把整批转置为各列，再逐列批量写入，字符串只对不同的值查表一次。
+        """
+        if not records:
+            return
+        (times, names, lines, sync_types, payloads, windows,
+         jumps, force_jumps, durations, hidden) = zip(*records)
+        base = len(self.times)
+        for sync_type in dict.fromkeys(sync_types):
+            if sync_type not in self.sync_type_codes:
+                self.sync_type_codes[sync_type] = len(self.sync_types)
+                self.sync_types.append(sync_type)
+        if len(self.sync_types) > 256 and self.sync_codes.typecode == "B":
+            self.sync_codes = array("H", self.sync_codes)
+
+        self.times.extend(times)
+        self.name_ids.extend(self.strings.intern_all(names))
+        self.sync_codes.extend(map(self.sync_type_codes.__getitem__, sync_types))
+        self.strings.intern_all(payload for payload in dict.fromkeys(payloads) if payload is not None)
+        self.payload_ids.extend(map(self.strings.ids.get, payloads, repeat(-1)))
+        self.lines.extend(lines)
+        self.flags.extend([(_FLAG_HIDDEN if hide else 0) | (_FLAG_FORCE_JUMP if force else 0)
+                           for hide, force in zip(hidden, force_jumps)])
+        self.window_before.extend([_NAN if window is None else window[0] for window in windows])
+        self.window_after.extend([_NAN if window is None else window[1] for window in windows])
+        self.durations.extend([_NAN if duration is None else duration for duration in durations])
+        self.jumps.update((base + offset, jump) for offset, jump in enumerate(jumps) if jump is not None)
+
+    def entry(self, index: int) -> TimelineEntry:
+        """取出一个条目（每次都是新对象，修改它不影响列中的数据）"""
+        strings = self.strings.strings
+        entry = TimelineEntry(self.times[index], strings[self.name_ids[index]], self.lines[index])
+        entry.sync_type = self.sync_types[self.sync_codes[index]]
+        payload_id = self.payload_ids[index]
+        if payload_id >= 0:
+            entry.payload = strings[payload_id]
+        window_before = self.window_before[index]
+        if window_before == window_before:  # NaN 表示没有 window
+            entry.window = (window_before, self.window_after[index])
+        entry.jump = self.jumps.get(index)
+        flags = self.flags[index]
+        entry.force_jump = bool(flags & _FLAG_FORCE_JUMP)
+        entry.hidden = bool(flags & _FLAG_HIDDEN)
+        duration = self.durations[index]
+        if duration == duration:
+            entry.duration = duration
+        return entry
+
+    def name(self, index: int) -> str:
+        return self.strings.strings[self.name_ids[index]]
+
+    def sync_type(self, index: int) -> Optional[str]:
+        return self.sync_types[self.sync_codes[index]]
+
+    def is_force_jump(self, index: int) -> bool:
+        return bool(self.flags[index] & _FLAG_FORCE_JUMP)
+
+    def iter_names(self) -> Iterator[str]:
+        return map(self.strings.strings.__getitem__, self.name_ids)
+
+    def iter_sync_types(self) -> Iterator[Optional[str]]:
+        return map(self.sync_types.__getitem__, self.sync_codes)
+
+    def params(self, index: int) -> dict:
+        """条目的同步参数，第一次查看时才解析 JSON
+
+        相同的参数文本共用同一个结果，调用方不要修改返回的字典。参数不是合法 JSON
+        时抛出 ValueError。
+        """
+        payload_id = self.payload_ids[index]
+        if payload_id < 0:
+            return {}
+        params = self._params.get(payload_id)
+        if params is None:
+            params = self._params[payload_id] = json.loads(self.strings.strings[payload_id])
+        return params
+
+    def hidden_count(self) -> int:
+        return sum(flags & _FLAG_HIDDEN for flags in self.flags)
+
+    def set_hidden(self, hidden_names: Set[str]):
+        """按 hideall 的名称设置每个条目的隐藏标记"""
+        hidden_ids = {self.strings.ids[name] for name in hidden_names if name in self.strings.ids}
+        self.flags = array("B", [flags | _FLAG_HIDDEN if name_id in hidden_ids else flags & ~_FLAG_HIDDEN
+                                 for flags, name_id in zip(self.flags, self.name_ids)])
+
+    def sort_by_time(self):
+        """按时间稳定排序（已经有序时不做任何事）"""
+        times = self.times
+        if all(map(le, times, islice(times, 1, None))):
+            return
+        order = sorted(range(len(times)), key=times.__getitem__)
+        for attribute in ("times", "name_ids", "sync_codes", "payload_ids", "lines", "flags",
+                          "window_before", "window_after", "durations"):
+            column = getattr(self, attribute)
+            setattr(self, attribute, array(column.typecode, map(column.__getitem__, order)))
+        jumps = self.jumps
+        self.jumps = {position: jumps[index] for position, index in enumerate(order) if index in jumps}
+
+    def select_rows(self, path: Iterable[Tuple[float, int]]) -> Tuple[TimelineRows, array]:
+        """按 (时间, 条目下标) 取出有名称的条目，返回行和每行对应的条目下标"""
+        empty_id = self.strings.ids.get("", -1)
+        name_ids = self.name_ids
+        times = array("d")
+        row_name_ids = array("I")
+        indices = array("I")
+        for time_val, index in path:
+            name_id = name_ids[index]
+            if name_id != empty_id:
+                times.append(time_val)
+                row_name_ids.append(name_id)
+                indices.append(index)
+        return TimelineRows.from_columns(times, row_name_ids, self.strings), indices
+
+    def rows(self) -> TimelineRows:
+        """所有有名称的条目的 (时间, 技能名称) 行"""
+        return self.select_rows(zip(self.times, range(len(self.times))))[0]
+
+    def nbytes(self) -> int:
+        """各列和字符串表的大约占用"""
+        total = _array_bytes(self.times, self.name_ids, self.sync_codes, self.payload_ids, self.lines,
+                             self.flags, self.window_before, self.window_after, self.durations)
+        total += sum(len(value) + 49 for value in self.strings.strings) + 100 * len(self.strings)
+        return total + 100 * len(self.jumps)
+
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""时间轴分支图：按 jump / label 把条目切分为片段
+
+cactbot 时间轴用 ``jump N`` / ``jump "label"`` 表示阶段跳转和循环，同步触发时
+时间轴从目标时间继续，跳过或重复一部分条目。TimelineGraph 把按时间排序的条目
+切分为连续的片段（片段在跳转条目之后和跳转目标处断开），预先解析所有跳转的
+目标，label 按名称直接查表。给定每个跳转是否触发，即可沿片段走出实际发生的
+路径，路径上的时间是连续的战斗时间。
+"""
+
+import bisect
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from .columns import TimelineRows
+from .parser import ParsedTimeline
+
+
+class TimelineJump:
+    """一个跳转：来源条目、目标条目和目标时间"""
+    __slots__ = ("source", "target", "target_time", "force")
+
+    def __init__(self, source: int, target: Optional[int], target_time: Optional[float], force: bool):
+        self.source = source  # 带 jump 的条目下标
+        self.target = target  # 目标条目下标，jump 0 或无法解析的 label 为 None（时间轴停止）
+        self.target_time = target_time
+        self.force = force  # forcejump：到达即跳转，不需要同步
+
+    def __repr__(self):
+        return f"TimelineJump({self.source} -> {self.target}, target_time={self.target_time!r})"
+
+
+class TimelineSegment:
+    """一段连续的条目 entries[start:end]"""
+    __slots__ = ("start", "end", "jump")
+
+    def __init__(self, start: int, end: int, jump: Optional[TimelineJump]):
+        self.start = start
+        self.end = end
+        self.jump = jump  # 片段最后一个条目的跳转
+
+    def __repr__(self):
+        return f"TimelineSegment({self.start}, {self.end}, jump={self.jump!r})"
+
+
+class TimelineGraph:
+    """由片段和跳转组成的时间轴图"""
+
+    def __init__(self, parsed: ParsedTimeline):
+        self.entries = parsed.entries  # TimelineColumns
+        self.times = self.entries.times  # array('d')，与条目共用
+        self.labels = {}  # label 名称 -> 时间（同名取第一个）
+        for label in parsed.labels:
+            self.labels.setdefault(label.name, label.time)
+
+        self.jumps = {}  # 来源条目下标 -> TimelineJump
+        boundaries = {0, len(self.entries)}
+        for index, jump_to in sorted(self.entries.jumps.items()):
+            target_time = self.labels.get(jump_to) if isinstance(jump_to, str) else jump_to
+            target = None
+            if target_time:
+                # jump 0 表示时间轴停止（重置），不是跳转到开头
+                target = bisect.bisect_left(self.times, target_time)
+                boundaries.add(target)
+            self.jumps[index] = TimelineJump(index, target, target_time, self.entries.is_force_jump(index))
+            boundaries.add(index + 1)
+
+        starts = sorted(boundaries)
+        self.segments = [
+            TimelineSegment(start, end, self.jumps.get(end - 1))
+            for start, end in zip(starts, starts[1:])
+        ]
+        self.segment_starts = [segment.start for segment in self.segments]
+        self.segment_by_start = {segment.start: number for number, segment in enumerate(self.segments)}
+
+    def branch_points(self) -> List[TimelineJump]:
+        """可以选择是否触发的跳转（不含 jump 0 等停止时间轴的跳转）"""
+        return [jump for _, jump in sorted(self.jumps.items()) if jump.target is not None]
+
+    def label_time(self, name: str) -> Optional[float]:
+        """label 的时间"""
+        return self.labels.get(name)
+
+    def segment_of(self, index: int) -> int:
+        """条目所在的片段编号"""
+        return bisect.bisect_right(self.segment_starts, index) - 1
+
+    def path(self, choices: Optional[Dict[int, int]] = None, max_segments: int = 100000) -> List[Tuple[float, int]]:
+        """沿选定的分支走出实际路径，返回 (战斗时间, 条目下标) 列表
+
+        choices 为 来源条目下标 -> 触发次数（True 视为 1 次）；未列出的跳转不触发，
+        forcejump 默认触发一次。跳转时战斗时间保持连续：目标条目发生在跳转条目的时间。
+        """
+        remaining = {jump.source: 1 for jump in self.jumps.values() if jump.force and jump.target is not None}
+        for source, count in (choices or {}).items():
+            remaining[source] = int(count)
+
+        path = []
+        times = self.times
+        offset = 0.0
+        number = 0 if self.segments else None
+        visited = 0
+        while number is not None and number < len(self.segments) and visited < max_segments:
+            visited += 1
+            segment = self.segments[number]
+            if offset:
+                path.extend((round(times[index] + offset, 6), index) for index in range(segment.start, segment.end))
+            else:
+                path.extend((times[index], index) for index in range(segment.start, segment.end))
+
+            jump = segment.jump
+            if jump is not None and jump.target is not None and remaining.get(jump.source, 0) > 0:
+                remaining[jump.source] -= 1
+                offset += times[jump.source] - jump.target_time
+                number = self.segment_by_start.get(jump.target)
+            else:
+                number += 1
+        return path
+
+    def path_rows(self, choices: Optional[Dict[int, int]] = None) -> Tuple[TimelineRows, array]:
+        """路径上查看器显示的行 (战斗时间, 技能名称) 以及每行对应的条目下标"""
+        return self.entries.select_rows(self.path(choices))
+
+    def choices_for_times(self, jump_times: List[float], tolerance: float = 0.05) -> Dict[int, int]:
+        """按跳转条目的时间选择分支：每给出一次时间，最接近的跳转多触发一次"""
+        choices = {}
+        points = self.branch_points()
+        for jump_time in jump_times:
+            candidates = [jump for jump in points if abs(self.times[jump.source] - jump_time) <= tolerance]
+            if not candidates:
+                raise ValueError(f"{jump_time:g}s 处没有跳转")
+            jump = min(candidates, key=lambda item: abs(self.times[item.source] - jump_time))
+            choices[jump.source] = choices.get(jump.source, 0) + 1
+        return choices
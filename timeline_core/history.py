@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""计划历史：持久化（不可变）的计划状态、撤销/重做和命名快照
+
+PlanState 由三个 PersistentMap 组成：使用记录 (时间, 技能名称) -> 次数、
+行号 -> 偏移时间字符串、行号 -> 希望使用的优先级。PersistentMap 是按路径复制的
+树堆，每次修改只新建 O(log n) 个节点，其余子树与旧状态共享，因此保存几百步
+历史的开销与修改次数成正比，而不是与计划大小成正比。
+
+比较两个状态时跳过共享的子树，只列出真正变化的键，恢复状态只需处理这些差异。
+"""
+
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+
+class _MapNode:
+    """PersistentMap 的树堆节点（创建后不再修改）"""
+    __slots__ = ("key", "value", "priority", "left", "right")
+
+    def __init__(self, key, value, priority: int, left: Optional["_MapNode"], right: Optional["_MapNode"]):
+        self.key = key
+        self.value = value
+        self.priority = priority
+        self.left = left
+        self.right = right
+
+
+def _priority(key) -> int:
+    """键的固定优先级（整数的哈希是其本身，与常量组成元组后再取哈希以打散连续的行号）"""
+    return hash((key, "plan"))
+
+
+def _split(node: Optional[_MapNode], key) -> Tuple[Optional[_MapNode], Optional[_MapNode], Optional[_MapNode]]:
+    """按 key 拆分为 (小于 key 的子树, 等于 key 的节点, 大于 key 的子树)，只复制拆分路径上的节点"""
+    if node is None:
+        return None, None, None
+    if key == node.key:
+        return node.left, node, node.right
+    if key < node.key:
+        less, same, greater = _split(node.left, key)
+        return less, same, _MapNode(node.key, node.value, node.priority, greater, node.right)
+    less, same, greater = _split(node.right, key)
+    return _MapNode(node.key, node.value, node.priority, node.left, less), same, greater
+
+
+def _merge(left: Optional[_MapNode], right: Optional[_MapNode]) -> Optional[_MapNode]:
+    """合并两棵树堆（left 的键全部小于 right 的键）"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority >= right.priority:
+        return _MapNode(left.key, left.value, left.priority, left.left, _merge(left.right, right))
+    return _MapNode(right.key, right.value, right.priority, _merge(left, right.left), right.right)
+
+
+def _set(node: Optional[_MapNode], key, value, priority: int) -> _MapNode:
+    if node is None:
+        return _MapNode(key, value, priority, None, None)
+    if key == node.key:
+        return _MapNode(key, value, node.priority, node.left, node.right)
+    if priority > node.priority:
+        # 键的优先级固定，比当前节点高说明键不在这棵子树中
+        less, _, greater = _split(node, key)
+        return _MapNode(key, value, priority, less, greater)
+    if key < node.key:
+        return _MapNode(node.key, node.value, node.priority, _set(node.left, key, value, priority), node.right)
+    return _MapNode(node.key, node.value, node.priority, node.left, _set(node.right, key, value, priority))
+
+
+def _remove(node: Optional[_MapNode], key) -> Optional[_MapNode]:
+    if key == node.key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        return _MapNode(node.key, node.value, node.priority, _remove(node.left, key), node.right)
+    return _MapNode(node.key, node.value, node.priority, node.left, _remove(node.right, key))
+
+
+def _iter_nodes(node: Optional[_MapNode]) -> Iterator[_MapNode]:
+    stack = []
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = node.left
+        node = stack.pop()
+        yield node
+        node = node.right
+
+
+def _diff(old: Optional[_MapNode], new: Optional[_MapNode], changes: list):
+    if old is new:
+        return
+    if old is None:
+        changes.extend((node.key, None, node.value) for node in _iter_nodes(new))
+        return
+    if new is None:
+        changes.extend((node.key, node.value, None) for node in _iter_nodes(old))
+        return
+    less, same, greater = _split(new, old.key)
+    _diff(old.left, less, changes)
+    if same is None:
+        changes.append((old.key, old.value, None))
+    elif same.value != old.value:
+        changes.append((old.key, old.value, same.value))
+    _diff(old.right, greater, changes)
+
+
+class PersistentMap:
+    """不可变的有序映射：set / remove 返回新映射，未改变的部分与原映射共享
+
+    节点优先级由键的哈希决定，同一组键在同一进程中总是得到同样形状的树。
+    """
+    __slots__ = ("root", "size")
+
+    def __init__(self, root: Optional[_MapNode] = None, size: int = 0):
+        self.root = root
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, key) -> bool:
+        return self._find(key) is not None
+
+    def __iter__(self):
+        return (node.key for node in _iter_nodes(self.root))
+
+    def __repr__(self):
+        return f"PersistentMap({dict(self.items())!r})"
+
+    def _find(self, key) -> Optional[_MapNode]:
+        node = self.root
+        while node is not None:
+            if key == node.key:
+                return node
+            node = node.left if key < node.key else node.right
+        return None
+
+    def get(self, key, default=None):
+        node = self._find(key)
+        return default if node is None else node.value
+
+    def items(self) -> List[Tuple[Any, Any]]:
+        """按键的顺序返回 (键, 值) 列表"""
+        return [(node.key, node.value) for node in _iter_nodes(self.root)]
+
+    def set(self, key, value) -> "PersistentMap":
+        """返回设置了 key 的新映射；值未改变时返回自身"""
+        node = self._find(key)
+        if node is not None and node.value == value:
+            return self
+        size = self.size if node is not None else self.size + 1
+        return PersistentMap(_set(self.root, key, value, _priority(key)), size)
+
+    def remove(self, key) -> "PersistentMap":
+        """返回删除了 key 的新映射；键不存在时返回自身"""
+        if self._find(key) is None:
+            return self
+        return PersistentMap(_remove(self.root, key), self.size - 1)
+
+    def diff(self, other: "PersistentMap") -> List[Tuple[Any, Any, Any]]:
+        """与 other 比较，按键的顺序返回 (键, 本映射中的值, other 中的值)，不存在的一侧为 None
+
+        共享的子树直接跳过，开销与变化的键数量相关。
+        """
+        changes = []
+        _diff(self.root, other.root, changes)
+        return changes
+
+
+EMPTY_MAP = PersistentMap()
+
+
+class PlanState:
+    """一个不可变的计划状态"""
+    __slots__ = ("uses", "offsets", "desired")
+
+    def __init__(self, uses: PersistentMap = EMPTY_MAP, offsets: PersistentMap = EMPTY_MAP,
+                 desired: PersistentMap = EMPTY_MAP):
+        self.uses = uses  # (使用时间, 技能名称) -> 次数
+        self.offsets = offsets  # 行号 -> 偏移时间字符串（只保存非零值）
+        self.desired = desired  # 行号 -> 希望使用的优先级
+
+    def __repr__(self):
+        return f"PlanState({len(self.uses)} uses, {len(self.offsets)} offsets, {len(self.desired)} desired)"
+
+    def with_use(self, use_time: float, skill_name: str, delta: int) -> "PlanState":
+        """增加 (delta > 0) 或减少一次使用后的状态"""
+        key = (use_time, skill_name)
+        count = self.uses.get(key, 0) + delta
+        uses = self.uses.set(key, count) if count > 0 else self.uses.remove(key)
+        return PlanState(uses, self.offsets, self.desired)
+
+    def with_offset(self, index: int, value: str) -> "PlanState":
+        offsets = self.offsets.set(index, value) if value != "0" else self.offsets.remove(index)
+        return self if offsets is self.offsets else PlanState(self.uses, offsets, self.desired)
+
+    def with_desired(self, index: int, priority: float) -> "PlanState":
+        desired = self.desired.set(index, priority) if priority > 0 else self.desired.remove(index)
+        return self if desired is self.desired else PlanState(self.uses, self.offsets, desired)
+
+
+class PlanHistory:
+    """计划的撤销/重做历史和命名快照
+
+    每一步只保存一个 PlanState 引用。merge_key 相同的连续记录合并为一步
+    （例如在同一行的偏移输入框中连续输入）。
+    """
+
+    def __init__(self, limit: int = 500):
+        self.limit = limit  # 最多保留的历史步数
+        self.entries = []  # (说明, PlanState, merge_key)
+        self.position = -1  # 当前状态在 entries 中的下标
+        self.snapshots = {}  # 快照名称 -> PlanState
+
+    def reset(self, state: PlanState, label: str = "初始"):
+        """清空历史和快照（行号随时间轴改变），以 state 作为第一步"""
+        self.entries = [(label, state, None)]
+        self.position = 0
+        self.snapshots = {}
+
+    def remap(self, function: Callable[[PlanState], PlanState]):
+        """行号随时间轴改变后迁移所有步骤和快照：每个状态换成 function(状态)
+
+        同一个状态对象只迁移一次；merge_key 中的行号已经失效，迁移后的步骤不再合并。
+        """
+        mapped = {}  # id(旧状态) -> (旧状态, 迁移后的状态)；保留旧状态的引用，id 不会被复用
+
+        def convert(state: PlanState) -> PlanState:
+            item = mapped.get(id(state))
+            if item is None:
+                item = mapped[id(state)] = (state, function(state))
+            return item[1]
+
+        self.entries = [(label, convert(state), None) for label, state, _ in self.entries]
+        self.snapshots = {name: convert(state) for name, state in self.snapshots.items()}
+
+    def current(self) -> Optional[PlanState]:
+        return self.entries[self.position][1] if self.position >= 0 else None
+
+    def record(self, state: PlanState, label: str, merge_key=None):
+        """记录新状态（丢弃可重做的步骤）；与当前状态相同时不记录"""
+        if state is self.current():
+            return
+        del self.entries[self.position + 1:]
+        if merge_key is not None and self.position > 0 and self.entries[-1][2] == merge_key:
+            self.entries[-1] = (label, state, merge_key)
+        else:
+            self.entries.append((label, state, merge_key))
+            if len(self.entries) > self.limit:
+                del self.entries[:len(self.entries) - self.limit]
+        self.position = len(self.entries) - 1
+
+    def can_undo(self) -> bool:
+        return self.position > 0
+
+    def can_redo(self) -> bool:
+        return self.position + 1 < len(self.entries)
+
+    def undo(self) -> Optional[Tuple[str, PlanState]]:
+        """后退一步，返回 (被撤销的步骤说明, 新的当前状态)"""
+        if not self.can_undo():
+            return None
+        label = self.entries[self.position][0]
+        self.position -= 1
+        return label, self.entries[self.position][1]
+
+    def redo(self) -> Optional[Tuple[str, PlanState]]:
+        """前进一步，返回 (重做的步骤说明, 新的当前状态)"""
+        if not self.can_redo():
+            return None
+        self.position += 1
+        label, state, _ = self.entries[self.position]
+        return label, state
+
+    def save_snapshot(self, name: str, state: PlanState):
+        self.snapshots[name] = state
+
+    def snapshot(self, name: str) -> Optional[PlanState]:
+        return self.snapshots.get(name)
+
+    def snapshot_names(self) -> List[str]:
+        return sorted(self.snapshots)
+
+    def delete_snapshot(self, name: str) -> bool:
+        return self.snapshots.pop(name, None) is not None
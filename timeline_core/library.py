@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""整个时间轴库（例如 RAID/*.txt）的技能索引：名称、技能 ID 和来源 -> (文件, 时间, 行号)
+
+每个文件记录 mtime 和大小，更新时只在进程池中重新解析变化的文件，其余文件的
+条目直接沿用；删除的文件从索引中移除。索引以与解析缓存相同的格式（字符串表加
+定长记录，整体 zlib 压缩）保存到磁盘，下次启动时只需检查文件状态。
+
+查询在内存中进行：名称、ID、来源各自建立 NgramIndex，查询词按空白分词，每个词
+都要出现在条目的某个字段中，开销只与不同字符串和命中的条目数有关。
+"""
+
+import os
+import zlib
+import struct
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from .parser import parse_timeline_file
+from .search import NgramIndex
+
+LIBRARY_FIELDS = ("name", "id", "source")
+
+_LIBRARY_MAGIC = b"SGTL"
+_LIBRARY_VERSION = 2
+_LIBRARY_HEADER = struct.Struct("<4sH")  # 魔数, 版本
+_LIBRARY_FILE = struct.Struct("<IqqII")  # 文件路径, mtime_ns, 文件大小, 条目数, 技能 ID 数
+_LIBRARY_HIT = struct.Struct("<dIiiI")  # 时间, 行号, 名称, 来源, 技能 ID 数
+_LIBRARY_COUNT = struct.Struct("<I")  # 计数，也用于文件条目之后逐个列出的技能 ID
+
+
+class LibraryHit:
+    """库中的一个条目"""
+    __slots__ = ("file", "time", "line", "name", "ids", "source")
+
+    def __init__(self, file_path: str, time_val: float, line: int, name: str,
+                 ids: Tuple[str, ...] = (), source: Optional[str] = None):
+        self.file = file_path
+        self.time = time_val
+        self.line = line  # 条目在文件中的行号
+        self.name = name
+        self.ids = ids  # 同步参数中的技能 ID
+        self.source = source  # 同步参数中的来源
+
+    def __repr__(self):
+        return f"LibraryHit({os.path.basename(self.file)!r}, {self.time!r}, {self.name!r}, line={self.line})"
+
+
+class LibraryFile:
+    """索引中的一个文件及其条目"""
+    __slots__ = ("path", "mtime_ns", "size", "hits")
+
+    def __init__(self, path: str, mtime_ns: int, size: int, hits: List[LibraryHit]):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.hits = hits
+
+    def is_current(self, stat: os.stat_result) -> bool:
+        return self.mtime_ns == stat.st_mtime_ns and self.size == stat.st_size
+
+
+def _sync_fields(entries, index: int) -> Tuple[Tuple[str, ...], Optional[str]]:
+    """从同步参数中取出技能 ID 和来源（参数不是合法 JSON 时忽略）"""
+    try:
+        params = entries.params(index)
+    except ValueError:
+        return (), None
+    if not isinstance(params, dict):
+        return (), None
+    ids = params.get("id", ())
+    if isinstance(ids, str):
+        ids = (ids,)
+    source = params.get("source")
+    if isinstance(source, list):
+        source = "/".join(str(item) for item in source)
+    return tuple(str(item) for item in ids if item), (str(source) if source else None)
+
+
+def index_timeline_file(file_path: str) -> LibraryFile:
+    """解析一个文件并取出要索引的条目（可以在工作进程中调用）"""
+    stat = os.stat(file_path)
+    hits = []
+    entries = parse_timeline_file(file_path).entries
+    for index, name in enumerate(entries.iter_names()):
+        ids, source = _sync_fields(entries, index)
+        if name or ids:
+            hits.append(LibraryHit(file_path, entries.times[index], entries.lines[index], name, ids, source))
+    return LibraryFile(file_path, stat.st_mtime_ns, stat.st_size, hits)
+
+
+def encode_library(files: Iterable[LibraryFile]) -> bytes:
+    """编码为文件头加 zlib 压缩的字符串表和定长记录"""
+    strings = []
+    string_ids = {}
+
+    def intern_id(value):
+        if value is None:
+            return -1
+        string_id = string_ids.get(value)
+        if string_id is None:
+            string_id = string_ids[value] = len(strings)
+            strings.append(value)
+        return string_id
+
+    # 每个文件：文件记录、各条目的定长记录，再按条目顺序列出所有技能 ID 的字符串编号
+    records = []
+    file_count = 0
+    for library_file in files:
+        file_count += 1
+        hit_records = []
+        id_records = []
+        for hit in library_file.hits:
+            hit_records.append(_LIBRARY_HIT.pack(hit.time, hit.line, intern_id(hit.name),
+                                                 intern_id(hit.source), len(hit.ids)))
+            id_records.extend(_LIBRARY_COUNT.pack(intern_id(skill_id)) for skill_id in hit.ids)
+        records.append(_LIBRARY_FILE.pack(intern_id(library_file.path), library_file.mtime_ns,
+                                          library_file.size, len(hit_records), len(id_records)))
+        records.extend(hit_records)
+        records.extend(id_records)
+
+    parts = [_LIBRARY_COUNT.pack(len(strings))]
+    for value in strings:
+        encoded = value.encode("utf-8")
+        parts.append(_LIBRARY_COUNT.pack(len(encoded)))
+        parts.append(encoded)
+    parts.append(_LIBRARY_COUNT.pack(file_count))
+    parts.extend(records)
+    return _LIBRARY_HEADER.pack(_LIBRARY_MAGIC, _LIBRARY_VERSION) + zlib.compress(b"".join(parts))
+
+
+def decode_library(data: bytes) -> List[LibraryFile]:
+    """从 encode_library 的输出还原文件列表，格式不符时抛出 ValueError"""
+    try:
+        magic, version = _LIBRARY_HEADER.unpack_from(data)
+        if magic != _LIBRARY_MAGIC or version != _LIBRARY_VERSION:
+            raise ValueError("不是可识别的索引文件")
+        body = memoryview(zlib.decompress(data[_LIBRARY_HEADER.size:]))
+        offset = 0
+
+        def read_count():
+            nonlocal offset
+            (count,) = _LIBRARY_COUNT.unpack_from(body, offset)
+            offset += _LIBRARY_COUNT.size
+            return count
+
+        strings = []
+        for _ in range(read_count()):
+            length = read_count()
+            strings.append(str(body[offset:offset + length], "utf-8"))
+            offset += length
+
+        def lookup(string_id):
+            return None if string_id < 0 else strings[string_id]
+
+        files = []
+        for _ in range(read_count()):
+            path_id, mtime_ns, size, hit_count, id_count = _LIBRARY_FILE.unpack_from(body, offset)
+            offset += _LIBRARY_FILE.size
+            path = strings[path_id]
+            end = offset + hit_count * _LIBRARY_HIT.size
+            hit_records = _LIBRARY_HIT.iter_unpack(body[offset:end])
+            skill_ids = [strings[string_id] for string_id in struct.unpack_from(f"<{id_count}I", body, end)]
+            offset = end + id_count * _LIBRARY_COUNT.size
+            hits = []
+            position = 0
+            for time_val, line, name_id, source_id, count in hit_records:
+                ids = tuple(skill_ids[position:position + count])
+                position += count
+                hits.append(LibraryHit(path, time_val, line, strings[name_id], ids, lookup(source_id)))
+            if position != id_count:
+                raise ValueError("索引文件已损坏: 技能 ID 数不一致")
+            files.append(LibraryFile(path, mtime_ns, size, hits))
+    except (struct.error, zlib.error, UnicodeDecodeError, IndexError) as e:
+        raise ValueError(f"索引文件已损坏: {e}") from e
+    return files
+
+
+def default_index_path() -> str:
+    """默认索引文件，与解析缓存位于同一个缓存目录下"""
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "SGE_TimeLineTool", "library.idx")
+
+
+class LibraryIndex:
+    """时间轴库的持久化技能索引"""
+
+    def __init__(self, index_path: Optional[str] = None):
+        self.index_path = index_path or default_index_path()
+        self.files = {}  # 文件绝对路径 -> LibraryFile
+        self.hits = []  # 所有条目（按文件、时间排序）
+        self.fields = {}  # 字段 -> (NgramIndex, 字符串编号 -> 条目下标列表)
+        self.errors = {}  # 最近一次更新中读取失败的文件 -> 错误信息
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.hits)
+
+    def load(self):
+        """读取磁盘上的索引，不存在或损坏时为空索引"""
+        try:
+            with open(self.index_path, "rb") as index_file:
+                files = decode_library(index_file.read())
+        except (OSError, ValueError):
+            files = []
+        self.files = {library_file.path: library_file for library_file in files}
+        self.rebuild()
+
+    def save(self):
+        """先写临时文件再替换，写入失败不影响查询"""
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, "wb") as index_file:
+                index_file.write(encode_library(self.files[path] for path in sorted(self.files)))
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            pass
+
+    def update(self, paths: Sequence[str], jobs: Optional[int] = None) -> Tuple[int, int]:
+        """使索引与给定的文件列表一致：只重新解析新增或 mtime / 大小变化的文件
+
+        多个文件变化时在进程池中并行解析。返回 (重新解析的文件数, 移除的文件数)。
+        """
+        wanted = {os.path.abspath(path) for path in paths}
+        removed = [path for path in self.files if path not in wanted]
+        for path in removed:
+            del self.files[path]
+
+        self.errors = {}
+        stale = []
+        for path in sorted(wanted):
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                self.files.pop(path, None)
+                self.errors[path] = str(e)
+                continue
+            library_file = self.files.get(path)
+            if library_file is None or not library_file.is_current(stat):
+                stale.append(path)
+
+        for path, result in _index_files(stale, jobs):
+            if isinstance(result, LibraryFile):
+                self.files[path] = result
+            else:
+                self.files.pop(path, None)
+                self.errors[path] = result
+
+        if stale or removed:
+            self.rebuild()
+            self.save()
+        return len(stale), len(removed)
+
+    def rebuild(self):
+        """重建内存中的查询索引"""
+        self.hits = [hit for path in sorted(self.files) for hit in self.files[path].hits]
+        self.fields = {field: (NgramIndex(), []) for field in LIBRARY_FIELDS}
+        for hit_index, hit in enumerate(self.hits):
+            values = {"name": (hit.name,) if hit.name else (), "id": hit.ids,
+                      "source": (hit.source,) if hit.source else ()}
+            for field, field_values in values.items():
+                strings, postings = self.fields[field]
+                for value in field_values:
+                    text_id = strings.add(value)
+                    if text_id == len(postings):
+                        postings.append([])
+                    postings[text_id].append(hit_index)
+
+    def match_term(self, term: str, fields: Sequence[str] = LIBRARY_FIELDS) -> set:
+        """任一字段包含 term 的条目下标"""
+        matched = set()
+        for field in fields:
+            strings, postings = self.fields[field]
+            for text_id in strings.match(term):
+                matched.update(postings[text_id])
+        return matched
+
+    def query(self, query: str, fields: Sequence[str] = LIBRARY_FIELDS, limit: Optional[int] = None) -> List[LibraryHit]:
+        """按文件、时间顺序返回匹配的条目；每个词都要出现在某个字段中"""
+        matched = None
+        for term in query.split():
+            term_hits = self.match_term(term, fields)
+            matched = term_hits if matched is None else matched & term_hits
+            if not matched:
+                return []
+        if matched is None:
+            return []
+        indices = sorted(matched)
+        if limit is not None:
+            indices = indices[:limit]
+        return [self.hits[index] for index in indices]
+
+
+def _index_safely(file_path: str):
+    try:
+        return index_timeline_file(file_path)
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        return str(e)
+
+
+def _index_files(paths: Sequence[str], jobs: Optional[int]):
+    """逐个产出 (路径, LibraryFile 或错误信息)；多个文件时使用进程池"""
+    if jobs == 1 or len(paths) <= 1:
+        for path in paths:
+            yield path, _index_safely(path)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(_index_safely, path): path for path in paths}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
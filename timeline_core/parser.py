@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""cactbot 时间轴解析"""
+
+import re
+import json
+
+
+class TimelineEntry:
+    """时间轴中的一条带时间的条目"""
+    __slots__ = ("time", "name", "sync_type", "payload", "window", "jump", "force_jump", "duration", "hidden", "line")
+
+    def __init__(self, time_val: float, name: str, line: int):
+        self.time = time_val
+        self.name = name
+        self.sync_type = None  # 同步类型，例如 Ability / StartsUsing / InCombat
+        self.payload = None  # 同步参数的原始 JSON 文本
+        self.window = None  # 同步窗口 (提前, 延后)
+        self.jump = None  # 跳转目标：时间 (float) 或标签名称 (str)
+        self.force_jump = False
+        self.duration = None
+        self.hidden = False
+        self.line = line
+
+    def __repr__(self):
+        return f"TimelineEntry({self.time!r}, {self.name!r}, sync_type={self.sync_type!r}, line={self.line})"
+
+    def sync_params(self) -> dict:
+        """解析同步参数 JSON"""
+        if self.payload is None:
+            return {}
+        return json.loads(self.payload)
+
+
+class TimelineLabel:
+    """时间轴中的 label 标记"""
+    __slots__ = ("time", "name", "line")
+
+    def __init__(self, time_val: float, name: str, line: int):
+        self.time = time_val
+        self.name = name
+        self.line = line
+
+    def __repr__(self):
+        return f"TimelineLabel({self.time!r}, {self.name!r}, line={self.line})"
+
+
+class TimelineParseError:
+    """某一行的解析错误"""
+    __slots__ = ("line", "column", "message", "text")
+
+    def __init__(self, line: int, column: int, message: str, text: str):
+        self.line = line
+        self.column = column
+        self.message = message
+        self.text = text
+
+    def __str__(self):
+        return f"第{self.line}行第{self.column}列: {self.message}"
+
+    def __repr__(self):
+        return f"TimelineParseError({self.line}, {self.column}, {self.message!r})"
+
+
+class ParsedTimeline:
+    """解析结果：按时间排序的条目、label、隐藏名称和逐行错误"""
+    __slots__ = ("entries", "labels", "hidden_names", "errors")
+
+    def __init__(self):
+        from .columns import TimelineColumns
+        self.entries = TimelineColumns()  # 按列保存，按下标取出时才创建 TimelineEntry
+        self.labels = []
+        self.hidden_names = set()
+        self.errors = []
+
+    def as_rows(self):
+        """转换为查看器使用的 (时间, 技能名称) 行 TimelineRows（名称为空的纯同步条目不显示）"""
+        return self.entries.rows()
+
+
+# 行首：时间 "技能名称" 或 时间 label "名称"，以及 hideall "名称"
+_TIMELINE_HEAD = re.compile(
+    r'(?:(?P<time>\d+(?:\.\d+)?)\s+(?:"(?P<name>[^"]*)"|label\s+"(?P<label>[^"]*)")'
+    r'|hideall\s+"(?P<hideall>[^"]*)")'
+)
+
+# 名称之后的各个部分，每次匹配一个记号
+_JSON_STRING = r'"(?:[^"\\]|\\.)*"'
+_TIMELINE_TOKEN = re.compile(
+    r'\s*(?:'
+    r'(?P<comment>#.*)'
+    r'|window\s+(?P<window_before>\d+(?:\.\d+)?)(?:\s*,\s*(?P<window_after>\d+(?:\.\d+)?))?'
+    r'|(?P<jump_kind>forcejump|jump)\s+(?:"(?P<jump_label>[^"]*)"|(?P<jump_time>\d+(?:\.\d+)?))'
+    r'|duration\s+(?P<duration>\d+(?:\.\d+)?)'
+    r'|(?P<sync_type>[A-Za-z][A-Za-z0-9]*)\s*(?P<payload>\{(?:[^{}"]|' + _JSON_STRING +
+    r'|\{(?:[^{}"]|' + _JSON_STRING + r')*\})*\})'
+    r')'
+)
+_NON_SPACE = re.compile(r'\S+')
+_RECORD_BATCH = 4096  # 条目按批转置写入各列，批次不宜过大以免解析百万行时临时占用过多内存
+
+
+def parse_timeline_lines(lines, first_line: int = 1) -> ParsedTimeline:
+    """逐行解析 cactbot 时间轴，每行只扫描一遍（first_line 为第一行的行号，用于只解析文件的一部分）"""
+    result = ParsedTimeline()
+    entries = result.entries
+    records = []  # 待写入各列的条目，每 _RECORD_BATCH 条写入一次
+    errors = result.errors
+    head_match = _TIMELINE_HEAD.match
+    token_match = _TIMELINE_TOKEN.match
+
+    for line_no, raw_line in enumerate(lines, first_line):
+        line = raw_line.strip()
+        if not line or line[0] == '#':
+            continue
+
+        head = head_match(line)
+        if head is None:
+            errors.append(TimelineParseError(line_no, 1, "无法识别的行", line))
+            continue
+
+        hideall = head.group("hideall")
+        if hideall is not None:
+            result.hidden_names.add(hideall)
+            continue
+
+        time_val = float(head.group("time"))
+        label = head.group("label")
+        if label is not None:
+            result.labels.append(TimelineLabel(time_val, label, line_no))
+        # 条目的各字段先放在局部变量中，整行解析完后作为一个记录按批写入各列
+        sync_type = payload = window = jump = duration = None
+        force_jump = False
+
+        pos = head.end()
+        length = len(line)
+        reported = False
+        while pos < length:
+            token = token_match(line, pos)
+            if token is None or token.end() == pos:
+                # 跳过无法识别的片段，每行只报告第一个错误
+                skipped = _NON_SPACE.search(line, pos)
+                if skipped is None:
+                    break
+                if not reported:
+                    errors.append(TimelineParseError(line_no, skipped.start() + 1,
+                                                     f"无法识别的内容: {skipped.group()[:20]}", line))
+                    reported = True
+                pos = skipped.end()
+                continue
+            pos = token.end()
+
+            if token.group("comment") is not None or label is not None:
+                if label is not None and token.group("comment") is None and not reported:
+                    errors.append(TimelineParseError(line_no, token.start() + 1, "label 行不应包含其他指令", line))
+                    reported = True
+                continue
+
+            if token.group("payload") is not None:
+                sync_type = token.group("sync_type")
+                payload = token.group("payload")
+            elif token.group("window_before") is not None:
+                before = float(token.group("window_before"))
+                after = token.group("window_after")
+                if after is None:
+                    window = (before / 2, before / 2)
+                else:
+                    window = (before, float(after))
+            elif token.group("jump_kind") is not None:
+                jump_time = token.group("jump_time")
+                jump = float(jump_time) if jump_time is not None else token.group("jump_label")
+                force_jump = token.group("jump_kind") == "forcejump"
+            elif token.group("duration") is not None:
+                duration = float(token.group("duration"))
+
+        if label is None:
+            records.append((time_val, head.group("name"), line_no, sync_type, payload, window,
+                            jump, force_jump, duration, False))
+            if len(records) >= _RECORD_BATCH:
+                entries.extend_records(records)
+                records = []
+
+    entries.extend_records(records)
+
+    # hideall 对整个文件生效，无论出现在条目之前还是之后
+    if result.hidden_names:
+        entries.set_hidden(result.hidden_names)
+
+    entries.sort_by_time()
+    result.labels.sort(key=lambda label: label.time)
+    return result
+
+
+def parse_timeline_file(file_path: str) -> ParsedTimeline:
+    """流式读取并解析时间轴文件"""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return parse_timeline_lines(file)
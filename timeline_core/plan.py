@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""蛇胆使用计划：时间轴行、使用记录、逐行偏移和逐行状态"""
+
+import math
+import bisect
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .columns import TimelineRows
+from .history import EMPTY_MAP, PlanState
+from .sensitivity import blocked_use_intervals, safe_offset_window, safe_offset_windows, splice_blocked_intervals
+from .serpent import SerpentLedger, extend_serpent_states, resweep_serpent_states, sweep_serpent_states
+
+
+class SerpentPlan:
+    """一个时间轴上的蛇胆使用计划
+
+    rows 为按时间排序的 (时间, 技能名称) 行 TimelineRows，row_times 是它的时间列
+    （array('d')，直接交给状态扫描和 numpy）。使用记录保存在 SerpentLedger 中，
+    states 是每行的 (蛇胆数量, 下一个回复的技能名称, 回复进度, 剩余时间)。
+    使用记录变化后先用 mark_dirty 记录变化范围，再由 refresh 只重算受影响的行。
+    每行在 ±safe_offset_range 内再使用一次仍不影响已有使用的偏移区间由 safe_window 按需计算
+    （界面只查询可见的行）；它依赖的不可用区间 blocked 在第一次查询时才计算，之后由 refresh 局部更新。
+    state 是与使用记录、偏移和希望使用标记同步维护的不可变 PlanState，用于撤销/重做。
+    """
+
+    def __init__(self, rows: Iterable[Tuple[float, str]] = (), max_count: int = 3, regen_interval: float = 30.0):
+        self.max_count = max_count
+        self.regen_interval = regen_interval
+        self.ledger = SerpentLedger(max_count, regen_interval)
+        self.offsets = {}  # 行号 -> 偏移时间字符串（只保存非零值）
+        self.desired = {}  # 行号 -> 希望使用的优先级，供自动规划使用
+        self.rows = TimelineRows()
+        self.row_times = self.rows.times
+        self.states = []
+        self.safe_offset_range = 10.0  # 可用偏移区间的计算范围 ±秒
+        self.blocked = None  # 不能再使用的时间开区间 (开始列表, 结束列表)，为 None 时在需要时计算
+        self.dirty_range = None  # 待重算的 (最早变化时间, 最晚变化时间)
+        self.state = PlanState()  # 当前计划的不可变快照
+        self.set_rows(rows)
+
+    def set_rows(self, rows: Iterable[Tuple[float, str]]):
+        """更换时间轴行（保留使用记录，清空逐行偏移和希望使用的标记）"""
+        self.rows = TimelineRows(rows)  # 复制一份，调用方之后追加的行不会影响计划
+        self.row_times = self.rows.times
+        self.offsets = {}
+        self.desired = {}
+        self.state = PlanState(self.state.uses)
+        self.recompute()
+
+    def extend_rows(self, rows: Iterable[Tuple[float, str]]):
+        """在末尾追加时间不早于已有行的新行，只计算新行的状态（用于逐批加载）"""
+        if self.dirty_range is not None:
+            self.refresh()
+        self.rows.extend(rows)  # row_times 是 rows 的时间列，一起增长
+        extend_serpent_states(self.states, self.row_times, self.ledger.uses(), self.max_count, self.regen_interval)
+
+    def blocked_intervals(self) -> Tuple[list, list]:
+        """不能再使用的时间开区间 (开始列表, 结束列表)"""
+        if self.blocked is None:
+            uses = [use_time for use_time, _ in self.ledger.uses()]
+            self.blocked = blocked_use_intervals(uses, self.max_count, self.regen_interval)
+        return self.blocked
+
+    def safe_window(self, index: int) -> Tuple[float, float, bool]:
+        """第 index 行的可用偏移区间 (最小偏移, 最大偏移, 原时间是否可用)"""
+        starts, ends = self.blocked_intervals()
+        return safe_offset_window(self.row_times[index], starts, ends, self.safe_offset_range)
+
+    def compute_safe_windows(self, start: int, end: int) -> list:
+        """批量计算 start..end 行的可用偏移区间"""
+        starts, ends = self.blocked_intervals()
+        low, high, usable = safe_offset_windows(self.row_times[start:end], starts, ends, self.safe_offset_range)
+        return list(zip(low, high, usable))
+
+    def recompute(self):
+        """一次扫描重新计算所有行的状态"""
+        uses = self.ledger.uses()
+        self.states = sweep_serpent_states(self.row_times, uses, self.max_count, self.regen_interval)
+        self.blocked = None
+        self.dirty_range = None
+
+    def mark_dirty(self, dirty_time: float, settle_time: float):
+        """合并记录使用记录的变化范围"""
+        if self.dirty_range is None:
+            self.dirty_range = (dirty_time, settle_time)
+        else:
+            old_dirty, old_settle = self.dirty_range
+            self.dirty_range = (min(old_dirty, dirty_time), max(old_settle, settle_time))
+
+    def refresh(self) -> List[int]:
+        """只重算变化范围内的行，返回状态改变的行号
+
+        已经计算过的不可用区间同时局部更新；可用偏移区间按需计算，不在返回的行号中，
+        使用记录变化后界面应重新查询可见行的 safe_window。
+        """
+        if self.dirty_range is None:
+            return []
+        dirty_time, settle_time = self.dirty_range
+        self.dirty_range = None
+        uses = self.ledger.uses()
+        changed = resweep_serpent_states(self.states, self.row_times, uses, dirty_time, settle_time,
+                                         self.max_count, self.regen_interval)
+
+        if self.blocked is None:
+            return changed
+        # 不可用区间只在 (dirty_time - 回复间隔, settle_time) 内变化：只用附近的使用记录重算这一段
+        low = dirty_time - self.regen_interval
+        nearby = self.ledger.uses_between(low - self.regen_interval, settle_time + self.regen_interval)
+        local = blocked_use_intervals([use_time for use_time, _ in nearby], self.max_count, self.regen_interval)
+        self.blocked = splice_blocked_intervals(self.blocked, local, low, settle_time)
+        return changed
+
+    def charges_at(self, target_time: float) -> int:
+        """指定时间点的蛇胆数量"""
+        return self.ledger.charges_at(target_time)
+
+    def next_recovery(self, target_time: float) -> tuple:
+        """指定时间点之后的下一个回复：(技能名称, 回复进度, 剩余时间)"""
+        return self.ledger.next_recovery(target_time)
+
+    def uses(self) -> List[Tuple[float, str]]:
+        """按时间顺序返回所有使用记录"""
+        return self.ledger.uses()
+
+    def row_offset(self, index: int) -> float:
+        """行的偏移时间，无法解析时为 0"""
+        return _parse_offset(self.offsets.get(index, "0"))
+
+    def set_row_offset(self, index: int, value: str):
+        """保存行的偏移时间字符串"""
+        if value == "0":
+            self.offsets.pop(index, None)
+        else:
+            self.offsets[index] = value
+        self.state = self.state.with_offset(index, value)
+
+    def use_time_for_row(self, index: int, offset: Optional[float] = None) -> float:
+        """行的实际使用时间（行时间加偏移，不小于 0）"""
+        if offset is None:
+            offset = self.row_offset(index)
+        return max(0.0, self.row_times[index] + offset)
+
+    def add_use(self, use_time: float, skill_name: str) -> bool:
+        """在有蛇胆时记录一次使用，蛇胆不足时返回 False"""
+        if self.ledger.charges_at(use_time) <= 0:
+            return False
+        self.ledger.add_use(use_time, skill_name)
+        self.state = self.state.with_use(use_time, skill_name, 1)
+        self.mark_dirty(use_time, use_time + self.regen_interval)
+        return True
+
+    def remove_use(self, use_time: float, skill_name: str) -> bool:
+        """删除一次使用，记录不存在时返回 False"""
+        if not self.ledger.remove_use(use_time, skill_name):
+            return False
+        self.state = self.state.with_use(use_time, skill_name, -1)
+        self.mark_dirty(use_time, use_time + self.regen_interval)
+        return True
+
+    def move_use(self, use_time: float, skill_name: str, new_time: float) -> bool:
+        """移动一次使用，记录不存在时返回 False"""
+        if not self.ledger.move_use(use_time, skill_name, new_time):
+            return False
+        self.state = self.state.with_use(use_time, skill_name, -1).with_use(new_time, skill_name, 1)
+        self.mark_dirty(min(use_time, new_time), max(use_time, new_time) + self.regen_interval)
+        return True
+
+    def find_use(self, use_time: float, skill_name: str, tolerance: float = 0.05) -> Optional[Tuple[float, str]]:
+        """查找时间在 use_time ± tolerance 内、名称相同且最接近的使用记录"""
+        candidates = [use for use in self.ledger.uses_between(use_time - tolerance, use_time + tolerance)
+                      if use[1] == skill_name]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda use: abs(use[0] - use_time))
+
+    def set_desired(self, index: int, priority: float):
+        """设置行的希望使用优先级，0 表示取消"""
+        if priority > 0:
+            self.desired[index] = priority
+        else:
+            self.desired.pop(index, None)
+        self.state = self.state.with_desired(index, priority)
+
+    def solve(self, min_offset: float = 0.0, max_offset: float = 0.0):
+        """按希望使用的行及优先级求解计划（不修改当前使用记录）"""
+        from .solver import desired_uses_from_rows, solve_serpent_plan
+        desired = desired_uses_from_rows(self.rows, self.desired, min_offset, max_offset)
+        return solve_serpent_plan(desired, self.max_count, self.regen_interval)
+
+    def replace_uses(self, uses: Iterable[Tuple[int, float, str]]):
+        """用 (行号, 使用时间, 技能名称) 列表替换全部使用记录，并据此设置这些行的偏移时间"""
+        self.ledger.clear()
+        self.state = PlanState(EMPTY_MAP, self.state.offsets, self.state.desired)
+        for index, use_time, skill_name in uses:
+            self.ledger.add_use(use_time, skill_name)
+            self.state = self.state.with_use(use_time, skill_name, 1)
+            self.set_row_offset(index, f"{round(use_time - self.row_times[index], 2) + 0.0:g}")
+        self.recompute()
+
+    def clear(self):
+        """清空所有使用记录"""
+        self.ledger.clear()
+        self.state = PlanState(EMPTY_MAP, self.state.offsets, self.state.desired)
+        self.recompute()
+
+    def load_saved(self, uses: Iterable[Tuple[float, str]], offsets: dict, desired: dict):
+        """一次性替换使用记录、逐行偏移和希望使用标记，只做一次全量重算（用于读取保存的计划）"""
+        self.ledger.clear()
+        state = PlanState()
+        for use_time, skill_name in uses:
+            self.ledger.add_use(use_time, skill_name)
+            state = state.with_use(use_time, skill_name, 1)
+        row_count = len(self.rows)
+        self.offsets = {index: value for index, value in offsets.items() if index < row_count and value != "0"}
+        self.desired = {index: priority for index, priority in desired.items() if index < row_count and priority > 0}
+        for index, value in self.offsets.items():
+            state = state.with_offset(index, value)
+        for index, priority in self.desired.items():
+            state = state.with_desired(index, priority)
+        self.state = state
+        self.recompute()
+
+    def load_state(self, state: PlanState):
+        """替换为 state 中的使用记录、逐行偏移和希望使用标记（保留 state 对象本身），只做一次全量重算"""
+        self.ledger.clear()
+        for (use_time, skill_name), count in state.uses.items():
+            for _ in range(count):
+                self.ledger.add_use(use_time, skill_name)
+        self.offsets = dict(state.offsets.items())
+        self.desired = dict(state.desired.items())
+        self.state = state
+        self.recompute()
+
+    def max_row_offset(self, offsets: Optional[dict] = None) -> float:
+        """所有行偏移的最大绝对值（offsets 默认为当前的逐行偏移）"""
+        offsets = self.offsets if offsets is None else offsets
+        return max((abs(_parse_offset(value)) for value in offsets.values()), default=0.0)
+
+    def use_row(self, use_time: float, skill_name: str, max_offset: Optional[float] = None,
+                offsets: Optional[dict] = None) -> Optional[int]:
+        """使用记录对应的行：名称相同且实际使用时间（含偏移）最接近的行，没有同名行时为 None
+
+        距离相同时取行号较小的行。offsets 默认为当前的逐行偏移。行的实际使用时间与
+        行时间最多相差 max_offset（默认为 max_row_offset(offsets)），因此从 use_time
+        处二分查找后向两侧扩展，行时间与 use_time 的距离超过当前最近距离加
+        max_offset 后停止。
+        """
+        name_id = self.rows.names.ids.get(skill_name)
+        if name_id is None:
+            return None
+        offsets = self.offsets if offsets is None else offsets
+        if max_offset is None:
+            max_offset = self.max_row_offset(offsets)
+        row_times = self.row_times
+        name_ids = self.rows.name_ids
+        best = None
+        best_distance = math.inf
+        middle = bisect.bisect_left(row_times, use_time)
+
+        index = middle - 1
+        while index >= 0 and use_time - row_times[index] - max_offset <= best_distance:
+            if name_ids[index] == name_id:
+                distance = abs(max(0.0, row_times[index] + _parse_offset(offsets.get(index, "0"))) - use_time)
+                if distance <= best_distance:
+                    best, best_distance = index, distance
+            index -= 1
+        index = middle
+        while index < len(row_times) and row_times[index] - use_time - max_offset <= best_distance:
+            if name_ids[index] == name_id:
+                distance = abs(max(0.0, row_times[index] + _parse_offset(offsets.get(index, "0"))) - use_time)
+                if distance < best_distance or (distance == best_distance and index < best):
+                    best, best_distance = index, distance
+            index += 1
+        return best
+
+    def remap_state(self, state: PlanState, rows: Sequence[Tuple[float, str]], row_map: Dict[int, int]) -> PlanState:
+        """把当前行上的计划状态（例如撤销历史中的一步）按 row_map（旧行号 -> 新行号）迁移到新的行 rows
+
+        使用记录按 state 自己的偏移找到所在行，随行的时间变化平移；所在行已被删除的
+        使用记录被丢弃。没有同名行的使用记录（例如命令行中手动指定的时间）保持不变。
+        必须在 remap_rows 更换行之前调用。
+        """
+        offsets = dict(state.offsets.items())
+        max_offset = self.max_row_offset(offsets)
+        result = PlanState()
+        for (use_time, skill_name), count in state.uses.items():
+            old_index = self.use_row(use_time, skill_name, max_offset, offsets)
+            if old_index is not None:
+                new_index = row_map.get(old_index)
+                if new_index is None:
+                    continue
+                use_time = max(0.0, round(use_time + rows[new_index][0] - self.row_times[old_index], 3))
+            result = result.with_use(use_time, skill_name, count)
+        for index, value in offsets.items():
+            if index in row_map:
+                result = result.with_offset(row_map[index], value)
+        for index, priority in state.desired.items():
+            if index in row_map:
+                result = result.with_desired(row_map[index], priority)
+        return result
+
+    def remap_rows(self, rows: Iterable[Tuple[float, str]], row_map: Dict[int, int],
+                   state: Optional[PlanState] = None) -> int:
+        """更换时间轴行，并按 row_map（旧行号 -> 新行号）迁移逐行偏移、希望使用标记和使用记录
+
+        迁移规则见 remap_state；state 为已经迁移好的当前状态（例如随撤销历史一起迁移的
+        当前步骤），不给出时由当前计划迁移。返回所在行已被删除而丢弃的使用次数。整体重算一次。
+        """
+        rows = TimelineRows(rows)
+        if state is None:
+            state = self.remap_state(self.state, rows, row_map)
+        dropped = len(self.ledger) - sum(count for _, count in state.uses.items())
+        self.rows = rows
+        self.row_times = rows.times
+        self.load_state(state)
+        return dropped
+
+    def restore(self, state: PlanState) -> List[int]:
+        """恢复到 state：只对与当前状态不同的使用、偏移和标记逐项修改
+
+        使用记录的变化通过 mark_dirty 交给 refresh 增量重算；返回偏移或希望使用
+        标记改变的行号。
+        """
+        for (use_time, skill_name), old_count, new_count in self.state.uses.diff(state.uses):
+            delta = (new_count or 0) - (old_count or 0)
+            for _ in range(abs(delta)):
+                if delta > 0:
+                    self.ledger.add_use(use_time, skill_name)
+                else:
+                    self.ledger.remove_use(use_time, skill_name)
+            self.mark_dirty(use_time, use_time + self.regen_interval)
+
+        changed_rows = set()
+        for index, _, value in self.state.offsets.diff(state.offsets):
+            _apply_change(self.offsets, index, value)
+            changed_rows.add(index)
+        for index, _, priority in self.state.desired.diff(state.desired):
+            _apply_change(self.desired, index, priority)
+            changed_rows.add(index)
+        self.state = state
+        return sorted(changed_rows)
+
+
+def _apply_change(mapping: dict, key, value):
+    """按差异结果更新字典（值为 None 表示删除）"""
+    if value is None:
+        mapping.pop(key, None)
+    else:
+        mapping[key] = value
+
+
+def _parse_offset(value: str) -> float:
+    """偏移时间字符串的数值，无法解析时为 0"""
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
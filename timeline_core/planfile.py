@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""蛇胆使用计划的保存与读取：紧凑的版本化二进制格式和后台自动保存
+
+计划文件记录使用记录（时间、技能名称）、逐行偏移、希望使用标记、分支选择以及
+时间轴文件内容的 SHA-1。偏移和标记按行号保存，只有时间轴内容与分支选择都相同
+时行号才有意义，因此读取时先比较哈希。格式与解析缓存相同：定长文件头加上
+zlib 压缩的字符串表和定长记录。
+"""
+
+import os
+import zlib
+import struct
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .history import PlanState
+
+
+_PLAN_MAGIC = b"SGTP"
+_PLAN_VERSION = 1
+_PLAN_HEADER = struct.Struct("<4sH20s")  # 魔数, 版本, 时间轴 SHA-1
+_PLAN_USE = struct.Struct("<dI")  # 使用时间, 技能名称
+_PLAN_OFFSET = struct.Struct("<II")  # 行号, 偏移时间字符串
+_PLAN_DESIRED = struct.Struct("<Id")  # 行号, 优先级
+_PLAN_BRANCH = struct.Struct("<ii")  # 跳转来源条目下标, 触发次数
+_PLAN_COUNT = struct.Struct("<I")
+
+
+class PlanFormatError(ValueError):
+    """计划文件无法识别或已损坏"""
+
+
+class SavedPlan:
+    """一个保存的计划"""
+    __slots__ = ("timeline_digest", "uses", "offsets", "desired", "branch_choices")
+
+    def __init__(self, timeline_digest: bytes, uses: List[Tuple[float, str]] = (), offsets: Dict[int, str] = None,
+                 desired: Dict[int, float] = None, branch_choices: Dict[int, int] = None):
+        self.timeline_digest = timeline_digest  # 时间轴文件内容的 SHA-1
+        self.uses = list(uses)  # (使用时间, 技能名称)，按时间排序
+        self.offsets = dict(offsets or {})  # 行号 -> 偏移时间字符串
+        self.desired = dict(desired or {})  # 行号 -> 希望使用的优先级
+        self.branch_choices = dict(branch_choices or {})  # 跳转来源条目下标 -> 触发次数
+
+    def __repr__(self):
+        return f"SavedPlan({len(self.uses)} uses, {len(self.offsets)} offsets, {len(self.desired)} desired)"
+
+    @classmethod
+    def from_state(cls, state: PlanState, timeline_digest: bytes,
+                   branch_choices: Optional[Dict[int, int]] = None) -> "SavedPlan":
+        """由不可变的计划状态生成（可以在工作线程中调用）"""
+        uses = []
+        for use, count in state.uses.items():
+            uses.extend([use] * count)
+        return cls(timeline_digest, uses, dict(state.offsets.items()), dict(state.desired.items()), branch_choices)
+
+
+def timeline_digest(file_path: str) -> bytes:
+    """时间轴文件内容的 SHA-1"""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 16), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def encode_plan(saved: SavedPlan) -> bytes:
+    """编码为文件头加 zlib 压缩的字符串表和定长记录"""
+    strings = []
+    string_ids = {}
+
+    def intern_id(value: str) -> int:
+        string_id = string_ids.get(value)
+        if string_id is None:
+            string_id = string_ids[value] = len(strings)
+            strings.append(value)
+        return string_id
+
+    use_records = [_PLAN_USE.pack(use_time, intern_id(skill_name)) for use_time, skill_name in saved.uses]
+    offset_records = [_PLAN_OFFSET.pack(index, intern_id(value)) for index, value in sorted(saved.offsets.items())]
+    desired_records = [_PLAN_DESIRED.pack(index, priority) for index, priority in sorted(saved.desired.items())]
+    branch_records = [_PLAN_BRANCH.pack(source, count) for source, count in sorted(saved.branch_choices.items())]
+
+    parts = [_PLAN_COUNT.pack(len(strings))]
+    for value in strings:
+        encoded = value.encode("utf-8")
+        parts.append(_PLAN_COUNT.pack(len(encoded)))
+        parts.append(encoded)
+    for records in (use_records, offset_records, desired_records, branch_records):
+        parts.append(_PLAN_COUNT.pack(len(records)))
+        parts.extend(records)
+    header = _PLAN_HEADER.pack(_PLAN_MAGIC, _PLAN_VERSION, saved.timeline_digest)
+    return header + zlib.compress(b"".join(parts))
+
+
+def decode_plan(data: bytes) -> SavedPlan:
+    """从 encode_plan 的输出还原计划，格式不符时抛出 PlanFormatError"""
+    try:
+        magic, version, digest = _PLAN_HEADER.unpack_from(data)
+        if magic != _PLAN_MAGIC:
+            raise PlanFormatError("不是计划文件")
+        if version != _PLAN_VERSION:
+            raise PlanFormatError(f"不支持的计划文件版本: {version}")
+        body = memoryview(zlib.decompress(data[_PLAN_HEADER.size:]))
+        offset = 0
+
+        def read_count():
+            nonlocal offset
+            (count,) = _PLAN_COUNT.unpack_from(body, offset)
+            offset += _PLAN_COUNT.size
+            return count
+
+        def read_records(record: struct.Struct):
+            nonlocal offset
+            count = read_count()
+            end = offset + count * record.size
+            records = list(record.iter_unpack(body[offset:end]))
+            offset = end
+            return records
+
+        strings = []
+        for _ in range(read_count()):
+            length = read_count()
+            strings.append(str(body[offset:offset + length], "utf-8"))
+            offset += length
+
+        uses = [(use_time, strings[name_id]) for use_time, name_id in read_records(_PLAN_USE)]
+        offsets = {index: strings[value_id] for index, value_id in read_records(_PLAN_OFFSET)}
+        desired = dict(read_records(_PLAN_DESIRED))
+        branch_choices = dict(read_records(_PLAN_BRANCH))
+    except (struct.error, zlib.error, UnicodeDecodeError, IndexError) as e:
+        raise PlanFormatError(f"计划文件已损坏: {e}") from e
+    return SavedPlan(digest, uses, offsets, desired, branch_choices)
+
+
+def default_plan_dir() -> str:
+    """默认计划目录，与解析缓存位于同一个应用数据目录下"""
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_DATA_HOME")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "SGE_TimeLineTool", "plans")
+
+
+class PlanStore:
+    """按时间轴文件保存计划：以文件绝对路径的哈希为文件名"""
+
+    def __init__(self, plan_dir: Optional[str] = None):
+        self.plan_dir = plan_dir or default_plan_dir()
+
+    def plan_path(self, file_path: str) -> str:
+        """时间轴文件对应的计划文件路径"""
+        key = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.plan_dir, key + ".sgp")
+
+    def load(self, file_path: str) -> Optional[SavedPlan]:
+        """读取保存的计划，没有保存过或文件损坏时返回 None"""
+        try:
+            with open(self.plan_path(file_path), "rb") as plan_file:
+                return decode_plan(plan_file.read())
+        except (OSError, PlanFormatError):
+            return None
+
+    def save(self, file_path: str, saved: SavedPlan):
+        """先写临时文件再替换，写入中断不会留下损坏的计划"""
+        os.makedirs(self.plan_dir, exist_ok=True)
+        plan_path = self.plan_path(file_path)
+        temp_path = plan_path + ".tmp"
+        with open(temp_path, "wb") as plan_file:
+            plan_file.write(encode_plan(saved))
+        os.replace(temp_path, plan_path)
+
+
+class PlanAutosaver:
+    """后台线程自动保存：连续的修改只保留最新的一份，静默 delay 秒后写入一次
+
+    schedule 只记录要保存的不可变状态，编码和写文件都在工作线程中进行。flush / close
+    在调用线程中写入时与工作线程共用写入锁，并按请求的先后编号跳过已被更新的请求
+    覆盖的旧请求，磁盘上总是最新的状态。
+    """
+
+    def __init__(self, store: PlanStore, delay: float = 0.5):
+        self.store = store
+        self.delay = delay  # 最后一次修改后等待的秒数
+        self.pending = None  # (请求编号, 时间轴路径, PlanState, 时间轴 SHA-1, 分支选择)
+        self.sequence = 0  # 最近一次请求的编号
+        self.written = {}  # 时间轴路径 -> 已写入的最新请求编号
+        self.write_lock = threading.Lock()  # 同一时间只有一个线程写计划文件（临时文件路径相同）
+        self.writes = 0  # 实际写入的次数
+        self.last_error = None  # 最近一次写入失败的异常
+        self.condition = threading.Condition()
+        self.thread = None
+        self.closed = False
+
+    def schedule(self, file_path: str, state: PlanState, digest: bytes, branch_choices: Dict[int, int]):
+        """排队保存（覆盖尚未写入的旧请求）"""
+        with self.condition:
+            self.sequence += 1
+            self.pending = (self.sequence, file_path, state, digest, dict(branch_choices))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                # 等到 delay 秒内没有新的请求；关闭时剩余的请求由 close 写入
+                while not self.closed:
+                    current = self.pending
+                    self.condition.wait(self.delay)
+                    if self.pending is current:
+                        break
+                if self.closed:
+                    return
+                pending, self.pending = self.pending, None
+            if pending is not None:
+                self._write(pending)
+
+    def _write(self, pending: tuple):
+        sequence, file_path, state, digest, branch_choices = pending
+        with self.write_lock:
+            if self.written.get(file_path, 0) >= sequence:
+                return  # 另一个线程已经写入了更新的请求
+            try:
+                self.store.save(file_path, SavedPlan.from_state(state, digest, branch_choices))
+                self.written[file_path] = sequence
+                self.writes += 1
+            except OSError as e:
+                self.last_error = e
+
+    def flush(self):
+        """立即写入尚未保存的请求（在调用线程中；工作线程正在写入时等它写完）"""
+        with self.condition:
+            pending, self.pending = self.pending, None
+        if pending is not None:
+            self._write(pending)
+        else:
+            with self.write_lock:
+                pass  # 工作线程可能正在写入刚取走的请求
+
+    def close(self, timeout: float = 5.0):
+        """结束工作线程（等待正在进行的写入）并写入尚未保存的请求"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self.flush()
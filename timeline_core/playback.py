@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""战斗回放：战斗时钟和按时间合并的事件流
+
+回放不逐帧轮询所有行，而是把每个按时间排序的事件流（时间轴行、蛇胆使用、
+蛇胆回复……）的下一个事件放进一个小顶堆，只在最近的事件到期时唤醒一次。
+暂停、跳转和调整速度后用二分查找重新定位每个事件流，复杂度为 O(流数 × log n)。
+"""
+
+import time
+import heapq
+import bisect
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+class FightClock:
+    """可暂停、跳转和变速的战斗时钟"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.anchor_time = 0.0  # 锚点处的战斗时间
+        self.anchor_real = clock()  # 锚点处的真实时间
+        self.speed = 1.0  # 回放速度倍率
+        self.running = False
+
+    def now(self) -> float:
+        """当前战斗时间"""
+        if not self.running:
+            return self.anchor_time
+        return self.anchor_time + (self.clock() - self.anchor_real) * self.speed
+
+    def _reanchor(self, fight_time: float):
+        self.anchor_time = fight_time
+        self.anchor_real = self.clock()
+
+    def play(self):
+        """开始或继续计时"""
+        if not self.running:
+            self._reanchor(self.anchor_time)
+            self.running = True
+
+    def pause(self):
+        """暂停计时"""
+        if self.running:
+            self._reanchor(self.now())
+            self.running = False
+
+    def seek(self, fight_time: float):
+        """跳转到指定战斗时间（保持当前运行状态）"""
+        self._reanchor(max(0.0, fight_time))
+
+    def set_speed(self, speed: float):
+        """调整回放速度（当前战斗时间不变）"""
+        self._reanchor(self.now())
+        self.speed = speed
+
+    def real_delay(self, fight_time: float) -> float:
+        """距离战斗时钟走到 fight_time 还需的真实秒数，暂停时为无穷大"""
+        if not self.running:
+            return float("inf")
+        return max(0.0, (fight_time - self.now()) / self.speed)
+
+
+class EventCursor:
+    """合并多个按时间排序的事件流，按时间顺序产出到期事件
+
+    streams 为 名称 -> 升序时间列表。堆中每个事件流最多只有一项（它的下一个事件），
+    因此 seek 只需对每个事件流做一次二分查找。
+    """
+
+    def __init__(self, streams: Optional[Dict[str, Sequence[float]]] = None):
+        self.streams = {}  # 名称 -> 升序时间列表
+        self.positions = {}  # 名称 -> 下一个未到期事件的下标
+        self.heap = []  # (时间, 名称, 下标)
+        self.position_time = 0.0  # 最近一次 seek/pop_due 的时间
+        for name, times in (streams or {}).items():
+            self.set_stream(name, times)
+
+    def set_stream(self, name: str, times: Sequence[float]):
+        """新增或替换一个事件流，并按当前时间重新定位"""
+        self.streams[name] = times
+        self.seek(self.position_time)
+
+    def seek(self, fight_time: float):
+        """重新定位：不晚于 fight_time 的事件视为已发生"""
+        self.position_time = fight_time
+        self.heap = []
+        for name, times in self.streams.items():
+            index = bisect.bisect_right(times, fight_time)
+            self.positions[name] = index
+            if index < len(times):
+                self.heap.append((times[index], name, index))
+        heapq.heapify(self.heap)
+
+    def next_time(self) -> Optional[float]:
+        """下一个事件的时间，没有剩余事件时为 None"""
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, fight_time: float) -> List[Tuple[float, str, int]]:
+        """按时间顺序取出所有不晚于 fight_time 的事件：(时间, 事件流名称, 下标)"""
+        self.position_time = fight_time
+        due = []
+        heap = self.heap
+        while heap and heap[0][0] <= fight_time:
+            event_time, name, index = heap[0]
+            due.append((event_time, name, index))
+            index += 1
+            self.positions[name] = index
+            times = self.streams[name]
+            if index < len(times):
+                heapq.heapreplace(heap, (times[index], name, index))
+            else:
+                heapq.heappop(heap)
+        return due
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""热点路径的可选性能埋点
+
+埋点默认关闭，关闭时被包装的函数只多一次属性检查。开启后每次调用记录一条
+（名称, 开始时间, 耗时, 线程, 父调用, 子调用耗时）到定长环形缓冲区，同时累计
+计数器。记录的数据可导出为 Chrome trace-event JSON（chrome://tracing 或 Perfetto
+打开）和 cProfile 兼容的统计文件（``pstats.Stats(path)`` 读取）。
+
+设置环境变量 ``SGE_PROFILE=1`` 时全局的 ``profiler`` 在启动时即开启。
+"""
+
+import os
+import json
+import time
+import marshal
+import functools
+import itertools
+import threading
+from typing import Optional
+
+
+class _Span:
+    """一次计时区间（上下文管理器）"""
+
+    __slots__ = ("profiler", "name", "start", "child", "parent")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+        self.child = 0  # 直接子区间的耗时之和（纳秒）
+        self.parent = None
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter_ns() - self.start
+        self.profiler._stack().pop()
+        parent = self.parent
+        if parent is not None:
+            parent.child += duration
+        self.profiler.record(self.name, self.start, duration,
+                             parent.name if parent is not None else None, self.child)
+        return False
+
+
+class _NullSpan:
+    """埋点关闭时使用的空区间"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    """环形缓冲区埋点记录器"""
+
+    def __init__(self, capacity: int = 8192, enabled: bool = False):
+        self.enabled = enabled  # 是否记录
+        self.capacity = capacity  # 环形缓冲区容量（条）
+        self.events = [None] * capacity  # (名称, 开始ns, 耗时ns, 线程id, 父名称, 子耗时ns)
+        self.counters = {}  # 名称 -> 计数
+        self.locations = {}  # 名称 -> (文件, 行号, 函数名)，用于 cProfile 导出
+        self._sequence = itertools.count()  # 下一个写入位置（next() 在 CPython 中是原子的）
+        self._written = 0  # 已写入的事件总数
+        self._local = threading.local()
+        self._origin = time.perf_counter_ns()  # 导出时间戳的零点
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name: str):
+        """计时区间：``with profiler.span("name"): ...``"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def instrument(self, name: Optional[str] = None):
+        """装饰器：开启时为每次调用记录一个区间"""
+        def decorator(func):
+            span_name = name or func.__qualname__
+            code = getattr(func, "__code__", None)
+            if code is not None:
+                self.locations[span_name] = (code.co_filename, code.co_firstlineno, span_name)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name: str, amount: int = 1):
+        """累加计数器"""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, name: str, start_ns: int, duration_ns: int, parent: Optional[str] = None, child_ns: int = 0):
+        """直接写入一条已完成的区间（例如 Tk 空闲回调的排队延迟）"""
+        position = next(self._sequence)
+        self.events[position % self.capacity] = (name, start_ns, duration_ns, threading.get_ident(), parent, child_ns)
+        self._written = position + 1
+
+    def clear(self):
+        """清空缓冲区和计数器"""
+        self.events = [None] * self.capacity
+        self.counters = {}
+        self._sequence = itertools.count()
+        self._written = 0
+
+    def recent_events(self) -> list:
+        """按写入顺序返回缓冲区中仍保留的事件"""
+        written = self._written
+        if written <= self.capacity:
+            events = self.events[:written]
+        else:
+            split = written % self.capacity
+            events = self.events[split:] + self.events[:split]
+        return [event for event in events if event is not None]
+
+    def summary(self) -> dict:
+        """按名称汇总缓冲区中的事件：名称 -> (次数, 最近一次ms, 平均ms, 最大ms)"""
+        totals = {}
+        for name, _, duration, _, _, _ in self.recent_events():
+            item = totals.get(name)
+            if item is None:
+                totals[name] = [1, duration, duration, duration]
+            else:
+                item[0] += 1
+                item[1] = duration
+                item[2] += duration
+                item[3] = max(item[3], duration)
+        return {
+            name: (calls, last / 1e6, total / calls / 1e6, longest / 1e6)
+            for name, (calls, last, total, longest) in totals.items()
+        }
+
+    def chrome_trace(self) -> dict:
+        """生成 Chrome trace-event 格式的数据"""
+        pid = os.getpid()
+        trace_events = [
+            {
+                "name": name,
+                "cat": "timeline",
+                "ph": "X",
+                "ts": (start - self._origin) / 1000.0,
+                "dur": duration / 1000.0,
+                "pid": pid,
+                "tid": thread_id,
+            }
+            for name, start, duration, thread_id, _, _ in self.recent_events()
+        ]
+        if self.counters:
+            last_ts = max((event["ts"] + event["dur"] for event in trace_events), default=0.0)
+            trace_events.append({
+                "name": "counters",
+                "ph": "C",
+                "ts": last_ts,
+                "pid": pid,
+                "args": dict(self.counters),
+            })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str):
+        """导出 Chrome trace-event JSON 文件"""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.chrome_trace(), file, ensure_ascii=False)
+
+    def _location(self, name: Optional[str]) -> tuple:
+        return self.locations.get(name) or ("~", 0, name)
+
+    def pstats_data(self) -> dict:
+        """生成 pstats 使用的统计字典：(文件, 行号, 函数名) -> (cc, nc, tt, ct, callers)"""
+        stats = {}
+        for name, _, duration, _, parent, child in self.recent_events():
+            key = self._location(name)
+            own = max(0, duration - child) / 1e9
+            total = duration / 1e9
+            cc, nc, tt, ct, callers = stats.get(key, (0, 0, 0.0, 0.0, {}))
+            if parent is not None:
+                caller_key = self._location(parent)
+                c_cc, c_nc, c_tt, c_ct = callers.get(caller_key, (0, 0, 0.0, 0.0))
+                callers[caller_key] = (c_cc + 1, c_nc + 1, c_tt + own, c_ct + total)
+            stats[key] = (cc + 1, nc + 1, tt + own, ct + total, callers)
+        return stats
+
+    def write_pstats(self, path: str):
+        """导出 cProfile 兼容的统计文件"""
+        with open(path, "wb") as file:
+            marshal.dump(self.pstats_data(), file)
+
+
+profiler = Profiler(enabled=bool(os.environ.get("SGE_PROFILE")))
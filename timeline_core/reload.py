@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""打开的时间轴文件的热重载：轮询文件状态、按变化的行范围重新解析、按行比较
+
+FileWatcher 只比较 mtime 和大小，开销与文件大小无关；状态变化后要在下一次轮询
+时保持不变才报告，避免读到编辑器写了一半的文件。
+
+reparse_timeline 去掉新旧文件相同的开头和结尾，只解析中间变化的行，其余条目
+沿用旧的解析结果（之后的条目按行数变化平移行号）。match_rows 比较新旧两组行，
+得到旧行号 -> 新行号，供使用计划迁移逐行偏移和使用记录。
+"""
+
+import os
+import hashlib
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .columns import TimelineColumns
+from .parser import ParsedTimeline, TimelineLabel, TimelineParseError, parse_timeline_lines
+
+
+class FileWatcher:
+    """按 (mtime_ns, 大小) 检查文件是否被修改"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.signature = self.stat_signature()  # 上次确认的文件状态
+        self.pending = None  # 发现变化后等待确认的文件状态
+
+    def stat_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self) -> bool:
+        """文件状态改变并且在两次轮询之间保持不变时返回 True（文件暂时不存在时不报告）"""
+        signature = self.stat_signature()
+        if signature is None or signature == self.signature:
+            self.pending = None
+            return False
+        if signature != self.pending:
+            self.pending = signature
+            return False
+        self.signature = signature
+        self.pending = None
+        return True
+
+
+def read_timeline_lines(file_path: str) -> Tuple[List[str], bytes]:
+    """读取文件的各行和内容的 SHA-1"""
+    with open(file_path, "rb") as file:
+        content = file.read()
+    return content.decode("utf-8").splitlines(), hashlib.sha1(content).digest()
+
+
+def changed_line_range(old_lines: Sequence[str], new_lines: Sequence[str]) -> Tuple[int, int, int]:
+    """去掉相同的开头和结尾，返回 (变化开始的下标, 旧文件中变化结束的下标, 新文件中变化结束的下标)"""
+    limit = min(len(old_lines), len(new_lines))
+    start = 0
+    while start < limit and old_lines[start] == new_lines[start]:
+        start += 1
+    old_end = len(old_lines)
+    new_end = len(new_lines)
+    while old_end > start and new_end > start and old_lines[old_end - 1] == new_lines[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+    return start, old_end, new_end
+
+
+def _hideall_names(lines: Sequence[str]) -> set:
+    """解析 hideall 行的名称（只看以 hideall 开头的行）"""
+    names = set()
+    for raw_line in lines:
+        line = raw_line.strip()
+        if line.startswith("hideall"):
+            names |= parse_timeline_lines([line]).hidden_names
+    return names
+
+
+def reparse_timeline(old_lines: Sequence[str], old_parsed: ParsedTimeline,
+                     new_lines: Sequence[str]) -> ParsedTimeline:
+    """只重新解析变化的行范围，结果与完整解析新文件相同
+
+    变化范围之前的条目直接沿用，之后的条目平移行号，最后写入新的 TimelineColumns
+    （旧的解析结果不被修改）。hideall 作用于整个文件，隐藏名称改变时更新受影响的条目。
+    """
+    start, old_end, new_end = changed_line_range(old_lines, new_lines)
+    shift = new_end - old_end
+    middle = parse_timeline_lines(new_lines[start:new_end], first_line=start + 1)
+
+    result = ParsedTimeline()
+    result.hidden_names = middle.hidden_names | _hideall_names(new_lines[:start]) | _hideall_names(new_lines[new_end:])
+
+    # 行号从 1 开始：旧文件中 start < line <= old_end 的行被替换；取出的条目都是新对象，可以直接修改
+    entries = list(middle.entries)
+    for entry in old_parsed.entries:
+        if entry.line <= start:
+            entries.append(entry)
+        elif entry.line > old_end:
+            entry.line += shift
+            entries.append(entry)
+    hidden_names = result.hidden_names
+    for entry in entries:
+        entry.hidden = entry.name in hidden_names
+    entries.sort(key=lambda entry: (entry.time, entry.line))
+    result.entries = TimelineColumns(entries)
+
+    labels = list(middle.labels)
+    errors = list(middle.errors)
+    for label in old_parsed.labels:
+        if label.line <= start:
+            labels.append(label)
+        elif label.line > old_end:
+            labels.append(TimelineLabel(label.time, label.name, label.line + shift))
+    for error in old_parsed.errors:
+        if error.line <= start:
+            errors.append(error)
+        elif error.line > old_end:
+            errors.append(TimelineParseError(error.line + shift, error.column, error.message, error.text))
+    labels.sort(key=lambda label: (label.time, label.line))
+    errors.sort(key=lambda error: error.line)
+    result.labels = labels
+    result.errors = errors
+    return result
+
+
+def match_rows(old_rows: Sequence[Tuple[float, str]], new_rows: Sequence[Tuple[float, str]]) -> Dict[int, int]:
+    """比较新旧两组 (时间, 技能名称) 行，返回仍然对应的 旧行号 -> 新行号
+
+    相同的行按最长匹配对齐；被替换的区域中名称相同的行（只改了时间）按顺序配对。
+    """
+    start, old_end, new_end = changed_line_range(old_rows, new_rows)
+    row_map = {index: index for index in range(start)}
+    shift = new_end - old_end
+    row_map.update((index, index + shift) for index in range(old_end, len(old_rows)))
+
+    matcher = SequenceMatcher(None, old_rows[start:old_end], new_rows[start:new_end], autojunk=False)
+    for tag, old_first, old_last, new_first, new_last in matcher.get_opcodes():
+        if tag == "equal":
+            row_map.update((start + old_first + offset, start + new_first + offset)
+                           for offset in range(old_last - old_first))
+        elif tag == "replace":
+            position = start + new_first
+            for old_index in range(start + old_first, start + old_last):
+                name = old_rows[old_index][1]
+                for new_index in range(position, start + new_last):
+                    if new_rows[new_index][1] == name:
+                        row_map[old_index] = new_index
+                        position = new_index + 1
+                        break
+    return row_map
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""声明式的多资源量谱模拟
+
+每种资源用 ResourceDefinition 描述：最大层数、初始层数、回复间隔、回复模型以及
+各动作的消耗和获得。支持三种回复模型：
+
+- ``per_use``：每次消耗在 regen_interval 秒后回复同样的数量（本工具的蛇胆模型）
+- ``continuous``：从 0 秒起每隔 regen_interval 秒回复 regen_amount，满层时溢出
+- ``charges``：充能技能，单个充能计时器在未满时依次回复，每次回复 1 层；
+  没有充能时的使用同样排入计时器，数量截断在 [0, 最大层数]
+
+simulate_resources 一次计算多种资源在所有行时间上的数量。安装了 NumPy 时，
+所有资源的事件排成一个二维数组，用截断函数的前缀组合（倍增扫描）一次求出；
+增加资源只增加数组的行数，不增加逐行循环。没有 NumPy 或数据量较小时使用逐事件计算，
+结果相同；NumPy 在第一次需要时才导入，导入本模块（例如查看器读取默认资源）不会加载它。
+"""
+
+import json
+import bisect
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+_NUMPY_MIN_SIZE = 256  # 行数与动作数之和少于此值时使用逐事件计算，也不必为此导入 NumPy
+_np = None  # 导入后的 NumPy 模块，没有安装时为 False
+
+
+def _numpy(size: int):
+    """数据量足够大时返回 NumPy 模块（第一次调用时才导入），否则返回 None"""
+    global _np
+    if size < _NUMPY_MIN_SIZE:
+        return None
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:  # NumPy 是可选依赖
+            numpy = False
+        _np = numpy
+    return _np or None
+
+
+REGEN_MODELS = ("per_use", "continuous", "charges")
+
+
+class ResourceDefinition:
+    """一种资源的声明式定义"""
+    __slots__ = ("name", "max_charges", "initial", "regen_interval", "regen_model", "regen_amount", "costs", "gains")
+
+    def __init__(self, name: str, max_charges: int = 3, regen_interval: float = 30.0, regen_model: str = "per_use",
+                 costs: Dict[str, float] = None, gains: Dict[str, float] = None, initial: float = None,
+                 regen_amount: float = 1.0):
+        if regen_model not in REGEN_MODELS:
+            raise ValueError(f"未知的回复模型: {regen_model}")
+        if regen_model == "charges" and gains:
+            raise ValueError("充能模型的资源不能通过动作获得")
+        self.name = name
+        self.max_charges = max_charges
+        self.initial = max_charges if initial is None else initial  # 战斗开始时的数量
+        self.regen_interval = regen_interval
+        self.regen_model = regen_model
+        self.regen_amount = regen_amount  # continuous 模型每次回复的数量
+        self.costs = dict(costs or {})  # 动作名称 -> 消耗数量
+        self.gains = dict(gains or {})  # 动作名称 -> 获得数量
+
+    def __repr__(self):
+        return f"ResourceDefinition({self.name!r}, max_charges={self.max_charges}, regen_model={self.regen_model!r})"
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ResourceDefinition":
+        return cls(
+            data["name"],
+            max_charges=data.get("max_charges", 3),
+            regen_interval=data.get("regen_interval", 30.0),
+            regen_model=data.get("regen_model", "per_use"),
+            costs=data.get("costs"),
+            gains=data.get("gains"),
+            initial=data.get("initial"),
+            regen_amount=data.get("regen_amount", 1.0),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "max_charges": self.max_charges,
+            "initial": self.initial,
+            "regen_interval": self.regen_interval,
+            "regen_model": self.regen_model,
+            "regen_amount": self.regen_amount,
+            "costs": self.costs,
+            "gains": self.gains,
+        }
+
+
+SERPENT_ACTION = "蛇胆"  # 查看器中“释放”按钮对应的动作名称
+
+DEFAULT_RESOURCES = (
+    ResourceDefinition("蛇胆", max_charges=3, regen_interval=30.0, regen_model="per_use", costs={SERPENT_ACTION: 1}),
+)
+
+
+def load_resource_definitions(file_path: str) -> List[ResourceDefinition]:
+    """从 JSON 文件读取资源定义列表"""
+    with open(file_path, "r", encoding="utf-8") as file:
+        return [ResourceDefinition.from_dict(item) for item in json.load(file)]
+
+
+def resource_events(resource: ResourceDefinition, actions: Sequence[Tuple[float, str]],
+                    end_time: float) -> List[Tuple[float, float]]:
+    """per_use / continuous 模型的 (时间, 变化量) 事件，按 (时间, 变化量) 排序
+
+    同一时间先处理消耗再处理回复，与蛇胆扫描的规则一致。
+    """
+    events = []
+    for action_time, action in actions:
+        cost = resource.costs.get(action)
+        if cost:
+            events.append((action_time, -cost))
+            if resource.regen_model == "per_use":
+                events.append((action_time + resource.regen_interval, cost))
+        gain = resource.gains.get(action)
+        if gain:
+            events.append((action_time, gain))
+    if resource.regen_model == "continuous" and resource.regen_interval > 0:
+        ticks = int(end_time // resource.regen_interval)
+        events.extend(((tick + 1) * resource.regen_interval, resource.regen_amount) for tick in range(ticks))
+    events.sort()
+    return events
+
+
+def charge_uses(resource: ResourceDefinition, actions: Sequence[Tuple[float, str]]) -> List[float]:
+    """充能模型的消耗时间（每层一项；初始未满的层数视为 0 秒时的消耗）"""
+    uses = [0.0] * int(resource.max_charges - resource.initial)
+    for action_time, action in actions:
+        cost = resource.costs.get(action)
+        if cost:
+            uses.extend([action_time] * int(cost))
+    uses.sort()
+    return uses
+
+
+def _simulate_python(resources: Sequence[ResourceDefinition], actions: Sequence[Tuple[float, str]],
+                     row_times: Sequence[float]) -> Dict[str, List[float]]:
+    """逐事件计算（没有 NumPy 时使用）"""
+    end_time = row_times[-1] if row_times else 0.0
+    results = {}
+    for resource in resources:
+        values = []
+        if resource.regen_model == "charges":
+            uses = charge_uses(resource, actions)
+            completions = []
+            finish = float("-inf")
+            for use_time in uses:
+                finish = max(use_time, finish) + resource.regen_interval
+                completions.append(finish)
+            for row_time in row_times:
+                used = bisect.bisect_right(uses, row_time)
+                recovered = bisect.bisect_right(completions, row_time)
+                values.append(float(min(resource.max_charges, max(0, resource.max_charges - used + recovered))))
+        else:
+            events = resource_events(resource, actions, end_time)
+            current = float(resource.initial)
+            event_index = 0
+            for row_time in row_times:
+                while event_index < len(events) and events[event_index][0] <= row_time:
+                    current = max(0.0, min(float(resource.max_charges), current + events[event_index][1]))
+                    event_index += 1
+                values.append(current)
+        results[resource.name] = values
+    return results
+
+
+def _numpy_events(np, resource: ResourceDefinition, action_times, action_codes, action_names: List[str], end_time: float):
+    """与 resource_events 相同的事件，以 (时间数组, 变化量数组) 表示"""
+    costs = np.array([resource.costs.get(name, 0.0) for name in action_names], dtype=float)[action_codes]
+    gains = np.array([resource.gains.get(name, 0.0) for name in action_names], dtype=float)[action_codes]
+    cost_mask = costs != 0
+    gain_mask = gains != 0
+    time_parts = [action_times[cost_mask], action_times[gain_mask]]
+    delta_parts = [-costs[cost_mask], gains[gain_mask]]
+    if resource.regen_model == "per_use":
+        time_parts.append(action_times[cost_mask] + resource.regen_interval)
+        delta_parts.append(costs[cost_mask])
+    elif resource.regen_interval > 0:
+        ticks = np.arange(1, int(end_time // resource.regen_interval) + 1) * resource.regen_interval
+        time_parts.append(ticks)
+        delta_parts.append(np.full(len(ticks), float(resource.regen_amount)))
+    times = np.concatenate(time_parts)
+    deltas = np.concatenate(delta_parts)
+    order = np.lexsort((deltas, times))
+    return times[order], deltas[order]
+
+
+def _simulate_numpy(np, resources: Sequence[ResourceDefinition], actions: Sequence[Tuple[float, str]],
+                    row_times: Sequence[float]) -> Dict[str, List[float]]:
+    """所有资源的事件排成二维数组，用倍增扫描一次求出截断累加的前缀"""
+    rows = np.asarray(row_times, dtype=float)
+    end_time = float(rows[-1]) if len(rows) else 0.0
+    results = {}
+
+    # 动作名称编码一次，各资源的消耗/获得用查表得到
+    action_names = []
+    name_codes = {}
+    codes = []
+    for _, action in actions:
+        code = name_codes.get(action)
+        if code is None:
+            code = name_codes[action] = len(action_names)
+            action_names.append(action)
+        codes.append(code)
+    action_times = np.array([action_time for action_time, _ in actions], dtype=float)
+    action_codes = np.array(codes, dtype=np.intp)
+
+    # 事件型资源：每行一个资源，右侧用恒等函数（shift 0, 不截断）补齐
+    gauge_resources = [resource for resource in resources if resource.regen_model != "charges"]
+    event_lists = [_numpy_events(np, resource, action_times, action_codes, action_names, end_time)
+                   for resource in gauge_resources]
+    if gauge_resources:
+        width = max(1, max(len(event_times) for event_times, _ in event_lists))
+        count = len(gauge_resources)
+        times = np.full((count, width), np.inf)
+        shift = np.zeros((count, width))
+        low = np.full((count, width), -np.inf)
+        high = np.full((count, width), np.inf)
+        for number, (resource, (event_times, deltas)) in enumerate(zip(gauge_resources, event_lists)):
+            size = len(event_times)
+            times[number, :size] = event_times
+            shift[number, :size] = deltas
+            low[number, :size] = 0.0
+            high[number, :size] = resource.max_charges
+
+        # 前缀组合：第 i 项变为 f_i ∘ ... ∘ f_0，先应用较早的事件
+        offset = 1
+        while offset < width:
+            earlier_shift = shift[:, :-offset]
+            earlier_low = low[:, :-offset]
+            earlier_high = high[:, :-offset]
+            later_shift = shift[:, offset:]
+            later_low = low[:, offset:]
+            later_high = high[:, offset:]
+            new_low = np.minimum(later_high, np.maximum(later_low, earlier_low + later_shift))
+            new_high = np.minimum(later_high, np.maximum(later_low, earlier_high + later_shift))
+            shift[:, offset:] = earlier_shift + later_shift
+            low[:, offset:] = new_low
+            high[:, offset:] = new_high
+            offset *= 2
+
+        initial = np.array([[float(resource.initial)] for resource in gauge_resources])
+        after_event = np.minimum(high, np.maximum(low, initial + shift))
+        values = np.concatenate([initial, after_event], axis=1)  # 第 k 列为处理完前 k 个事件后的数量
+        for number, resource in enumerate(gauge_resources):
+            processed = np.searchsorted(times[number], rows, side="right")
+            results[resource.name] = values[number, processed].tolist()
+
+    # 充能模型：完成时间 c_i = max(u_i, c_{i-1}) + R = (i+1)R + max_{j<=i}(u_j - jR)
+    for resource in resources:
+        if resource.regen_model != "charges":
+            continue
+        costs = np.array([resource.costs.get(name, 0) for name in action_names], dtype=np.intp)[action_codes]
+        initial_uses = np.zeros(int(resource.max_charges - resource.initial))
+        uses = np.sort(np.concatenate([initial_uses, np.repeat(action_times, costs)]))
+        interval = resource.regen_interval
+        steps = np.arange(len(uses))
+        completions = (steps + 1) * interval + np.maximum.accumulate(uses - steps * interval) if len(uses) else uses
+        used = np.searchsorted(uses, rows, side="right")
+        recovered = np.searchsorted(completions, rows, side="right")
+        values = np.clip(resource.max_charges - used + recovered, 0, resource.max_charges)
+        results[resource.name] = values.astype(float).tolist()
+
+    return {resource.name: results[resource.name] for resource in resources}
+
+
+def simulate_resources(resources: Iterable[ResourceDefinition], actions: Iterable[Tuple[float, str]],
+                       row_times: Sequence[float]) -> Dict[str, List[float]]:
+    """计算每种资源在每个行时间（处理完不晚于该时间的事件后）的数量
+
+    actions 为 (时间, 动作名称)，row_times 必须升序。返回 资源名称 -> 逐行数量。
+    """
+    resources = list(resources)
+    actions = sorted(actions)
+    np = _numpy(len(row_times) + len(actions))
+    if np is not None:
+        return _simulate_numpy(np, resources, actions, row_times)
+    return _simulate_python(resources, actions, row_times)
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""蒙特卡洛稳健性分析：计划中的每次蛇胆使用在时间抖动下失败的概率
+
+实际战斗中条目时间会在同步窗口内漂移，玩家按键也有延迟。每次试验对条目时间和
+使用时间加上随机扰动后按时间顺序重新模拟：使用时蛇胆数量（与
+calculate_serpent_at_time 相同，按 (时间, 变化量) 顺序截断累加不晚于该时间的
+使用和回复）为 0 则这次使用失败，失败的使用不消耗蛇胆，也不会回复。
+
+条目漂移按同步分组：时间轴在每个同步点重新对齐，同一同步点之后的条目共享一次
+漂移，漂移量由该同步点的 window 决定。安装了 NumPy 时，所有试验按数组同时模拟，
+只对计划中的使用逐个循环；试验按固定大小分块，可分散到进程池，同一随机种子的
+结果与进程数无关。NumPy 在第一次分析时才导入，导入本模块不会加载它。
+"""
+
+import bisect
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from .sync import DEFAULT_SYNC_WINDOW
+
+JITTER_KINDS = ("none", "uniform", "normal", "exponential", "window")
+
+TRIAL_CHUNK = 5000  # 每个任务块的试验次数
+
+_np = None  # 导入后的 NumPy 模块，没有安装时为 False
+
+
+def _numpy():
+    """返回 NumPy 模块（第一次调用时才导入），没有安装时返回 None"""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:  # NumPy 是可选依赖
+            numpy = False
+        _np = numpy
+    return _np or None
+
+
+class Jitter:
+    """时间扰动的分布
+
+    - ``none``：不扰动
+    - ``uniform``：在 ±scale 内均匀分布
+    - ``normal``：标准差为 scale 的正态分布
+    - ``exponential``：均值为 scale 的指数分布（只会推迟，适合按键延迟）
+    - ``window``：在同步窗口 (提前, 延后) 乘以 scale 的范围内均匀分布；没有窗口时同 uniform
+    """
+    __slots__ = ("kind", "scale")
+
+    def __init__(self, kind: str = "none", scale: float = 0.0):
+        if kind not in JITTER_KINDS:
+            raise ValueError(f"未知的扰动分布: {kind}")
+        if scale < 0:
+            raise ValueError("扰动幅度不能为负数")
+        self.kind = kind
+        self.scale = scale
+
+    def __repr__(self):
+        return f"Jitter({self.kind!r}, {self.scale!r})"
+
+    @classmethod
+    def parse(cls, text: str) -> "Jitter":
+        """解析 分布[:幅度]，例如 normal:0.3、window:0.5、none"""
+        kind, _, scale = text.partition(":")
+        return cls(kind, float(scale) if scale else 1.0)
+
+    def bounds(self, windows: Optional[Sequence[Tuple[float, float]]], count: int) -> Tuple[list, list]:
+        """uniform / window 分布每列的 (下限列表, 上限列表)"""
+        if self.kind == "window" and windows is not None:
+            return [-before * self.scale for before, _ in windows], [after * self.scale for _, after in windows]
+        return [-self.scale] * count, [self.scale] * count
+
+    def sample(self, rng, trials: int, count: int, windows: Optional[Sequence[Tuple[float, float]]] = None):
+        """NumPy：形状为 (trials, count) 的扰动，rng 为 numpy.random.Generator"""
+        np = _numpy()
+        if self.kind == "none" or self.scale == 0 or count == 0:
+            return np.zeros((trials, count))
+        if self.kind == "normal":
+            return rng.normal(0.0, self.scale, (trials, count))
+        if self.kind == "exponential":
+            return rng.exponential(self.scale, (trials, count))
+        low, high = self.bounds(windows, count)
+        return rng.uniform(np.asarray(low), np.asarray(high), (trials, count))
+
+    def sample_python(self, rng: random.Random, count: int,
+                      windows: Optional[Sequence[Tuple[float, float]]] = None) -> List[float]:
+        """纯 Python：一次试验的 count 个扰动"""
+        if self.kind == "none" or self.scale == 0:
+            return [0.0] * count
+        if self.kind == "normal":
+            return [rng.gauss(0.0, self.scale) for _ in range(count)]
+        if self.kind == "exponential":
+            return [rng.expovariate(1.0 / self.scale) for _ in range(count)]
+        low, high = self.bounds(windows, count)
+        return [rng.uniform(a, b) for a, b in zip(low, high)]
+
+
+class RobustnessReport:
+    """稳健性分析结果"""
+    __slots__ = ("uses", "trials", "failure_counts", "failed_trials")
+
+    def __init__(self, uses: List[Tuple[float, str]], trials: int, failure_counts: List[int], failed_trials: int):
+        self.uses = uses  # 计划中的使用 (时间, 技能名称)，按时间排序
+        self.trials = trials
+        self.failure_counts = failure_counts  # 每次使用失败的试验次数
+        self.failed_trials = failed_trials  # 至少有一次使用失败的试验次数
+
+    def __repr__(self):
+        return f"RobustnessReport({len(self.uses)} uses, trials={self.trials}, failed_trials={self.failed_trials})"
+
+    def failure_probability(self) -> List[float]:
+        """每次使用失败的概率"""
+        if not self.trials:
+            return [0.0] * len(self.uses)
+        return [count / self.trials for count in self.failure_counts]
+
+    def any_failure_probability(self) -> float:
+        """至少有一次使用失败的概率"""
+        return self.failed_trials / self.trials if self.trials else 0.0
+
+
+def row_sync_windows(entries: Sequence, indices: Sequence[int]) -> List[Optional[Tuple[float, float]]]:
+    """路径上每行对应条目的同步窗口，不是同步点的行为 None"""
+    windows = []
+    for index in indices:
+        entry = entries[index]
+        windows.append((entry.window or DEFAULT_SYNC_WINDOW) if entry.sync_type is not None else None)
+    return windows
+
+
+def use_anchor_rows(rows: Sequence[Tuple[float, str]], uses: Sequence[Tuple[float, str]]) -> List[int]:
+    """每次使用所依附的行：同名行中时间最接近的一行，没有同名行时取不晚于使用时间的最后一行"""
+    row_times = [time_val for time_val, _ in rows]
+    rows_by_name = {}
+    for index, (_, skill_name) in enumerate(rows):
+        rows_by_name.setdefault(skill_name, []).append(index)
+
+    anchors = []
+    for use_time, skill_name in uses:
+        candidates = rows_by_name.get(skill_name)
+        if candidates:
+            anchors.append(min(candidates, key=lambda index: abs(row_times[index] - use_time)))
+        else:
+            anchors.append(max(0, bisect.bisect_right(row_times, use_time) - 1))
+    return anchors
+
+
+def drift_groups(anchors: Sequence[int], windows: Sequence[Optional[Tuple[float, float]]]) -> Tuple[List[int], list]:
+    """按依附行之前最近的同步点给使用分组，返回 (每次使用的组号, 每组的同步窗口)
+
+    第一个同步点之前的使用组号为 -1（战斗开始时没有漂移）。
+    """
+    sync_rows = [index for index, window in enumerate(windows) if window is not None]
+    group_numbers = {}
+    group_windows = []
+    groups = []
+    for anchor in anchors:
+        position = bisect.bisect_right(sync_rows, anchor) - 1
+        if position < 0:
+            groups.append(-1)
+            continue
+        row = sync_rows[position]
+        if row not in group_numbers:
+            group_numbers[row] = len(group_windows)
+            group_windows.append(windows[row])
+        groups.append(group_numbers[row])
+    return groups, group_windows
+
+
+def _simulate_chunk_numpy(use_times: list, groups: list, group_windows: list, entry_jitter: Jitter,
+                          input_delay: Jitter, trials: int, max_count: int, regen_interval: float,
+                          seed) -> Tuple[List[int], int]:
+    """NumPy：模拟一块试验，返回 (每次使用的失败次数, 有失败的试验次数)"""
+    np = _numpy()
+    rng = np.random.default_rng(seed)
+    count = len(use_times)
+    group_index = np.asarray(groups, dtype=np.intp)
+
+    # 组号 -1 对应最后补上的一列 0（不漂移）
+    drift = entry_jitter.sample(rng, trials, len(group_windows), group_windows)
+    drift = np.concatenate([drift, np.zeros((trials, 1))], axis=1)
+    times = np.asarray(use_times, dtype=float) + drift[:, group_index]
+    times += input_delay.sample(rng, trials, count)
+    np.maximum(times, 0.0, out=times)
+
+    order = np.argsort(times, axis=1, kind="stable")
+    sorted_times = np.take_along_axis(times, order, axis=1)
+
+    # 成功使用的回复时间按使用顺序追加，因此每个试验内也是升序；applied 之前的回复已计入数量
+    trial_index = np.arange(trials)
+    recoveries = np.full((trials, count + 1), np.inf)
+    accepted = np.zeros(trials, dtype=np.intp)
+    applied = np.zeros(trials, dtype=np.intp)
+    current = np.full(trials, max_count, dtype=np.int64)
+    failed = np.zeros((trials, count), dtype=bool)
+    for position in range(count):
+        use_time = sorted_times[:, position]
+        # 早于使用时间的回复：只会在满时被截断
+        while True:
+            due = recoveries[trial_index, applied] < use_time
+            if not due.any():
+                break
+            current = np.minimum(current + due, max_count)
+            applied += due
+        # 同一时间的回复计入查询结果，但排在这次使用之后处理
+        same_time = applied.copy()
+        while True:
+            tie = recoveries[trial_index, same_time] == use_time
+            if not tie.any():
+                break
+            same_time += tie
+        success = np.minimum(current + (same_time - applied), max_count) > 0
+        failed[:, position] = ~success
+        current = np.where(success, np.maximum(current - 1, 0), current)
+        recoveries[trial_index[success], accepted[success]] = use_time[success] + regen_interval
+        accepted += success
+
+    failure_counts = np.zeros(count, dtype=np.int64)
+    np.add.at(failure_counts, order[failed], 1)
+    return failure_counts.tolist(), int(np.count_nonzero(failed.any(axis=1)))
+
+
+def _simulate_chunk_python(use_times: list, groups: list, group_windows: list, entry_jitter: Jitter,
+                           input_delay: Jitter, trials: int, max_count: int, regen_interval: float,
+                           seed) -> Tuple[List[int], int]:
+    """纯 Python：逐次试验模拟（没有 NumPy 时使用）"""
+    rng = random.Random(seed)
+    count = len(use_times)
+    failure_counts = [0] * count
+    failed_trials = 0
+    for _ in range(trials):
+        drift = entry_jitter.sample_python(rng, len(group_windows), group_windows) + [0.0]
+        delays = input_delay.sample_python(rng, count)
+        times = [max(0.0, use_times[number] + drift[groups[number]] + delays[number]) for number in range(count)]
+
+        recoveries = []  # 成功使用的回复时间（升序）
+        applied = 0  # 已计入数量的回复个数
+        current = max_count
+        any_failed = False
+        for number in sorted(range(count), key=times.__getitem__):
+            use_time = times[number]
+            while applied < len(recoveries) and recoveries[applied] < use_time:
+                current = min(current + 1, max_count)
+                applied += 1
+            same_time = bisect.bisect_right(recoveries, use_time, applied) - applied
+            if min(current + same_time, max_count) > 0:
+                current = max(current - 1, 0)
+                recoveries.append(use_time + regen_interval)
+            else:
+                failure_counts[number] += 1
+                any_failed = True
+        failed_trials += any_failed
+    return failure_counts, failed_trials
+
+
+def analyze_robustness(uses: Sequence[Tuple[float, str]], anchors: Sequence[int],
+                       row_windows: Sequence[Optional[Tuple[float, float]]],
+                       entry_jitter: Jitter, input_delay: Jitter, trials: int = 20000,
+                       max_count: int = 3, regen_interval: float = 30.0, seed: Optional[int] = None,
+                       jobs: Optional[int] = 1) -> RobustnessReport:
+    """对计划做 trials 次扰动模拟，统计每次使用失败的概率
+
+    uses 为计划中的使用 (时间, 技能名称)，anchors 为每次使用依附的行号
+    （见 use_anchor_rows），row_windows 为每行的同步窗口（见 row_sync_windows）。
+    jobs 不为 1 时按 TRIAL_CHUNK 分块在进程池中模拟（None 表示 CPU 核数）。
+    """
+    ordered = sorted(zip(uses, anchors))
+    uses = [use for use, _ in ordered]
+    use_times = [use_time for use_time, _ in uses]
+    groups, group_windows = drift_groups([anchor for _, anchor in ordered], row_windows)
+    if not uses or trials <= 0:
+        return RobustnessReport(uses, max(0, trials), [0] * len(uses), 0)
+
+    chunk_sizes = [TRIAL_CHUNK] * (trials // TRIAL_CHUNK)
+    if trials % TRIAL_CHUNK:
+        chunk_sizes.append(trials % TRIAL_CHUNK)
+    np = _numpy()
+    if np is not None:
+        simulate = _simulate_chunk_numpy
+        seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    else:
+        simulate = _simulate_chunk_python
+        base_seed = random.Random(seed).getrandbits(64)
+        seeds = [base_seed + number for number in range(len(chunk_sizes))]
+
+    arguments = [(use_times, groups, group_windows, entry_jitter, input_delay, size, max_count, regen_interval, chunk_seed)
+                 for size, chunk_seed in zip(chunk_sizes, seeds)]
+    if jobs == 1 or len(arguments) == 1:
+        results = [simulate(*item) for item in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(simulate, *zip(*arguments)))
+
+    failure_counts = [0] * len(uses)
+    failed_trials = 0
+    for counts, failed in results:
+        failure_counts = [total + value for total, value in zip(failure_counts, counts)]
+        failed_trials += failed
+    return RobustnessReport(uses, trials, failure_counts, failed_trials)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""技能名称的 n-gram 倒排索引和分类筛选
+
+SkillIndex 在解析后构建一次：不同的技能名称只索引一次（NgramIndex 把小写后的
+名称按 1～3 字的 n-gram 建立 n-gram -> 名称编号 的倒排表），每个名称记录出现它的
+条目下标。查询时取查询词中最长的 n-gram，对倒排表求交集得到候选名称，再确认子串，
+结果与时间轴长度无关，只与匹配的名称数有关。
+
+分类按条目预先计算：``marker`` 为名称中带 ``--`` 的标记行，``sync`` 为带同步
+指令的行，``damage`` 为按 Ability / StartsUsing 同步的首领技能（不含标记行）。
+"""
+
+from typing import Iterable, List, Optional, Sequence, Set
+
+from .columns import TimelineColumns
+
+GRAM_SIZE = 3  # 索引的最长 n-gram
+
+CATEGORY_NAMES = {
+    "marker": "-- 标记",
+    "sync": "同步",
+    "damage": "伤害",
+}
+
+_DAMAGE_SYNC_TYPES = ("Ability", "StartsUsing")
+
+
+def _grams(text: str, size: int) -> Set[str]:
+    return {text[start:start + size] for start in range(len(text) - size + 1)}
+
+
+class NgramIndex:
+    """字符串的 n-gram 倒排索引：按子串（不区分大小写）查找已加入的字符串"""
+
+    def __init__(self):
+        self.texts = []  # 字符串编号 -> 小写字符串
+        self.text_ids = {}  # 小写字符串 -> 字符串编号
+        self.grams = {}  # n-gram -> 包含它的字符串编号集合
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def add(self, text: str) -> int:
+        """加入字符串（已存在时不重复索引），返回字符串编号"""
+        lowered = text.lower()
+        text_id = self.text_ids.get(lowered)
+        if text_id is None:
+            text_id = self.text_ids[lowered] = len(self.texts)
+            self.texts.append(lowered)
+            for size in range(1, GRAM_SIZE + 1):
+                for gram in _grams(lowered, size):
+                    self.grams.setdefault(gram, set()).add(text_id)
+        return text_id
+
+    def match(self, term: str) -> Set[int]:
+        """包含 term 的字符串编号"""
+        term = term.lower()
+        size = min(len(term), GRAM_SIZE)
+        postings = [self.grams.get(gram) for gram in _grams(term, size)]
+        if not postings or any(posting is None for posting in postings):
+            return set()
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return candidates
+        if len(term) <= GRAM_SIZE:
+            return candidates
+        texts = self.texts
+        return {text_id for text_id in candidates if term in texts[text_id]}
+
+
+class SkillIndex:
+    """技能名称的 n-gram 倒排索引"""
+
+    def __init__(self, entries: TimelineColumns):
+        self.names = NgramIndex()  # 不同的技能名称
+        self.postings = []  # 名称编号 -> 出现该名称的条目下标（升序）
+        self.categories = {category: set() for category in CATEGORY_NAMES}  # 分类 -> 条目下标集合
+
+        # 直接读取名称和同步类型两列，不创建 TimelineEntry
+        for index, (name, sync_type) in enumerate(zip(entries.iter_names(), entries.iter_sync_types())):
+            if not name:
+                continue
+            name_id = self.names.add(name)
+            if name_id == len(self.postings):
+                self.postings.append([])
+            self.postings[name_id].append(index)
+
+            marker = "--" in name
+            if marker:
+                self.categories["marker"].add(index)
+            if sync_type is not None:
+                self.categories["sync"].add(index)
+                if sync_type in _DAMAGE_SYNC_TYPES and not marker:
+                    self.categories["damage"].add(index)
+
+    def match_names(self, term: str) -> Set[int]:
+        """名称中包含 term（不区分大小写）的名称编号"""
+        return self.names.match(term)
+
+    def search(self, query: str = "", categories: Iterable[str] = ()) -> Optional[Set[int]]:
+        """返回匹配的条目下标集合；没有任何筛选条件时返回 None（全部显示）
+
+        查询按空白分词，每个词都要出现在名称中；选中的分类之间为“或”。
+        """
+        terms = query.split()
+        categories = [category for category in categories if category in self.categories]
+        if not terms and not categories:
+            return None
+
+        matched = None
+        if terms:
+            name_ids = None
+            for term in terms:
+                term_ids = self.match_names(term)
+                name_ids = term_ids if name_ids is None else name_ids & term_ids
+                if not name_ids:
+                    return set()
+            matched = set()
+            for name_id in name_ids:
+                matched.update(self.postings[name_id])
+        if categories:
+            in_category = set().union(*(self.categories[category] for category in categories))
+            matched = in_category if matched is None else matched & in_category
+        return matched
+
+    def filter_rows(self, row_entries: Sequence[int], query: str = "",
+                    categories: Iterable[str] = ()) -> Optional[List[int]]:
+        """按行对应的条目下标筛选行，返回显示的行号（升序）；没有筛选条件时返回 None"""
+        matched = self.search(query, categories)
+        if matched is None:
+            return None
+        return [row for row, index in enumerate(row_entries) if index in matched]
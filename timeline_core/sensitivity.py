@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""偏移敏感度：每行在多大偏移范围内还能再使用一次蛇胆
+
+在可行的计划中（没有使用因蛇胆不足被截断），时间 t 的蛇胆数量为
+``最大数量 - #{u : u <= t < u + 回复间隔}``。在 x 时刻再使用一次，会让
+[x, x + 回复间隔) 内的数量都减 1，因此这次使用以及之后所有已有的使用都仍然
+成立，当且仅当这段时间内的数量始终不少于 1。
+
+把数量降到 0 的时间段记为 [a, b)，则 x 不可用当且仅当 x 落在开区间
+(a - 回复间隔, b) 内。先由使用记录一次求出这些开区间（排序后的差分累加），
+再对行时间做二分查找，即可得到该行可用偏移的区间，不需要逐个偏移模拟。
+界面只对可见的行调用 safe_offset_window；批量计算时，安装了 NumPy 且数据量
+较大时两步都按数组计算。NumPy 在第一次需要时才导入，导入本模块（以及使用
+计划）不会加载它。
+"""
+
+import bisect
+import math
+from typing import List, Sequence, Tuple
+
+_NUMPY_MIN_SIZE = 256  # 行数或使用次数少于此值时纯 Python 更快，也不必为此导入 NumPy（约 100 ms）
+_np = None  # 导入后的 NumPy 模块，没有安装时为 False
+
+
+def _numpy(size: int):
+    """数据量足够大时返回 NumPy 模块（第一次调用时才导入），否则返回 None"""
+    global _np
+    if size < _NUMPY_MIN_SIZE:
+        return None
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:  # NumPy 是可选依赖
+            numpy = False
+        _np = numpy
+    return _np or None
+
+
+def blocked_use_intervals(use_times: Sequence[float], max_count: int = 3,
+                          regen_interval: float = 30.0) -> Tuple[list, list]:
+    """不能再使用的时间：按开始时间排序、互不重叠的开区间 (开始, 结束)，返回 (开始列表, 结束列表)"""
+    if not use_times:
+        return [], []
+
+    np = _numpy(len(use_times))
+    if np is not None:
+        uses = np.asarray(use_times, dtype=float)
+        times, inverse = np.unique(np.concatenate([uses, uses + regen_interval]), return_inverse=True)
+        deltas = np.zeros(len(times))
+        np.add.at(deltas, inverse, np.concatenate([np.ones(len(uses)), -np.ones(len(uses))]))
+        active = np.cumsum(deltas)  # active[k] 在 [times[k], times[k+1]) 内有效
+        full = np.nonzero(active[:-1] >= max_count)[0]
+        starts = times[full] - regen_interval
+        ends = times[full + 1]
+        if len(starts) == 0:
+            return [], []
+        # 结束时间单调递增，开始时间不小于上一段的结束时间时开始新的一组
+        group_start = np.concatenate([[True], starts[1:] >= ends[:-1]])
+        group_end = np.concatenate([group_start[1:], [True]])
+        return starts[group_start].tolist(), ends[group_end].tolist()
+
+    changes = {}
+    for use_time in use_times:
+        changes[use_time] = changes.get(use_time, 0) + 1
+        recovery = use_time + regen_interval
+        changes[recovery] = changes.get(recovery, 0) - 1
+    times = sorted(changes)
+    starts = []
+    ends = []
+    active = 0
+    for index, time_val in enumerate(times[:-1]):
+        active += changes[time_val]
+        if active >= max_count:
+            start = time_val - regen_interval
+            if ends and start < ends[-1]:
+                ends[-1] = times[index + 1]
+            else:
+                starts.append(start)
+                ends.append(times[index + 1])
+    return starts, ends
+
+
+def splice_blocked_intervals(old: Tuple[list, list], local: Tuple[list, list],
+                             low: float, high: float) -> Tuple[list, list]:
+    """用局部重算的不可用区间替换 (low, high) 内的部分，返回新的 (开始列表, 结束列表)
+
+    使用记录只在 [low + 回复间隔, high) 内变化时，不可用的时间只在 (low, high) 内
+    变化，low 和 high 两点是否可用前后相同。local 由 (low - 回复间隔, high + 回复间隔)
+    内的使用记录求出，在 [low, high] 内与完整计算一致；跨过 low / high 的区间两端
+    取自 old。
+    """
+    old_starts, old_ends = old
+    new_starts, new_ends = local
+    first = bisect.bisect_right(old_ends, low)  # old[:first] 整个在 low 之前
+    last = bisect.bisect_left(old_starts, high)  # old[last:] 整个在 high 之后
+    new_first = bisect.bisect_right(new_ends, low)
+    new_last = bisect.bisect_left(new_starts, high)
+    starts = new_starts[new_first:new_last]
+    ends = new_ends[new_first:new_last]
+    if first < len(old_starts) and old_starts[first] < low:
+        starts[0] = old_starts[first]  # low 在区间内：区间的开始在变化范围之前
+    if last > first and old_ends[last - 1] > high:
+        ends[-1] = old_ends[last - 1]
+    return old_starts[:first] + starts + old_starts[last:], old_ends[:first] + ends + old_ends[last:]
+
+
+def safe_offset_window(row_time: float, starts: list, ends: list, max_offset: float) -> Tuple[float, float, bool]:
+    """一行的可用偏移区间 (最小偏移, 最大偏移, 原时间是否可用)，含义同 safe_offset_windows"""
+    if not starts:
+        return -max_offset, max_offset, True
+    index = bisect.bisect_left(starts, row_time) - 1
+    usable = index < 0 or row_time >= ends[index]
+    if not usable:
+        # 原时间不可用：取离原时间最近的可用点所在的区间
+        if row_time - starts[index] <= ends[index] - row_time:
+            index -= 1
+    left = ends[index] if index >= 0 else -math.inf
+    right = starts[index + 1] if index + 1 < len(starts) else math.inf
+    low = max(left - row_time, -max_offset)
+    high = min(right - row_time, max_offset)
+    if low > high:
+        return math.nan, math.nan, usable
+    return low, high, usable
+
+
+def safe_offset_windows(row_times: Sequence[float], starts: list, ends: list,
+                        max_offset: float) -> Tuple[List[float], List[float], List[bool]]:
+    """每行在 ±max_offset 内的可用偏移区间
+
+    返回 (最小偏移, 最大偏移, 原时间是否可用) 三个列表。原时间可用时区间包含 0；
+    不可用时给出离原时间最近的可用区间，超出 ±max_offset 时为 NaN。
+    """
+    if not starts:
+        count = len(row_times)
+        return [-max_offset] * count, [max_offset] * count, [True] * count
+
+    np = _numpy(len(row_times))
+    if np is None:
+        windows = [safe_offset_window(row_time, starts, ends, max_offset) for row_time in row_times]
+        return [item[0] for item in windows], [item[1] for item in windows], [item[2] for item in windows]
+
+    times = np.asarray(row_times, dtype=float)
+    start_array = np.asarray(starts, dtype=float)
+    end_array = np.asarray(ends, dtype=float)
+    padded_starts = np.concatenate([start_array, [np.inf]])
+    padded_ends = np.concatenate([[-np.inf], end_array])  # padded_ends[i + 1] == ends[i]
+
+    index = np.searchsorted(start_array, times, side="left") - 1
+    usable = (index < 0) | (times >= padded_ends[index + 1])
+    # 原时间不可用且离区间开始更近时，取前一个可用区间
+    closer_to_start = ~usable & (times - padded_starts[np.maximum(index, 0)] <= padded_ends[index + 1] - times)
+    index = index - closer_to_start
+    low = np.maximum(padded_ends[index + 1] - times, -max_offset)
+    high = np.minimum(padded_starts[index + 1] - times, max_offset)
+    empty = low > high
+    low[empty] = np.nan
+    high[empty] = np.nan
+    return low.tolist(), high.tolist(), usable.tolist()
@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""蛇胆（Addersgall）资源模拟：使用记录索引与逐行状态扫描"""
+
+import bisect
+import random
+from typing import List, Optional, Tuple
+
+
+class _LedgerNode:
+    """SerpentLedger 使用的树堆节点"""
+    __slots__ = ("key", "delta", "priority", "left", "right", "size", "shift", "low", "high")
+
+    def __init__(self, key: tuple, delta: int):
+        self.key = key
+        self.delta = delta
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.size = 1
+        self.shift = 0
+        self.low = 0
+        self.high = 0
+
+
+def _compose_clamp(first: tuple, second: tuple) -> tuple:
+    """组合两个截断函数 c -> min(high, max(low, c + shift))，先应用 first 再应用 second"""
+    shift1, low1, high1 = first
+    shift2, low2, high2 = second
+    low = min(high2, max(low2, low1 + shift2))
+    high = min(high2, max(low2, high1 + shift2))
+    return shift1 + shift2, low, high
+
+
+_IDENTITY_CLAMP = (0, float("-inf"), float("inf"))
+
+
+class SerpentLedger:
+    """蛇胆使用记录索引
+
+    使用事件与回复事件按 (时间, 变化量) 存放在树堆中，每个子树缓存其事件序列
+    组合后的截断函数，因此插入、删除、移动一次使用以及查询任意时间点的蛇胆数量
+    都只需 O(log n)。另一棵树堆按 (使用时间, 技能名称) 保存使用记录本身，用于
+    查询下一个回复和按顺序遍历。
+    """
+
+    def __init__(self, max_count: int = 3, regen_interval: float = 30.0):
+        self.max_count = max_count
+        self.regen_interval = regen_interval
+        self._events = None  # 使用(-1)与回复(+1)事件
+        self._uses = None  # 使用记录
+
+    def __len__(self) -> int:
+        return self._uses.size if self._uses else 0
+
+    def __iter__(self):
+        return iter(self.uses())
+
+    def clear(self):
+        """清空所有使用记录"""
+        self._events = None
+        self._uses = None
+
+    def add_use(self, use_time: float, skill_name: str):
+        """添加一次使用"""
+        self._uses = self._insert(self._uses, _LedgerNode((use_time, skill_name), 0))
+        self._events = self._insert(self._events, _LedgerNode((use_time, -1, skill_name), -1))
+        recovery_time = use_time + self.regen_interval
+        self._events = self._insert(self._events, _LedgerNode((recovery_time, 1, use_time, skill_name), 1))
+
+    def remove_use(self, use_time: float, skill_name: str) -> bool:
+        """删除一次使用，记录不存在时返回 False"""
+        self._uses, removed = self._remove(self._uses, (use_time, skill_name))
+        if not removed:
+            return False
+        self._events, _ = self._remove(self._events, (use_time, -1, skill_name))
+        recovery_time = use_time + self.regen_interval
+        self._events, _ = self._remove(self._events, (recovery_time, 1, use_time, skill_name))
+        return True
+
+    def move_use(self, use_time: float, skill_name: str, new_time: float) -> bool:
+        """把一次使用移动到新的时间点，记录不存在时返回 False"""
+        if not self.remove_use(use_time, skill_name):
+            return False
+        self.add_use(new_time, skill_name)
+        return True
+
+    def charges_at(self, target_time: float) -> int:
+        """计算指定时间点（含该时间点的所有事件）的蛇胆数量"""
+        clamp = _IDENTITY_CLAMP
+        node = self._events
+        while node is not None:
+            if node.key[0] <= target_time:
+                if node.left is not None:
+                    clamp = _compose_clamp(clamp, (node.left.shift, node.left.low, node.left.high))
+                clamp = _compose_clamp(clamp, (node.delta, 0, self.max_count))
+                node = node.right
+            else:
+                node = node.left
+        shift, low, high = clamp
+        return min(high, max(low, self.max_count + shift))
+
+    def next_recovery(self, target_time: float) -> tuple:
+        """获取指定时间点之后的下一个回复：(技能名称, 回复进度, 剩余时间)"""
+        found = None
+        node = self._uses
+        while node is not None:
+            # 回复时间随使用时间单调递增，找第一条回复时间晚于 target_time 的记录
+            if node.key[0] + self.regen_interval > target_time:
+                found = node
+                node = node.left
+            else:
+                node = node.right
+
+        if found is None:
+            return None, 0.0, 0.0
+
+        use_time, skill_name = found.key
+        recovery_time = use_time + self.regen_interval
+        progress = max(0.0, min(1.0, (target_time - use_time) / self.regen_interval))
+        return skill_name, progress, recovery_time - target_time
+
+    def uses(self) -> List[Tuple[float, str]]:
+        """按时间顺序返回所有使用记录"""
+        result = []
+        stack = []
+        node = self._uses
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            result.append(node.key)
+            node = node.right
+        return result
+
+    def uses_between(self, start_time: float, end_time: float) -> List[Tuple[float, str]]:
+        """返回使用时间在 [start_time, end_time] 内的记录（按时间顺序）"""
+        result = []
+        stack = []
+        node = self._uses
+        # 只沿着可能包含起点之后记录的路径下降
+        while node is not None:
+            if node.key[0] >= start_time:
+                stack.append(node)
+                node = node.left
+            else:
+                node = node.right
+        while stack:
+            node = stack.pop()
+            if node.key[0] > end_time:
+                break
+            result.append(node.key)
+            node = node.right
+            while node is not None:
+                if node.key[0] >= start_time:
+                    stack.append(node)
+                    node = node.left
+                else:
+                    node = node.right
+        return result
+
+    def last_uses(self, count: int) -> List[Tuple[float, str]]:
+        """返回最近的 count 条使用记录（按时间顺序）"""
+        result = []
+        stack = []
+        node = self._uses
+        while (stack or node is not None) and len(result) < count:
+            while node is not None:
+                stack.append(node)
+                node = node.right
+            node = stack.pop()
+            result.append(node.key)
+            node = node.left
+        result.reverse()
+        return result
+
+    def _update(self, node: "_LedgerNode"):
+        """重新计算节点的子树大小与组合截断函数"""
+        max_count = self.max_count
+        left = node.left
+        right = node.right
+        # 节点自身事件：c -> min(max_count, max(0, c + delta))
+        shift = node.delta
+        low = 0
+        high = max_count
+        size = 1
+        if left is not None:
+            # 先应用左子树，再应用节点自身
+            low = min(max_count, max(0, left.low + shift))
+            high = min(max_count, max(0, left.high + shift))
+            shift += left.shift
+            size += left.size
+        if right is not None:
+            low = min(right.high, max(right.low, low + right.shift))
+            high = min(right.high, max(right.low, high + right.shift))
+            shift += right.shift
+            size += right.size
+        node.shift = shift
+        node.low = low
+        node.high = high
+        node.size = size
+
+    def _replace_child(self, parent, old, new):
+        """在父节点中用 new 替换子节点 old（parent 为 None 表示 old 是根）"""
+        if parent is None:
+            return
+        if parent.left is old:
+            parent.left = new
+        else:
+            parent.right = new
+
+    def _insert(self, root, node: "_LedgerNode"):
+        """插入节点（相同键放在右侧），返回新的根"""
+        self._update(node)
+        path = []
+        parent = root
+        while parent is not None:
+            path.append(parent)
+            parent = parent.left if node.key < parent.key else parent.right
+        if not path:
+            return node
+        if node.key < path[-1].key:
+            path[-1].left = node
+        else:
+            path[-1].right = node
+
+        # 按优先级向上旋转
+        while path and path[-1].priority < node.priority:
+            parent = path.pop()
+            if parent.left is node:
+                parent.left = node.right
+                node.right = parent
+            else:
+                parent.right = node.left
+                node.left = parent
+            self._update(parent)
+            self._replace_child(path[-1] if path else None, parent, node)
+        self._update(node)
+
+        for ancestor in reversed(path):
+            self._update(ancestor)
+        return path[0] if path else node
+
+    def _remove(self, root, key: tuple):
+        """删除一个键等于 key 的节点，返回 (新的根, 是否删除)"""
+        path = []
+        node = root
+        while node is not None and node.key != key:
+            path.append(node)
+            node = node.left if key < node.key else node.right
+        if node is None:
+            return root, False
+
+        # 将节点旋转到最多只有一个子节点的位置
+        while node.left is not None and node.right is not None:
+            if node.left.priority > node.right.priority:
+                child = node.left
+                node.left = child.right
+                child.right = node
+            else:
+                child = node.right
+                node.right = child.left
+                child.left = node
+            self._replace_child(path[-1] if path else None, node, child)
+            if not path:
+                root = child
+            path.append(child)
+
+        replacement = node.left if node.left is not None else node.right
+        self._replace_child(path[-1] if path else None, node, replacement)
+        if not path:
+            return replacement, True
+
+        for ancestor in reversed(path):
+            self._update(ancestor)
+        return root, True
+
+
+def _iter_serpent_states(row_times: List[float], serpent_uses: List[Tuple[float, str]], start_index: int,
+                         initial_count: int, max_count: int, regen_interval: float):
+    """从 start_index 行开始逐行产出蛇胆状态
+
+    initial_count 为处理完所有不晚于前一行的事件后的蛇胆数量。
+    """
+    use_count = len(serpent_uses)
+    use_times = [use_time for use_time, _ in serpent_uses]
+    recoveries = [use_time + regen_interval for use_time in use_times]
+
+    current_serpent = initial_count
+    if start_index > 0:
+        # 跳过已经计入前一行状态的事件
+        previous_time = row_times[start_index - 1]
+        use_index = bisect.bisect_right(use_times, previous_time)
+        recovery_index = bisect.bisect_right(recoveries, previous_time)
+    else:
+        use_index = 0  # 下一个尚未计入的使用事件
+        recovery_index = 0  # 下一个尚未计入的回复事件
+    pending_index = recovery_index  # 第一个回复时间晚于当前行的使用记录
+
+    for row_index in range(start_index, len(row_times)):
+        row_time = row_times[row_index]
+
+        # 按 (时间, 变化量) 顺序归并处理所有不晚于当前行的事件，同一时间先使用后回复
+        while True:
+            use_time = use_times[use_index] if use_index < use_count else None
+            recovery_time = recoveries[recovery_index] if recovery_index < use_count else None
+            take_use = use_time is not None and use_time <= row_time
+            take_recovery = recovery_time is not None and recovery_time <= row_time
+            if take_use and (not take_recovery or use_time <= recovery_time):
+                current_serpent = max(0, min(max_count, current_serpent - 1))
+                use_index += 1
+            elif take_recovery:
+                current_serpent = max(0, min(max_count, current_serpent + 1))
+                recovery_index += 1
+            else:
+                break
+
+        # 下一个回复：回复时间晚于当前行的第一条使用记录
+        while pending_index < use_count and recoveries[pending_index] <= row_time:
+            pending_index += 1
+
+        if pending_index < use_count:
+            use_time, skill_name = serpent_uses[pending_index]
+            elapsed = row_time - use_time
+            progress = max(0.0, min(1.0, elapsed / regen_interval))
+            yield current_serpent, skill_name, progress, recoveries[pending_index] - row_time
+        else:
+            yield current_serpent, None, 0.0, 0.0
+
+
+def sweep_serpent_states(row_times: List[float], serpent_uses: List[Tuple[float, str]],
+                         max_count: int = 3, regen_interval: float = 30.0) -> List[Tuple[int, Optional[str], float, float]]:
+    """一次归并扫描计算所有行的蛇胆状态
+
+    row_times 与 serpent_uses 都必须按时间升序排列。返回每行的
+    (蛇胆数量, 下一个回复的技能名称, 回复进度, 剩余时间)，结果与
+    calculate_serpent_at_time / get_next_serpent_recovery_info 逐行计算一致，
+    总复杂度为 O(行数 + 使用次数)。
+    """
+    return list(_iter_serpent_states(row_times, serpent_uses, 0, max_count, max_count, regen_interval))
+
+
+def extend_serpent_states(states: list, row_times: List[float], serpent_uses: List[Tuple[float, str]],
+                          max_count: int = 3, regen_interval: float = 30.0):
+    """row_times 末尾追加了新行（时间不早于已有行）后，原地补算新行的状态"""
+    start_index = len(states)
+    initial_count = states[start_index - 1][0] if start_index > 0 else max_count
+    states.extend(_iter_serpent_states(row_times, serpent_uses, start_index, initial_count, max_count, regen_interval))
+
+
+def resweep_serpent_states(states: list, row_times: List[float], serpent_uses: List[Tuple[float, str]],
+                           dirty_time: float, settle_time: float,
+                           max_count: int = 3, regen_interval: float = 30.0) -> List[int]:
+    """使用记录变化后只重新计算受影响的行，原地更新 states 并返回状态变化的行号
+
+    dirty_time 为变化的使用记录中最早的时间，settle_time 为变化的事件
+    （使用及其回复）中最晚的时间。早于 dirty_time 的行蛇胆数量不变，只可能改变
+    下一个回复信息；从 dirty_time 开始向后扫描，越过 settle_time 后一旦某行状态与
+    原来一致，之后的事件序列完全相同，扫描即可停止。
+    """
+    changed = []
+    use_times = [use_time for use_time, _ in serpent_uses]
+    first_changed_use = bisect.bisect_left(use_times, dirty_time)
+    dirty_row = bisect.bisect_left(row_times, dirty_time)
+
+    # 早于 dirty_time 的行：所有更早使用都已回复的行，下一个回复变为 first_changed_use
+    if first_changed_use > 0:
+        block_start = bisect.bisect_left(row_times, use_times[first_changed_use - 1] + regen_interval)
+    else:
+        block_start = 0
+    for row_index in range(block_start, dirty_row):
+        row_time = row_times[row_index]
+        if first_changed_use < len(serpent_uses):
+            use_time, skill_name = serpent_uses[first_changed_use]
+            progress = max(0.0, min(1.0, (row_time - use_time) / regen_interval))
+            new_state = (states[row_index][0], skill_name, progress, use_time + regen_interval - row_time)
+        else:
+            new_state = (states[row_index][0], None, 0.0, 0.0)
+        if new_state != states[row_index]:
+            states[row_index] = new_state
+            changed.append(row_index)
+
+    # 从 dirty_time 开始向后扫描直到状态收敛
+    initial_count = states[dirty_row - 1][0] if dirty_row > 0 else max_count
+    new_states = _iter_serpent_states(row_times, serpent_uses, dirty_row, initial_count, max_count, regen_interval)
+    for row_index, new_state in enumerate(new_states, dirty_row):
+        if new_state == states[row_index]:
+            if row_times[row_index] >= settle_time:
+                break
+            continue
+        states[row_index] = new_state
+        changed.append(row_index)
+
+    return changed
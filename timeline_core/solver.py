@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""蛇胆使用计划求解：在充能规则下放入尽可能多的高优先级使用"""
+
+import heapq
+from typing import Iterable, List, Optional, Tuple
+
+_NEGATIVE_INFINITY = float("-inf")
+
+
+class DesiredUse:
+    """一次希望的使用：所在行、优先级和允许的偏移范围"""
+    __slots__ = ("row", "time", "name", "priority", "earliest", "latest", "required")
+
+    def __init__(self, row: int, time_val: float, name: str, priority: float = 1.0,
+                 min_offset: float = 0.0, max_offset: float = 0.0, required: bool = False):
+        self.row = row
+        self.time = time_val
+        self.name = name
+        self.priority = priority
+        self.earliest = max(0.0, time_val + min_offset)
+        self.latest = max(0.0, time_val + max_offset)
+        self.required = required
+
+    def __repr__(self):
+        return f"DesiredUse(row={self.row}, time={self.time!r}, name={self.name!r}, priority={self.priority!r})"
+
+
+class SolvedPlan:
+    """求解结果：放入的使用 (行号, 使用时间, 技能名称)、总优先级和未能放入的使用"""
+    __slots__ = ("uses", "value", "dropped", "exact")
+
+    def __init__(self, uses: List[Tuple[int, float, str]], value: float, dropped: List[DesiredUse], exact: bool):
+        self.uses = uses
+        self.value = value
+        self.dropped = dropped
+        self.exact = exact  # 状态数未超过上限时结果为最优
+
+    def __repr__(self):
+        return f"SolvedPlan(uses={len(self.uses)}, value={self.value!r}, dropped={len(self.dropped)})"
+
+
+def _dominates(first: tuple, second: tuple) -> bool:
+    """first 的每个冷却中使用都不晚于 second（对齐到最近的一端比较）"""
+    return all(a <= b for a, b in zip(first, second))
+
+
+def _prune(states: dict, max_count: int, max_states: int) -> Tuple[dict, bool]:
+    """去掉被支配的状态：总优先级不高且冷却中的使用都不更早的状态不可能更优"""
+    ordered = sorted(states.items(), key=lambda item: (-item[1][0], item[0]))
+    kept = []
+    for active, payload in ordered:
+        padded = (_NEGATIVE_INFINITY,) * (max_count - len(active)) + active
+        if any(_dominates(other, padded) for other, _ in kept):
+            continue
+        kept.append((padded, (active, payload)))
+        if len(kept) >= max_states:
+            return {active: payload for _, (active, payload) in kept}, False
+    return {active: payload for _, (active, payload) in kept}, True
+
+
+def _solve_in_order(items: List[DesiredUse], max_count: int, regen_interval: float,
+                    max_states: int) -> Tuple[dict, float, bool]:
+    """按 items 的顺序依次选择放入或跳过，使用时间也按这个顺序，返回 ({条目下标: 使用时间}, 总优先级, 是否最优)"""
+    # 冷却中的使用时间（升序） -> (总优先级, 选择链表)
+    states = {(): (0.0, None)}
+    exact = True
+
+    for item_index, item in enumerate(items):
+        next_states = {}
+
+        def offer(active, value, chain):
+            current = next_states.get(active)
+            if current is None or value > current[0]:
+                next_states[active] = (value, chain)
+
+        for active, (value, chain) in states.items():
+            # 已经回复的使用不再约束本次及之后的使用
+            expire_before = item.earliest - regen_interval
+            if active and active[0] <= expire_before:
+                active = tuple(use_time for use_time in active if use_time > expire_before)
+
+            if not item.required:
+                offer(active, value, chain)
+
+            use_time = item.earliest
+            if active:
+                use_time = max(use_time, active[-1])
+            if len(active) >= max_count:
+                use_time = max(use_time, active[0] + regen_interval)
+            if use_time > item.latest:
+                continue
+
+            new_active = active + (use_time,)
+            if len(new_active) > max_count:
+                new_active = new_active[1:]
+            offer(new_active, value + item.priority, (item_index, use_time, chain))
+
+        if not next_states:
+            # 必须放入的使用无法满足时跳过它，保证仍能给出可行计划
+            for active, (value, chain) in states.items():
+                offer(active, value, chain)
+
+        states, state_exact = _prune(next_states, max_count, max_states)
+        exact = exact and state_exact
+
+    value, chain = max(states.values(), key=lambda payload: payload[0])
+    return _chosen(chain), value, exact
+
+
+def _solve_any_order(items: List[DesiredUse], max_count: int, regen_interval: float,
+                     max_states: int) -> Tuple[dict, tuple, bool]:
+    """按使用时间顺序逐次选择下一次使用的条目，枚举所有顺序
+
+    状态为 (上一次使用时间, 冷却中的使用时间, 截止时间未过的已放入条目)：之后的使用都
+    不早于上一次使用，截止时间已过的条目不会再被放入，不必记录。按 (时间, 已放入条目数)
+    的顺序展开，每个状态展开时它的所有前驱都已展开。返回
+    ({条目下标: 使用时间}, (放入的必须使用数, 总优先级), 是否最优)。
+    """
+    start = (_NEGATIVE_INFINITY, (), frozenset())
+    best = {start: ((0, 0.0), None)}
+    heap = [(_NEGATIVE_INFINITY, 0, 0, start)]
+    best_value, best_chain = (0, 0.0), None
+    counter = 1
+    expanded = 0
+    while heap:
+        _, _, _, key = heapq.heappop(heap)
+        last_time, active, placed = key
+        value, chain = best[key]
+        if value > best_value:
+            best_value, best_chain = value, chain
+        expanded += 1
+        if expanded > max_states:
+            return _chosen(best_chain), best_value, False
+
+        for item_index, item in enumerate(items):
+            if item_index in placed or item.latest < last_time:
+                continue
+            use_time = max(item.earliest, last_time)
+            if len(active) >= max_count:
+                use_time = max(use_time, active[0] + regen_interval)
+            if use_time > item.latest:
+                continue
+            # 满 max_count 次时最早的一次在 use_time 前已经回复，会在这里一起去掉
+            new_active = tuple(old for old in active if old + regen_interval > use_time) + (use_time,)
+            new_placed = frozenset([item_index]).union(
+                index for index in placed if items[index].latest >= use_time)
+            new_value = (value[0] + item.required, value[1] + item.priority)
+            new_key = (use_time, new_active, new_placed)
+            current = best.get(new_key)
+            if current is None:
+                heapq.heappush(heap, (use_time, len(new_placed), counter, new_key))
+                counter += 1
+            elif new_value <= current[0]:
+                continue
+            best[new_key] = (new_value, (item_index, use_time, chain))
+    return _chosen(best_chain), best_value, True
+
+
+def _chosen(chain) -> dict:
+    """选择链表 -> {条目下标: 使用时间}"""
+    chosen = {}
+    while chain is not None:
+        item_index, use_time, chain = chain
+        chosen[item_index] = use_time
+    return chosen
+
+
+def solve_serpent_plan(desired: Iterable[DesiredUse], max_count: int = 3, regen_interval: float = 30.0,
+                       max_states: int = 4096) -> SolvedPlan:
+    """求解使用计划
+
+    按 (最早可用时间, 最晚可用时间) 依次处理每个希望的使用，选择放入或跳过。放入时
+    取最早可行时间：不早于允许范围起点、不早于上一次放入的使用，并且在已有 max_count
+    次冷却中的使用时等到最早的一次回复。状态只需记录仍在冷却中的使用时间（最多
+    max_count 个）；对相同状态保留总优先级最高的方案，并剪掉被支配的状态。
+
+    各条目的允许范围按这个顺序排列时最晚时间也不减小（例如偏移范围都相同）时，交换
+    任意两次使用的条目都不会违反范围，存在使用顺序与处理顺序一致的最优方案，状态数
+    不超过 max_states 时结果为最优。否则范围有嵌套，最优方案可能先使用范围较晚开始
+    的条目，这时再按使用时间顺序枚举所有使用顺序（见 _solve_any_order），展开的状态
+    数不超过 max_states 时结果为最优，超过时取两种方法中较好的结果。
+    """
+    items = sorted(desired, key=lambda item: (item.earliest, item.latest, item.row))
+    chosen, value, exact = _solve_in_order(items, max_count, regen_interval, max_states)
+
+    if any(first.latest > second.latest for first, second in zip(items, items[1:])):
+        any_chosen, any_value, exact = _solve_any_order(items, max_count, regen_interval, max_states)
+        in_order_required = sum(items[index].required for index in chosen)
+        if any_value > (in_order_required, value) or exact:
+            chosen, value = any_chosen, any_value[1]
+
+    uses = [(items[index].row, use_time, items[index].name)
+            for index, use_time in sorted(chosen.items(), key=lambda item: (item[1], item[0]))]
+    dropped = [item for index, item in enumerate(items) if index not in chosen]
+    return SolvedPlan(uses, value, dropped, exact)
+
+
+def desired_uses_from_rows(rows: List[Tuple[float, str]], priorities: dict, min_offset: float = 0.0,
+                           max_offset: float = 0.0, required_rows: Optional[Iterable[int]] = None) -> List[DesiredUse]:
+    """根据 {行号: 优先级} 生成希望的使用列表"""
+    required_rows = set(required_rows or ())
+    return [
+        DesiredUse(row, rows[row][0], rows[row][1], priority, min_offset, max_offset, row in required_rows)
+        for row, priority in sorted(priorities.items())
+        if priority > 0 or row in required_rows
+    ]
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""按 ACT 网络日志同步回放时钟
+
+时间轴条目上的同步指令（``Ability {"id":"A74F","source":"剑嚎"} window 10,10``、
+``InCombat``、``StartsUsing``、``jump`` 等）只在同步窗口内生效。LogSyncEngine
+只把窗口覆盖当前战斗时间的条目放进索引（按 同步类型 -> 参数 -> 取值 分桶），
+每行日志先按行类型过滤，再用一次字典查找取出候选条目，因此每秒数千行日志的
+处理开销很小。匹配后把战斗时钟同步到条目时间，或按 jump 跳转。
+
+LogTailer 以增量读取的方式跟踪不断增长的日志文件。
+"""
+
+import os
+import re
+import heapq
+import bisect
+from typing import List, Optional
+
+from .parser import ParsedTimeline, TimelineEntry
+from .playback import FightClock
+
+
+# 同步类型 -> (网络日志行类型, {参数名: 字段下标})，字段下标按 ``|`` 分隔计数
+LOG_LINE_FIELDS = {
+    "GameLog": (("00",), {"code": 2, "name": 3, "line": 4}),
+    "ChangeZone": (("01",), {"id": 2, "name": 3}),
+    "AddedCombatant": (("03",), {"id": 2, "name": 3, "job": 4, "level": 5, "ownerId": 6, "worldId": 7,
+                                 "world": 8, "npcNameId": 9, "npcBaseId": 10}),
+    "RemovedCombatant": (("04",), {"id": 2, "name": 3}),
+    "StartsUsing": (("20",), {"sourceId": 2, "source": 3, "id": 4, "ability": 5, "targetId": 6, "target": 7,
+                              "castTime": 8}),
+    "Ability": (("21", "22"), {"sourceId": 2, "source": 3, "id": 4, "ability": 5, "targetId": 6, "target": 7}),
+    "NetworkCancelAbility": (("23",), {"sourceId": 2, "source": 3, "id": 4, "name": 5, "reason": 6}),
+    "WasDefeated": (("25",), {"targetId": 2, "target": 3, "sourceId": 4, "source": 5}),
+    "GainsEffect": (("26",), {"effectId": 2, "effect": 3, "duration": 4, "sourceId": 5, "source": 6,
+                              "targetId": 7, "target": 8, "count": 9}),
+    "HeadMarker": (("27",), {"targetId": 2, "target": 3, "id": 6}),
+    "LosesEffect": (("30",), {"effectId": 2, "effect": 3, "duration": 4, "sourceId": 5, "source": 6,
+                              "targetId": 7, "target": 8, "count": 9}),
+    "ActorControl": (("33",), {"instance": 2, "command": 3, "data0": 4, "data1": 5, "data2": 6, "data3": 7}),
+    "NameToggle": (("34",), {"id": 2, "name": 3, "targetId": 4, "targetName": 5, "toggle": 6}),
+    "Tether": (("35",), {"sourceId": 2, "source": 3, "targetId": 4, "target": 5, "id": 8}),
+    "MapEffect": (("257",), {"instance": 2, "flags": 3, "location": 4}),
+    "InCombat": (("260",), {"inACTCombat": 2, "inGameCombat": 3, "isACTChanged": 4, "isGameChanged": 5}),
+    "StartsUsingExtra": (("263",), {"sourceId": 2, "id": 3}),
+    "AbilityExtra": (("264",), {"sourceId": 2, "id": 3}),
+    "NpcYell": (("266",), {"npcId": 2, "npcNameId": 3, "npcYellId": 4}),
+    "BattleTalk2": (("267",), {"npcId": 2, "instance": 3, "npcNameId": 4, "instanceContentTextId": 5,
+                               "displayMs": 6}),
+    "ActorControlExtra": (("273",), {"id": 2, "category": 3, "param1": 4, "param2": 5, "param3": 6,
+                                     "param4": 7}),
+}
+
+DEFAULT_SYNC_WINDOW = (2.5, 2.5)  # 未指定 window 时的同步窗口（与 cactbot 相同）
+
+_REGEX_CHARS = re.compile(r'[.*+?\[\](){}|\\^$]')
+
+
+class _SyncCondition:
+    """一个参数的匹配条件：字面值集合或正则表达式"""
+    __slots__ = ("field", "literals", "patterns")
+
+    def __init__(self, field: int, values: list):
+        self.field = field
+        self.literals = set()
+        self.patterns = []
+        for value in values:
+            if _REGEX_CHARS.search(value):
+                self.patterns.append(re.compile(value, re.IGNORECASE))
+            else:
+                self.literals.add(value.upper())
+
+    def matches(self, fields: list) -> bool:
+        if self.field >= len(fields):
+            return False
+        value = fields[self.field]
+        if value.upper() in self.literals:
+            return True
+        return any(pattern.fullmatch(value) for pattern in self.patterns)
+
+
+class SyncPoint:
+    """一条可同步的时间轴条目"""
+    __slots__ = ("entry", "sync_type", "conditions", "key", "start", "end")
+
+    def __init__(self, entry: TimelineEntry, conditions: list, key: Optional[tuple]):
+        window = entry.window or DEFAULT_SYNC_WINDOW
+        self.entry = entry
+        self.sync_type = entry.sync_type
+        self.conditions = conditions  # 全部 _SyncCondition
+        self.key = key  # 索引键 (参数名, 字段下标, 字面值集合)，没有可用的字面值参数时为 None
+        self.start = entry.time - window[0]  # 同步窗口开始
+        self.end = entry.time + window[1]  # 同步窗口结束
+
+    def __repr__(self):
+        return f"SyncPoint({self.entry!r}, window=({self.start}, {self.end}))"
+
+
+class SyncMatch:
+    """一次成功的同步：匹配的条目、同步前后的战斗时间和日志行"""
+    __slots__ = ("entry", "old_time", "new_time", "line")
+
+    def __init__(self, entry: TimelineEntry, old_time: float, new_time: float, line: str):
+        self.entry = entry
+        self.old_time = old_time
+        self.new_time = new_time
+        self.line = line
+
+    def __repr__(self):
+        return f"SyncMatch({self.entry.name!r}, {self.old_time:.1f} -> {self.new_time:.1f})"
+
+
+def build_sync_points(parsed: ParsedTimeline) -> tuple:
+    """把带同步指令的条目转换为 SyncPoint，返回 (按窗口开始排序的列表, 无法使用的条目数)"""
+    points = []
+    unsupported = 0
+    for entry in parsed.entries:
+        if entry.sync_type is None:
+            continue
+        definition = LOG_LINE_FIELDS.get(entry.sync_type)
+        try:
+            params = entry.sync_params()
+        except ValueError:
+            params = None
+        if definition is None or not isinstance(params, dict):
+            unsupported += 1
+            continue
+
+        field_map = definition[1]
+        conditions = []
+        key = None
+        for name, value in params.items():
+            values = value if isinstance(value, list) else [value]
+            if name not in field_map or not all(isinstance(item, str) for item in values):
+                conditions = None
+                break
+            condition = _SyncCondition(field_map[name], values)
+            conditions.append(condition)
+            if key is None and not condition.patterns:
+                key = (name, condition.field, frozenset(condition.literals))
+        if conditions is None:
+            unsupported += 1
+            continue
+        points.append(SyncPoint(entry, conditions, key))
+
+    points.sort(key=lambda point: point.start)
+    return points, unsupported
+
+
+class LogSyncEngine:
+    """按日志行同步战斗时钟，只索引同步窗口覆盖当前时间的条目"""
+
+    def __init__(self, parsed: ParsedTimeline, clock: FightClock):
+        self.clock = clock
+        self.points, self.unsupported = build_sync_points(parsed)
+        self.starts = [point.start for point in self.points]
+        self.labels = {label.name: label.time for label in parsed.labels}
+        self.line_types = {}  # 网络日志行类型 -> 同步类型
+        for sync_type, (codes, _) in LOG_LINE_FIELDS.items():
+            for code in codes:
+                self.line_types[code] = sync_type
+
+        self.keyed = {}  # 同步类型 -> {字段下标: {字面值: [SyncPoint]}}
+        self.unkeyed = {}  # 同步类型 -> [SyncPoint]（只有正则条件的条目）
+        self.active_counts = {}  # 同步类型 -> 活动条目数
+        self.expiry = []  # (窗口结束, 序号, SyncPoint)
+        self.next_point = 0  # 下一个尚未进入窗口的条目
+        self.indexed_time = None  # 索引对应的战斗时间
+        self.lines_seen = 0
+        self.matches = 0
+        self.reset(clock.now())
+
+    def _add(self, point: SyncPoint, sequence: int):
+        sync_type = point.sync_type
+        if point.key is None:
+            self.unkeyed.setdefault(sync_type, []).append(point)
+        else:
+            _, field, literals = point.key
+            buckets = self.keyed.setdefault(sync_type, {}).setdefault(field, {})
+            for literal in literals:
+                buckets.setdefault(literal, []).append(point)
+        self.active_counts[sync_type] = self.active_counts.get(sync_type, 0) + 1
+        heapq.heappush(self.expiry, (point.end, sequence, point))
+
+    def _remove(self, point: SyncPoint):
+        sync_type = point.sync_type
+        if point.key is None:
+            self.unkeyed[sync_type].remove(point)
+        else:
+            _, field, literals = point.key
+            buckets = self.keyed[sync_type][field]
+            for literal in literals:
+                bucket = buckets[literal]
+                bucket.remove(point)
+                if not bucket:
+                    del buckets[literal]
+        self.active_counts[sync_type] -= 1
+        if not self.active_counts[sync_type]:
+            del self.active_counts[sync_type]
+
+    def reset(self, fight_time: float):
+        """重建活动索引（跳转或同步后调用）"""
+        self.keyed = {}
+        self.unkeyed = {}
+        self.active_counts = {}
+        self.expiry = []
+        self.next_point = bisect.bisect_right(self.starts, fight_time)
+        for sequence in range(self.next_point):
+            point = self.points[sequence]
+            if point.end >= fight_time:
+                self._add(point, sequence)
+        self.indexed_time = fight_time
+
+    def advance(self, fight_time: float):
+        """战斗时间前进：窗口开始的条目加入索引，窗口结束的条目移出"""
+        if self.indexed_time is not None and fight_time < self.indexed_time:
+            self.reset(fight_time)
+            return
+        points = self.points
+        while self.next_point < len(points) and points[self.next_point].start <= fight_time:
+            point = points[self.next_point]
+            if point.end >= fight_time:
+                self._add(point, self.next_point)
+            self.next_point += 1
+        expiry = self.expiry
+        while expiry and expiry[0][0] < fight_time:
+            self._remove(heapq.heappop(expiry)[2])
+        self.indexed_time = fight_time
+
+    def active_points(self) -> List[SyncPoint]:
+        """当前处于同步窗口内的条目"""
+        return sorted((item[2] for item in self.expiry), key=lambda point: point.entry.time)
+
+    def match_line(self, line: str) -> Optional[SyncPoint]:
+        """在活动条目中查找与日志行匹配的条目（多个时取时间最早的）"""
+        separator = line.find("|")
+        if separator <= 0:
+            return None
+        sync_type = self.line_types.get(line[:separator])
+        if sync_type is None or sync_type not in self.active_counts:
+            return None
+
+        fields = line.split("|")
+        best = None
+        for field, buckets in self.keyed.get(sync_type, {}).items():
+            if field >= len(fields):
+                continue
+            for point in buckets.get(fields[field].upper(), ()):
+                if (best is None or point.entry.time < best.entry.time) and \
+                        all(condition.matches(fields) for condition in point.conditions):
+                    best = point
+        for point in self.unkeyed.get(sync_type, ()):
+            if (best is None or point.entry.time < best.entry.time) and \
+                    all(condition.matches(fields) for condition in point.conditions):
+                best = point
+        return best
+
+    def feed_lines(self, lines) -> List[SyncMatch]:
+        """处理一批日志行，返回其中触发的同步"""
+        clock = self.clock
+        self.advance(clock.now())
+        synced = []
+        for line in lines:
+            self.lines_seen += 1
+            point = self.match_line(line)
+            if point is None:
+                continue
+            synced.append(self.apply(point, line))
+            self.advance(clock.now())
+        return synced
+
+    def apply(self, point: SyncPoint, line: str) -> SyncMatch:
+        """把战斗时钟同步到条目时间，有 jump 时跳转；jump 0 表示战斗重置"""
+        clock = self.clock
+        entry = point.entry
+        old_time = clock.now()
+        new_time = entry.time
+        jump = entry.jump
+        if isinstance(jump, str):
+            jump = self.labels.get(jump)
+        if jump is not None:
+            new_time = jump
+
+        clock.seek(new_time)
+        if entry.jump == 0:
+            clock.pause()
+        else:
+            clock.play()
+        self.matches += 1
+        self.reset(clock.now())
+        return SyncMatch(entry, old_time, new_time, line)
+
+
+class LogTailer:
+    """增量读取不断增长的日志文件，只返回完整的行"""
+
+    def __init__(self, file_path: str, from_end: bool = True, max_read: int = 4 << 20):
+        self.file_path = file_path
+        self.max_read = max_read  # 每次最多读取的字节数
+        self.file = open(file_path, "rb")
+        self.offset = os.fstat(self.file.fileno()).st_size if from_end else 0
+        self.partial = b""  # 末尾尚未写完的半行
+
+    def read_lines(self) -> List[str]:
+        """读取自上次以来新写入的完整行（文件被截断或替换时从头开始）"""
+        try:
+            size = os.stat(self.file_path).st_size
+        except OSError:
+            return []
+        if size < self.offset:
+            self.file.close()
+            self.file = open(self.file_path, "rb")
+            self.offset = 0
+            self.partial = b""
+        if size == self.offset:
+            return []
+
+        self.file.seek(self.offset)
+        data = self.file.read(min(size - self.offset, self.max_read))
+        self.offset += len(data)
+        data = self.partial + data
+        end = data.rfind(b"\n")
+        if end < 0:
+            self.partial = data
+            return []
+        self.partial = data[end + 1:]
+        return data[:end].decode("utf-8", errors="replace").splitlines()
+
+    def close(self):
+        self.file.close()
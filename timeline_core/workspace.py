@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""同时打开的多个时间轴：每个标签页一个 TimelineDocument，按最近使用淘汰
+
+每个文档分为三部分：
+- 计划（行、使用计划和历史、分支选择）始终保留，切换回来时不会丢失修改；
+- 完整的解析模型（条目、分支图、搜索索引和文件各行）受内存预算限制，
+  超出预算时从最久未使用的文档开始丢弃，切换回来时从解析缓存重新读取；
+- 视图（画布和行槽控件）由界面创建，受数量限制，超出时销毁最久未使用的视图。
+"""
+
+import sys
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from .columns import TimelineRows
+
+_ENTRY_INDEX_BYTES = 1400  # 每个条目的分支图和搜索索引的大约占用（实测 RAID 时间轴约 1.0～1.8 KB）
+
+
+class TimelineDocument:
+    """一个打开的时间轴（标签页）"""
+    __slots__ = ("path", "plan", "history", "rows", "branch_choices", "digest",
+                 "parsed", "graph", "skill_index", "lines", "watcher", "path_indices",
+                 "display_rows", "search_query", "categories", "found_row", "scroll", "view", "model_bytes")
+
+    def __init__(self, path: str, plan, history):
+        self.path = path
+        # 计划部分：始终保留
+        self.plan = plan  # SerpentPlan
+        self.history = history  # PlanHistory
+        self.rows = TimelineRows()  # 当前路径上的 (时间, 技能名称)
+        self.branch_choices = {}  # 跳转来源条目下标 -> 触发次数
+        self.digest = None  # 时间轴内容的 SHA-1
+        # 完整模型：超出内存预算时丢弃
+        self.parsed = None
+        self.graph = None
+        self.skill_index = None
+        self.lines = None  # 文件各行（热重载时比较）
+        self.watcher = None
+        self.path_indices = []  # 当前路径上每行对应的条目下标
+        self.model_bytes = 0  # 完整模型的估计占用
+        # 显示状态
+        self.display_rows = None  # 筛选后显示的行号
+        self.search_query = ""
+        self.categories = ()  # 勾选的分类
+        self.found_row = None
+        self.scroll = 0.0  # 画布滚动位置（yview 的起点）
+        self.view = None  # 界面的视图（画布和行槽），为 None 时切换回来需要重新创建
+
+    def __repr__(self):
+        state = "model" if self.has_model() else "compact"
+        return f"TimelineDocument({self.path!r}, {len(self.rows)} rows, {state})"
+
+    def has_model(self) -> bool:
+        return self.graph is not None
+
+    def set_model(self, parsed, graph, skill_index, lines, watcher):
+        """设置完整模型并估计其占用"""
+        self.parsed = parsed
+        self.graph = graph
+        self.skill_index = skill_index
+        self.lines = lines
+        self.watcher = watcher
+        self.model_bytes = estimate_model_bytes(parsed, lines)
+
+    def compact(self):
+        """丢弃完整模型，只保留行和计划（筛选结果依赖搜索索引，一并丢弃）"""
+        self.parsed = None
+        self.graph = None
+        self.skill_index = None
+        self.lines = None
+        self.watcher = None
+        self.path_indices = []
+        self.display_rows = None
+        self.model_bytes = 0
+
+
+def estimate_model_bytes(parsed, lines) -> int:
+    """完整模型的大约占用：条目各列、文件各行的字符串，加上分支图和搜索索引的每条目开销"""
+    total = parsed.entries.nbytes() + len(parsed.entries) * _ENTRY_INDEX_BYTES if parsed is not None else 0
+    if lines:
+        total += sum(sys.getsizeof(line) for line in lines) + 8 * len(lines)
+    return total
+
+
+class DocumentLRU:
+    """按最近使用排序的文档集合
+
+    memory_budget 限制所有完整模型的估计占用之和，max_views 限制同时保留的视图数，
+    当前文档总是保留。
+    """
+
+    def __init__(self, memory_budget: int = 32 * 1024 * 1024, max_views: int = 3):
+        self.memory_budget = memory_budget  # 完整模型的内存预算（字节）
+        self.max_views = max_views  # 保留视图的标签页数
+        self.documents = OrderedDict()  # 路径 -> TimelineDocument，最近使用的在最后
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __iter__(self):
+        return iter(self.documents.values())
+
+    def get(self, path: str) -> Optional[TimelineDocument]:
+        return self.documents.get(path)
+
+    def add(self, document: TimelineDocument):
+        self.documents[document.path] = document
+        self.documents.move_to_end(document.path)
+
+    def touch(self, document: TimelineDocument):
+        """标记为最近使用"""
+        self.documents.move_to_end(document.path)
+
+    def remove(self, document: TimelineDocument):
+        self.documents.pop(document.path, None)
+
+    def most_recent(self, exclude: Optional[TimelineDocument] = None) -> Optional[TimelineDocument]:
+        for document in reversed(self.documents.values()):
+            if document is not exclude:
+                return document
+        return None
+
+    def model_bytes(self) -> int:
+        return sum(document.model_bytes for document in self.documents.values())
+
+    def trim(self, active: Optional[TimelineDocument]) -> Tuple[List[TimelineDocument], List[TimelineDocument]]:
+        """按预算淘汰：返回 (丢弃了完整模型的文档, 需要由界面销毁视图的文档)
+
+        完整模型在这里直接丢弃；视图属于界面，只返回需要销毁的文档。
+        """
+        compacted = []
+        total = self.model_bytes()
+        for document in self.documents.values():
+            if total <= self.memory_budget:
+                break
+            if document is active or not document.has_model():
+                continue
+            total -= document.model_bytes
+            document.compact()
+            compacted.append(document)
+
+        with_views = [document for document in self.documents.values()
+                      if document.view is not None and document is not active]
+        keep = max(self.max_views - (1 if active is not None and active.view is not None else 0), 0)
+        dropped_views = with_views[:max(len(with_views) - keep, 0)]
+        return compacted, dropped_views
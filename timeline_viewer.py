@@ -1,9 +1,29 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext
-import re
+from tkinter import filedialog, messagebox, simpledialog
+import os
+import math
 import time
+import bisect
+import queue
+import sys
 import threading
-from typing import List, Tuple
+import multiprocessing
+
+from timeline_core.cache import TimelineCache
+from timeline_core.columns import TimelineRows
+from timeline_core.graph import TimelineGraph
+from timeline_core.history import PlanHistory
+from timeline_core.library import LibraryIndex
+from timeline_core.plan import SerpentPlan
+from timeline_core.planfile import PlanAutosaver, PlanStore
+from timeline_core.playback import EventCursor, FightClock
+from timeline_core.profiling import profiler
+from timeline_core.reload import FileWatcher, match_rows, read_timeline_lines, reparse_timeline
+from timeline_core.resources import DEFAULT_RESOURCES, SERPENT_ACTION, load_resource_definitions, simulate_resources
+from timeline_core.search import CATEGORY_NAMES, SkillIndex
+from timeline_core.sync import LogSyncEngine, LogTailer
+from timeline_core.workspace import DocumentLRU, TimelineDocument
+
 
 class TimelineViewer:
     def __init__(self):
@@ -12,19 +32,106 @@ class TimelineViewer:
         self.root.geometry("1200x650")
         self.root.configure(bg="#2b2b2b")
 
-        self.timeline_data = []
+        # 多个标签页：每个打开的时间轴是一个文档，完整模型和视图按最近使用淘汰，计划始终保留
+        # 所有标签页完整模型的内存预算（字节，当前标签页总是保留）和保留画布与行槽的标签页数
+        self.documents = DocumentLRU(memory_budget=32 * 1024 * 1024, max_views=3)
+        self.active_document = None  # 当前标签页（没有打开文件时为 None）
+        self.tab_order = []  # 标签栏中的显示顺序
+
+        self.timeline_data = TimelineRows()  # 当前路径上的 (时间, 技能名称)，按列保存
+        self.parsed_timeline = None  # 结构化解析结果（含同步参数、跳转、label 和逐行错误）
+        self.timeline_cache = TimelineCache()  # 解析结果的磁盘缓存
+        self.timeline_graph = None  # 按 jump / label 切分的分支图
+        self.branch_choices = {}  # 跳转来源条目下标 -> 触发次数
+        self.branch_vars = {}  # 分支菜单中的勾选状态
+        # 搜索与筛选：技能名称索引在解析后构建一次，筛选只改变显示哪些行，不重建行槽
+        self.skill_index = None  # 技能名称的 n-gram 倒排索引
+        self.timeline_path_indices = []  # 当前路径上每行对应的条目下标
+        self.display_rows = None  # 筛选后显示的行号（升序，None 表示全部显示）
+        # 全库搜索：RAID 目录下所有时间轴的持久化索引，在工作线程中增量更新
+        # 打包成单个可执行文件时 __file__ 指向解压出的临时目录，RAID 目录在可执行文件旁边
+        app_dir = os.path.dirname(sys.executable if getattr(sys, "frozen", False) else os.path.abspath(__file__))
+        self.library_dir = os.path.join(app_dir, "RAID")
+        self.library_index = None  # 更新完成前为 None
+        self.library_job = None  # 正在进行的索引更新（结果队列和轮询 after id）
+        self.library_window = None
+        self.library_widgets = None  # 搜索窗口的 (查询变量, 结果列表, 状态标签)
+        self.library_hits = []  # 搜索窗口列表中显示的条目
+        self.pending_library_jump = None  # 打开文件后要跳转到的条目 (文件, 行号, 时间)
+        self.found_row = None  # 全库搜索跳转到的行（高亮）
+
+        # 后台加载：工作线程解析文件并通过队列分批交给界面线程
+        self.load_job = None  # 当前加载任务（路径、队列、取消事件、总行数）
+        self.load_chunk_size = 2000  # 每批交给界面线程的行数
+        self.load_frame_budget = 0.016  # 每帧处理加载批次的时间上限（秒）
+        self.load_poll_interval = 16  # 检查加载队列的间隔（毫秒）
 
         # 蛇胆使用记录系统
-        self.serpent_uses = []  # 记录蛇胆使用的时间点，格式：[(使用时间, 技能名称)]
-        self.max_serpent_offerings = 3  # 最大蛇胆数量
-        self.serpent_regen_interval = 30.0  # 30秒回复一个蛇胆
-
-        self.serpent_displays = []  # 存储所有蛇胆显示组件的引用
+        self.serpent_resource = DEFAULT_RESOURCES[0]  # 蛇胆的资源定义（最大数量、回复间隔）
+        self.max_serpent_offerings = self.serpent_resource.max_charges  # 最大蛇胆数量
+        self.serpent_regen_interval = self.serpent_resource.regen_interval  # 每次使用后回复所需秒数
+        # 其他资源量谱：按资源定义文件声明，蛇胆使用记作 SERPENT_ACTION 动作，用 simulate_resources 一次计算所有行
+        self.resources_path = os.path.join(app_dir, "resources.json")  # 启动时自动读取的资源定义
+        self.gauge_resources = []  # 除蛇胆外要显示的资源定义
+        self.gauge_values = {}  # 资源名称 -> 逐行数量
+        self.gauge_key = None  # gauge_values 对应的 (行, 行数, 计划状态)，任一改变时重新模拟
+        # 蛇胆使用计划：使用记录索引、逐行偏移和逐行蛇胆状态
+        self.serpent_plan = SerpentPlan(max_count=self.max_serpent_offerings, regen_interval=self.serpent_regen_interval)
+        self.serpent_flush_pending = None
+        self.serpent_flush_scheduled = 0  # 空闲刷新的排队时间（用于统计 Tk 空闲回调延迟）
+        self.plan_history = PlanHistory()  # 撤销/重做历史和命名快照（共享结构的不可变计划状态）
+        self.restoring_plan = False  # 恢复历史状态时不记录新的历史
+        # 计划按时间轴文件保存：修改后由后台线程合并写入，加载时间轴时自动读取
+        self.plan_store = PlanStore()
+        self.plan_autosaver = PlanAutosaver(self.plan_store)
+        self.timeline_path = None  # 当前时间轴文件（加载完成前为 None，不自动保存）
+        self.timeline_digest = None  # 当前时间轴内容的 SHA-1，用于校验保存的计划
+        # 热重载：定时检查文件的 mtime 和大小，修改后只重新解析变化的行并按行迁移计划
+        self.timeline_lines = None  # 当前时间轴文件的各行（与修改后的文件比较）
+        self.file_watcher = None
+        self.reload_job = None  # 下一次检查文件的 after id
+        self.reload_poll_interval = 1000  # 检查文件修改的间隔（毫秒）
+        # 稳健性分析：在工作线程中模拟时间抖动，估计每次使用失败的概率
+        self.robustness_job = None  # 正在进行的分析（结果队列和轮询 after id）
+        self.robustness_trials = 20000
+        self.robustness_entry_jitter = "window:0.5"  # 条目在同步窗口一半范围内漂移（Jitter.parse 的格式）
+        self.robustness_input_delay = "exponential:0.15"  # 平均 0.15s 的按键延迟
+
+        # 回放模式：战斗时钟加上按时间合并的事件流（时间轴行、蛇胆使用和回复）
+        self.fight_clock = FightClock()
+        self.playback_cursor = EventCursor()
+        self.playback_job = None  # 下一次回放唤醒的 after id
+        self.playback_row = None  # 当前回放所在行
+        self.playback_speeds = ("0.5x", "1x", "2x", "4x")
+        self.log_sync = None  # 日志同步（同步引擎、日志跟踪器和下一次轮询的 after id）
+        self.log_sync_interval = 100  # 轮询日志文件的间隔（毫秒）
+
+        # 虚拟化时间轴显示：只为可见区域内的行创建画布项目，行槽随滚动复用
+        self.row_height = 57  # 每行占用的高度（含行间距）
+        self.header_height = 50  # 标题栏高度（含下边距）
+        self.row_overscan = 5  # 可见区域上下额外绑定的行数
+        self.name_column_x = 120  # 技能名称列起始位置
+        self.action_column_x = 460  # 操作/偏移列起始位置
+        self.min_canvas_width = 900  # 布局使用的最小画布宽度
+        self.row_slots = {}  # 行号 -> 行槽
+        self.free_slots = []  # 已回收可复用的行槽
+        self.slot_counter = 0
+        self.hover_row = None
+        self.timeline_displayed = False
+        self.layout_width = 0  # 当前行槽布局所用的画布宽度
 
         # 蛇胆显示相关
         self.serpent_history_label = None
 
+        # 性能统计浮层（F12 切换）
+        self.profiler_window = None
+        self.profiler_text = None
+        self.profiler_refresh_job = None
+        self.profiler_refresh_interval = 500  # 浮层刷新间隔（毫秒）
+
         self.setup_ui()
+        if os.path.exists(self.resources_path):
+            self.load_gauge_resources(self.resources_path)
 
     def setup_ui(self):
         # 顶部工具栏
@@ -54,6 +161,94 @@ class TimelineViewer:
         )
         self.file_label.pack(side=tk.LEFT, padx=20)
 
+        # 加载进度标签
+        self.load_progress_label = tk.Label(
+            toolbar,
+            text="",
+            bg="#404040",
+            fg="#FFD54F",
+            font=("黑体", 10)
+        )
+        self.load_progress_label.pack(side=tk.LEFT)
+
+        # 分支选择：勾选要触发的 jump，只显示实际路径上的行
+        self.branch_button = tk.Menubutton(
+            toolbar,
+            text="🔀 分支",
+            bg="#795548",
+            fg="white",
+            font=("黑体", 10, "bold"),
+            padx=10,
+            relief=tk.RAISED,
+            state=tk.DISABLED
+        )
+        self.branch_menu = tk.Menu(self.branch_button, tearoff=0)
+        self.branch_button.config(menu=self.branch_menu)
+        self.branch_button.pack(side=tk.RIGHT, padx=5)
+
+        # 全库搜索：在所有时间轴中查找技能名称、技能 ID 或来源，双击打开对应的战斗
+        library_btn = tk.Button(
+            toolbar,
+            text="📚 全库搜索",
+            command=self.open_library_search,
+            bg="#00796B",
+            fg="white",
+            font=("黑体", 10, "bold"),
+            padx=10
+        )
+        library_btn.pack(side=tk.RIGHT, padx=5)
+
+        # 日志同步按钮：跟踪 ACT 网络日志，按时间轴中的同步指令校正回放时钟
+        self.sync_button = tk.Button(
+            toolbar,
+            text="📡 日志同步",
+            command=self.toggle_log_sync,
+            bg="#607D8B",
+            fg="white",
+            font=("黑体", 10, "bold"),
+            padx=10
+        )
+        self.sync_button.pack(side=tk.RIGHT, padx=5)
+
+        # 计划快照：保存当前计划或恢复到已保存的快照
+        self.snapshot_button = tk.Menubutton(
+            toolbar,
+            text="📌 快照",
+            bg="#5C6BC0",
+            fg="white",
+            font=("黑体", 10, "bold"),
+            padx=10,
+            relief=tk.RAISED
+        )
+        self.snapshot_menu = tk.Menu(self.snapshot_button, tearoff=0)
+        self.snapshot_button.config(menu=self.snapshot_menu)
+        self.snapshot_button.pack(side=tk.RIGHT, padx=5)
+        self.rebuild_snapshot_menu()
+
+        # 撤销/重做按钮（Ctrl+Z / Ctrl+Y）
+        self.redo_button = tk.Button(
+            toolbar,
+            text="↷ 重做",
+            command=self.redo_plan,
+            bg="#555555",
+            fg="white",
+            font=("黑体", 10, "bold"),
+            padx=8,
+            state=tk.DISABLED
+        )
+        self.redo_button.pack(side=tk.RIGHT, padx=(0, 5))
+        self.undo_button = tk.Button(
+            toolbar,
+            text="↶ 撤销",
+            command=self.undo_plan,
+            bg="#555555",
+            fg="white",
+            font=("黑体", 10, "bold"),
+            padx=8,
+            state=tk.DISABLED
+        )
+        self.undo_button.pack(side=tk.RIGHT, padx=(5, 2))
+
         # 蛇胆控制面板
         control_frame = tk.Frame(self.root, bg="#333333", height=60)
         control_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
@@ -72,6 +267,108 @@ class TimelineViewer:
         )
         reset_btn.pack(side=tk.LEFT, padx=15, pady=15)
 
+        # 自动规划按钮：按行上标记的希望使用（★）求解蛇胆使用计划
+        plan_btn = tk.Button(
+            control_frame,
+            text="🧮 自动规划",
+            command=self.auto_plan_serpent,
+            bg="#3F51B5",
+            fg="white",
+            font=("黑体", 12, "bold"),
+            width=10,
+            height=1
+        )
+        plan_btn.pack(side=tk.LEFT, padx=(0, 5), pady=15)
+
+        # 稳健性分析按钮：估计时间抖动下每次使用失败的概率
+        robust_btn = tk.Button(
+            control_frame,
+            text="🎲 稳健性",
+            command=self.analyze_plan_robustness,
+            bg="#00796B",
+            fg="white",
+            font=("黑体", 12, "bold"),
+            width=8,
+            height=1
+        )
+        robust_btn.pack(side=tk.LEFT, padx=(0, 5), pady=15)
+
+        # 资源定义：读取 JSON 资源定义文件，在每行蛇胆量谱下方显示其他资源的数量
+        gauges_btn = tk.Button(
+            control_frame,
+            text="📊 资源",
+            command=self.choose_gauge_resources,
+            bg="#6D4C41",
+            fg="white",
+            font=("黑体", 12, "bold"),
+            width=8,
+            height=1
+        )
+        gauges_btn.pack(side=tk.LEFT, padx=(0, 5), pady=15)
+
+        # 自动规划允许的偏移范围
+        window_label = tk.Label(
+            control_frame,
+            text="允许偏移 ±",
+            bg="#333333",
+            fg="#FFD54F",
+            font=("黑体", 10)
+        )
+        window_label.pack(side=tk.LEFT, pady=15)
+
+        self.plan_window_var = tk.StringVar(value="0")
+        window_entry = tk.Entry(
+            control_frame,
+            textvariable=self.plan_window_var,
+            width=4,
+            font=("黑体", 10),
+            bg="#555555",
+            fg="white",
+            justify="center"
+        )
+        window_entry.pack(side=tk.LEFT, padx=(2, 0), pady=15)
+
+        # 回放控制：播放/暂停、速度和跳转
+        self.play_button = tk.Button(
+            control_frame,
+            text="▶ 播放",
+            command=self.toggle_playback,
+            bg="#009688",
+            fg="white",
+            font=("黑体", 12, "bold"),
+            width=8,
+            height=1
+        )
+        self.play_button.pack(side=tk.LEFT, padx=(15, 5), pady=15)
+
+        self.playback_speed_var = tk.StringVar(value="1x")
+        speed_menu = tk.OptionMenu(control_frame, self.playback_speed_var, *self.playback_speeds,
+                                   command=self.change_playback_speed)
+        speed_menu.config(bg="#555555", fg="white", font=("黑体", 10), highlightthickness=0)
+        speed_menu.pack(side=tk.LEFT, pady=15)
+
+        seek_label = tk.Label(
+            control_frame,
+            text="跳转",
+            bg="#333333",
+            fg="#FFD54F",
+            font=("黑体", 10)
+        )
+        seek_label.pack(side=tk.LEFT, padx=(5, 0), pady=15)
+
+        self.seek_var = tk.StringVar(value="0")
+        seek_entry = tk.Entry(
+            control_frame,
+            textvariable=self.seek_var,
+            width=5,
+            font=("黑体", 10),
+            bg="#555555",
+            fg="white",
+            justify="center"
+        )
+        seek_entry.pack(side=tk.LEFT, padx=(2, 0), pady=15)
+        seek_entry.bind("<Return>", lambda event: self.seek_playback_from_entry())
+
         # 蛇胆使用历史显示
         self.serpent_history_label = tk.Label(
             control_frame,
@@ -92,6 +389,48 @@ class TimelineViewer:
         )
         self.global_progress_label.pack(side=tk.RIGHT, padx=20, pady=15)
 
+        # 搜索与分类筛选
+        filter_frame = tk.Frame(self.root, bg="#333333")
+        filter_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+
+        tk.Label(filter_frame, text="🔍", bg="#333333", fg="white", font=("黑体", 11)).pack(side=tk.LEFT, padx=(10, 2), pady=5)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.apply_filter())
+        search_entry = tk.Entry(
+            filter_frame,
+            textvariable=self.search_var,
+            width=24,
+            font=("黑体", 10),
+            bg="#444444",
+            fg="white",
+            insertbackground="white"
+        )
+        search_entry.pack(side=tk.LEFT, padx=(0, 10), pady=5)
+
+        self.category_vars = {}  # 分类 -> 勾选状态
+        for category, label in CATEGORY_NAMES.items():
+            var = tk.BooleanVar(value=False)
+            self.category_vars[category] = var
+            tk.Checkbutton(
+                filter_frame,
+                text=label,
+                variable=var,
+                command=self.apply_filter,
+                bg="#333333",
+                fg="white",
+                selectcolor="#555555",
+                activebackground="#333333",
+                activeforeground="white",
+                font=("黑体", 10)
+            ).pack(side=tk.LEFT, padx=5, pady=5)
+
+        self.filter_count_label = tk.Label(filter_frame, text="", bg="#333333", fg="#B0BEC5", font=("黑体", 10))
+        self.filter_count_label.pack(side=tk.RIGHT, padx=10, pady=5)
+
+        # 标签栏：每个打开的时间轴一个标签
+        self.tab_frame = tk.Frame(self.root, bg="#2b2b2b")
+        self.tab_frame.pack(fill=tk.X, padx=5)
+
         # 主要内容区域
         main_frame = tk.Frame(self.root, bg="#2b2b2b")
         main_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -101,30 +440,279 @@ class TimelineViewer:
         self.timeline_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         # 滚动条
-        scrollbar = tk.Scrollbar(self.timeline_frame)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scrollbar = tk.Scrollbar(self.timeline_frame)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # 每个标签页有自己的画布，没有打开文件时显示欢迎视图
+        self.current_view = None
+        self.welcome_view = self.create_timeline_view()
+        self.use_view(self.welcome_view)
+
+        self.root.bind("<F12>", lambda event: self.toggle_profiler_overlay())
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.bind("<Control-z>", lambda event: self.undo_plan())
+        self.root.bind("<Control-y>", lambda event: self.redo_plan())
+        self.root.bind("<Control-Z>", lambda event: self.redo_plan())
+        self.root.bind("<Control-f>", lambda event: search_entry.focus_set())
+        self.root.bind("<Control-F>", lambda event: self.open_library_search())
 
-        # 创建Canvas用于滚动
-        self.canvas = tk.Canvas(
-            self.timeline_frame, 
+        # 初始提示
+        self.show_initial_message()
+
+    def create_timeline_view(self) -> dict:
+        """创建一个视图：滚动画布、放置提示的内部框架和行槽池（创建后不显示）"""
+        view = {"row_slots": {}, "free_slots": [], "layout_width": 0, "timeline_displayed": False, "hover_row": None}
+        canvas = tk.Canvas(
+            self.timeline_frame,
             bg="#363636",
-            yscrollcommand=scrollbar.set,
             highlightthickness=0
         )
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.config(command=self.canvas.yview)
+        # 只有当前视图的画布同步滚动条
+        canvas.configure(yscrollcommand=lambda first, last: self._on_canvas_yview(first, last)
+                         if canvas is self.canvas else None)
+        view["canvas"] = canvas
 
-        # 内部框架用于放置时间轴项目
-        self.inner_frame = tk.Frame(self.canvas, bg="#363636")
-        self.canvas_frame = self.canvas.create_window((0, 0), window=self.inner_frame, anchor="nw")
+        # 内部框架用于放置提示信息
+        view["inner_frame"] = tk.Frame(canvas, bg="#363636")
+        view["canvas_frame"] = canvas.create_window((0, 0), window=view["inner_frame"], anchor="nw")
 
         # 绑定鼠标滚轮事件
-        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
-        self.inner_frame.bind("<Configure>", self._on_frame_configure)
-        self.canvas.bind("<Configure>", self._on_canvas_configure)
+        canvas.bind("<MouseWheel>", self._on_mousewheel)
+        view["inner_frame"].bind("<Configure>", self._on_frame_configure)
+        canvas.bind("<Configure>", self._on_canvas_configure)
+        return view
+
+    def use_view(self, view: dict):
+        """显示视图：保存当前视图的行槽状态，换上新视图的画布"""
+        if view is self.current_view:
+            return
+        if self.current_view is not None:
+            self.stash_view()
+            self.canvas.pack_forget()
+        self.current_view = view
+        self.canvas = view["canvas"]
+        self.inner_frame = view["inner_frame"]
+        self.canvas_frame = view["canvas_frame"]
+        self.row_slots = view["row_slots"]
+        self.free_slots = view["free_slots"]
+        self.layout_width = view["layout_width"]
+        self.timeline_displayed = view["timeline_displayed"]
+        self.hover_row = view["hover_row"]
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.config(command=self.canvas.yview)
+
+    def stash_view(self):
+        """把当前视图的行槽状态写回视图（这些属性会被整体替换）"""
+        view = self.current_view
+        view["row_slots"] = self.row_slots
+        view["free_slots"] = self.free_slots
+        view["layout_width"] = self.layout_width
+        view["timeline_displayed"] = self.timeline_displayed
+        view["hover_row"] = self.hover_row
+
+    def destroy_view(self, document: TimelineDocument):
+        """销毁非当前标签页的视图（画布连同其中的行槽控件），保留文档的计划"""
+        view = document.view
+        document.view = None
+        if view is None or view is self.current_view:
+            return
+        view["canvas"].destroy()
+
+    def stash_document(self, document: TimelineDocument):
+        """把当前文档的状态写回文档对象"""
+        document.rows = self.timeline_data
+        document.plan = self.serpent_plan
+        document.history = self.plan_history
+        document.branch_choices = self.branch_choices
+        document.digest = self.timeline_digest
+        if self.timeline_graph is not None and self.timeline_graph is not document.graph:
+            document.set_model(self.parsed_timeline, self.timeline_graph, self.skill_index,
+                               self.timeline_lines, self.file_watcher)
+        document.path_indices = self.timeline_path_indices
+        document.display_rows = self.display_rows
+        document.search_query = self.search_var.get()
+        document.categories = tuple(category for category, var in self.category_vars.items() if var.get())
+        document.found_row = self.found_row
+        document.scroll = self.canvas.yview()[0]
+
+    def restore_document(self, document: TimelineDocument):
+        """把文档的状态设为当前状态"""
+        self.timeline_path = document.path
+        self.timeline_digest = document.digest
+        self.timeline_data = document.rows
+        self.serpent_plan = document.plan
+        self.plan_history = document.history
+        self.branch_choices = document.branch_choices
+        self.parsed_timeline = document.parsed
+        self.timeline_graph = document.graph
+        self.timeline_lines = document.lines
+        self.file_watcher = document.watcher
+        self.timeline_path_indices = document.path_indices
+        self.display_rows = document.display_rows
+        self.found_row = document.found_row
+        # 先恢复筛选条件再设置索引，避免搜索框的回调按旧索引筛选
+        self.skill_index = None
+        self.search_var.set(document.search_query)
+        for category, var in self.category_vars.items():
+            var.set(category in document.categories)
+        self.skill_index = document.skill_index
+
+    def rehydrate_document(self, document: TimelineDocument) -> bool:
+        """从解析缓存重新读取被丢弃的完整模型；文件在此期间被修改时按行迁移计划"""
+        with profiler.span("viewer.rehydrate_document"):
+            watcher = FileWatcher(document.path)
+            try:
+                lines, digest = read_timeline_lines(document.path)
+                parsed = self.timeline_cache.load(document.path)
+            except (OSError, UnicodeDecodeError, ValueError) as e:
+                self.update_status_message(f"⚠ 重新读取文件失败：{e}", "#FFA726")
+                return False
+            graph = TimelineGraph(parsed)
+            document.set_model(parsed, graph, SkillIndex(parsed.entries), lines, watcher)
+            if digest != document.digest:
+                document.branch_choices = {source: count for source, count in document.branch_choices.items()
+                                           if source in graph.jumps}
+            rows, document.path_indices = graph.path_rows(document.branch_choices)
+            if rows != document.rows:
+                row_map = match_rows(document.rows, rows)
+                plan = document.plan
+                document.history.remap(lambda state: plan.remap_state(state, rows, row_map))
+                plan.remap_rows(rows, row_map, document.history.current())
+                document.rows = rows
+                document.display_rows = None
+                self.destroy_view(document)
+            document.digest = digest
+        return True
+
+    def activate_document(self, document: TimelineDocument):
+        """切换到标签页：保存当前文档和视图，恢复目标文档（视图被销毁时重新创建）"""
+        if document is self.active_document:
+            return
+        with profiler.span("viewer.activate_document"):
+            self.cancel_loading()
+            self.stop_log_sync()
+            self.stop_playback()
+            # 自动保存只保留最新的一份请求，切换前先写入当前文档的计划
+            self.plan_autosaver.flush()
+            if self.active_document is not None:
+                self.stash_document(self.active_document)
+            if self.reload_job is not None:
+                self.root.after_cancel(self.reload_job)
+                self.reload_job = None
+
+            self.active_document = document
+            self.documents.touch(document)
+            if document.digest is not None and not document.has_model():
+                self.rehydrate_document(document)
+            self.restore_document(document)
+
+            new_view = document.view is None
+            if new_view:
+                document.view = self.create_timeline_view()
+            self.use_view(document.view)
+            if document.digest is not None:
+                if new_view:
+                    self.show_timeline_rows(document.scroll)
+                self.apply_filter()
+                if self.timeline_graph is not None:
+                    self.rebuild_branch_menu(self.timeline_path_indices)
+                else:
+                    self.branch_menu.delete(0, tk.END)
+                    self.branch_button.config(state=tk.DISABLED)
+                self.file_label.config(text=f"已加载: {os.path.basename(document.path)}")
+                self.reload_job = self.root.after(self.reload_poll_interval, self.poll_file_changes)
+            self.update_history_buttons()
+            self.rebuild_snapshot_menu()
+            self.update_serpent_history_display()
+            self.trim_documents()
+            self.rebuild_tab_bar()
+
+        if document.digest is None:
+            # 还没有加载完成（新打开或加载时切换走了）：重新加载
+            self.begin_loading(document)
+
+    def trim_documents(self):
+        """按内存预算丢弃非当前标签页的完整模型，按数量销毁多余的视图"""
+        _, dropped_views = self.documents.trim(self.active_document)
+        for document in dropped_views:
+            self.destroy_view(document)
+
+    def close_document(self, document: TimelineDocument):
+        """关闭标签页，切换到最近使用的另一个标签页"""
+        if document is self.active_document:
+            successor = self.documents.most_recent(exclude=document)
+            if successor is not None:
+                self.activate_document(successor)
+            else:
+                self.show_welcome()
+        self.plan_autosaver.flush()
+        self.documents.remove(document)
+        self.tab_order.remove(document)
+        self.destroy_view(document)
+        self.rebuild_tab_bar()
+
+    def show_welcome(self):
+        """没有打开的标签页时回到欢迎视图"""
+        self.cancel_loading()
+        self.stop_log_sync()
+        self.stop_playback()
+        self.plan_autosaver.flush()
+        self.stop_file_watch()
+        self.active_document = None
+        self.timeline_path = None
+        self.timeline_digest = None
+        self.parsed_timeline = None
+        self.timeline_graph = None
+        self.skill_index = None
+        self.timeline_path_indices = []
+        self.display_rows = None
+        self.found_row = None
+        self.branch_choices = {}
+        self.timeline_data = TimelineRows()
+        self.serpent_plan = SerpentPlan(max_count=self.max_serpent_offerings, regen_interval=self.serpent_regen_interval)
+        self.plan_history = PlanHistory()
+        self.use_view(self.welcome_view)
+        self.search_var.set("")
+        self.branch_menu.delete(0, tk.END)
+        self.branch_button.config(state=tk.DISABLED)
+        self.file_label.config(text="未选择文件")
+        self.filter_count_label.config(text="")
+        self.update_history_buttons()
+        self.rebuild_snapshot_menu()
+        self.update_serpent_history_display()
 
-        # 初始提示
-        self.show_initial_message()
+    def rebuild_tab_bar(self):
+        """按打开顺序重建标签栏（完整模型已丢弃的标签在名称后加 ·）"""
+        for widget in self.tab_frame.winfo_children():
+            widget.destroy()
+        for document in self.tab_order:
+            active = document is self.active_document
+            background = "#4CAF50" if active else "#444444"
+            tab = tk.Frame(self.tab_frame, bg=background)
+            tab.pack(side=tk.LEFT, padx=(0, 2), pady=(0, 3))
+            name = os.path.basename(document.path)
+            if not active and not document.has_model():
+                name += " ·"
+            tk.Button(
+                tab,
+                text=name,
+                command=lambda d=document: self.activate_document(d),
+                bg=background,
+                fg="white",
+                relief=tk.FLAT,
+                font=("黑体", 10, "bold" if active else "normal"),
+                padx=8
+            ).pack(side=tk.LEFT)
+            tk.Button(
+                tab,
+                text="×",
+                command=lambda d=document: self.close_document(d),
+                bg=background,
+                fg="#dddddd",
+                relief=tk.FLAT,
+                font=("Arial", 9),
+                padx=4
+            ).pack(side=tk.LEFT)
 
     def show_initial_message(self):
         """显示初始提示信息"""
@@ -166,169 +754,610 @@ class TimelineViewer:
         )
 
         if file_path:
-            try:
-                self.parse_file(file_path)
-                self.file_label.config(text=f"已加载: {file_path.split('/')[-1]}")
-                self.display_timeline()
-            except Exception as e:
-                messagebox.showerror("错误", f"加载文件失败：{str(e)}")
-
-    def parse_file(self, file_path: str):
-        """解析文件内容"""
-        self.timeline_data = []
-
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
+            self.start_loading(file_path)
+
+    def start_loading(self, file_path: str):
+        """在新标签页中打开文件；文件已经打开时切换到对应的标签页"""
+        path = os.path.abspath(file_path)
+        document = self.documents.get(path)
+        if document is None:
+            plan = SerpentPlan(max_count=self.max_serpent_offerings, regen_interval=self.serpent_regen_interval)
+            document = TimelineDocument(path, plan, PlanHistory())
+            self.documents.add(document)
+            self.tab_order.append(document)
+        self.activate_document(document)
+
+    def begin_loading(self, document: TimelineDocument):
+        """在工作线程中解析当前标签页的文件，界面线程逐批显示（取消仍在进行的加载）"""
+        self.cancel_loading()
+        self.stop_log_sync()
+        self.stop_playback()
+        file_path = document.path
+        job = {"path": file_path, "queue": queue.Queue(), "cancel": threading.Event(), "total": None, "poll": None}
+        self.load_job = job
+
+        self.parsed_timeline = None
+        self.timeline_graph = None
+        self.timeline_path = None
+        self.timeline_digest = None
+        self.stop_file_watch()
+        self.skill_index = None
+        self.timeline_path_indices = []
+        self.display_rows = None
+        self.filter_count_label.config(text="")
+        self.branch_choices = {}
+        self.branch_menu.delete(0, tk.END)
+        self.branch_button.config(state=tk.DISABLED)
+        self.timeline_data = TimelineRows()
+        self.display_timeline(loading=True)
+        self.file_label.config(text=f"加载中: {os.path.basename(file_path)}")
+        self.load_progress_label.config(text="⏳ 解析中...")
+
+        threading.Thread(target=self.load_worker, args=(job,), daemon=True).start()
+        job["poll"] = self.root.after(self.load_poll_interval, self.poll_loading, job)
+
+    def cancel_loading(self):
+        """取消当前加载任务（工作线程在下一批之前停止，已排队的批次被丢弃）"""
+        job = self.load_job
+        if job is None:
+            return
+        job["cancel"].set()
+        if job["poll"] is not None:
+            self.root.after_cancel(job["poll"])
+            job["poll"] = None
+        self.load_job = None
+        self.load_progress_label.config(text="")
+
+    def load_worker(self, job: dict):
+        """工作线程：解析文件并把行分批放入队列（不访问任何 Tk 对象）"""
+        try:
+            with profiler.span("viewer.parse_file"):
+                parsed = self.timeline_cache.load(job["path"])
+                rows = parsed.as_rows()
+            with profiler.span("viewer.build_skill_index"):
+                job["skill_index"] = SkillIndex(parsed.entries)
+            job["queue"].put(("total", len(rows)))
+            for start in range(0, len(rows), self.load_chunk_size):
+                if job["cancel"].is_set():
+                    return
+                job["queue"].put(("rows", rows[start:start + self.load_chunk_size]))
+            # 校验用的内容哈希、热重载比较用的各行和保存的计划也在工作线程中读取
+            job["watcher"] = FileWatcher(job["path"])
+            job["lines"], job["digest"] = read_timeline_lines(job["path"])
+            job["saved_plan"] = self.plan_store.load(job["path"])
+            job["queue"].put(("done", parsed))
+        except Exception as e:
+            job["queue"].put(("error", e))
+
+    def poll_loading(self, job: dict):
+        """界面线程：在每帧的时间预算内取出已解析的批次并追加显示"""
+        job["poll"] = None
+        if job is not self.load_job:
+            return
 
-        # 正则表达式匹配时间和技能名称
-        # 匹配格式：时间 "技能名称" 或 时间 技能名称（不带引号）
-        pattern = r'^(\d+\.?\d*)\s+"([^"]+)"'
-        pattern_no_quotes = r'^(\d+\.?\d*)\s+([^"#\s][^#]*?)(?:\s+[A-Z]|$)'
+        deadline = time.perf_counter() + self.load_frame_budget
+        rows_added = False
+        finished = None
+        with profiler.span("viewer.poll_loading"):
+            while finished is None and time.perf_counter() < deadline:
+                try:
+                    kind, value = job["queue"].get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "total":
+                    job["total"] = value
+                elif kind == "rows":
+                    if self.serpent_plan.dirty_range is not None:
+                        # 加载期间点击产生的变化先重算重绘，再追加新行
+                        self.flush_serpent_updates()
+                    self.timeline_data.extend(value)
+                    self.serpent_plan.extend_rows(value)
+                    rows_added = True
+                else:
+                    finished = (kind, value)
 
-        lines = content.split('\n')
+            if rows_added:
+                self.update_scroll_region()
+                self.render_visible_rows()
+                if self.fight_clock.running:
+                    self.refresh_playback_streams()
 
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith('#') or line.startswith('hideall'):
-                continue
+        if finished is not None:
+            self.finish_loading(job, *finished)
+            return
 
-            # 先尝试匹配带引号的格式
-            match = re.match(pattern, line)
-            if match:
-                time_str = match.group(1)
-                skill_name = match.group(2)
-                self.timeline_data.append((float(time_str), skill_name))
-                continue
+        if job["total"] is not None:
+            self.load_progress_label.config(text=f"⏳ 加载中 {len(self.timeline_data)}/{job['total']} 行")
+        job["poll"] = self.root.after(self.load_poll_interval, self.poll_loading, job)
+
+    def finish_loading(self, job: dict, kind: str, value):
+        """加载完成或失败后更新界面"""
+        self.load_job = None
+        self.load_progress_label.config(text="")
+
+        if kind == "error":
+            self.file_label.config(text="未选择文件")
+            self.timeline_data = TimelineRows()
+            self.display_timeline()
+            self.pending_library_jump = None
+            messagebox.showerror("错误", f"加载文件失败：{str(value)}")
+            return
 
-            # 再尝试匹配不带引号的格式
-            match = re.match(pattern_no_quotes, line)
-            if match:
-                time_str = match.group(1)
-                skill_name = match.group(2).strip()
-                if skill_name and not skill_name.startswith('label') and not skill_name.startswith('--'):
-                    self.timeline_data.append((float(time_str), skill_name))
+        self.parsed_timeline = value
+        self.timeline_graph = TimelineGraph(value)
+        self.timeline_path = job["path"]
+        self.timeline_digest = job["digest"]
+        self.timeline_lines = job["lines"]
+        self.file_watcher = job["watcher"]
+        self.reload_job = self.root.after(self.reload_poll_interval, self.poll_file_changes)
+        self.skill_index = job["skill_index"]
+        self.file_label.config(text=f"已加载: {os.path.basename(job['path'])}")
+        if not self.timeline_data:
+            self.display_timeline()
+
+        # 加载期间已经修改过计划时保留当前修改，否则读取保存的计划（行号依赖分支选择，先恢复分支）
+        saved = job["saved_plan"]
+        edited = self.plan_history.can_undo()
+        if saved is not None and not edited and saved.timeline_digest == self.timeline_digest:
+            self.branch_choices = {source: count for source, count in saved.branch_choices.items()
+                                   if source in self.timeline_graph.jumps}
+        # 逐批加载的是全部条目，forcejump 等默认触发的跳转在这里按路径重排
+        self.apply_branch_path()
+        self.report_parse_errors()
+        if edited:
+            self.schedule_autosave()
+        elif saved is not None:
+            self.apply_saved_plan(saved)
+
+        jump, self.pending_library_jump = self.pending_library_jump, None
+        if jump is not None and jump[0] == os.path.abspath(job["path"]):
+            self.show_entry_line(jump[1], jump[2])
+
+    def open_library_search(self):
+        """打开全库搜索窗口，并在工作线程中更新索引（只重新解析变化的文件）"""
+        if self.library_window is not None and self.library_window.winfo_exists():
+            self.library_window.lift()
+            return
 
-        # 按时间排序
-        self.timeline_data.sort(key=lambda x: x[0])
+        window = tk.Toplevel(self.root)
+        window.title("全库搜索")
+        window.geometry("620x420")
+        window.configure(bg="#2b2b2b")
+        self.library_window = window
+
+        query_var = tk.StringVar()
+        entry = tk.Entry(window, textvariable=query_var, font=("黑体", 11), bg="#444444", fg="white",
+                         insertbackground="white")
+        entry.pack(fill=tk.X, padx=5, pady=5)
+        entry.focus_set()
+        results = tk.Listbox(window, bg="#1e1e1e", fg="#cccccc", font=("Consolas", 10), relief=tk.FLAT,
+                             selectbackground="#00796B", activestyle="none")
+        results.pack(fill=tk.BOTH, expand=True, padx=5)
+        status = tk.Label(window, text="", bg="#2b2b2b", fg="#B0BEC5", font=("黑体", 10), anchor="w")
+        status.pack(fill=tk.X, padx=5, pady=5)
+        self.library_widgets = (query_var, results, status)
+
+        query_var.trace_add("write", lambda *args: self.run_library_query())
+        results.bind("<Double-Button-1>", lambda event: self.open_library_selection())
+        results.bind("<Return>", lambda event: self.open_library_selection())
+        entry.bind("<Return>", lambda event: self.open_library_selection(first=True))
+        entry.bind("<Down>", lambda event: results.focus_set())
+        self.update_library_index()
+
+    def update_library_index(self):
+        """在工作线程中读取并增量更新全库索引"""
+        if self.library_job is not None:
+            return
+        job = {"queue": queue.Queue(), "poll": None}
+        self.library_job = job
+        library_dir = self.library_dir
 
-    def display_timeline(self):
-        """显示时间轴"""
-        # 清除旧内容
-        for widget in self.inner_frame.winfo_children():
-            widget.destroy()
+        def worker():
+            try:
+                with profiler.span("viewer.update_library_index"):
+                    index = LibraryIndex()
+                    files = [os.path.join(library_dir, name) for name in os.listdir(library_dir)
+                             if name.endswith(".txt")]
+                    updated, removed = index.update(files)
+                job["queue"].put(("done", (index, updated, removed)))
+            except Exception as e:
+                job["queue"].put(("error", e))
 
-        # 重置蛇胆显示列表
-        self.serpent_displays = []
+        threading.Thread(target=worker, daemon=True).start()
+        self.set_library_status("⏳ 正在更新索引...")
+        job["poll"] = self.root.after(100, self.poll_library_index)
 
-        if not self.timeline_data:
-            self.show_no_data_message()
+    def poll_library_index(self):
+        """等待全库索引更新完成"""
+        job = self.library_job
+        try:
+            kind, value = job["queue"].get_nowait()
+        except queue.Empty:
+            job["poll"] = self.root.after(100, self.poll_library_index)
             return
 
-        # 标题栏
-        header_frame = tk.Frame(self.inner_frame, bg="#404040", height=40)
-        header_frame.pack(fill=tk.X, pady=(0, 10))
-        header_frame.pack_propagate(False)
+        self.library_job = None
+        if kind == "error":
+            self.set_library_status(f"✗ 更新索引失败：{value}")
+            return
+        self.library_index, updated, removed = value
+        self.run_library_query()
+        if updated or removed:
+            self.set_library_status(f"索引已更新：重新解析 {updated} 个文件，移除 {removed} 个", keep=True)
+
+    def set_library_status(self, text: str, keep: bool = False):
+        """更新搜索窗口底部的状态（keep 为 True 时附加在查询结果之后）"""
+        if self.library_window is None or not self.library_window.winfo_exists():
+            return
+        status = self.library_widgets[2]
+        status.config(text=f"{status.cget('text')}；{text}" if keep else text)
 
-        time_header = tk.Label(
-            header_frame,
-            text="时间",
-            font=("Arial", 14, "bold"),
-            fg="white",
-            bg="#404040",
-            width=10
-        )
-        time_header.pack(side=tk.LEFT, padx=(20, 0), pady=10)
+    @profiler.instrument("viewer.run_library_query")
+    def run_library_query(self):
+        """按搜索框内容查询全库索引并刷新列表"""
+        if self.library_window is None or not self.library_window.winfo_exists() or self.library_index is None:
+            return
+        query_var, results, _ = self.library_widgets
+        hits = self.library_index.query(query_var.get())
+        self.library_hits = hits[:500]
+        results.delete(0, tk.END)
+        for hit in self.library_hits:
+            details = " ".join(filter(None, (",".join(hit.ids), hit.source)))
+            results.insert(tk.END, f"{os.path.basename(hit.file):<10} {hit.time:7.1f}s  {hit.name or '--'}  {details}")
+        files = len({hit.file for hit in hits})
+        shown = f"（列出前 {len(self.library_hits)} 条）" if len(hits) > len(self.library_hits) else ""
+        self.set_library_status(f"{len(hits)} 条匹配，{files} 个文件{shown}；索引共 {len(self.library_index)} 条")
+
+    def open_library_selection(self, first: bool = False):
+        """打开列表中选中的条目所在的战斗并滚动到该行"""
+        if self.library_window is None or not self.library_hits:
+            return
+        results = self.library_widgets[1]
+        selection = results.curselection()
+        if not selection and not first:
+            return
+        hit = self.library_hits[selection[0] if selection else 0]
+        if self.timeline_path != hit.file:
+            self.start_loading(hit.file)
+        if self.load_job is None:
+            self.show_entry_line(hit.line, hit.time)
+        else:
+            self.pending_library_jump = (hit.file, hit.line, hit.time)
 
-        skill_header = tk.Label(
-            header_frame,
-            text="技能名称",
-            font=("Arial", 14, "bold"),
-            fg="white",
-            bg="#404040"
-        )
-        skill_header.pack(side=tk.LEFT, padx=(50, 0), pady=10)
+    def show_entry_line(self, line: int, time_val: float):
+        """滚动到文件中第 line 行的条目并高亮；该条目不在当前分支路径上时取时间最接近的行"""
+        if self.timeline_graph is None or not self.timeline_data:
+            return
+        row = None
+        lines = self.timeline_graph.entries.lines
+        if line in lines:
+            entry_index = lines.index(line)
+            if entry_index in self.timeline_path_indices:
+                row = self.timeline_path_indices.index(entry_index)
+        if row is None:
+            row = bisect.bisect_left(self.serpent_plan.row_times, time_val)
+            row = min(row, len(self.timeline_data) - 1)
+
+        if self.display_rows is not None and row not in self.display_rows:
+            # 被筛选隐藏的行：清除筛选条件
+            for var in self.category_vars.values():
+                var.set(False)
+            self.search_var.set("")
+            self.apply_filter()
+
+        old_row, self.found_row = self.found_row, row
+        for index in (old_row, row):
+            slot = self.row_slots.get(index)
+            if slot is not None:
+                self.canvas.itemconfigure(slot["bg"], fill=self.row_background(index))
+        self.scroll_row_into_view(row)
+        self.root.lift()
+
+    def apply_saved_plan(self, saved):
+        """一次性应用保存的计划（整体重算一次，不逐次回放点击）"""
+        if saved.timeline_digest != self.timeline_digest:
+            self.update_status_message("⚠ 时间轴文件已修改，未加载保存的计划", "#FFA726")
+            return
+        self.serpent_plan.load_saved(saved.uses, saved.offsets, saved.desired)
+        self.plan_history.reset(self.serpent_plan.state)
+        self.update_history_buttons()
+        for index, slot in self.row_slots.items():
+            self.bind_row_slot(slot, index)
+        self.update_serpent_history_display()
+        self.update_status_message(f"✓ 已读取保存的计划：{len(saved.uses)} 次使用", "#4CAF50")
 
-        button_header = tk.Label(
-            header_frame,
-            text="操作/偏移",
-            font=("Arial", 14, "bold"),
-            fg="white",
-            bg="#404040"
-        )
-        button_header.pack(side=tk.LEFT, padx=(20, 0), pady=10)
+    def schedule_autosave(self):
+        """把当前计划交给后台线程保存（连续修改合并为一次写入）"""
+        if self.timeline_path is None:
+            return
+        self.plan_autosaver.schedule(self.timeline_path, self.serpent_plan.state, self.timeline_digest,
+                                     self.branch_choices)
+
+    def on_close(self):
+        """关闭窗口前写入尚未保存的计划"""
+        self.cancel_loading()
+        self.stop_file_watch()
+        self.plan_autosaver.close()
+        self.root.destroy()
+
+    def stop_file_watch(self):
+        """停止检查当前文件的修改"""
+        if self.reload_job is not None:
+            self.root.after_cancel(self.reload_job)
+            self.reload_job = None
+        self.file_watcher = None
+        self.timeline_lines = None
+
+    def poll_file_changes(self):
+        """定时检查文件状态，修改后热重载"""
+        self.reload_job = None
+        if self.file_watcher is None:
+            return
+        if self.load_job is None and self.file_watcher.poll():
+            self.reload_timeline()
+        self.reload_job = self.root.after(self.reload_poll_interval, self.poll_file_changes)
 
-        serpent_header = tk.Label(
-            header_frame,
-            text="蛇胆量谱",
-            font=("Arial", 14, "bold"),
-            fg="#E1BEE7",
-            bg="#404040"
-        )
-        serpent_header.pack(side=tk.RIGHT, padx=(0, 30), pady=10)
+    @profiler.instrument("viewer.reload_timeline")
+    def reload_timeline(self):
+        """重新读取修改后的文件：只解析变化的行，按行比较后迁移计划并只更新变化的行槽"""
+        try:
+            lines, digest = read_timeline_lines(self.timeline_path)
+        except (OSError, UnicodeDecodeError) as e:
+            self.update_status_message(f"⚠ 重新读取文件失败：{e}", "#FFA726")
+            return
+        if lines == self.timeline_lines:
+            return
 
-        # 时间轴项目
-        for i, (time_val, skill_name) in enumerate(self.timeline_data):
-            self.create_timeline_item(i, time_val, skill_name)
+        parsed = reparse_timeline(self.timeline_lines, self.parsed_timeline, lines)
+        graph = TimelineGraph(parsed)
+        # 跳转来源的条目下标随文件改变，按 (时间, 名称) 找回分支选择
+        sources = {(graph.entries[source].time, graph.entries[source].name): source for source in graph.jumps}
+        choices = {}
+        for source, count in self.branch_choices.items():
+            entry = self.timeline_graph.entries[source]
+            new_source = sources.get((entry.time, entry.name))
+            if new_source is not None:
+                choices[new_source] = count
+        rows, indices = graph.path_rows(choices)
+
+        old_rows = self.timeline_data
+        row_map = match_rows(old_rows, rows)
+        if self.serpent_plan.dirty_range is not None:
+            self.flush_serpent_updates()
+        # 撤销历史和快照中的状态随行号一起迁移（必须在更换行之前），当前步骤就是计划迁移后的状态
+        plan = self.serpent_plan
+        self.plan_history.remap(lambda state: plan.remap_state(state, rows, row_map))
+        dropped = plan.remap_rows(rows, row_map, self.plan_history.current())
+
+        self.parsed_timeline = parsed
+        self.timeline_graph = graph
+        self.branch_choices = choices
+        self.timeline_lines = lines
+        self.timeline_digest = digest
+        self.skill_index = SkillIndex(parsed.entries)
+        self.timeline_data = rows
+        self.timeline_path_indices = indices
+        self.update_history_buttons()
+        self.rebuild_snapshot_menu()
+        self.rebuild_branch_menu(indices)
+
+        # 行槽按新行号重新登记：内容和位置都没变的行只刷新蛇胆状态，被删除的行回收
+        old_slots = self.row_slots
+        self.row_slots = {}
+        self.display_rows = None
+        self.hover_row = None
+        self.found_row = None
+        self.playback_row = None
+        for old_index, slot in old_slots.items():
+            new_index = row_map.get(old_index)
+            if new_index is None or new_index in self.row_slots:
+                self.canvas.itemconfigure(slot["tag"], state="hidden")
+                self.free_slots.append(slot)
+                continue
+            self.row_slots[new_index] = slot
+            if new_index == old_index and rows[new_index] == old_rows[old_index]:
+                self.canvas.itemconfigure(slot["bg"], fill=self.row_background(new_index))
+                self.update_slot_desired(slot)
+                self.update_slot_serpent_display(slot)
+            else:
+                self.bind_row_slot(slot, new_index)
+        self.update_scroll_region()
+        self.render_visible_rows()
+        self.apply_filter()
+        self.update_serpent_history_display()
+        if self.fight_clock.running:
+            self.refresh_playback_streams()
+        self.schedule_autosave()
+
+        changed = len(old_rows) + len(rows) - 2 * len(row_map)
+        changed += sum(1 for old_index, new_index in row_map.items() if old_rows[old_index] != rows[new_index])
+        message = f"↻ 文件已修改，重新加载（{changed} 行变化）"
+        if dropped:
+            message += f"，{dropped} 次使用所在的行已删除"
+        self.update_status_message(message, "#FFA726" if dropped else "#4CAF50")
+        self.report_parse_errors()
+
+    @profiler.instrument("viewer.parse_file")
+    def parse_file(self, file_path: str):
+        """解析文件内容"""
+        self.parsed_timeline = self.timeline_cache.load(file_path)
+        self.timeline_graph = TimelineGraph(self.parsed_timeline)
+        self.branch_choices = {}
+        self.timeline_data, _ = self.timeline_graph.path_rows()
+
+    def report_parse_errors(self):
+        """在状态栏提示解析失败的行"""
+        errors = self.parsed_timeline.errors if self.parsed_timeline else []
+        if errors:
+            self.update_status_message(f"⚠ {len(errors)} 行解析失败（{errors[0]}）", "#FFA726")
+
+    @profiler.instrument("viewer.display_timeline")
+    def display_timeline(self, loading: bool = False):
+        """显示时间轴（虚拟化：只为可见区域内的行创建画布项目）
+
+        loading 为 True 时即使还没有行也显示标题栏，之后由后台加载逐批追加行。
+        """
+        # 清除旧内容
+        for widget in self.inner_frame.winfo_children():
+            widget.destroy()
+        self.clear_row_slots()
+        self.canvas.delete("header")
+        self.serpent_plan.set_rows(self.timeline_data)
+        self.plan_history.reset(self.serpent_plan.state)
+        self.update_history_buttons()
+        self.rebuild_snapshot_menu()
+        self.hover_row = None
+        self.found_row = None
+
+        if not self.timeline_data and not loading:
+            self.timeline_displayed = False
+            self.canvas.itemconfigure(self.canvas_frame, state="normal")
+            self.show_no_data_message()
+            return
 
-    def create_timeline_item(self, index: int, time_val: float, skill_name: str):
-        """创建时间轴项目"""
-        # 交替背景色
-        bg_color = "#2e2e2e" if index % 2 == 0 else "#323232"
+        self.show_timeline_rows()
+
+    def show_timeline_rows(self, top: float = 0.0):
+        """在当前视图的画布上绘制标题栏和可见的行（不改变计划）"""
+        # 隐藏提示用的内部框架，改为直接在画布上绘制
+        self.timeline_displayed = True
+        self.canvas.itemconfigure(self.canvas_frame, state="hidden")
+
+        self.draw_timeline_header()
+        self.update_scroll_region()
+        self.canvas.yview_moveto(top)
+        self.render_visible_rows()
+
+    def draw_timeline_header(self):
+        """在画布顶部绘制标题栏"""
+        self.canvas.delete("header")
+        width = self.get_canvas_width()
+        self.layout_width = width
+        header_bottom = self.header_height - 10
+
+        self.canvas.create_rectangle(0, 0, width, header_bottom, fill="#404040", outline="", tags=("header",))
+        header_font = ("Arial", 14, "bold")
+        middle = header_bottom / 2
+        self.canvas.create_text(20, middle, text="时间", font=header_font, fill="white", anchor="w", tags=("header",))
+        self.canvas.create_text(self.name_column_x, middle, text="技能名称", font=header_font, fill="white", anchor="w", tags=("header",))
+        self.canvas.create_text(self.action_column_x, middle, text="操作/偏移", font=header_font, fill="white", anchor="w", tags=("header",))
+        self.canvas.create_text(width - 30, middle, text="蛇胆量谱", font=header_font, fill="#E1BEE7", anchor="e", tags=("header",))
+
+    def get_canvas_width(self) -> int:
+        """获取画布当前宽度"""
+        return max(self.canvas.winfo_width(), self.min_canvas_width)
+
+    def row_top(self, index: int) -> int:
+        """计算指定行在画布上的顶部坐标（筛选时按行在显示行中的位置计算）"""
+        if self.display_rows is not None:
+            index = bisect.bisect_left(self.display_rows, index)
+        return self.header_height + index * self.row_height
+
+    def update_scroll_region(self):
+        """根据行数设置滚动区域（与实际创建的行数无关）"""
+        total_height = self.row_top(len(self.timeline_data))
+        self.canvas.configure(scrollregion=(0, 0, self.get_canvas_width(), total_height))
+
+    @profiler.instrument("viewer.render_visible_rows")
+    def render_visible_rows(self):
+        """为可见区域及上下缓冲区内的行绑定行槽，移出区域的行槽回收复用"""
+        if not self.timeline_displayed:
+            return
 
-        # 特殊技能的颜色标记
-        if "--" in skill_name:
-            accent_color = "#FFA726"  # 橙色用于特殊标记
-        elif any(keyword in skill_name for keyword in ["连指向", "定格"]):
-            accent_color = "#EF5350"  # 红色用于攻击技能
-        elif any(keyword in skill_name for keyword in ["场地", "热舞"]):
-            accent_color = "#42A5F5"  # 蓝色用于场地技能
-        elif any(keyword in skill_name for keyword in ["同步", "Reset"]):
-            accent_color = "#66BB6A"  # 绿色用于同步技能
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first = int((top - self.header_height) // self.row_height) - self.row_overscan
+        last = int((bottom - self.header_height) // self.row_height) + 1 + self.row_overscan
+        first = max(0, first)
+        if self.display_rows is None:
+            last = min(len(self.timeline_data), last)
+            visible = range(first, last)
         else:
-            accent_color = "#AB47BC"  # 紫色用于其他技能
-
-        item_frame = tk.Frame(self.inner_frame, bg=bg_color, height=55)
-        item_frame.pack(fill=tk.X, pady=1)
-        item_frame.pack_propagate(False)
+            visible = self.display_rows[first:last]
+            if visible:
+                first, last = visible[0], visible[-1] + 1
+
+        # 回收移出可见区域的行槽（筛选时被隐藏的行也一并回收）
+        shown = self.row_slots if self.display_rows is None else set(visible)
+        for index in [i for i in self.row_slots if i < first or i >= last or i not in shown]:
+            slot = self.row_slots.pop(index)
+            self.canvas.itemconfigure(slot["tag"], state="hidden")
+            self.free_slots.append(slot)
+
+        for index in visible:
+            if index in self.row_slots:
+                continue
+            slot = self.free_slots.pop() if self.free_slots else self.create_row_slot()
+            self.row_slots[index] = slot
+            self.bind_row_slot(slot, index)
+
+    @profiler.instrument("viewer.apply_filter")
+    def apply_filter(self):
+        """按搜索框和勾选的分类筛选行：只改变显示哪些行，行槽回收后重新绑定，不重建显示"""
+        if self.skill_index is None:
+            return
+        categories = [category for category, var in self.category_vars.items() if var.get()]
+        display_rows = self.skill_index.filter_rows(self.timeline_path_indices, self.search_var.get(), categories)
+        if display_rows is None:
+            self.filter_count_label.config(text="")
+        else:
+            self.filter_count_label.config(text=f"显示 {len(display_rows)}/{len(self.timeline_data)} 行")
+        if display_rows == self.display_rows:
+            return
 
-        # 时间显示
-        time_label = tk.Label(
-            item_frame,
-            text=f"{time_val:.1f}s",
-            font=("Arial", 11, "bold"),
-            fg="#FFD54F",
-            bg=bg_color,
-            width=8,
-            anchor="w"
+        self.display_rows = display_rows
+        if not self.timeline_displayed:
+            return
+        # 行的位置随筛选改变，所有已绑定的行槽回收后按新位置重新绑定
+        for slot in self.row_slots.values():
+            self.canvas.itemconfigure(slot["tag"], state="hidden")
+            self.free_slots.append(slot)
+        self.row_slots = {}
+        self.hover_row = None
+        self.update_scroll_region()
+        self.canvas.yview_moveto(0)
+        self.render_visible_rows()
+
+    def clear_row_slots(self):
+        """销毁所有行槽及其嵌入的控件"""
+        for slot in list(self.row_slots.values()) + self.free_slots:
+            slot["button"].destroy()
+            slot["entry"].destroy()
+        self.row_slots = {}
+        self.free_slots = []
+        self.canvas.delete("row")
+
+    @profiler.instrument("viewer.create_row_slot")
+    def create_row_slot(self) -> dict:
+        """创建一个可复用的行槽（一组画布项目加上按钮和输入框）"""
+        self.slot_counter += 1
+        tag = f"slot{self.slot_counter}"
+        tags = (tag, "row")
+        width = self.get_canvas_width()
+        height = self.row_height - 2
+        middle = height / 2
+        canvas = self.canvas
+
+        slot = {"tag": tag, "row": None, "y": 0}
+
+        slot["bg"] = canvas.create_rectangle(0, 0, width, height, outline="", tags=tags)
+        slot["time"] = canvas.create_text(
+            20, middle, font=("Arial", 11, "bold"), fill="#FFD54F", anchor="w", tags=tags
         )
-        time_label.pack(side=tk.LEFT, padx=(20, 5), pady=15)
-
-        # 连接线
-        line_frame = tk.Frame(item_frame, bg=accent_color, width=3, height=40)
-        line_frame.pack(side=tk.LEFT, padx=(5, 15), pady=5)
-        line_frame.pack_propagate(False)
-
-        # 技能名称（简化显示，不使用框架包装）
-        skill_label = tk.Label(
-            item_frame,
-            text=skill_name,
-            font=("Arial", 11),
-            fg="white",
-            bg=bg_color,
-            anchor="w"
+        slot["accent"] = canvas.create_rectangle(
+            self.name_column_x - 20, middle - 20, self.name_column_x - 17, middle + 20, outline="", tags=tags
+        )
+        slot["name"] = canvas.create_text(
+            self.name_column_x, middle, font=("Arial", 11), fill="white", anchor="w", tags=tags
         )
-        skill_label.pack(side=tk.LEFT, pady=15, padx=(0, 15))
-
-        # 操作区域框架（包含按钮和偏移时间）
-        action_frame = tk.Frame(item_frame, bg=bg_color)
-        action_frame.pack(side=tk.LEFT, pady=10, padx=(10, 0))
 
-        # 技能按钮
-        # 创建独立的偏移时间变量
+        # 操作区域（按钮和偏移时间输入框为真实控件，随行槽复用）
         offset_var = tk.StringVar(value="0")
+        slot["offset_var"] = offset_var
+        offset_var.trace_add("write", lambda *args, s=slot: self.store_row_offset(s))
 
-        skill_button = tk.Button(
-            action_frame,
+        slot["button"] = tk.Button(
+            canvas,
             text="释放",
             font=("黑体", 9, "bold"),
             bg="#4CAF50",
@@ -339,23 +1368,14 @@ class TimelineViewer:
             bd=2,
             width=6,
             height=1,
-            command=lambda t=time_val, s=skill_name, offset=offset_var: self.use_serpent_offering_with_individual_offset(t, s, offset)
-        )
-        skill_button.pack(side=tk.LEFT)
-
-        # 偏移时间输入框
-        offset_label = tk.Label(
-            action_frame,
-            text="±",
-            font=("黑体", 10),
-            fg="#FFD54F",
-            bg=bg_color,
-            width=2
+            command=lambda s=slot: self.use_serpent_offering_for_slot(s)
         )
-        offset_label.pack(side=tk.LEFT, padx=(5, 2))
+        action_x = self.action_column_x
+        canvas.create_window(action_x, middle, window=slot["button"], anchor="w", tags=tags)
+        canvas.create_text(action_x + 75, middle, text="±", font=("黑体", 10), fill="#FFD54F", anchor="w", tags=tags)
 
-        offset_entry = tk.Entry(
-            action_frame,
+        slot["entry"] = tk.Entry(
+            canvas,
             textvariable=offset_var,
             width=4,
             font=("黑体", 10),
@@ -363,160 +1383,364 @@ class TimelineViewer:
             fg="white",
             justify="center"
         )
-        offset_entry.pack(side=tk.LEFT)
-
-        offset_unit = tk.Label(
-            action_frame,
-            text="s",
-            font=("黑体", 10),
-            fg="#FFD54F",
-            bg=bg_color,
-            width=1
+        canvas.create_window(action_x + 92, middle, window=slot["entry"], anchor="w", tags=tags)
+        canvas.create_text(action_x + 138, middle, text="s", font=("黑体", 10), fill="#FFD54F", anchor="w", tags=tags)
+
+        # 可用偏移带：输入框下方，红色底为会让已有使用失败的偏移，绿色为可用偏移，竖线为当前偏移
+        band_left = action_x + 75
+        band_right = action_x + 150
+        slot["band_left"] = band_left
+        slot["band_width"] = band_right - band_left
+        canvas.create_rectangle(band_left, 44, band_right, 49, fill="#5D1F1F", outline="", tags=tags)
+        slot["band_safe"] = canvas.create_rectangle(band_left, 44, band_left, 49, outline="", tags=tags)
+        slot["band_marker"] = canvas.create_line(band_left, 42, band_left, 51, fill="white", width=1, tags=tags)
+
+        # 希望使用标记：点击在 ☆ / ★1 / ★2 / ★3 之间切换优先级
+        slot["desired"] = canvas.create_text(
+            action_x + 160, middle, font=("Arial", 11, "bold"), anchor="w", tags=tags
         )
-        offset_unit.pack(side=tk.LEFT, padx=(2, 0))
+        canvas.tag_bind(slot["desired"], "<Button-1>", lambda event, s=slot: self.cycle_desired_for_slot(s))
+        # 双击时间跳转回放到该行
+        canvas.tag_bind(slot["time"], "<Double-Button-1>",
+                        lambda event, s=slot: self.seek_playback(self.timeline_data[s["row"]][0]))
 
         # 蛇胆量谱显示区域
-        serpent_frame = tk.Frame(item_frame, bg=bg_color, width=150, height=50)
-        serpent_frame.pack(side=tk.RIGHT, padx=(0, 20), pady=0)
-        serpent_frame.pack_propagate(False)
-
-        # 创建蛇胆显示
-        serpent_display = self.create_serpent_display(serpent_frame, bg_color, time_val)
-
-        # 添加到蛇胆显示列表
-        self.serpent_displays.append(serpent_display)
-
-        # 添加悬停效果
-        widgets_to_bind = [item_frame, time_label, skill_label, action_frame, skill_button, offset_label, offset_entry, offset_unit, serpent_frame]
-
-        def on_enter(event, frame=item_frame, orig_color=bg_color, widgets=widgets_to_bind):
-            hover_color = "#404040"
-            frame.config(bg=hover_color)
-            for widget in widgets:
-                if isinstance(widget, (tk.Label, tk.Frame)) and widget != offset_entry:
-                    try:
-                        widget.config(bg=hover_color)
-                    except:
-                        pass
-
-        def on_leave(event, frame=item_frame, orig_color=bg_color, widgets=widgets_to_bind):
-            frame.config(bg=orig_color)
-            for widget in widgets:
-                if isinstance(widget, (tk.Label, tk.Frame)) and widget != offset_entry:
-                    try:
-                        widget.config(bg=orig_color)
-                    except:
-                        pass
-
-        for widget in widgets_to_bind:
-            if widget != offset_entry:  # 不绑定输入框，避免影响输入
-                widget.bind("<Enter>", on_enter)
-                widget.bind("<Leave>", on_leave)
-
-    def create_serpent_display(self, parent_frame, bg_color, time_val):
-        """创建蛇胆量谱显示"""
+        self.create_serpent_display(slot, width - 170, tags)
+
+        # 添加悬停效果（输入框不绑定，避免影响输入）
+        canvas.tag_bind(tag, "<Enter>", lambda event, s=slot: self.set_row_hover(s, True))
+        canvas.tag_bind(tag, "<Leave>", lambda event, s=slot: self.set_row_hover(s, False))
+        slot["button"].bind("<Enter>", lambda event, s=slot: self.set_row_hover(s, True), add="+")
+        slot["button"].bind("<Leave>", lambda event, s=slot: self.set_row_hover(s, False), add="+")
+        # 右键撤销该行在当前偏移时间的蛇胆使用
+        slot["button"].bind("<Button-3>", lambda event, s=slot: self.cancel_serpent_offering_for_slot(s))
+
+        return slot
+
+    def create_serpent_display(self, slot: dict, left: int, tags: tuple):
+        """在行槽中绘制蛇胆量谱显示"""
+        canvas = self.canvas
+
         # 蛇胆标题
-        title_label = tk.Label(
-            parent_frame,
-            text="蛇胆:",
-            font=("Arial", 8, "bold"),
-            fg="#E1BEE7",
-            bg=bg_color
-        )
-        title_label.place(x=2, y=2)
-
-        # 蛇胆图标容器
-        serpent_icons = []
-        for i in range(3):
-            x_pos = 30 + i * 25
-
-            # 蛇胆背景框
-            bg_frame = tk.Frame(
-                parent_frame,
-                bg="#1a1a2e",
-                width=20,
-                height=16,
-                relief="sunken",
-                bd=1
-            )
-            bg_frame.place(x=x_pos, y=5)
-            bg_frame.pack_propagate(False)
-
-            # 蛇胆图标
-            serpent_icon = tk.Label(
-                bg_frame,
-                text="◆",
-                font=("Arial", 10, "bold"),
-                fg="#9C27B0",
-                bg="#1a1a2e"
-            )
-            serpent_icon.pack(expand=True)
-
-            serpent_icons.append((bg_frame, serpent_icon))
+        canvas.create_text(left + 2, 4, text="蛇胆:", font=("Arial", 8, "bold"), fill="#E1BEE7", anchor="nw", tags=tags)
 
-        # 数量显示
-        count_label = tk.Label(
-            parent_frame,
-            text="",
-            font=("Arial", 8, "bold"),
-            fg="#FFD54F",
-            bg=bg_color
-        )
-        count_label.place(x=105, y=6)
+        # 蛇胆图标
+        slot["serpent_icons"] = []
+        for i in range(self.max_serpent_offerings):
+            x_pos = left + 30 + i * 25
+            icon_bg = canvas.create_rectangle(x_pos, 5, x_pos + 20, 21, outline="#111111", tags=tags)
+            icon = canvas.create_text(x_pos + 10, 13, font=("Arial", 10, "bold"), tags=tags)
+            slot["serpent_icons"].append((icon_bg, icon))
 
-        # 回复进度条背景
-        progress_bg = tk.Frame(
-            parent_frame,
-            bg="#1a1a2e",
-            width=106,
-            height=8,
-            relief="sunken",
-            bd=1
+        # 数量显示
+        slot["count"] = canvas.create_text(
+            left + 30 + self.max_serpent_offerings * 25, 7, font=("Arial", 8, "bold"), fill="#FFD54F", anchor="nw", tags=tags
         )
-        progress_bg.place(x=30, y=25)
-        progress_bg.pack_propagate(False)
 
         # 回复进度条
-        progress_bar = tk.Frame(
-            progress_bg,
-            bg="#4CAF50",
-            height=6
-        )
+        slot["progress_left"] = left + 31
+        canvas.create_rectangle(left + 30, 25, left + 136, 33, fill="#1a1a2e", outline="#111111", tags=tags)
+        slot["progress_bar"] = canvas.create_rectangle(left + 31, 26, left + 32, 32, outline="", tags=tags)
 
         # 进度条文字
-        progress_label = tk.Label(
-            parent_frame,
-            text="",
-            font=("Arial", 7),
-            fg="#888888",
-            bg=bg_color
+        slot["progress_label"] = canvas.create_text(
+            left + 2, 37, font=("Arial", 7), fill="#888888", anchor="nw", tags=tags
         )
-        progress_label.place(x=2, y=35)
 
-        def update_display():
-            """更新蛇胆显示状态"""
-            # 计算当前时间点的蛇胆数量
-            serpent_count = self.calculate_serpent_at_time(time_val)
+        # 其他资源的数量（没有声明其他资源时为空）
+        slot["gauges"] = canvas.create_text(
+            left + 2, 46, font=("Arial", 7), fill="#B0BEC5", anchor="nw", tags=tags
+        )
 
-            for i, (bg_frame, icon) in enumerate(serpent_icons):
-                if i < serpent_count:
-                    # 有蛇胆 - 亮紫色
-                    icon.config(fg="#E1BEE7", text="◆")
-                    bg_frame.config(bg="#2d1b69")
-                else:
-                    # 无蛇胆 - 暗灰色
-                    icon.config(fg="#555555", text="◇")
-                    bg_frame.config(bg="#1a1a2e")
+    @profiler.instrument("viewer.bind_row_slot")
+    def bind_row_slot(self, slot: dict, index: int):
+        """将行槽移动到指定行并刷新内容"""
+        time_val, skill_name = self.timeline_data[index]
+        new_y = self.row_top(index)
+        self.canvas.move(slot["tag"], 0, new_y - slot["y"])
+        slot["y"] = new_y
+        slot["row"] = index
+        self.canvas.itemconfigure(slot["tag"], state="normal")
+
+        self.canvas.itemconfigure(slot["bg"], fill=self.row_background(index))
+        self.canvas.itemconfigure(slot["time"], text=f"{time_val:.1f}s")
+        self.canvas.itemconfigure(slot["accent"], fill=self.get_accent_color(skill_name))
+        self.canvas.itemconfigure(slot["name"], text=skill_name)
+        slot["offset_var"].set(self.serpent_plan.offsets.get(index, "0"))
+        self.update_slot_desired(slot)
+
+        self.update_slot_serpent_display(slot)
+
+    def row_background(self, index: int) -> str:
+        """获取行背景色（交替背景色，回放当前行和悬停行高亮）"""
+        if index == self.playback_row:
+            return "#1E3A5F"
+        if index == self.found_row:
+            return "#4E342E"
+        if index == self.hover_row:
+            return "#404040"
+        return "#2e2e2e" if index % 2 == 0 else "#323232"
+
+    def get_accent_color(self, skill_name: str) -> str:
+        """特殊技能的颜色标记"""
+        if "--" in skill_name:
+            return "#FFA726"  # 橙色用于特殊标记
+        elif any(keyword in skill_name for keyword in ["连指向", "定格"]):
+            return "#EF5350"  # 红色用于攻击技能
+        elif any(keyword in skill_name for keyword in ["场地", "热舞"]):
+            return "#42A5F5"  # 蓝色用于场地技能
+        elif any(keyword in skill_name for keyword in ["同步", "Reset"]):
+            return "#66BB6A"  # 绿色用于同步技能
+        else:
+            return "#AB47BC"  # 紫色用于其他技能
+
+    def set_row_hover(self, slot: dict, hovered: bool):
+        """悬停时高亮整行"""
+        index = slot["row"]
+        if index is None:
+            return
+        if hovered:
+            self.hover_row = index
+        elif self.hover_row == index:
+            self.hover_row = None
+        self.canvas.itemconfigure(slot["bg"], fill=self.row_background(index))
+
+    def store_row_offset(self, slot: dict):
+        """保存行槽输入框中的偏移时间（行槽复用时由行号取回）"""
+        index = slot["row"]
+        if index is None:
+            return
+        self.serpent_plan.set_row_offset(index, slot["offset_var"].get())
+        self.update_slot_safe_window(slot)
+        # 同一行的连续输入合并为一步历史
+        self.record_plan_history("修改偏移", ("offset", index))
+
+    def use_serpent_offering_for_slot(self, slot: dict):
+        """行槽按钮回调：对当前绑定的行使用蛇胆"""
+        index = slot["row"]
+        if index is None:
+            return False
+        time_val, skill_name = self.timeline_data[index]
+        return self.use_serpent_offering_with_individual_offset(time_val, skill_name, slot["offset_var"])
+
+    def cancel_serpent_offering_for_slot(self, slot: dict):
+        """行槽按钮右键回调：撤销当前绑定行在偏移时间的蛇胆使用"""
+        index = slot["row"]
+        if index is None:
+            return False
+        time_val, skill_name = self.timeline_data[index]
+        actual_time = self.get_actual_use_time(time_val, slot["offset_var"])
+        # 偏移时间输入框只显示有限位小数，按名称查找时间最接近的使用记录
+        use = self.serpent_plan.find_use(actual_time, skill_name)
+        if use is not None and self.remove_serpent_use(*use):
+            self.update_status_message(f"↺ 已撤销蛇胆使用 {skill_name[:8]}... (时间: {actual_time:.1f}s)", "#FFD54F")
+            return True
+        self.update_status_message(f"✗ 没有可撤销的蛇胆使用 {skill_name[:8]}... (时间: {actual_time:.1f}s)", "#ff6b6b")
+        return False
+
+    def update_slot_desired(self, slot: dict):
+        """刷新行槽的希望使用标记"""
+        priority = self.serpent_plan.desired.get(slot["row"], 0)
+        if priority:
+            self.canvas.itemconfigure(slot["desired"], text=f"★{priority}", fill="#FFD54F")
+        else:
+            self.canvas.itemconfigure(slot["desired"], text="☆", fill="#777777")
+
+    def cycle_desired_for_slot(self, slot: dict):
+        """切换行的希望使用优先级：0 -> 1 -> 2 -> 3 -> 0"""
+        index = slot["row"]
+        if index is None:
+            return
+        priority = self.serpent_plan.desired.get(index, 0)
+        self.serpent_plan.set_desired(index, (priority + 1) % 4)
+        self.update_slot_desired(slot)
+        self.record_plan_history("标记希望使用")
+
+    def auto_plan_serpent(self):
+        """按希望使用的行求解蛇胆使用计划并替换当前使用记录"""
+        if not self.serpent_plan.desired:
+            self.update_status_message("✗ 请先点击行上的 ☆ 标记希望使用蛇胆的技能", "#ff6b6b")
+            return
+
+        try:
+            window = abs(float(self.plan_window_var.get()))
+        except ValueError:
+            window = 0.0
+
+        solved = self.serpent_plan.solve(-window, window)
+        self.serpent_plan.replace_uses(solved.uses)
+        self.record_plan_history("自动规划")
+
+        # 刷新可见行的偏移时间和蛇胆显示
+        for index, slot in self.row_slots.items():
+            self.bind_row_slot(slot, index)
+        self.update_serpent_history_display()
+
+        message = f"✓ 自动规划: 放入 {len(solved.uses)} 次使用"
+        if solved.dropped:
+            message += f"，{len(solved.dropped)} 次无法放入"
+        self.update_status_message(message, "#4CAF50" if not solved.dropped else "#FFA726")
+
+    def analyze_plan_robustness(self):
+        """在工作线程中对当前使用计划做蒙特卡洛抖动模拟，完成后弹出结果"""
+        if self.robustness_job is not None:
+            return
+        uses = self.serpent_plan.uses()
+        if not uses:
+            self.update_status_message("✗ 当前没有蛇胆使用记录", "#ff6b6b")
+            return
+        if self.timeline_graph is None:
+            self.update_status_message("✗ 时间轴仍在加载", "#ff6b6b")
+            return
 
-            count_label.config(text=f"{serpent_count}/3")
+        # 只在分析时才导入（NumPy 也在分析时才加载），不拖慢启动
+        from timeline_core.robustness import Jitter, analyze_robustness, row_sync_windows, use_anchor_rows
 
-            # 更新进度条
-            self.update_serpent_progress_bar(time_val, progress_bar, progress_label, serpent_count)
+        rows, indices = self.timeline_graph.path_rows(self.branch_choices)
+        arguments = (uses, use_anchor_rows(rows, uses), row_sync_windows(self.timeline_graph.entries, indices),
+                     Jitter.parse(self.robustness_entry_jitter), Jitter.parse(self.robustness_input_delay))
+        options = {"trials": self.robustness_trials, "max_count": self.max_serpent_offerings,
+                   "regen_interval": self.serpent_regen_interval}
+        job = {"queue": queue.Queue(), "poll": None}
+        self.robustness_job = job
 
-        # 初始显示
-        update_display()
+        def worker():
+            try:
+                job["queue"].put(("done", analyze_robustness(*arguments, **options)))
+            except Exception as e:
+                job["queue"].put(("error", e))
 
-        return update_display
+        threading.Thread(target=worker, daemon=True).start()
+        self.update_status_message(f"⏳ 稳健性分析中（{self.robustness_trials} 次试验）...", "#FFD54F")
+        job["poll"] = self.root.after(100, self.poll_robustness)
+
+    def poll_robustness(self):
+        """等待稳健性分析结果"""
+        job = self.robustness_job
+        try:
+            kind, value = job["queue"].get_nowait()
+        except queue.Empty:
+            job["poll"] = self.root.after(100, self.poll_robustness)
+            return
+
+        self.robustness_job = None
+        if kind == "error":
+            self.update_status_message(f"✗ 稳健性分析失败：{value}", "#ff6b6b")
+            return
+        self.show_robustness_report(value)
+
+    def show_robustness_report(self, report):
+        """弹窗列出每次使用的失败概率"""
+        any_failure = report.any_failure_probability()
+        self.update_status_message(f"✓ 稳健性分析：至少一次使用失败的概率 {any_failure * 100:.1f}%",
+                                   "#4CAF50" if any_failure < 0.05 else "#FFA726")
+
+        window = tk.Toplevel(self.root)
+        window.title("稳健性分析")
+        window.geometry("420x360")
+        window.configure(bg="#2b2b2b")
+        text = tk.Text(window, bg="#1e1e1e", fg="#cccccc", font=("Consolas", 10), relief=tk.FLAT)
+        text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        text.tag_configure("risky", foreground="#FFA726")
+        text.tag_configure("failing", foreground="#ff6b6b")
+
+        text.insert(tk.END, f"{report.trials} 次试验，至少一次使用失败的概率 {any_failure * 100:.2f}%\n\n")
+        for (use_time, skill_name), probability in zip(report.uses, report.failure_probability()):
+            tag = "failing" if probability >= 0.5 else "risky" if probability >= 0.05 else ()
+            text.insert(tk.END, f"{use_time:8.1f}s  {probability * 100:6.2f}%  {skill_name}\n", tag)
+        text.config(state=tk.DISABLED)
+
+    def update_slot_serpent_display(self, slot: dict):
+        """更新行槽的蛇胆显示状态"""
+        serpent_state = self.serpent_plan.states[slot["row"]]
+        serpent_count = serpent_state[0]
+        canvas = self.canvas
+
+        for i, (icon_bg, icon) in enumerate(slot["serpent_icons"]):
+            if i < serpent_count:
+                # 有蛇胆 - 亮紫色
+                canvas.itemconfigure(icon, fill="#E1BEE7", text="◆")
+                canvas.itemconfigure(icon_bg, fill="#2d1b69")
+            else:
+                # 无蛇胆 - 暗灰色
+                canvas.itemconfigure(icon, fill="#555555", text="◇")
+                canvas.itemconfigure(icon_bg, fill="#1a1a2e")
+
+        canvas.itemconfigure(slot["count"], text=f"{serpent_count}/{self.max_serpent_offerings}")
+
+        # 更新进度条
+        self.update_serpent_progress_bar(serpent_state, slot)
+        self.update_slot_safe_window(slot)
+        self.update_slot_gauges(slot)
+
+    def load_gauge_resources(self, file_path: str) -> bool:
+        """读取资源定义文件，蛇胆本身仍由使用计划显示"""
+        try:
+            resources = load_resource_definitions(file_path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.update_status_message(f"✗ 资源定义读取失败: {e}", "#ff6b6b")
+            return False
+        self.gauge_resources = [resource for resource in resources if resource.name != self.serpent_resource.name]
+        self.gauge_key = None
+        for slot in self.row_slots.values():
+            self.update_slot_gauges(slot)
+        return True
+
+    def choose_gauge_resources(self):
+        """选择资源定义文件（JSON，格式同 gauges 子命令的 --resources）"""
+        file_path = filedialog.askopenfilename(
+            title="选择资源定义",
+            filetypes=[("JSON 文件", "*.json"), ("所有文件", "*.*")]
+        )
+        if file_path and self.load_gauge_resources(file_path):
+            names = "、".join(resource.name for resource in self.gauge_resources) or "无"
+            self.update_status_message(f"📊 显示的资源：{names}", "#4CAF50")
+
+    @profiler.instrument("viewer.simulate_gauges")
+    def current_gauge_values(self) -> dict:
+        """当前计划下其他资源的逐行数量（行或计划状态改变后第一次需要时重新模拟）"""
+        plan = self.serpent_plan
+        key = (plan.rows, len(plan.row_times), plan.state)
+        if self.gauge_key is None or any(old is not new for old, new in zip(self.gauge_key, key)):
+            actions = [(use_time, SERPENT_ACTION) for use_time, _ in plan.uses()]
+            self.gauge_values = simulate_resources(self.gauge_resources, actions, plan.row_times)
+            self.gauge_key = key
+        return self.gauge_values
+
+    def update_slot_gauges(self, slot: dict):
+        """更新行槽中其他资源的数量"""
+        index = slot["row"]
+        if not self.gauge_resources or index is None or index >= len(self.serpent_plan.row_times):
+            self.canvas.itemconfigure(slot["gauges"], text="")
+            return
+        values = self.current_gauge_values()
+        text = "  ".join(f"{resource.name} {values[resource.name][index]:g}/{resource.max_charges:g}"
+                         for resource in self.gauge_resources)
+        self.canvas.itemconfigure(slot["gauges"], text=text)
+
+    def update_slot_safe_window(self, slot: dict):
+        """更新行槽的可用偏移带"""
+        plan = self.serpent_plan
+        index = slot["row"]
+        if index is None or index >= len(plan.row_times):
+            return
+        low, high, usable = plan.safe_window(index)
+        canvas = self.canvas
+        left = slot["band_left"]
+        y = slot["y"]
+        scale = slot["band_width"] / (2 * plan.safe_offset_range)
+        center = left + slot["band_width"] / 2
+
+        if low != low:
+            # ±范围内没有可用偏移
+            canvas.itemconfigure(slot["band_safe"], state="hidden")
+        else:
+            canvas.coords(slot["band_safe"], center + low * scale, y + 44, center + high * scale, y + 49)
+            canvas.itemconfigure(slot["band_safe"], fill="#4CAF50" if usable else "#2E6B31", state="normal")
+
+        offset = max(-plan.safe_offset_range, min(plan.safe_offset_range, plan.row_offset(index)))
+        marker_x = center + offset * scale
+        canvas.coords(slot["band_marker"], marker_x, y + 42, marker_x, y + 51)
 
     def show_no_data_message(self):
         """显示无数据消息"""
@@ -546,97 +1770,161 @@ class TimelineViewer:
         """处理鼠标滚轮滚动"""
         self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
 
+    def _on_canvas_yview(self, first, last):
+        """画布视图变化时同步滚动条并绑定新进入可见区域的行"""
+        self.scrollbar.set(first, last)
+        self.render_visible_rows()
+
     def _on_frame_configure(self, event):
         """当内部框架大小改变时更新滚动区域"""
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        if event.widget is not self.inner_frame:
+            return
+        if not self.timeline_displayed:
+            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
 
     def _on_canvas_configure(self, event):
-        """当画布大小改变时调整内部框架宽度"""
+        """当画布大小改变时调整内部框架宽度，并按新宽度重新布局行槽"""
+        if event.widget is not self.canvas:
+            return
         self.canvas.itemconfig(self.canvas_frame, width=event.width)
+        if self.timeline_displayed and event.width != self.layout_width:
+            self.clear_row_slots()
+            self.draw_timeline_header()
+            self.update_scroll_region()
+        self.render_visible_rows()
 
     def reset_serpent(self):
         """重置蛇胆使用记录"""
-        self.serpent_uses = []
+        self.serpent_plan.clear()
+        self.record_plan_history("重置蛇胆")
         self.update_serpent_history_display()
         self.update_all_serpent_displays()
 
-    def calculate_serpent_at_time(self, target_time: float) -> int:
-        """计算指定时间点的蛇胆数量（优化版本）"""
-        # 开始时有3个蛇胆
-        current_serpent = 3
-
-        if not self.serpent_uses:
-            return current_serpent
-
-        # 获取相关使用记录（优化：减少不必要的计算）
-        relevant_uses = [(use_time, skill_name) for use_time, skill_name in self.serpent_uses if use_time <= target_time]
-        if not relevant_uses:
-            return current_serpent
-
-        relevant_uses.sort(key=lambda x: x[0])  # 按时间排序
-
-        # 跟踪使用和回复事件
-        events = []
-        for use_time, skill_name in relevant_uses:
-            events.append((use_time, -1))  # 使用蛇胆事件
-            recovery_time = use_time + self.serpent_regen_interval
-            if recovery_time <= target_time:
-                events.append((recovery_time, 1))  # 回复蛇胆事件
+    def record_plan_history(self, label: str, merge_key=None):
+        """记录一步计划历史（恢复历史状态时跳过）"""
+        state = self.serpent_plan.state
+        if self.restoring_plan or state is self.plan_history.current():
+            return
+        self.plan_history.record(state, label, merge_key)
+        self.update_history_buttons()
+        self.schedule_autosave()
+
+    def update_history_buttons(self):
+        """按历史位置启用/禁用撤销和重做按钮"""
+        self.undo_button.config(state=tk.NORMAL if self.plan_history.can_undo() else tk.DISABLED)
+        self.redo_button.config(state=tk.NORMAL if self.plan_history.can_redo() else tk.DISABLED)
+
+    def undo_plan(self):
+        """撤销上一步计划修改"""
+        step = self.plan_history.undo()
+        if step is None:
+            return
+        label, state = step
+        self.restore_plan_state(state)
+        self.update_status_message(f"↶ 已撤销：{label}", "#FFD54F")
+
+    def redo_plan(self):
+        """重做被撤销的计划修改"""
+        step = self.plan_history.redo()
+        if step is None:
+            return
+        label, state = step
+        self.restore_plan_state(state)
+        self.update_status_message(f"↷ 已重做：{label}", "#FFD54F")
 
-        # 按时间顺序处理事件
-        events.sort()
-        for event_time, change in events:
-            current_serpent = max(0, min(self.max_serpent_offerings, current_serpent + change))
+    def restore_plan_state(self, state):
+        """恢复计划状态：只重绘偏移/标记变化的可见行，蛇胆状态走增量重算"""
+        self.restoring_plan = True
+        try:
+            for index in self.serpent_plan.restore(state):
+                slot = self.row_slots.get(index)
+                if slot is not None:
+                    slot["offset_var"].set(self.serpent_plan.offsets.get(index, "0"))
+                    self.update_slot_desired(slot)
+        finally:
+            self.restoring_plan = False
+        self.update_history_buttons()
+        self.schedule_autosave()
+        self.quick_update_displays()
+
+    def rebuild_snapshot_menu(self):
+        """列出已保存的计划快照"""
+        menu = self.snapshot_menu
+        menu.delete(0, tk.END)
+        menu.add_command(label="保存当前计划为快照...", command=self.save_plan_snapshot)
+        names = self.plan_history.snapshot_names()
+        if names:
+            menu.add_separator()
+        for name in names:
+            menu.add_command(label=f"恢复：{name}", command=lambda n=name: self.restore_plan_snapshot(n))
+
+    def save_plan_snapshot(self):
+        """以输入的名称保存当前计划"""
+        name = simpledialog.askstring("保存快照", "快照名称：", parent=self.root)
+        if not name:
+            return
+        self.plan_history.save_snapshot(name, self.serpent_plan.state)
+        self.rebuild_snapshot_menu()
+        self.update_status_message(f"📌 已保存快照：{name}", "#4CAF50")
+
+    def restore_plan_snapshot(self, name: str):
+        """恢复到命名快照（作为一步历史，可以撤销）"""
+        state = self.plan_history.snapshot(name)
+        if state is None:
+            return
+        self.restore_plan_state(state)
+        self.record_plan_history(f"恢复快照 {name}")
+        self.update_status_message(f"📌 已恢复快照：{name}", "#4CAF50")
 
-        return current_serpent
+    @profiler.instrument("viewer.calculate_serpent_at_time")
+    def calculate_serpent_at_time(self, target_time: float) -> int:
+        """计算指定时间点的蛇胆数量"""
+        return self.serpent_plan.charges_at(target_time)
 
     def get_next_serpent_recovery_info(self, target_time: float) -> tuple:
-        """获取下一个蛇胆回复信息（优化版本）"""
-        if not self.serpent_uses:
-            return None, 0.0, 0.0
+        """获取下一个蛇胆回复信息"""
+        return self.serpent_plan.next_recovery(target_time)
 
-        # 直接寻找最近的未回复使用记录
-        next_recovery = None
-        min_recovery_time = float('inf')
-
-        for use_time, skill_name in self.serpent_uses:
-            recovery_time = use_time + self.serpent_regen_interval
-            if recovery_time > target_time and recovery_time < min_recovery_time:
-                min_recovery_time = recovery_time
-                next_recovery = (use_time, skill_name, recovery_time)
-
-        if next_recovery is None:
-            return None, 0.0, 0.0
-
-        use_time, skill_name, recovery_time = next_recovery
-
-        # 快速计算进度
-        elapsed = target_time - use_time
-        progress = max(0.0, min(1.0, elapsed / self.serpent_regen_interval))
+    def remove_serpent_use(self, use_time: float, skill_name: str) -> bool:
+        """删除一次蛇胆使用并重绘受影响的行"""
+        if not self.serpent_plan.remove_use(use_time, skill_name):
+            return False
+        self.record_plan_history("撤销使用")
+        self.quick_update_displays()
+        return True
 
-        return skill_name, progress, recovery_time - target_time
+    def move_serpent_use(self, use_time: float, skill_name: str, new_time: float) -> bool:
+        """移动一次蛇胆使用并重绘受影响的行"""
+        if not self.serpent_plan.move_use(use_time, skill_name, new_time):
+            return False
+        self.record_plan_history("移动使用")
+        self.quick_update_displays()
+        return True
 
-    def update_serpent_progress_bar(self, time_val: float, progress_bar: tk.Frame, progress_label: tk.Label, serpent_count: int):
+    def update_serpent_progress_bar(self, serpent_state: tuple, slot: dict):
         """更新蛇胆回复进度条"""
+        serpent_count, next_skill, progress, time_remaining = serpent_state
+        canvas = self.canvas
+        progress_bar = slot["progress_bar"]
+        progress_label = slot["progress_label"]
+
         if serpent_count >= self.max_serpent_offerings:
             # 蛇胆已满，隐藏进度条
-            progress_bar.place_forget()
-            progress_label.config(text="已满")
+            canvas.itemconfigure(progress_bar, state="hidden")
+            canvas.itemconfigure(progress_label, text="已满")
             return
 
-        # 获取下一个回复信息
-        next_skill, progress, time_remaining = self.get_next_serpent_recovery_info(time_val)
-
         if next_skill is None:
             # 没有待回复的蛇胆
-            progress_bar.place_forget()
-            progress_label.config(text="待使用")
+            canvas.itemconfigure(progress_bar, state="hidden")
+            canvas.itemconfigure(progress_label, text="待使用")
             return
 
         # 显示进度条
         progress_width = int(104 * progress)  # 104是进度条背景宽度减去边框
-        progress_bar.config(width=max(1, progress_width))
-        progress_bar.place(x=1, y=1)
+        left = slot["progress_left"]
+        y = slot["y"]
+        canvas.coords(progress_bar, left, y + 26, left + max(1, progress_width), y + 32)
 
         # 根据进度改变颜色
         if progress < 0.3:
@@ -646,46 +1934,74 @@ class TimelineViewer:
         else:
             color = "#4CAF50"  # 绿色 - 即将完成
 
-        progress_bar.config(bg=color)
+        canvas.itemconfigure(progress_bar, fill=color, state="normal")
 
         # 更新文字显示
         if time_remaining > 0:
-            progress_label.config(text=f"回复中: {time_remaining:.1f}s")
+            canvas.itemconfigure(progress_label, text=f"回复中: {time_remaining:.1f}s")
         else:
-            progress_label.config(text="即将回复")
+            canvas.itemconfigure(progress_label, text="即将回复")
 
     def update_serpent_history_display(self):
         """更新蛇胆使用历史显示（优化版本）"""
-        if not self.serpent_uses:
+        if not self.serpent_plan.ledger:
             self.serpent_history_label.config(text="蛇胆使用记录: 无")
             return
 
         # 优化：只构建一次字符串
-        recent_uses = self.serpent_uses[-3:]  # 减少显示数量提高性能
+        recent_uses = self.serpent_plan.ledger.last_uses(3)  # 减少显示数量提高性能
         history_parts = [f"{use_time:.1f}s({skill_name[:2]})" for use_time, skill_name in recent_uses]
         history_text = "蛇胆使用记录: " + " ".join(history_parts)
 
-        if len(self.serpent_uses) > 3:
+        if len(self.serpent_plan.ledger) > 3:
             history_text += "..."
 
         self.serpent_history_label.config(text=history_text)
 
+    @profiler.instrument("viewer.update_all_serpent_displays")
     def update_all_serpent_displays(self):
-        """更新所有蛇胆显示"""
-        for display_func in self.serpent_displays:
-            if display_func:
-                display_func()
+        """更新所有蛇胆显示（只有已绑定行槽的可见行需要重绘）"""
+        self.serpent_plan.recompute()
+        for slot in self.row_slots.values():
+            self.update_slot_serpent_display(slot)
+        if self.fight_clock.running:
+            self.refresh_playback_streams()
+
+    @profiler.instrument("viewer.flush_serpent_updates")
+    def flush_serpent_updates(self):
+        """只重算变化范围内的行，并只重绘状态改变的可见行"""
+        self.serpent_flush_pending = None
+        if self.serpent_flush_scheduled:
+            start = self.serpent_flush_scheduled
+            self.serpent_flush_scheduled = 0
+            profiler.record("tk.idle_delay", start, time.perf_counter_ns() - start)
+        uses_changed = self.serpent_plan.dirty_range is not None
+        changed = self.serpent_plan.refresh()
+        for index in changed:
+            slot = self.row_slots.get(index)
+            if slot is not None:
+                self.update_slot_serpent_display(slot)
+        if uses_changed or self.gauge_resources:
+            # 状态未变的可见行：偏移带按需计算，只在使用记录变化后重画；
+            # 其他资源的回复间隔不同，也可能改变
+            changed = set(changed)
+            for index, slot in self.row_slots.items():
+                if index in changed:
+                    continue
+                if uses_changed:
+                    self.update_slot_safe_window(slot)
+                if self.gauge_resources:
+                    self.update_slot_gauges(slot)
 
     def quick_update_displays(self):
-        """快速更新显示（优化版本）"""
-        # 批量更新，减少UI重绘次数
-        self.root.update_idletasks()
-
-        # 只更新必要的组件
+        """快速更新显示（变化范围内的行在空闲时合并重算）"""
         self.update_serpent_history_display()
-
-        # 延迟更新所有蛇胆显示以避免卡顿
-        self.root.after_idle(self.update_all_serpent_displays)
+        if self.fight_clock.running:
+            self.refresh_playback_streams()
+        if self.serpent_flush_pending is None:
+            self.serpent_flush_pending = self.root.after_idle(self.flush_serpent_updates)
+            if profiler.enabled:
+                self.serpent_flush_scheduled = time.perf_counter_ns()
 
     def update_status_message(self, message: str, color: str):
         """更新状态消息"""
@@ -697,18 +2013,266 @@ class TimelineViewer:
     def clear_status_message(self):
         """清除状态消息"""
         if hasattr(self, 'global_progress_label'):
+            if self.fight_clock.running:
+                # 回放中由回放唤醒刷新全局状态栏
+                self.update_playback_display(self.fight_clock.now())
+                return
             # 恢复原来的全局进度显示
-            if not self.serpent_uses:
+            if not self.serpent_plan.ledger:
                 self.global_progress_label.config(text="", fg="#4CAF50")
             else:
-                current_total_serpent = 3 - len([use for use in self.serpent_uses])
+                current_total_serpent = self.max_serpent_offerings - len(self.serpent_plan.ledger)
                 if current_total_serpent < self.max_serpent_offerings:
                     self.global_progress_label.config(text="⏳ 蛇胆回复中...", fg="#4CAF50")
                 else:
                     self.global_progress_label.config(text="✓ 蛇胆已满", fg="#4CAF50")
 
-    def use_serpent_offering_with_individual_offset(self, base_time_val: float, skill_name: str, offset_var: tk.StringVar):
-        """使用带独立偏移时间的蛇胆"""
+    def toggle_playback(self):
+        """开始/暂停回放"""
+        if self.fight_clock.running:
+            self.pause_playback()
+        elif self.timeline_data:
+            self.fight_clock.play()
+            self.play_button.config(text="⏸ 暂停")
+            self.refresh_playback_streams()
+
+    def pause_playback(self):
+        """暂停回放，保留当前战斗时间"""
+        self.fight_clock.pause()
+        self.play_button.config(text="▶ 播放")
+        self.schedule_playback_tick()
+
+    def stop_playback(self):
+        """停止回放并回到 0 秒（加载新文件时调用）"""
+        self.fight_clock.pause()
+        self.fight_clock.seek(0.0)
+        self.play_button.config(text="▶ 播放")
+        if self.playback_job is not None:
+            self.root.after_cancel(self.playback_job)
+            self.playback_job = None
+        self.set_playback_row(None)
+        self.playback_cursor = EventCursor()
+        self.clear_status_message()
+
+    def seek_playback(self, fight_time: float):
+        """跳转到指定战斗时间"""
+        self.fight_clock.seek(fight_time)
+        self.refresh_playback_streams()
+        if self.playback_row is not None:
+            self.scroll_row_into_view(self.playback_row)
+
+    def seek_playback_from_entry(self):
+        """按跳转输入框中的时间跳转"""
+        try:
+            fight_time = float(self.seek_var.get())
+        except ValueError:
+            self.update_status_message("✗ 跳转时间无效", "#ff6b6b")
+            return
+        self.seek_playback(fight_time)
+
+    def change_playback_speed(self, value: str):
+        """调整回放速度"""
+        self.fight_clock.set_speed(float(value.rstrip("x")))
+        self.schedule_playback_tick()
+
+    def refresh_playback_streams(self):
+        """按当前时间轴和使用记录重建回放事件流，并重新定位到当前战斗时间"""
+        uses = self.serpent_plan.uses()
+        use_times = [use_time for use_time, _ in uses]
+        cursor = EventCursor({
+            "row": self.serpent_plan.row_times,
+            "use": use_times,
+            "recovery": [use_time + self.serpent_regen_interval for use_time in use_times],
+        })
+        cursor.seek(self.fight_clock.now())
+        self.playback_cursor = cursor
+        self.schedule_playback_tick()
+
+    def schedule_playback_tick(self):
+        """立即刷新回放显示，并重新安排下一次唤醒"""
+        if self.playback_job is not None:
+            self.root.after_cancel(self.playback_job)
+            self.playback_job = None
+        self.playback_tick()
+
+    @profiler.instrument("viewer.playback_tick")
+    def playback_tick(self):
+        """回放唤醒：处理到期事件、刷新显示，并只在下一个事件或显示变化时再次唤醒"""
+        self.playback_job = None
+        clock = self.fight_clock
+        fight_time = clock.now()
+        self.playback_cursor.pop_due(fight_time)
+        next_change = self.update_playback_display(fight_time)
+
+        if not clock.running:
+            return
+        next_event = self.playback_cursor.next_time()
+        if next_event is None and not self.serpent_plan.next_recovery(fight_time)[0]:
+            # 所有行和回复都已经过去
+            self.pause_playback()
+            self.update_status_message("⏹ 回放结束", "#4CAF50")
+            return
+
+        wake_time = next_change if next_event is None else min(next_event, next_change)
+        delay = int(clock.real_delay(wake_time) * 1000) + 1
+        self.playback_job = self.root.after(delay, self.playback_tick)
+
+    def update_playback_display(self, fight_time: float) -> float:
+        """高亮当前行并在全局状态栏显示蛇胆量谱，返回显示内容下一次变化的战斗时间"""
+        row_index = bisect.bisect_right(self.serpent_plan.row_times, fight_time) - 1
+        self.set_playback_row(row_index if row_index >= 0 else None)
+
+        # 战斗时间按整秒显示，下次回复倒计时按向上取整的秒数显示
+        next_change = math.floor(fight_time) + 1
+        charges = self.serpent_plan.charges_at(fight_time)
+        text = f"▶ {fight_time:.0f}s  蛇胆 {charges}/{self.max_serpent_offerings}"
+        next_skill, _, time_remaining = self.serpent_plan.next_recovery(fight_time)
+        if next_skill is not None and time_remaining > 0:
+            shown = math.ceil(time_remaining)
+            text += f"  下次回复 {shown}s"
+            next_change = min(next_change, fight_time + time_remaining - (shown - 1))
+        elif charges >= self.max_serpent_offerings:
+            text += "  已满"
+        if not self.fight_clock.running:
+            text = "⏸" + text[1:]
+        self.global_progress_label.config(text=text, fg="#4FC3F7")
+        return next_change
+
+    def set_playback_row(self, index):
+        """切换回放高亮行，必要时滚动使其可见"""
+        if index == self.playback_row:
+            return
+        old_index = self.playback_row
+        self.playback_row = index
+        for row in (old_index, index):
+            slot = self.row_slots.get(row)
+            if slot is not None:
+                self.canvas.itemconfigure(slot["bg"], fill=self.row_background(row))
+        if index is not None and self.fight_clock.running:
+            self.scroll_row_into_view(index)
+
+    def scroll_row_into_view(self, index: int):
+        """行不在可见区域内时滚动，使其位于可见区域上部三分之一处"""
+        top = self.canvas.canvasy(0)
+        height = self.canvas.winfo_height()
+        row_top = self.row_top(index)
+        if top + self.header_height <= row_top and row_top + self.row_height <= top + height:
+            return
+        total_height = self.row_top(len(self.timeline_data))
+        if total_height > 0:
+            self.canvas.yview_moveto(max(0.0, row_top - height / 3) / total_height)
+
+    def apply_branch_path(self):
+        """按当前选择的分支重新取出路径上的行并重绘（不重新解析文件）"""
+        if self.timeline_graph is None:
+            return
+        rows, indices = self.timeline_graph.path_rows(self.branch_choices)
+        self.rebuild_branch_menu(indices)
+        self.timeline_path_indices = indices
+        if rows == self.timeline_data:
+            self.apply_filter()
+            return
+
+        top = self.canvas.yview()[0]
+        self.timeline_data = rows
+        self.display_rows = None
+        self.display_timeline()
+        self.canvas.yview_moveto(top)
+        # 行号随路径改变，按新路径重新筛选
+        self.apply_filter()
+        if self.fight_clock.running:
+            self.refresh_playback_streams()
+
+    def rebuild_branch_menu(self, path_indices: list):
+        """列出当前路径上可以选择的跳转"""
+        menu = self.branch_menu
+        menu.delete(0, tk.END)
+        self.branch_vars = {}
+        graph = self.timeline_graph
+        on_path = set(path_indices)
+        points = [jump for jump in graph.branch_points() if jump.source in on_path or jump.source in self.branch_choices]
+        if not points:
+            self.branch_button.config(state=tk.DISABLED)
+            return
+
+        self.branch_button.config(state=tk.NORMAL)
+        for jump in points:
+            entry = graph.entries[jump.source]
+            taken = self.branch_choices.get(jump.source, 1 if jump.force else 0) > 0
+            var = tk.BooleanVar(value=taken)
+            self.branch_vars[jump.source] = var
+            label = f"{entry.time:.1f}s {entry.name or '--'} → {jump.target_time:g}s"
+            if jump.force:
+                label += " (forcejump)"
+            menu.add_checkbutton(label=label, variable=var, command=lambda s=jump.source: self.toggle_branch(s))
+
+    def toggle_branch(self, source: int):
+        """切换一个跳转是否触发"""
+        self.branch_choices[source] = 1 if self.branch_vars[source].get() else 0
+        self.apply_branch_path()
+        self.schedule_autosave()
+
+    def toggle_log_sync(self):
+        """开始/停止按 ACT 日志同步回放时钟"""
+        if self.log_sync is not None:
+            self.stop_log_sync()
+            self.update_status_message("日志同步已停止", "#cccccc")
+            return
+
+        if self.parsed_timeline is None:
+            self.update_status_message("✗ 请先加载时间轴", "#ff6b6b")
+            return
+
+        file_path = filedialog.askopenfilename(
+            title="选择 ACT 网络日志",
+            filetypes=[("日志文件", "*.log"), ("所有文件", "*.*")]
+        )
+        if not file_path:
+            return
+
+        try:
+            tailer = LogTailer(file_path)
+        except OSError as e:
+            messagebox.showerror("错误", f"打开日志失败：{str(e)}")
+            return
+        engine = LogSyncEngine(self.parsed_timeline, self.fight_clock)
+        self.log_sync = {"engine": engine, "tailer": tailer, "poll": None}
+        self.sync_button.config(text="📡 停止同步", bg="#C62828")
+        message = f"📡 正在同步 {os.path.basename(file_path)}（{len(engine.points)} 个同步点"
+        if engine.unsupported:
+            message += f"，{engine.unsupported} 个不支持"
+        self.update_status_message(message + "）", "#4FC3F7")
+        self.poll_log_sync()
+
+    def stop_log_sync(self):
+        """停止日志同步（加载新文件时也会调用）"""
+        if self.log_sync is None:
+            return
+        if self.log_sync["poll"] is not None:
+            self.root.after_cancel(self.log_sync["poll"])
+        self.log_sync["tailer"].close()
+        self.log_sync = None
+        self.sync_button.config(text="📡 日志同步", bg="#607D8B")
+
+    @profiler.instrument("viewer.poll_log_sync")
+    def poll_log_sync(self):
+        """读取日志新增的行并同步回放时钟"""
+        log_sync = self.log_sync
+        log_sync["poll"] = None
+        lines = log_sync["tailer"].read_lines()
+        if lines:
+            profiler.count("sync.lines", len(lines))
+            synced = log_sync["engine"].feed_lines(lines)
+            if synced:
+                last = synced[-1]
+                self.play_button.config(text="⏸ 暂停" if self.fight_clock.running else "▶ 播放")
+                self.refresh_playback_streams()
+                self.update_status_message(f"📡 同步: {last.entry.name} ({last.old_time:.1f}s → {last.new_time:.1f}s)",
+                                           "#4FC3F7")
+        log_sync["poll"] = self.root.after(self.log_sync_interval, self.poll_log_sync)
+
+    def get_actual_use_time(self, base_time_val: float, offset_var: tk.StringVar) -> float:
+        """根据偏移时间输入框计算实际使用时间"""
         try:
             offset = float(offset_var.get())
         except (ValueError, AttributeError):
@@ -720,15 +2284,16 @@ class TimelineViewer:
         if actual_time < 0:
             actual_time = 0.0
 
-        # 计算实际使用时间点的蛇胆数量
-        current_serpent = self.calculate_serpent_at_time(actual_time)
+        return actual_time
 
-        if current_serpent > 0:
-            # 记录使用（使用实际时间）
-            self.serpent_uses.append((actual_time, skill_name))
-            self.serpent_uses.sort()  # 保持时间顺序
+    def use_serpent_offering_with_individual_offset(self, base_time_val: float, skill_name: str, offset_var: tk.StringVar):
+        """使用带独立偏移时间的蛇胆"""
+        actual_time = self.get_actual_use_time(base_time_val, offset_var)
 
-            # 快速更新显示
+        # 实际使用时间点有蛇胆时记录使用（使用实际时间）
+        if self.serpent_plan.add_use(actual_time, skill_name):
+            self.record_plan_history("使用蛇胆")
+            # 快速更新显示：只有不早于使用时间的行可能改变
             self.quick_update_displays()
 
             # 更新状态栏显示成功
@@ -749,10 +2314,106 @@ class TimelineViewer:
 
     # 所有弹窗反馈方法已移除，使用状态栏显示代替
 
+    def toggle_profiler_overlay(self):
+        """打开/关闭性能统计浮层（打开时开启埋点）"""
+        if self.profiler_window is not None:
+            self.close_profiler_overlay()
+            return
+
+        profiler.enabled = True
+        window = tk.Toplevel(self.root)
+        window.title("性能统计")
+        window.geometry("560x360")
+        window.configure(bg="#2b2b2b")
+        window.attributes("-topmost", True)
+        window.protocol("WM_DELETE_WINDOW", self.close_profiler_overlay)
+        self.profiler_window = window
+
+        button_frame = tk.Frame(window, bg="#2b2b2b")
+        button_frame.pack(fill=tk.X, padx=5, pady=5)
+        for text, command in (("清空", self.clear_profiler_data),
+                              ("导出 Chrome Trace", self.export_chrome_trace),
+                              ("导出 cProfile", self.export_pstats)):
+            tk.Button(
+                button_frame,
+                text=text,
+                command=command,
+                bg="#555555",
+                fg="white",
+                font=("黑体", 10)
+            ).pack(side=tk.LEFT, padx=5)
+
+        self.profiler_text = tk.Text(
+            window,
+            bg="#1e1e1e",
+            fg="#cccccc",
+            font=("Consolas", 10),
+            relief=tk.FLAT
+        )
+        self.profiler_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+        self.refresh_profiler_overlay()
+
+    def close_profiler_overlay(self):
+        """关闭性能统计浮层（未通过环境变量开启时同时关闭埋点）"""
+        if self.profiler_refresh_job is not None:
+            self.root.after_cancel(self.profiler_refresh_job)
+            self.profiler_refresh_job = None
+        if self.profiler_window is not None:
+            self.profiler_window.destroy()
+        self.profiler_window = None
+        self.profiler_text = None
+        if not os.environ.get("SGE_PROFILE"):
+            profiler.enabled = False
+
+    def refresh_profiler_overlay(self):
+        """定时刷新浮层中的最近耗时"""
+        if self.profiler_window is None:
+            return
+
+        lines = [f"{'名称':<36}{'次数':>6}{'最近ms':>9}{'平均ms':>9}{'最大ms':>9}"]
+        summary = profiler.summary()
+        for name in sorted(summary, key=lambda n: -summary[n][2] * summary[n][0]):
+            calls, last, average, longest = summary[name]
+            lines.append(f"{name:<36}{calls:>6}{last:>9.2f}{average:>9.2f}{longest:>9.2f}")
+        for name, value in sorted(profiler.counters.items()):
+            lines.append(f"{name:<36}{value:>6}")
+
+        self.profiler_text.delete("1.0", tk.END)
+        self.profiler_text.insert("1.0", "\n".join(lines))
+        self.profiler_refresh_job = self.root.after(self.profiler_refresh_interval, self.refresh_profiler_overlay)
+
+    def clear_profiler_data(self):
+        """清空埋点数据"""
+        profiler.clear()
+
+    def export_chrome_trace(self):
+        """导出 Chrome trace-event JSON"""
+        file_path = filedialog.asksaveasfilename(
+            title="导出 Chrome Trace",
+            defaultextension=".json",
+            filetypes=[("Trace JSON", "*.json"), ("所有文件", "*.*")]
+        )
+        if file_path:
+            profiler.write_chrome_trace(file_path)
+            self.update_status_message(f"✓ 已导出 {os.path.basename(file_path)}", "#4CAF50")
+
+    def export_pstats(self):
+        """导出 cProfile 兼容的统计文件"""
+        file_path = filedialog.asksaveasfilename(
+            title="导出 cProfile 统计",
+            defaultextension=".prof",
+            filetypes=[("cProfile 统计", "*.prof"), ("所有文件", "*.*")]
+        )
+        if file_path:
+            profiler.write_pstats(file_path)
+            self.update_status_message(f"✓ 已导出 {os.path.basename(file_path)}", "#4CAF50")
+
     def run(self):
         """运行应用程序"""
         self.root.mainloop()
 
 if __name__ == "__main__":
+    # 全库索引使用进程池；打包后的子进程会重新运行本入口，必须先交给 multiprocessing 处理
+    multiprocessing.freeze_support()
     app = TimelineViewer()
     app.run()